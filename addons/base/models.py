@@ -3,7 +3,6 @@ import os
 import time
 
 import markupsafe
-import requests
 from django.db import models
 from framework.auth import Auth
 from framework.auth.decorators import must_be_logged_in
@@ -557,8 +556,9 @@ class BaseStorageAddon(object):
             name = name + ': {folder}'.format(folder=folder_name)
         return name
 
-    def _get_fileobj_child_metadata(self, filenode, user, cookie=None, version=None):
+    def _get_fileobj_child_metadata(self, filenode, user, cookie=None, version=None, base_url=None):
         from api.base.utils import waterbutler_api_url_for
+        from website.util import waterbutler
 
         kwargs = {}
         if version:
@@ -566,7 +566,7 @@ class BaseStorageAddon(object):
         if cookie:
             kwargs['cookie'] = cookie
         elif user:
-            kwargs['cookie'] = user.get_or_create_cookie()
+            kwargs['cookie'] = user.get_service_cookie()
 
         metadata_url = waterbutler_api_url_for(
             self.owner._id,
@@ -575,11 +575,11 @@ class BaseStorageAddon(object):
             user=user,
             view_only=True,
             _internal=True,
-            base_url=self.owner.osfstorage_region.waterbutler_url,
+            base_url=base_url or self.owner.osfstorage_region.waterbutler_url,
             **kwargs
         )
 
-        res = requests.get(metadata_url)
+        res = waterbutler.get(metadata_url, 'metadata')
 
         if res.status_code != 200:
             raise HTTPError(res.status_code, data={'error': res.json()})
@@ -592,10 +592,13 @@ class BaseStorageAddon(object):
             return [child['attributes'] for child in data]
         return []
 
-    def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None):
+    def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None, concurrency=None):
         """
-        Recursively get file metadata
+        Get file metadata of the whole tree below filenode, listing the folders of
+        each level of the tree with up to `concurrency` requests at once
         """
+        from website.util import waterbutler
+
         filenode = filenode or {
             'path': '/',
             'kind': 'folder',
@@ -604,14 +607,26 @@ class BaseStorageAddon(object):
         if filenode.get('kind') == 'file':
             return filenode
 
-        kwargs = {
-            'version': version,
-            'cookie': cookie,
-        }
-        filenode['children'] = [
-            self._get_file_tree(child, user, cookie=cookie)
-            for child in self._get_fileobj_child_metadata(filenode, user, **kwargs)
-        ]
+        # Resolved here since the folders are listed in other threads
+        if not cookie and user:
+            cookie = user.get_service_cookie()
+        base_url = self.owner.osfstorage_region.waterbutler_url
+
+        # Only the top folder is listed at `version`
+        kwargs = {'version': version}
+        level = [filenode]
+        while level:
+            listings = waterbutler.map_concurrent(
+                lambda folder: self._get_fileobj_child_metadata(folder, user, cookie=cookie, base_url=base_url, **kwargs),
+                level,
+                concurrency=concurrency,
+            )
+            kwargs = {}
+            next_level = []
+            for folder, children in zip(level, listings):
+                folder['children'] = children
+                next_level.extend(child for child in children if child.get('kind') != 'file')
+            level = next_level
         return filenode
 
 
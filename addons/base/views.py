@@ -539,20 +539,18 @@ def create_waterbutler_log(payload, **kwargs):
             file_node = BaseFileNode.resolve_class(
                 provider, BaseFileNode.FILE
             ).get_or_create(node, '/' + metadata.get('path').lstrip('/'))
-            if file_node:
-                func_hash = getattr(file_node, 'get_hash_for_timestamp', None)
-                if func_hash:
-                    extras = {}
-                    # collect new metadata from waterbutler
-                    # and update external hashes of the file_node
-                    # to update timestamp by file hash
-                    file_node.touch(
-                        request.headers.get('Authorization'),
-                        **dict(
-                            extras,
-                            cookie=user.get_or_create_cookie()
-                        )
+            if file_node and BaseFileNode.supports_hash_timestamp(provider):
+                extras = {}
+                # collect new metadata from waterbutler
+                # and update external hashes of the file_node
+                # to update timestamp by file hash
+                file_node.touch(
+                    request.headers.get('Authorization'),
+                    **dict(
+                        extras,
+                        cookie=user.get_service_cookie()
                     )
+                )
 
     if file_created_or_updated:
         prepare_file_node(metadata['provider'])
@@ -845,7 +843,7 @@ def addon_view_or_download_file(auth, path, provider, **kwargs):
         return dict(guid=guid._id)
 
     if action == 'addtimestamp':
-        cookie = auth.user.get_or_create_cookie()
+        cookie = auth.user.get_service_cookie()
         file_info = timestamp.get_file_info(cookie, file_node, version)
         if file_info is not None:
             timestamp.add_token(auth.user.id, target, file_info)
@@ -941,7 +939,7 @@ def addon_view_file(auth, node, file_node, version):
 
     # Verify file
     verify_result = None
-    cookie = auth.user.get_or_create_cookie()
+    cookie = auth.user.get_service_cookie()
     file_info = timestamp.get_file_info(cookie, file_node, version)
     if file_info is not None:
         verify_result = timestamp.check_file_timestamp(auth.user.id, node, file_info)
@@ -1508,10 +1508,10 @@ class TestFileTags(StorageTestCase):
 @pytest.mark.enable_bookmark_creation
 class TestFileViews(StorageTestCase):
 
-    @mock.patch('website.util.timestamp.requests')
-    def test_file_views(self, mock_requests):
+    @mock.patch('website.util.timestamp.waterbutler.metadata')
+    def test_file_views(self, mock_metadata):
         # Pretend timestamp request to waterbutler failed
-        mock_requests.get.return_value.status_code = 400
+        mock_metadata.return_value = None
 
         file = create_test_file(target=self.node, user=self.user)
         url = self.node.web_url_for('addon_view_or_download_file', path=file._id, provider=file.provider)
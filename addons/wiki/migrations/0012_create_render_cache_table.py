@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from django.db import migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('addons_wiki', '0011_auto_20180415_1649'),
+    ]
+    operations = [
+        migrations.RunSQL([
+            """
+            CREATE TABLE "{}" (
+                "cache_key" varchar(255) NOT NULL PRIMARY KEY,
+                "value" text NOT NULL,
+                "expires" timestamp with time zone NOT NULL
+            );
+            CREATE INDEX "{}_expires" ON "{}" ("expires");
+            """.format(*[settings.CACHES[settings.WIKI_RENDER_CACHE_NAME]['LOCATION']] * 3)
+        ], [
+            """DROP TABLE "{}"; """.format(settings.CACHES[settings.WIKI_RENDER_CACHE_NAME]['LOCATION'])
+        ])
+    ]
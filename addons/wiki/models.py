@@ -7,6 +7,7 @@ import markdown
 import pytz
 from django.db.models.expressions import F
 from django.db.models.aggregates import Max
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from framework.auth.core import Auth
@@ -15,8 +16,9 @@ from bleach.callbacks import nofollow
 from bleach import Cleaner
 from functools import partial
 from bleach.linkifier import LinkifyFilter
-from django.db import models
+from django.db import connection, models
 from framework.forms.utils import sanitize
+from framework.postcommit_tasks.handlers import enqueue_postcommit_task
 from markdown.extensions import codehilite, fenced_code, wikilinks
 from osf.models import NodeLog, OSFUser, Comment
 from osf.models.base import BaseModel, GuidMixin, ObjectIDMixin
@@ -25,6 +27,8 @@ from osf.utils.fields import NonNaiveDateTimeField
 from osf.utils.requests import get_request_and_user_id, string_type_request_headers
 from osf.exceptions import NodeStateError
 from addons.wiki import utils as wiki_utils
+from addons.wiki.tasks import render_wiki_version
+from api.base import settings as api_settings
 from addons.wiki.exceptions import (
     PageCannotRenameError,
     PageConflictError,
@@ -48,6 +52,18 @@ SHAREJS_URL = '{}:{}'.format(SHAREJS_HOST, SHAREJS_PORT)
 SHAREJS_DB_NAME = 'sharejs'
 SHAREJS_DB_URL = 'mongodb://{}:{}/{}'.format(settings.DB_HOST, settings.DB_PORT, SHAREJS_DB_NAME)
 
+# Versions keep their creation date, which orders them and decides how they are rendered
+COPY_WIKI_VERSIONS_SQL = """
+    INSERT INTO addons_wiki_wikiversion (created, modified, _id, user_id, wiki_page_id, content, identifier)
+    SELECT created, now(), generate_object_id(), %s, %s, content, identifier
+    FROM addons_wiki_wikiversion
+    WHERE wiki_page_id = %s
+    ORDER BY created;
+"""
+
+# Versions are immutable, so their rendering only changes with the node linked to and the renderer
+RENDER_CACHE_KEY = 'wiki_render:{renderer}:{version_id}:{node_id}'
+
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098).replace(tzinfo=pytz.utc)
 
@@ -128,8 +144,7 @@ class WikiVersion(ObjectIDMixin, BaseModel):
     def is_current(self):
         return not self.wiki_page.deleted and self.id == self.wiki_page.versions.order_by('-created').first().id
 
-    def html(self, node):
-        """The cleaned HTML of the page"""
+    def _render_html(self, node):
         html_output = build_html_output(self.content, node=node)
         try:
             cleaner = Cleaner(
@@ -143,10 +158,31 @@ class WikiVersion(ObjectIDMixin, BaseModel):
             logger.warning('Returning unlinkified content.')
             return render_content(self.content, node=node)
 
+    def render(self, node):
+        """The cleaned HTML and the raw text of the page, rendered once per version and
+        `WIKI_RENDERER_VERSION`
+
+        :return dict: with keys 'html' and 'text'
+        """
+        cache = caches[api_settings.WIKI_RENDER_CACHE_NAME]
+        key = RENDER_CACHE_KEY.format(renderer=settings.WIKI_RENDERER_VERSION, version_id=self._id, node_id=node._id)
+        rendered = cache.get(key)
+        if rendered is None:
+            html = self._render_html(node)
+            rendered = {
+                'html': html,
+                'text': sanitize(html, tags=[], strip=True),
+            }
+            cache.set(key, rendered, timeout=settings.WIKI_RENDER_CACHE_TIMEOUT)
+        return rendered
+
+    def html(self, node):
+        """The cleaned HTML of the page"""
+        return self.render(node)['html']
+
     def raw_text(self, node):
         """ The raw text of the page, suitable for using in a test search"""
-
-        return sanitize(self.html(node), tags=[], strip=True)
+        return self.render(node)['text']
 
     @property
     def rendered_before_update(self):
@@ -176,6 +212,7 @@ class WikiVersion(ObjectIDMixin, BaseModel):
     def save(self, *args, **kwargs):
         rv = super(WikiVersion, self).save(*args, **kwargs)
         if self.wiki_page.node:
+            enqueue_postcommit_task(render_wiki_version, (self._id, ), {}, celery=True)
             self.wiki_page.node.update_search()
         self.wiki_page.modified = self.created
         self.wiki_page.save()
@@ -375,10 +412,10 @@ class WikiPage(GuidMixin, BaseModel):
         new_wiki_page.node = copy
         new_wiki_page.user = user
         new_wiki_page.save()
-        for version in self.versions.all().order_by('created'):
-            new_version = version.clone_version(new_wiki_page, user)
-            if save:
-                new_version.save()
+        # Copy all versions in one query. Unlike WikiVersion.save this skips the search
+        # update and spam check for each version, as the content is not new.
+        with connection.cursor() as cursor:
+            cursor.execute(COPY_WIKI_VERSIONS_SQL, [user.id, new_wiki_page.id, self.id])
         return
 
     @classmethod
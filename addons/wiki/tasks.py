@@ -0,0 +1,12 @@
+from django.apps import apps
+
+from framework.celery_tasks import app
+
+
+@app.task(max_retries=0, ignore_result=True)
+def render_wiki_version(version_id):
+    """Render a saved wiki version ahead of its first view"""
+    WikiVersion = apps.get_model('addons_wiki.WikiVersion')
+    version = WikiVersion.load(version_id)
+    if version and version.wiki_page.node:
+        version.render(version.wiki_page.node)
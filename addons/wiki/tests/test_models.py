@@ -1,12 +1,15 @@
 import pytest
 import pytz
 import datetime
+import mock
 from addons.wiki.exceptions import NameMaximumLengthError
 
 from addons.wiki.models import WikiPage, WikiVersion
 from addons.wiki.tests.factories import WikiFactory, WikiVersionFactory
 from osf_tests.factories import NodeFactory, UserFactory, ProjectFactory
+from framework.auth import Auth
 from tests.base import OsfTestCase, fake
+from website import settings
 
 pytestmark = pytest.mark.django_db
 
@@ -103,3 +106,40 @@ class TestWikiPage(OsfTestCase):
         latest_version = wiki.versions.order_by('-created')[0]
         assert latest_version.is_current
         assert wiki.get_version(5) == latest_version
+
+
+class TestWikiVersionRender:
+
+    def test_render_is_cached(self):
+        user = UserFactory()
+        node = NodeFactory()
+        page = WikiPage.objects.create_for_node(node, 'foo', '# Title\n\nSee [[bar]]', Auth(user))
+        version = page.get_version()
+        rendered = version.render(node)
+        assert '<h1>Title</h1>' in rendered['html']
+        assert '/{}/wiki/bar/'.format(node._id) in rendered['html']
+        assert rendered['text'].strip().startswith('Title')
+
+        with mock.patch('addons.wiki.models.build_html_output') as mock_build:
+            assert version.html(node) == rendered['html']
+            assert version.raw_text(node) == rendered['text']
+        assert not mock_build.called
+
+    def test_render_cache_is_keyed_by_renderer_version(self):
+        user = UserFactory()
+        node = NodeFactory()
+        page = WikiPage.objects.create_for_node(node, 'foo', 'hello', Auth(user))
+        version = page.get_version()
+        version.render(node)
+        with mock.patch.object(settings, 'WIKI_RENDERER_VERSION', settings.WIKI_RENDERER_VERSION + 1):
+            with mock.patch('addons.wiki.models.build_html_output', return_value='<p>new</p>') as mock_build:
+                assert version.html(node) == '<p>new</p>'
+        assert mock_build.called
+
+    def test_new_versions_are_rendered_separately(self):
+        user = UserFactory()
+        node = NodeFactory()
+        page = WikiPage.objects.create_for_node(node, 'foo', 'first', Auth(user))
+        assert 'first' in page.get_version().html(node)
+        page.update(user, 'second')
+        assert 'second' in page.get_version().html(node)
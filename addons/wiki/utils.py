@@ -239,8 +239,9 @@ def serialize_wiki_widget(node):
     more = node.wikis.filter(deleted__isnull=True).count() >= 2
     MAX_DISPLAY_LENGTH = 400
     rendered_before_update = False
-    if wiki_version and wiki_version.html(node):
-        wiki_html = BeautifulSoup(wiki_version.html(node)).text
+    wiki_html = wiki_version and wiki_version.html(node)
+    if wiki_html:
+        wiki_html = BeautifulSoup(wiki_html).text
         if len(wiki_html) > MAX_DISPLAY_LENGTH:
             wiki_html = BeautifulSoup(wiki_html[:MAX_DISPLAY_LENGTH] + '...', 'html.parser')
             more = True
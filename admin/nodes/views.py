@@ -238,7 +238,7 @@ class AdminNodeLogView(PermissionRequiredMixin, ListView):
 
     def get_queryset(self):
         node = self.get_object()
-        query = Q(node_id__in=list(Node.objects.get_children(node).values_list('id', flat=True)) + [node.id])
+        query = Q(node_id__in=Node.objects.get_children(node, include_root=True).values('id'))
         return NodeLog.objects.filter(query).order_by('-date').include(
             'node__guids', 'user__guids', 'original_node__guids', limit_includes=10
         )
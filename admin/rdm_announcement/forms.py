@@ -43,7 +43,7 @@ class SendForm(forms.ModelForm):
 
     class Meta:
         model = RdmAnnouncement
-        exclude = ['user', 'date_sent', 'is_success']
+        exclude = ['user', 'date_sent', 'is_success', 'status', 'recipients', 'sent', 'failed']
 
 class SettingsForm(forms.ModelForm):
 
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Background delivery of announcements by email and push notification.
+
+`queue_announcement` splits the recipients of an announcement into chunks of consecutive
+primary keys without loading them into memory, and queues one `send_announcement_chunk`
+task per chunk. Chunks are sent in parallel by the workers, emails over pooled SMTP
+connections with at most `ANNOUNCEMENT_EMAIL_RECIPIENTS_PER_MESSAGE` Bcc recipients per
+message. The status of each chunk and the progress of the announcement are recorded on
+`RdmAnnouncementChunk` and `RdmAnnouncement`; a chunk claimed by a lost worker is sent
+again once its claim is older than `ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT`.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from admin.base.settings import ANNOUNCEMENT_EMAIL_FROM, FCM_SETTINGS
+from framework.celery_tasks import app as celery_app
+from framework.email import smtp
+from osf.models import OSFUser
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementChunk, RdmFcmDevice
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+EMAIL = 'Email'
+
+
+def get_recipients(announcement):
+    """Return the users (for emails) or devices (for push notifications) the announcement
+    is sent to: all of them if it was sent by a superuser, else those of the users affiliated
+    with the institutions of the sender.
+    """
+    sender = announcement.user
+    if sender.is_superuser:
+        users = OSFUser.objects.all()
+        if announcement.announcement_type == EMAIL:
+            users = users.filter(is_active=True, is_registered=True)
+    else:
+        users = OSFUser.objects.filter(affiliated_institutions__in=sender.affiliated_institutions.all())
+    if announcement.announcement_type == EMAIL:
+        return users.distinct()
+    return RdmFcmDevice.objects.filter(user_id__in=users.values('pk'))
+
+
+def get_chunk_size(announcement):
+    if announcement.announcement_type == EMAIL:
+        return settings.ANNOUNCEMENT_EMAIL_CHUNK_SIZE
+    return settings.ANNOUNCEMENT_PUSH_CHUNK_SIZE
+
+
+@celery_app.task(ignore_result=True)
+def queue_announcement(announcement_id):
+    """Split the recipients of an announcement into chunks and queue sending them."""
+    announcement = RdmAnnouncement.objects.select_related('user').get(id=announcement_id)
+    chunk_size = get_chunk_size(announcement)
+    chunks = []
+    ids = []
+    recipient_ids = get_recipients(announcement).order_by('pk').values_list('pk', flat=True)
+    for recipient_id in recipient_ids.iterator():
+        ids.append(recipient_id)
+        if len(ids) == chunk_size:
+            chunks.append(RdmAnnouncementChunk(announcement=announcement, first_id=ids[0], last_id=ids[-1], recipients=len(ids)))
+            ids = []
+    if ids:
+        chunks.append(RdmAnnouncementChunk(announcement=announcement, first_id=ids[0], last_id=ids[-1], recipients=len(ids)))
+    RdmAnnouncementChunk.objects.bulk_create(chunks)
+
+    announcement.recipients = sum(chunk.recipients for chunk in chunks)
+    announcement.status = RdmAnnouncementChunk.SENDING if chunks else RdmAnnouncementChunk.SENT
+    announcement.is_success = not chunks
+    announcement.save()
+    for chunk_id in announcement.chunks.values_list('id', flat=True):
+        send_announcement_chunk.delay(chunk_id)
+
+
+@celery_app.task(bind=True, ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def send_announcement_chunk(self, chunk_id):
+    """Send a chunk of an announcement. The task is acknowledged once it finished, so it is
+    delivered again if its worker is lost, and takes over chunks whose claim went stale.
+    """
+    # Claim the chunk, so it is not sent twice if the task is delivered twice
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT)
+    claimable = Q(status=RdmAnnouncementChunk.QUEUED) | Q(status=RdmAnnouncementChunk.SENDING, modified__lt=stale)
+    if not RdmAnnouncementChunk.objects.filter(claimable, id=chunk_id).update(status=RdmAnnouncementChunk.SENDING, modified=now):
+        if RdmAnnouncementChunk.objects.filter(id=chunk_id, status=RdmAnnouncementChunk.SENDING).exists():
+            # Being sent by another task, check again once its claim went stale in case its
+            # worker was lost
+            raise self.retry(countdown=settings.ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT)
+        return
+    chunk = RdmAnnouncementChunk.objects.select_related('announcement__user').get(id=chunk_id)
+    announcement = chunk.announcement
+    recipients = get_recipients(announcement).filter(pk__gte=chunk.first_id, pk__lte=chunk.last_id)
+    try:
+        if announcement.announcement_type == EMAIL:
+            sent, failed = send_emails(announcement, list(recipients.values_list('username', flat=True)))
+        else:
+            sent, failed = send_push_notifications(announcement, list(recipients.values_list('device_token', flat=True)))
+    except Exception as e:
+        logger.exception('Failed to send chunk {} of announcement {}'.format(chunk.id, announcement.id))
+        finish_chunk(chunk, 0, chunk.recipients, error=str(e))
+    else:
+        finish_chunk(chunk, sent, failed)
+
+
+def send_emails(announcement, addresses):
+    """Send an announcement to `addresses` in Bcc, over pooled SMTP connections.
+
+    :return tuple: The number of addresses the email was sent and failed to be sent to
+    """
+    per_message = settings.ANNOUNCEMENT_EMAIL_RECIPIENTS_PER_MESSAGE
+    batches = [addresses[i:i + per_message] for i in range(0, len(addresses), per_message)]
+    messages = []
+    for bcc in batches:
+        email = EmailMessage(
+            subject=announcement.title,
+            body=announcement.body,
+            from_email=ANNOUNCEMENT_EMAIL_FROM,
+            to=[settings.SUPPORT_EMAIL or announcement.user.username],
+            bcc=bcc,
+        )
+        messages.append(smtp.SMTPMessage(
+            from_addr=email.from_email,
+            to_addrs=email.recipients(),
+            msg=email.message().as_string(),
+        ))
+    if settings.USE_EMAIL:
+        results = smtp.deliver(messages, username=settings.MAIL_USERNAME, password=settings.MAIL_PASSWORD)
+    else:
+        results = [True] * len(messages)
+    sent = sum(len(bcc) for bcc, result in zip(batches, results) if result)
+    return sent, len(addresses) - sent
+
+
+def send_push_notifications(announcement, tokens):
+    """Send an announcement to the devices with `tokens` in one FCM request.
+
+    :return tuple: The number of devices the notification was sent and failed to be sent to
+    """
+    from pyfcm import FCMNotification
+
+    registration_ids = list(set(tokens))  # Remove duplicates
+    push_service = FCMNotification(api_key=FCM_SETTINGS.get('FCM_SERVER_KEY'))
+    result = push_service.notify_multiple_devices(
+        registration_ids=registration_ids,
+        message_title=announcement.title,
+        message_body=announcement.body,
+    )
+    sent = result.get('success', 0)
+    return sent, len(registration_ids) - sent
+
+
+def finish_chunk(chunk, sent, failed, error=''):
+    """Record the result of sending a chunk, and the result of the announcement once all of
+    its chunks were sent.
+    """
+    chunk.status = RdmAnnouncementChunk.FAILED if error else RdmAnnouncementChunk.SENT
+    chunk.sent = sent
+    chunk.failed = failed
+    chunk.error = error
+    chunk.save()
+    RdmAnnouncement.objects.filter(id=chunk.announcement_id).update(
+        sent=F('sent') + sent,
+        failed=F('failed') + failed,
+    )
+
+    chunks = RdmAnnouncementChunk.objects.filter(announcement_id=chunk.announcement_id)
+    if not chunks.exclude(status__in=[RdmAnnouncementChunk.SENT, RdmAnnouncementChunk.FAILED]).exists():
+        is_success = not chunks.filter(status=RdmAnnouncementChunk.FAILED).exists()
+        RdmAnnouncement.objects.filter(id=chunk.announcement_id).update(
+            status=RdmAnnouncementChunk.SENT if is_success else RdmAnnouncementChunk.FAILED,
+            is_success=is_success,
+        )
@@ -8,14 +8,11 @@ from django.views.generic import UpdateView, TemplateView, FormView
 from admin.rdm.utils import RdmPermissionMixin
 from admin.rdm_announcement.forms import PreviewForm, SendForm, SettingsForm
 
-from osf.models.rdm_announcement import RdmAnnouncementOption, RdmFcmDevice
+from admin.rdm_announcement import tasks
+from osf.models.rdm_announcement import RdmAnnouncementChunk, RdmAnnouncementOption
 from osf.models.user import OSFUser
-from django.core.mail import EmailMessage
-from website.settings import SUPPORT_EMAIL
-from admin.base.settings import FCM_SETTINGS
-from admin.base.settings import EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS, ANNOUNCEMENT_EMAIL_FROM  # noqa
+from django.db import transaction
 from redminelib import Redmine
-from pyfcm import FCMNotification
 import facebook
 from urlparse import urlparse
 import tweepy
@@ -190,13 +187,18 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
         login_user_id = self.request.user.id
         form = SendForm(request.POST)
         if form.is_valid():
-            ret = self.send(form)
+            announcement = form.save(commit=False)
+            announcement.user_id = login_user_id
+            ret = self.send(form, announcement)
             data = form.cleaned_data
             if ret['is_success']:
-                temp = form.save(commit=False)
-                temp.user_id = login_user_id
-                temp.save()
-                msg = 'Send successfully!'
+                # Saved and queued only once every step, Redmine included, succeeded
+                announcement.save()
+                if announcement.status == RdmAnnouncementChunk.QUEUED:
+                    transaction.on_commit(lambda: tasks.queue_announcement.delay(announcement.id))
+                    msg = 'Queued successfully!'
+                else:
+                    msg = 'Send successfully!'
             else:
                 msg = ret['error']
         else:
@@ -205,7 +207,7 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
             data = form.cleaned_data
         return render(request, 'rdm_announcement/send.html', {'msg': msg, 'data': data})
 
-    def send(self, form):
+    def send(self, form, announcement):
         data = form.cleaned_data
         announcement_type = data['announcement_type']
         login_user_id = self.request.user.id
@@ -214,48 +216,31 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
         else:
             option = RdmAnnouncementOption.objects.create()
         if announcement_type == 'Email':
-            ret = self.send_email(data)
+            ret = self.send_email(data, announcement)
         elif announcement_type == 'SNS (Twitter)':
             ret = self.send_twitter(data, option)
         elif announcement_type == 'SNS (Facebook)':
             ret = self.send_facebook(data, option)
         else:
-            ret = self.push_notification(data)
+            ret = self.push_notification(data, announcement)
         if ret['is_success'] and getattr(option, 'redmine_api_url') and getattr(option, 'redmine_api_key'):
             if option.redmine_api_url and option.redmine_api_key:
                 ret = self.send_redmine(data, option)
         return ret
     # Email
-    def send_email(self, data):
+    def send_email(self, data, announcement):
+        return self.queue_announcement(announcement)
+
+    def queue_announcement(self, announcement):
+        """Mark the announcement to be sent to the recipients in the background once it is
+        saved, see admin.rdm_announcement.tasks
+        """
         ret = {'is_success': True, 'error': ''}
-        now_user = self.request.user
-        to_list = []
-        if self.is_super_admin:
-            all_users = OSFUser.objects.all()
-            for user in all_users:
-                if user.is_active and user.is_registered:
-                    to_list.append(user.username)
-        elif self.is_admin:
-            now_institutions_id = list(now_user.affiliated_institutions.all().values_list('pk', flat=True))
-            qs = OSFUser.objects.filter(affiliated_institutions__in=now_institutions_id).distinct().values_list('username', flat=True)
-            to_list = list(qs)
-        else:
+        if not (self.is_super_admin or self.is_admin):
             ret['is_success'] = False
             return ret
-        try:
-            email = EmailMessage(
-                subject=data['title'],
-                body=data['body'],
-                from_email=ANNOUNCEMENT_EMAIL_FROM,
-                to=[SUPPORT_EMAIL or now_user.username],
-                bcc=to_list
-            )
-            email.send(fail_silently=False)
-        except Exception as e:
-            ret['is_success'] = False
-            ret['error'] = 'Email error: ' + str(e)
-        finally:
-            return ret
+        announcement.status = RdmAnnouncementChunk.QUEUED
+        return ret
 
     # SNS (Twitter)
     def send_twitter(self, data, option):
@@ -292,39 +277,8 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
             return ret
 
     # Push notification
-    def push_notification(self, data):
-        ret = {'is_success': True, 'error': ''}
-        now_user = self.request.user
-        to_list = []
-        if self.is_super_admin:
-            all_users_id = list(OSFUser.objects.all().values_list('pk', flat=True))
-            all_tokens = RdmFcmDevice.objects.filter(user_id__in=all_users_id).distinct().values_list(
-                'device_token', flat=True)
-            to_list = list(all_tokens)
-        elif self.is_admin:
-            now_institutions_id = list(now_user.affiliated_institutions.all().values_list('pk', flat=True))
-            all_institution_users_id = list(OSFUser.objects.filter(affiliated_institutions__in=now_institutions_id).distinct().values_list(
-                'pk', flat=True))
-            all_institution_tokens = RdmFcmDevice.objects.filter(user_id__in=all_institution_users_id).distinct().values_list(
-                'device_token', flat=True)
-            to_list = list(all_institution_tokens)
-        else:
-            ret['is_success'] = False
-            return ret
-        try:
-            api_key = FCM_SETTINGS.get('FCM_SERVER_KEY')
-            FCMNotification(api_key=api_key)
-            push_service = FCMNotification(api_key=api_key)
-            registration_ids = list(set(to_list))  # Remove duplicates
-            message_title = data['title']
-            message_body = data['body']
-            push_service.notify_multiple_devices(registration_ids=registration_ids, message_title=message_title,
-                                                 message_body=message_body)
-        except Exception as e:
-            ret['is_success'] = False
-            ret['error'] = 'Push notification error: ' + str(e)
-        finally:
-            return ret
+    def push_notification(self, data, announcement):
+        return self.queue_announcement(announcement)
 
     # Redmine
     def send_redmine(self, data, option):
@@ -7,7 +7,6 @@ import datetime
 import pytz
 import re
 import json
-import requests
 import urllib
 import csv
 import pandas as pd
@@ -31,6 +30,7 @@ from osf.models import (
     AbstractNode,
     RdmStatistics)
 from website import settings as website_settings
+from website.util import waterbutler
 from website.settings import SUPPORT_EMAIL
 from api.base.utils import waterbutler_api_url_for
 import matplotlib as mpl           # noqa
@@ -50,7 +50,6 @@ RANGE_STATISTICS = 10
 STATISTICS_IMAGE_WIDTH = 8
 STATISTICS_IMAGE_HEIGHT = 4
 RECURSIVE_LIMIT = 10000
-WB_MAX_RETRY = 3
 SITE_KEY = 'rdm_statistics'
 
 class InstitutionListViewStat(RdmPermissionMixin, UserPassesTestMixin, TemplateView):
@@ -459,9 +458,6 @@ class GatherView(TemplateView):
         self.stat_list = []
         current_date = get_current_date()
         try:
-            # create session
-            self.session = requests.Session()
-            self.adapter = requests.adapters.HTTPAdapter(max_retries=WB_MAX_RETRY)
             # user crawling
             for user in self.get_users():
                 if user.affiliated_institutions.first():
@@ -489,8 +485,6 @@ class GatherView(TemplateView):
             response_json = json.dumps(response_hash)
             response = HttpResponse(response_json, content_type='application/json')
             send_error_mail(err)
-        finally:
-            self.session.close()
         return response
 
     def regist_database(self, node, guid, owner, institution, provider, date_acquired, count_list):
@@ -530,7 +524,7 @@ class GatherView(TemplateView):
         return OSFUser.objects.all()
 
     def get_cookie(self, user):
-        cookie = user.get_or_create_cookie()
+        cookie = user.get_service_cookie()
         return cookie
 
     def get_user_nodes(self, user):
@@ -542,21 +536,17 @@ class GatherView(TemplateView):
         return url
 
     def count_project_files(self, node_id, provider, path, cookies):
-        """recursive count"""
-        url_api = self.get_wb_url(node_id=node_id, provider=provider, path=re.sub(r'^//', '/', path), cookie=cookies)
-        self.session.mount('http://', self.adapter)
-        headers = {'content-type': 'application/json'}
-        # connect timeout:10sec, read timeout:300sec
-        res = self.session.get(url=url_api, headers=headers, timeout=(10.0, 300.0))
-        if not res.status_code == requests.codes.ok:
-            return None
-        response_json = res.json()
-        self.cnt += 1
-        if self.cnt > RECURSIVE_LIMIT:
-            return None
+        """count the files and folders below path, listing at most RECURSIVE_LIMIT folders in total"""
+        listings = waterbutler.walk(
+            lambda folder: self.get_wb_url(node_id=node_id, provider=provider, path=re.sub(r'^//', '/', folder), cookie=cookies),
+            path=path,
+            max_requests=RECURSIVE_LIMIT - self.cnt,
+            headers={'content-type': 'application/json'},
+        )
+        self.cnt += len(listings)
         # parse response json
-        if 'data' in response_json.keys():
-            for obj in response_json['data']:
+        for entries in listings.values():
+            for obj in entries or ():
                 if provider != 'osfstorage':
                     root, ext = os.path.splitext(obj['id'])
                 else:
@@ -574,7 +564,6 @@ class GatherView(TemplateView):
                                                                                                   err))
                         pass
                 elif obj['attributes']['kind'] == 'folder':
-                    path = re.sub('^' + provider, '', obj['id'])
                     try:
                         self.count_list.append(['folder', obj['id'], int(obj['attributes']['size'] if obj['attributes']['size'] else 0), ext])
                     except Exception as err:
@@ -584,7 +573,6 @@ class GatherView(TemplateView):
                                                                                                   obj['attributes']['size'],
                                                                                                   err))
                         pass
-                    self.count_project_files(provider=provider, node_id=node_id, path='/' + path, cookies=cookies)
 
 def simple_auth(access_token):
     digest = hashlib.sha512(SITE_KEY).hexdigest()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+import mock
+from celery.exceptions import Retry
+from django.utils import timezone
+from nose import tools as nt
+
+from admin.rdm_announcement import tasks
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementChunk
+from osf.models import OSFUser
+from osf_tests.factories import AuthUserFactory, InstitutionFactory, UnconfirmedUserFactory
+from tests.base import AdminTestCase
+from website import settings
+
+
+class TestAnnouncementTasks(AdminTestCase):
+
+    def setUp(self):
+        super(TestAnnouncementTasks, self).setUp()
+        self.sender = AuthUserFactory(is_superuser=True)
+        self.users = [AuthUserFactory() for _ in range(4)]
+        self.unconfirmed = UnconfirmedUserFactory()
+        self.recipients = OSFUser.objects.filter(is_active=True, is_registered=True).count()
+        self.announcement = RdmAnnouncement.objects.create(
+            user=self.sender,
+            title='test title',
+            body='test body',
+            announcement_type='Email',
+            status=RdmAnnouncementChunk.QUEUED,
+        )
+
+    @mock.patch.object(settings, 'ANNOUNCEMENT_EMAIL_CHUNK_SIZE', 2)
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.delay')
+    def test_queue_announcement(self, mock_send_chunk):
+        tasks.queue_announcement(self.announcement.id)
+        self.announcement.reload()
+        chunks = list(self.announcement.chunks.order_by('first_id'))
+        nt.assert_equal(self.announcement.status, RdmAnnouncementChunk.SENDING)
+        nt.assert_equal(self.announcement.recipients, self.recipients)
+        nt.assert_equal(sum(chunk.recipients for chunk in chunks), self.recipients)
+        nt.assert_true(all(chunk.recipients <= 2 for chunk in chunks))
+        nt.assert_true(all(a.last_id < b.first_id for a, b in zip(chunks, chunks[1:])))
+        nt.assert_equal(mock_send_chunk.call_count, len(chunks))
+        nt.assert_equal(self.announcement.progress, 0.0)
+
+    @mock.patch.object(settings, 'USE_EMAIL', True)
+    @mock.patch.object(settings, 'ANNOUNCEMENT_EMAIL_RECIPIENTS_PER_MESSAGE', 2)
+    @mock.patch('admin.rdm_announcement.tasks.smtp.deliver')
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.delay')
+    def test_send_announcement_chunks(self, mock_send_chunk, mock_deliver):
+        mock_deliver.side_effect = lambda messages, **kwargs: [True] * len(messages)
+        tasks.queue_announcement(self.announcement.id)
+        for chunk_id in self.announcement.chunks.values_list('id', flat=True):
+            tasks.send_announcement_chunk(chunk_id)
+
+        messages, = mock_deliver.call_args[0]
+        nt.assert_equal(len(messages), (self.recipients + 1) // 2)
+        recipients = set()
+        for message in messages:
+            nt.assert_not_in('Bcc', message.msg)
+            recipients.update(message.to_addrs)
+        nt.assert_true({user.username for user in self.users + [self.sender]} <= recipients)
+        nt.assert_not_in(self.unconfirmed.username, recipients)
+
+        self.announcement.reload()
+        nt.assert_equal(self.announcement.status, RdmAnnouncementChunk.SENT)
+        nt.assert_true(self.announcement.is_success)
+        nt.assert_equal(self.announcement.sent, self.recipients)
+        nt.assert_equal(self.announcement.progress, 1.0)
+
+    @mock.patch('admin.rdm_announcement.tasks.send_emails')
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.delay')
+    def test_failed_chunk(self, mock_send_chunk, mock_send_emails):
+        mock_send_emails.side_effect = Exception('Connection refused')
+        tasks.queue_announcement(self.announcement.id)
+        chunk = self.announcement.chunks.get()
+        tasks.send_announcement_chunk(chunk.id)
+        # Chunks are only sent once
+        tasks.send_announcement_chunk(chunk.id)
+        nt.assert_equal(mock_send_emails.call_count, 1)
+
+        chunk.reload()
+        nt.assert_equal(chunk.status, RdmAnnouncementChunk.FAILED)
+        nt.assert_equal(chunk.error, 'Connection refused')
+        self.announcement.reload()
+        nt.assert_equal(self.announcement.status, RdmAnnouncementChunk.FAILED)
+        nt.assert_false(self.announcement.is_success)
+        nt.assert_equal(self.announcement.failed, self.recipients)
+
+    @mock.patch('admin.rdm_announcement.tasks.send_emails')
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.delay')
+    def test_stale_claim(self, mock_send_chunk, mock_send_emails):
+        mock_send_emails.return_value = (self.recipients, 0)
+        tasks.queue_announcement(self.announcement.id)
+        chunk = self.announcement.chunks.get()
+        # Claimed by a worker that was lost
+        RdmAnnouncementChunk.objects.filter(id=chunk.id).update(
+            status=RdmAnnouncementChunk.SENDING,
+            modified=timezone.now() - timedelta(seconds=settings.ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT + 1),
+        )
+        tasks.send_announcement_chunk(chunk.id)
+        nt.assert_equal(mock_send_emails.call_count, 1)
+        chunk.reload()
+        nt.assert_equal(chunk.status, RdmAnnouncementChunk.SENT)
+
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.retry')
+    @mock.patch('admin.rdm_announcement.tasks.send_emails')
+    @mock.patch('admin.rdm_announcement.tasks.send_announcement_chunk.delay')
+    def test_claimed_chunk(self, mock_send_chunk, mock_send_emails, mock_retry):
+        mock_retry.return_value = Retry()
+        tasks.queue_announcement(self.announcement.id)
+        chunk = self.announcement.chunks.get()
+        RdmAnnouncementChunk.objects.filter(id=chunk.id).update(status=RdmAnnouncementChunk.SENDING)
+        with nt.assert_raises(Retry):
+            tasks.send_announcement_chunk(chunk.id)
+        nt.assert_false(mock_send_emails.called)
+        mock_retry.assert_called_once_with(countdown=settings.ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT)
+
+    def test_institution_admin_recipients(self):
+        self.sender.is_superuser = False
+        self.sender.is_staff = True
+        self.sender.save()
+        institution = InstitutionFactory()
+        institution_user = self.users[0]
+        for user in [self.sender, institution_user]:
+            user.affiliated_institutions.add(institution)
+        nt.assert_equal(
+            set(tasks.get_recipients(self.announcement).values_list('username', flat=True)),
+            {self.sender.username, institution_user.username},
+        )
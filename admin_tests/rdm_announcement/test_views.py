@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import mock
 from nose import tools as nt
 
 from django.test import RequestFactory
@@ -7,7 +8,7 @@ from osf_tests.factories import AuthUserFactory
 
 
 from admin.rdm_announcement.forms import PreviewForm, SettingsForm
-from osf.models.rdm_announcement import RdmAnnouncementOption
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementChunk, RdmAnnouncementOption
 from admin.rdm_announcement import views
 from admin_tests.utilities import setup_user_view
 from admin_tests.rdm_announcement.test_forms import data
@@ -371,3 +372,30 @@ class TestSendView(AdminTestCase):
         self.request.user.is_superuser = True
         self.request.user.is_staff = True
         nt.assert_equal(self.view.test_func(), False)
+
+    def _post(self, redmine_result):
+        self.user.is_superuser = True
+        self.user.save()
+        RdmAnnouncementOption.objects.create(user_id=self.user.id, **option_data)
+        request = RequestFactory().post('/fake_path', data)
+        view = setup_user_view(views.SendView(), request, user=self.user)
+        with mock.patch.object(views.SendView, 'send_redmine', return_value=redmine_result), \
+                mock.patch('admin.rdm_announcement.views.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('admin.rdm_announcement.views.render') as mock_render, \
+                mock.patch('admin.rdm_announcement.tasks.queue_announcement.delay') as mock_queue:
+            view.post(request)
+        return mock_render.call_args[0][2]['msg'], mock_queue
+
+    def test_post_queues_announcement(self):
+        msg, mock_queue = self._post({'is_success': True, 'error': ''})
+        announcement = RdmAnnouncement.objects.get(user=self.user)
+        nt.assert_equal(msg, 'Queued successfully!')
+        nt.assert_equal(announcement.status, RdmAnnouncementChunk.QUEUED)
+        mock_queue.assert_called_once_with(announcement.id)
+
+    def test_post_redmine_error(self):
+        """announcements are neither saved nor queued if a later step fails"""
+        msg, mock_queue = self._post({'is_success': False, 'error': 'Redmine error: refused'})
+        nt.assert_equal(msg, 'Redmine error: refused')
+        nt.assert_false(RdmAnnouncement.objects.filter(user=self.user).exists())
+        nt.assert_false(mock_queue.called)
@@ -387,6 +387,9 @@ def mocked_requests_get(*args, **kwargs):
 
         def json(self):
             return self.json_data
+
+        def close(self):
+            pass
     return MockResponse({'data': [{'type': 'files', 'links': {'delete': 'http://localhost:7777/v1/resources/jy73h/providers/osfstorage/5ca01e2d3618060086091b85', 'upload': 'http://localhost:7777/v1/resources/jy73h/providers/osfstorage/5ca01e2d3618060086091b85?kind=file', 'move': 'http://localhost:7777/v1/resources/jy73h/providers/osfstorage/5ca01e2d3618060086091b85', 'download': 'http://localhost:7777/v1/resources/jy73h/providers/osfstorage/5ca01e2d3618060086091b85'}, 'id': 'osfstorage/5ca01e2d3618060086091b85', 'attributes': {'path': '/5ca01e2d3618060086091b85', 'size': 44167, 'contentType': None, 'created_utc': '2019-03-31T01:55:57.706150+00:00', 'provider': 'osfstorage', 'sizeInt': 44167, 'etag': '42811153669f5825fda6f810975bc44af5973bb7c3a1b163ae722358715673d0', 'modified_utc': '2019-03-31T01:55:57.706150+00:00', 'modified': '2019-03-31T01:55:57.70615+00:00', 'extra': {'latestVersionSeen': None, 'guid': None, 'version': 1, 'hashes': {'sha256': '93afecd63c60f0ff0ef6cf0e8b904c281f00f9e5251751b9fa292f16e6dc0d9b', 'md5': 'a89fa2dd3c6bbff0f5e58aa2b4e8f735'}, 'checkout': None, 'downloads': 0}, 'resource': 'jy73h', 'name': 'OSF contact.png', 'materialized': '/OSF contact.png', 'kind': 'file'}}]}, 200)
 
 class TestGatherView(AdminTestCase):
@@ -420,7 +423,7 @@ class TestGatherView(AdminTestCase):
             institution.delete()
         shutil.rmtree(self.tmp_dir)
 
-    @patch('admin.rdm_statistics.views.requests.Session.get', side_effect=mocked_requests_get)
+    @patch('admin.rdm_statistics.views.waterbutler.get', side_effect=mocked_requests_get)
     def test_get(self, *args, **kwargs):
         resp = json.loads(self.view.get(self, self.request, self.view.args, self.view.kwargs).content)
         nt.assert_equal(len(resp), 2)
@@ -472,7 +475,7 @@ class TestGatherView(AdminTestCase):
     def test_get_all_statistic_data_csv(self, **kwargs):
         nt.assert_is_instance(views.get_all_statistic_data_csv(self.institution1, **self.view.kwargs), type([]))
 
-    @patch('admin.rdm_statistics.views.requests.Session.get', side_effect=mocked_requests_get)
+    @patch('admin.rdm_statistics.views.waterbutler.get', side_effect=mocked_requests_get)
     def test_get_graphs(self, mock_sessionget):
         self.request.user.is_active = True
         self.request.user.is_registered = True
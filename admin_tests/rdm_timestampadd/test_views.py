@@ -260,10 +260,11 @@ class TestAddTimestampData(AdminTestCase):
         rdmuserkey_pub_key.delete()
 
     @mock.patch('celery.contrib.abortable.AbortableTask.is_aborted')
-    @mock.patch('website.util.waterbutler.shutil')
+    @mock.patch('website.util.waterbutler.request')
     @mock.patch('requests.get')
-    def test_post(self, mock_get, mock_shutil, mock_aborted, **kwargs):
+    def test_post(self, mock_get, mock_wb_request, mock_aborted, **kwargs):
         mock_get.return_value.content = ''
+        mock_wb_request.return_value = mock_get.return_value
         mock_aborted.return_value = False
 
         res_timestampaddlist = self.view.get_context_data()
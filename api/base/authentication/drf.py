@@ -16,8 +16,9 @@ from api.base.exceptions import (
 )
 from framework.auth import cas
 from framework.auth.core import get_user
+from framework.sessions import store
 from osf import features
-from osf.models import OSFUser, Session
+from osf.models import OSFUser
 from website import settings
 
 
@@ -33,11 +34,7 @@ def get_session_from_cookie(cookie_val):
         session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie_val)
     except itsdangerous.BadSignature:
         return None
-    try:
-        session = Session.objects.get(_id=session_id)
-        return session
-    except Session.DoesNotExist:
-        return None
+    return store.load_session(session_id)
 
 
 def check_user(user):
@@ -159,7 +156,11 @@ class OSFBasicAuthentication(BasicAuthentication):
         :raises: AuthenticationFailed
         """
 
-        user = get_user(email=userid, password=password)
+        verified = userid and password and store.get_verified_password(userid, password)
+        if verified:
+            user = OSFUser.load(verified['user_id'])
+        else:
+            user = get_user(email=userid, password=password)
 
         if userid and not user:
             raise exceptions.AuthenticationFailed(_('Invalid username/password.'))
@@ -167,6 +168,8 @@ class OSFBasicAuthentication(BasicAuthentication):
             raise exceptions.NotAuthenticated()
 
         check_user(user)
+        if not verified and not TwoFactorUserSettings.objects.filter(owner_id=user.pk, is_confirmed=True).exists():
+            store.set_verified_password(userid, password, user)
         return user, None
 
     @staticmethod
@@ -217,13 +220,16 @@ class OSFCASAuthentication(authentication.BaseAuthentication):
         except (cas.CasTokenError, KeyError):
             return None
 
-        try:
-            cas_auth_response = client.profile(auth_token)
-        except cas.CasHTTPError:
-            raise exceptions.NotAuthenticated(_('User provided an invalid OAuth2 access token'))
+        cas_auth_response = store.get_verified_token(auth_token)
+        if cas_auth_response is None:
+            try:
+                cas_auth_response = client.profile(auth_token)
+            except cas.CasHTTPError:
+                raise exceptions.NotAuthenticated(_('User provided an invalid OAuth2 access token'))
 
-        if cas_auth_response.authenticated is False:
-            raise exceptions.NotAuthenticated(_('CAS server failed to authenticate this token'))
+            if cas_auth_response.authenticated is False:
+                raise exceptions.NotAuthenticated(_('CAS server failed to authenticate this token'))
+            store.set_verified_token(auth_token, cas_auth_response)
 
         user = OSFUser.load(cas_auth_response.user)
         if not user:
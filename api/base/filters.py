@@ -13,8 +13,8 @@ from api.base.exceptions import (
 )
 from api.base.serializers import RelationshipField, ShowIfVersion, TargetField
 from dateutil import parser as date_parser
-from django.core.exceptions import ValidationError
-from django.db.models import QuerySet as DjangoQuerySet
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Model, QuerySet as DjangoQuerySet
 from django.db.models import Q
 from rest_framework import serializers as ser
 from rest_framework.filters import OrderingFilter
@@ -365,36 +365,73 @@ class ListFilterMixin(FilterMixin):
         """filters default queryset based on query parameters"""
         filters = self.parse_query_params(query_params)
         queryset = default_queryset
-        query_parts = []
 
-        if filters:
+        if filters and isinstance(queryset, list):
+            # Filtering in Python is only meant for collections that are not in the database,
+            # like addon configs and scopes: database rows must be filtered in SQL, before pagination
+            assert not any(isinstance(item, Model) for item in queryset[:1]), (
+                '{} must return a QuerySet from get_default_queryset to be filtered'.format(type(self).__name__)
+            )
             for key, field_names in filters.items():
-
-                sub_query_parts = []
                 for field_name, data in field_names.items():
                     operations = data if isinstance(data, list) else [data]
-                    if isinstance(queryset, list):
-                        for operation in operations:
-                            queryset = self.get_filtered_queryset(field_name, operation, queryset)
-                    else:
-                        sub_query_parts.append(
-                            functools.reduce(
-                                operator.and_, [
-                                    self.build_query_from_field(field_name, operation)
-                                    for operation in operations
-                                ],
-                            ),
-                        )
-                if not isinstance(queryset, list):
-                    sub_query = functools.reduce(operator.or_, sub_query_parts)
-                    query_parts.append(sub_query)
-
-            if not isinstance(queryset, list):
-                for query in query_parts:
-                    queryset = queryset.filter(query)
+                    for operation in operations:
+                        queryset = self.get_filtered_queryset(field_name, operation, queryset)
+            return queryset
 
+        for query in self.compile_filters(filters, queryset):
+            queryset = queryset.filter(query)
         return queryset
 
+    def compile_filters(self, filters, queryset):
+        """Compiles parsed query params to one Q object per `filter[...]` query param.
+
+        Fields of a single query param are ORed, the operations of a field (e.g. the bounds of a
+        date range) are ANDed.
+
+        :param dict filters: query params, as returned by `parse_query_params`
+        :param QuerySet queryset: queryset the filters are applied to
+        :return list<Q>:
+        """
+        query_parts = []
+        for key, field_names in filters.items():
+            sub_query_parts = []
+            for field_name, data in field_names.items():
+                operations = data if isinstance(data, list) else [data]
+                sub_query_parts.append(
+                    functools.reduce(
+                        operator.and_, [
+                            self.compile_filter(field_name, operation, queryset)
+                            for operation in operations
+                        ],
+                    ),
+                )
+            query_parts.append(functools.reduce(operator.or_, sub_query_parts))
+        return query_parts
+
+    def compile_filter(self, field_name, operation, queryset):
+        """Compiles a single filter operation with `build_query_from_field`, and checks that
+        the database can evaluate it.
+
+        Filters on fields without a model counterpart, like `SerializerMethodField`s, need an
+        override of `build_query_from_field` mapping them to ORM lookups or annotations.
+
+        :raises InvalidFilterFieldError: If the filter cannot be evaluated by the database
+        :raises InvalidFilterValue: If the filter value does not match the type of the model field
+        """
+        query = self.build_query_from_field(field_name, operation)
+        try:
+            # Only builds the SQL, nothing is queried
+            queryset.filter(query)
+        except FieldError:
+            raise InvalidFilterFieldError(
+                parameter='filter',
+                detail="Field '{0}' cannot be filtered on this endpoint.".format(field_name),
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidFilterValue(value=operation['value'])
+        return query
+
     def build_query_from_field(self, field_name, operation):
         query_field_name = operation['source_field_name']
         if operation['op'] == 'ne':
@@ -1,8 +1,17 @@
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
 from django.utils import six
 from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist
 from django.core.urlresolvers import reverse
 from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
-from django.db.models import QuerySet
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
 
 from rest_framework import pagination
 from rest_framework.exceptions import NotFound
@@ -10,6 +19,8 @@ from rest_framework.response import Response
 from rest_framework.utils.urls import (
     replace_query_param, remove_query_param,
 )
+from api.base.exceptions import InvalidQueryStringError
+from api.base.permissions import prefetch_object_permissions
 from api.base.serializers import is_anonymized
 from api.base.settings import MAX_PAGE_SIZE
 from api.base.utils import absolute_reverse
@@ -18,16 +29,60 @@ from osf.models import AbstractNode, Comment, Preprint, Guid
 from website.search.elastic_search import DOC_TYPE_TO_MODEL
 
 
+def encode_cursor_value(value):
+    # Full precision, unlike DjangoJSONEncoder which truncates microseconds
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return six.text_type(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def estimate_count(queryset):
+    """Return the number of rows of `queryset` estimated by the query planner, without
+    running the query.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, six.string_types):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPage(object):
+    """A page of a queryset, and the keyset positions of its first and last items."""
+
+    def __init__(self, items, first_position, last_position, has_previous, has_next, per_page, total):
+        self.items = items
+        self.first_position = first_position
+        self.last_position = last_position
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.per_page = per_page
+        self.total = total
+
+
 class JSONAPIPagination(pagination.PageNumberPagination):
     """
     Custom paginator that formats responses in a JSON-API compatible format.
 
     Properly handles pagination of embedded objects.
 
+    Pages are numbered unless the `page[cursor]` query param is given (empty for the first
+    page). Cursor pagination selects the items following the last item of the previous page by
+    the ordering of the queryset and the primary key, so that deep pages are as fast as the
+    first one, and only counts the items when `page[total]=approximate` is given, as estimated
+    by the query planner.
     """
 
     page_size_query_param = 'page[size]'
     max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'page[cursor]'
+    total_query_param = 'page[total]'
+    invalid_cursor_message = 'Invalid cursor'
+    cursor_page = None
 
     def page_number_query(self, url, page_number):
         """
@@ -68,7 +123,44 @@ class JSONAPIPagination(pagination.PageNumberPagination):
         page_number = self.page.next_page_number()
         return self.page_number_query(url, page_number)
 
+    def cursor_query(self, url, position, reverse=False):
+        """
+        Builds uri and adds cursor param, empty for the first page.
+        """
+        url = remove_query_param(self.request.build_absolute_uri(url), '_')
+        url = remove_query_param(url, self.page_query_param)
+        cursor = ''
+        if position is not None or reverse:
+            cursor = base64.urlsafe_b64encode(json.dumps(
+                {'p': position, 'r': int(reverse)}, default=encode_cursor_value
+            ))
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_cursor_links(self, url):
+        page = self.cursor_page
+        return OrderedDict([
+            ('self', remove_query_param(self.request.build_absolute_uri(url), '_')),
+            ('first', self.cursor_query(url, None) if page.has_previous else None),
+            ('last', self.cursor_query(url, None, reverse=True) if page.has_next else None),
+            ('prev', self.cursor_query(url, page.first_position, reverse=True) if page.has_previous else None),
+            ('next', self.cursor_query(url, page.last_position) if page.has_next else None),
+        ])
+
+    def get_cursor_meta(self):
+        return OrderedDict([
+            ('total', self.cursor_page.total),
+            ('per_page', self.cursor_page.per_page),
+        ])
+
     def get_response_dict_deprecated(self, data, url):
+        if self.cursor_page is not None:
+            links = self.get_cursor_links(url)
+            links.pop('self')
+            links['meta'] = self.get_cursor_meta()
+            return OrderedDict([
+                ('data', data),
+                ('links', links),
+            ])
         return OrderedDict([
             ('data', data),
             (
@@ -88,6 +180,12 @@ class JSONAPIPagination(pagination.PageNumberPagination):
         ])
 
     def get_response_dict(self, data, url):
+        if self.cursor_page is not None:
+            return OrderedDict([
+                ('data', data),
+                ('meta', self.get_cursor_meta()),
+                ('links', self.get_cursor_links(url)),
+            ])
         return OrderedDict([
             ('data', data),
             (
@@ -162,10 +260,121 @@ class JSONAPIPagination(pagination.PageNumberPagination):
                 self.display_page_controls = True
 
             self.request = request
-            return list(self.page)
-
+            page = list(self.page)
+        elif self.cursor_query_param in request.query_params:
+            page = self.paginate_queryset_by_cursor(queryset, request)
         else:
-            return super(JSONAPIPagination, self).paginate_queryset(queryset, request, view=None)
+            page = super(JSONAPIPagination, self).paginate_queryset(queryset, request, view=None)
+
+        if page:
+            prefetch_object_permissions(request, page)
+        return page
+
+    def get_cursor_ordering(self, queryset):
+        """Return the fields (attribute names) the queryset is ordered by, ending with the
+        primary key, and whether each is descending.
+        """
+        query = queryset.query
+        opts = queryset.model._meta
+        ordering = list(query.order_by)
+        if not ordering and query.default_ordering:
+            ordering = list(opts.ordering)
+        if query.extra_order_by:
+            ordering = None
+
+        keys = []
+        for key in ordering or ():
+            if not isinstance(key, six.string_types) or key == '?' or LOOKUP_SEP in key:
+                ordering = None
+                break
+            descending = key.startswith('-')
+            name = key.lstrip('-')
+            if name == 'pk':
+                name = opts.pk.attname
+            try:
+                name = opts.get_field(name).attname
+            except FieldDoesNotExist:
+                if name not in query.annotations:
+                    ordering = None
+                    break
+            keys.append((name, descending))
+        if ordering is None:
+            raise InvalidQueryStringError(
+                detail='This list can not be paginated by cursor.', parameter=self.cursor_query_param,
+            )
+
+        if opts.pk.attname not in [key for key, _ in keys]:
+            keys.append((opts.pk.attname, keys[-1][1] if keys else False))
+        return keys
+
+    def decode_cursor(self, request):
+        """Return the position and direction of the `page[cursor]` query param."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            position, reverse = decoded['p'], bool(decoded['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_keyset_filter(self, keys, position, reverse):
+        """Return the filter of the items after `position` in the ordering `keys`, or before
+        it if `reverse`. NULLs are ordered last in ascending orderings, as by Postgres.
+        """
+        if position is None or len(position) != len(keys):
+            raise NotFound(self.invalid_cursor_message)
+        condition = None
+        for (name, descending), value in reversed(list(zip(keys, position))):
+            descending = descending != reverse
+            if value is None:
+                after = Q(**{name + '__isnull': False}) if descending else None
+                equal = Q(**{name + '__isnull': True})
+            else:
+                after = Q(**{name + '__lt': value}) if descending else Q(**{name + '__gt': value}) | Q(**{name + '__isnull': True})
+                equal = Q(**{name: value})
+            if condition is not None:
+                equal &= condition
+                after = equal if after is None else after | equal
+            condition = after
+        return condition if condition is not None else Q(pk__in=[])
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        if not isinstance(queryset, QuerySet):
+            raise InvalidQueryStringError(
+                detail='This list can not be paginated by cursor.', parameter=self.cursor_query_param,
+            )
+        self.request = request
+        page_size = self.get_page_size(request)
+        keys = self.get_cursor_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        total = None
+        if request.query_params.get(self.total_query_param) == 'approximate':
+            total = estimate_count(queryset)
+
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + name for name, descending in keys
+        ])
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(keys, position, reverse))
+        items = list(queryset[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if reverse:
+            items.reverse()
+
+        self.cursor_page = CursorPage(
+            items,
+            first_position=[getattr(items[0], name) for name, _ in keys] if items else None,
+            last_position=[getattr(items[-1], name) for name, _ in keys] if items else None,
+            has_previous=has_more if reverse else position is not None,
+            has_next=position is not None if reverse else has_more,
+            per_page=page_size,
+            total=total,
+        )
+        return items
 
 
 class MaxSizePagination(JSONAPIPagination):
@@ -215,13 +424,22 @@ class NodeContributorPagination(JSONAPIPagination):
         resource_id = kwargs.get('node_id', None)
         return AbstractNode.load(resource_id)
 
+    def get_total_bibliographic(self, kwargs):
+        if self.cursor_page is not None:
+            # Pages by cursor are not backed by a paginator with the whole list
+            return self.get_resource(kwargs).visible_contributors.count()
+        object_list = self.page.paginator.object_list
+        if kwargs.get('is_embedded') and isinstance(object_list, list):
+            # Embedded contributor lists are prefetched in full and never filtered
+            return len([contributor for contributor in object_list if contributor.visible])
+        return self.get_resource(kwargs).visible_contributors.count()
+
     def get_paginated_response(self, data):
         """ Add number of bibliographic contributors to links.meta"""
         response = super(NodeContributorPagination, self).get_paginated_response(data)
         response_dict = response.data
         kwargs = self.request.parser_context['kwargs'].copy()
-        node = self.get_resource(kwargs)
-        total_bibliographic = node.visible_contributors.count()
+        total_bibliographic = self.get_total_bibliographic(kwargs)
         if self.request.version < '2.1':
             response_dict['links']['meta']['total_bibliographic'] = total_bibliographic
         else:
@@ -9,6 +9,7 @@ from framework.auth import oauth_scopes
 from framework.auth.cas import CasResponse
 
 from osf.models import ApiOAuth2Application, ApiOAuth2PersonalToken
+from osf.utils.permission_resolver import prefetch_node_permissions
 from website.util.sanitize import is_iterable_but_not_string
 
 
@@ -147,3 +148,15 @@ def PermissionWithGetter(Base, getter):
             obj = self.get_object(request, view, obj)
             return super(Perm, self).has_object_permission(request, view, obj)
     return Perm
+
+
+def prefetch_object_permissions(request, objs):
+    """Batch-load the requesting user's node permissions for ``objs``.
+
+    Permission classes and serializer fields that later call ``can_view``, ``can_edit``
+    or ``has_permission`` on these objects are answered from the request-scoped cache.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return
+    prefetch_node_permissions(user, objs)
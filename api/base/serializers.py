@@ -1164,6 +1164,8 @@ class JSONAPIListSerializer(ser.ListSerializer):
                 self.child.to_esi_representation(item, envelope=None) for item in data
             ]
         else:
+            data = list(data)
+            self.prefetch_embeds(data)
             ret = [
                 self.child.to_representation(item, envelope=envelope) for item in data
             ]
@@ -1173,6 +1175,15 @@ class JSONAPIListSerializer(ser.ListSerializer):
 
         return ret
 
+    def prefetch_embeds(self, data):
+        """Give every embedded field the chance to resolve its targets for the whole
+        list at once, before the items are serialized one by one.
+        """
+        for embed_partial in self.context.get('embed', {}).values():
+            prefetch = getattr(embed_partial, 'prefetch', None)
+            if prefetch:
+                prefetch(data)
+
     # Overrides ListSerializer which doesn't support multiple update by default
     def update(self, instance, validated_data):
 
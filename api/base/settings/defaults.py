@@ -183,7 +183,7 @@ REST_FRAMEWORK = {
         'api.base.authentication.drf.OSFCASAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.UserRateThrottle',
+        'api.base.throttling.UserThrottle',
         'api.base.throttling.NonCookieAuthThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
@@ -288,6 +288,9 @@ ADDONS_OAUTH = ADDONS_FOLDER_CONFIGURABLE + ['dataverse', 'github', 'bitbucket',
 
 BYPASS_THROTTLE_TOKEN = 'test-token'
 
+# Seconds to use the local fallback cache after the shared throttle cache failed
+THROTTLE_CACHE_RETRY_INTERVAL = 30
+
 OSF_SHELL_USER_IMPORTS = None
 
 # Settings for use in the admin
@@ -319,6 +322,21 @@ ELASTICSEARCH_METRICS_DATE_FORMAT = '%Y'
 
 WAFFLE_CACHE_NAME = 'waffle_cache'
 STORAGE_USAGE_CACHE_NAME = 'storage_usage'
+# Throttle counters must be shared by all API processes in production, e.g. by
+# overriding CACHES[THROTTLE_CACHE_NAME] with a memcached backend in local.py
+THROTTLE_CACHE_NAME = 'throttle'
+THROTTLE_FALLBACK_CACHE_NAME = 'throttle_fallback'
+# Subscribers of node events, see website.notifications.subscriptions. Must be shared by
+# all processes, since entries are invalidated by whichever process changes a subscription
+NOTIFICATION_SUBSCRIBERS_CACHE_NAME = 'notification_subscribers'
+# Sessions and verified credentials, see framework.sessions.store. They are only cached if this
+# is shared by all processes, so production must configure a shared backend (e.g. memcached or
+# redis) in local.py; the default process-local cache only throttles last login updates
+SESSION_CACHE_NAME = 'sessions'
+# Rendered wiki versions, see addons.wiki.models.WikiVersion.render
+WIKI_RENDER_CACHE_NAME = 'wiki_render'
+# Rendered citations, see api.citations.utils.render_citations
+CITATION_CACHE_NAME = 'citations'
 
 
 CACHES = {
@@ -332,6 +350,36 @@ CACHES = {
     WAFFLE_CACHE_NAME: {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
+    THROTTLE_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+    THROTTLE_FALLBACK_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle_fallback',
+    },
+    NOTIFICATION_SUBSCRIBERS_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'osf_cache_table',
+    },
+    SESSION_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+    CITATION_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'citations',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    WIKI_RENDER_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'addons_wiki_render_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
 
 ### NII extensions
@@ -401,29 +449,6 @@ KEY_SAVE_PATH = '/user_key_info/'
 KEY_NAME_FORMAT = '{0}_{1}_{2}{3}'
 PRIVATE_KEY_VALUE = 1
 PUBLIC_KEY_VALUE = 2
-# FreeTSA openation commands
-SSL_CREATE_TIMESTAMP_REQUEST = 'openssl' + TST_COMMAND_DELIMITER + \
-                               'ts' + TST_COMMAND_DELIMITER + \
-                               '-query' + TST_COMMAND_DELIMITER + \
-                               '-data' + TST_COMMAND_DELIMITER + \
-                               '{0}' + TST_COMMAND_DELIMITER + \
-                               '-cert' + TST_COMMAND_DELIMITER + \
-                               '-sha512'
-SSL_GET_TIMESTAMP_RESPONSE = 'openssl' + TST_COMMAND_DELIMITER + \
-                             'ts' + TST_COMMAND_DELIMITER + \
-                             '-verify' + TST_COMMAND_DELIMITER + \
-                             '-data' + TST_COMMAND_DELIMITER + \
-                             '{0}' + TST_COMMAND_DELIMITER + \
-                             '-in' + TST_COMMAND_DELIMITER + \
-                             '{1}' + TST_COMMAND_DELIMITER + \
-                             '-CAfile' + TST_COMMAND_DELIMITER + \
-                             '{2}'
-
-SSL_CREATE_TIMESTAMP_HASH_REQUEST = 'openssl ts -query -digest {digest} {digest_type} -cert'
-SSL_GET_TIMESTAMP_HASH_RESPONSE = 'openssl ts -verify {digest_type} -digest {digest} -in {input} -CAfile {ca}'
-
-# openssl ts verify check value
-OPENSSL_VERIFY_RESULT_OK = 'OK'
 # timestamp verify rootKey
 VERIFY_ROOT_CERTIFICATE = 'root_cert_verifycate.pem'
 # timestamp request const
@@ -470,4 +495,6 @@ DEFAULT_MAX_QUOTA = 100
 WARNING_THRESHOLD = 0.9
 BASE_FOR_METRIC_PREFIX = 1000
 SIZE_UNIT_GB = BASE_FOR_METRIC_PREFIX ** 3
+# Seconds after which storage reserved for an upload is released if the upload is not logged
+QUOTA_RESERVATION_TTL = 60 * 60
 NII_STORAGE_REGION_ID = 1
@@ -30,6 +30,12 @@ if DEBUG:
     )
 
 
+# Share throttle counters between API processes
+# CACHES[THROTTLE_CACHE_NAME] = {
+#     'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#     'LOCATION': '127.0.0.1:11211',
+# }
+
 REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
     'user': '1000000/second',
     'non-cookie-auth': '1000000/second',
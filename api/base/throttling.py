@@ -1,3 +1,4 @@
+from django.core.cache import caches
 from rest_framework import permissions
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle, SimpleRateThrottle
 import logging
@@ -6,14 +7,39 @@ from api.base import settings
 
 logger = logging.getLogger(__name__)
 
+METRICS_KEY_FORMAT = 'throttle-metrics:{scope}:{result}'
+ALLOWED = 'allowed'
+THROTTLED = 'throttled'
+
 
 class BaseThrottle(SimpleRateThrottle):
+    """Sliding window counter throttle.
+
+    Each throttle key is backed by two integer counters, one for the current fixed window
+    and one for the previous window, so the memory used per key does not depend on the
+    rate. The request count over the last `duration` seconds is estimated by weighting the
+    previous window's count with the part of it that still overlaps the sliding window.
+
+    Counters live in the `THROTTLE_CACHE_NAME` cache, which should be shared by all API
+    processes (e.g. memcached) so that limits are enforced consistently across workers and
+    hosts. If that cache is unavailable the throttle falls back to the process-local
+    `THROTTLE_FALLBACK_CACHE_NAME` cache for `THROTTLE_CACHE_RETRY_INTERVAL` seconds.
+    """
+
+    # Timestamp until which the shared cache is considered unavailable
+    shared_cache_down_until = 0
 
     def get_ident(self, request):
         if request.META.get('HTTP_X_THROTTLE_TOKEN'):
             return request.META['HTTP_X_THROTTLE_TOKEN']
         return super(BaseThrottle, self).get_ident(request)
 
+    @property
+    def cache(self):
+        if self.timer() < BaseThrottle.shared_cache_down_until:
+            return caches[settings.THROTTLE_FALLBACK_CACHE_NAME]
+        return caches[settings.THROTTLE_CACHE_NAME]
+
     def allow_request(self, request, view):
         """
         Implement the check to see if the request should be throttled.
@@ -29,16 +55,99 @@ class BaseThrottle(SimpleRateThrottle):
         if self.key is None:
             return True
 
-        self.history = self.cache.get(self.key, [])
         self.now = self.timer()
-
-        # Drop any requests from the history which have now passed the throttle duration
-        while self.history and self.history[-1] <= self.now - self.duration:
-            self.history.pop()
-
-        if len(self.history) >= self.num_requests:
-            return self.throttle_failure()
-        return self.throttle_success()
+        cache = self.cache
+        try:
+            allowed = self.check_window(cache)
+        except Exception:
+            if cache is caches[settings.THROTTLE_FALLBACK_CACHE_NAME]:
+                raise
+            logger.warning('Throttle cache unavailable, falling back to the local cache', exc_info=True)
+            BaseThrottle.shared_cache_down_until = self.now + settings.THROTTLE_CACHE_RETRY_INTERVAL
+            cache = caches[settings.THROTTLE_FALLBACK_CACHE_NAME]
+            allowed = self.check_window(cache)
+
+        self.record_metric(cache, ALLOWED if allowed else THROTTLED)
+        return allowed
+
+    def check_window(self, cache):
+        """Count the request against the current window of `cache` and return whether it
+        is allowed. Throttled requests are not counted.
+        """
+        window, offset = divmod(self.now, self.duration)
+        current_key = '{}:{}'.format(self.key, int(window))
+        previous_key = '{}:{}'.format(self.key, int(window) - 1)
+
+        # Counters expire once they can no longer overlap the sliding window
+        cache.add(current_key, 0, self.duration * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The counter expired between `add` and `incr`
+            cache.set(current_key, 1, self.duration * 2)
+            current = 1
+        previous = cache.get(previous_key, 0)
+        elapsed = offset / float(self.duration)
+
+        if previous * (1 - elapsed) + current <= self.num_requests:
+            return self.throttle_success()
+
+        cache.decr(current_key)
+        self.window_counts = (previous, current - 1, elapsed)
+        return self.throttle_failure()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """
+        Returns the recommended next request time in seconds.
+        """
+        previous, current, elapsed = self.window_counts
+        available = self.num_requests - 1 - current
+        if available >= 0 and previous:
+            # Wait until the previous window's weight has dropped far enough
+            return max(1 - float(available) / previous - elapsed, 0) * self.duration
+
+        remaining = (1 - elapsed) * self.duration
+        available = self.num_requests - 1
+        if current <= available:
+            return remaining
+        return remaining + (1 - float(available) / current) * self.duration
+
+    def record_metric(self, cache, result):
+        key = METRICS_KEY_FORMAT.format(scope=self.scope, result=result)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except Exception:
+            logger.exception('Could not record throttle metric {}'.format(key))
+
+
+def get_throttle_metrics(scopes=None):
+    """Return the number of allowed and throttled requests per throttle scope, as counted
+    in the shared throttle cache.
+
+    :param list scopes: Scopes to report, defaults to all scopes with a configured rate
+    :return dict: {scope: {'allowed': int, 'throttled': int}}
+    """
+    if scopes is None:
+        scopes = sorted(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].keys())
+    keys = {
+        (scope, result): METRICS_KEY_FORMAT.format(scope=scope, result=result)
+        for scope in scopes
+        for result in (ALLOWED, THROTTLED)
+    }
+    values = caches[settings.THROTTLE_CACHE_NAME].get_many(keys.values())
+    metrics = {scope: {ALLOWED: 0, THROTTLED: 0} for scope in scopes}
+    for (scope, result), key in keys.items():
+        metrics[scope][result] = values.get(key, 0)
+    return metrics
+
+
+class UserThrottle(BaseThrottle, UserRateThrottle):
+
+    scope = 'user'
 
 
 class NonCookieAuthThrottle(BaseThrottle, AnonRateThrottle):
@@ -83,7 +192,7 @@ class CreateGuidThrottle(BaseThrottle, UserRateThrottle):
         return super(CreateGuidThrottle, self).allow_request(request, view)
 
 
-class RootAnonThrottle(AnonRateThrottle):
+class RootAnonThrottle(BaseThrottle, AnonRateThrottle):
 
     scope = 'root-anon-throttle'
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import urllib
+from collections import defaultdict
 import furl
 import urlparse
 from distutils.version import StrictVersion
@@ -143,6 +144,20 @@ def get_object_or_error(model_or_qs, query_or_pk=None, request=None, display_nam
             raise Gone(detail='The requested {name} is no longer available.'.format(name=display_name))
     return obj
 
+def get_embed_prefetch_store(request):
+    """Return the per-request store used to batch embedded requests.
+
+    'parents' maps a model class to {_id: object} and is merged into the `parents` of every
+    EmbeddedRequest; 'results' maps (view class, lookup value) to prefetched view results.
+    """
+    django_request = getattr(request, '_request', request)
+    if not hasattr(django_request, '_embed_prefetch'):
+        django_request._embed_prefetch = {
+            'parents': defaultdict(dict),
+            'results': {},
+        }
+    return django_request._embed_prefetch
+
 def default_node_list_queryset(model_cls):
     assert model_cls in {Node, Registration}
     return model_cls.objects.filter(is_deleted=False).annotate(region=F('addons_osfstorage_node_settings__region___id'))
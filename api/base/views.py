@@ -28,8 +28,8 @@ from api.base.serializers import (
     LinkedNodesRelationshipSerializer,
     LinkedRegistrationsRelationshipSerializer,
 )
-from api.base.throttling import RootAnonThrottle, UserRateThrottle
-from api.base.utils import is_bulk_request, get_user_auth, default_node_list_queryset
+from api.base.throttling import RootAnonThrottle, UserThrottle
+from api.base.utils import is_bulk_request, get_user_auth, default_node_list_queryset, get_embed_prefetch_store
 from api.nodes.filters import NodesFilterMixin
 from api.nodes.utils import get_file_object
 from api.nodes.permissions import ContributorOrPublic
@@ -74,6 +74,9 @@ class JSONAPIBaseView(generics.GenericAPIView):
                 request._request._embed_cache = {}
             cache = request._request._embed_cache
 
+            # Objects loaded in bulk by `prefetch` are made available to the embedded view
+            for model, objects in get_embed_prefetch_store(request)['parents'].items():
+                request.parents.setdefault(model, {}).update(objects)
             request.parents.setdefault(type(item), {})[item._id] = item
 
             view_kwargs.update({
@@ -115,7 +118,10 @@ class JSONAPIBaseView(generics.GenericAPIView):
                 if not isinstance(view, ListModelMixin):
                     ret = ser.to_representation(item)
                 else:
-                    queryset = view.filter_queryset(view.get_queryset())
+                    # List views that implement `prefetch_embedded` may already have their results
+                    queryset = view.get_prefetched_embed() if hasattr(view, 'get_prefetched_embed') else None
+                    if queryset is None:
+                        queryset = view.filter_queryset(view.get_queryset())
                     page = view.paginate_queryset(getattr(queryset, '_results_cache', None) or queryset)
 
                     ret = ser.to_representation(page or queryset)
@@ -137,6 +143,29 @@ class JSONAPIBaseView(generics.GenericAPIView):
 
             return ret
 
+        def prefetch(items):
+            """Resolve the embed targets of all `items` and let each target view class load
+            what it needs for all of them at once.
+            """
+            if field is None:
+                return
+            targets = defaultdict(list)
+            for item in items:
+                try:
+                    v, view_args, view_kwargs = field.resolve(item, field_name, self.request)
+                except Exception:
+                    # Unresolvable embeds are reported by `partial`
+                    continue
+                if v:
+                    targets[v.cls].append(view_kwargs)
+            for view_cls, view_kwargs_list in targets.items():
+                # Views opt in to batching by implementing `prefetch_embedded`, which loads
+                # everything needed by all of the embedded requests into the prefetch store.
+                # Other embeds are resolved one item at a time by `partial`.
+                if hasattr(view_cls, 'prefetch_embedded'):
+                    view_cls.prefetch_embedded(self.request, view_kwargs_list)
+
+        partial.prefetch = prefetch
         return partial
 
     def get_serializer_context(self):
@@ -399,7 +428,7 @@ class LinkedRegistrationsRelationship(JSONAPIBaseView, generics.RetrieveUpdateDe
 
 
 @api_view(('GET',))
-@throttle_classes([RootAnonThrottle, UserRateThrottle])
+@throttle_classes([RootAnonThrottle, UserThrottle])
 def root(request, format=None, **kwargs):
     """
     The documentation for the GakuNin RDM API can be found at [developer.osf.io](https://developer.osf.io).
@@ -441,7 +470,7 @@ def root(request, format=None, **kwargs):
     return Response(return_val)
 
 @api_view(('GET',))
-@throttle_classes([RootAnonThrottle, UserRateThrottle])
+@throttle_classes([RootAnonThrottle, UserThrottle])
 def status_check(request, format=None, **kwargs):
     maintenance = MaintenanceState.objects.all().first()
     return Response({
@@ -625,9 +654,8 @@ class WaterButlerMixin(object):
         node = self.get_node(check_object_permissions=False)
         content_type = ContentType.objects.get_for_model(node)
 
-        objs_to_create = defaultdict(lambda: [])
-        file_objs = []
-
+        # Existing file nodes are looked up with one query per provider class
+        items_by_class = defaultdict(list)
         for item in files_list:
             attrs = item['attributes']
             base_class = BaseFileNode.resolve_class(
@@ -635,24 +663,31 @@ class WaterButlerMixin(object):
                 BaseFileNode.FOLDER if attrs['kind'] == 'folder'
                 else BaseFileNode.FILE,
             )
+            items_by_class[base_class].append(('/' + attrs['path'].lstrip('/'), attrs))
 
-            # mirrors BaseFileNode get_or_create
-            try:
-                file_obj = base_class.objects.get(target_object_id=node.id, target_content_type=content_type, _path='/' + attrs['path'].lstrip('/'))
-            except base_class.DoesNotExist:
-                # create method on BaseFileNode appends provider, bulk_create bypasses this step so it is added here
-                file_obj = base_class(target=node, _path='/' + attrs['path'].lstrip('/'), provider=base_class._provider)
-                objs_to_create[base_class].append(file_obj)
-            else:
-                file_objs.append(file_obj)
-
-            file_obj.update(None, attrs, user=self.request.user, save=False)
-
-        bulk_update(file_objs)
-
-        for base_class in objs_to_create:
-            base_class.objects.bulk_create(objs_to_create[base_class])
-            file_objs += objs_to_create[base_class]
+        file_objs = []
+        for base_class, items in items_by_class.items():
+            # mirrors BaseFileNode get_or_create; (target, _path) is not unique, so the oldest entry wins
+            existing = {}
+            for file_obj in base_class.objects.filter(
+                target_object_id=node.id,
+                target_content_type=content_type,
+                _path__in=set(path for path, _ in items),
+            ).order_by('-id'):
+                existing[file_obj._path] = file_obj
+
+            objs_to_create = []
+            for path, attrs in items:
+                if path not in existing:
+                    # create method on BaseFileNode appends provider, bulk_create bypasses this step so it is added here
+                    existing[path] = base_class(target=node, _path=path, provider=base_class._provider)
+                    objs_to_create.append(existing[path])
+                existing[path].update(None, attrs, user=self.request.user, save=False)
+
+            objs_to_update = [file_obj for file_obj in existing.values() if file_obj.pk]
+            bulk_update(objs_to_update)
+            base_class.objects.bulk_create(objs_to_create)
+            file_objs += objs_to_update + objs_to_create
 
         return file_objs
 
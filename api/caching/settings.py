@@ -2,3 +2,6 @@ NEVER_TIMEOUT = None  # for django caches setting None as a timeout value means
 FIVE_MIN_TIMEOUT = 60 * 5
 
 STORAGE_USAGE_KEY = 'storage_usage:{target_id}'
+
+# Number of storage usage counters recomputed by each run of reconcile_storage_usage
+STORAGE_USAGE_RECONCILE_BATCH_SIZE = 1000
@@ -104,11 +104,11 @@ def ban_url(instance):
 
 @app.task(max_retries=5, default_retry_delay=10)
 def update_storage_usage_cache(target_id):
-    AbstractNode = apps.get_model('osf.AbstractNode')
+    NodeStorageUsage = apps.get_model('osf.NodeStorageUsage')
 
-    storage_usage_total = AbstractNode.objects.get(
-        guids___id=target_id,
-    ).files.aggregate(sum=models.Sum('versions__size'))['sum'] or 0
+    storage_usage_total = NodeStorageUsage.objects.filter(
+        node__guids___id=target_id,
+    ).values_list('total', flat=True).first() or 0
 
     key = cache_settings.STORAGE_USAGE_KEY.format(target_id=target_id)
     storage_usage_cache.set(key, storage_usage_total, cache_settings.FIVE_MIN_TIMEOUT)
@@ -119,3 +119,19 @@ def update_storage_usage(target):
 
     if not isinstance(target, Preprint) and not target.is_quickfiles:
         enqueue_postcommit_task(update_storage_usage_cache, (target._id,), {}, celery=True)
+
+
+@app.task(ignore_results=True)
+def reconcile_storage_usage(batch_size=cache_settings.STORAGE_USAGE_RECONCILE_BATCH_SIZE):
+    """Recompute the least recently reconciled storage usage counters from the files of
+    their nodes, correcting any drift from changes that bypassed the file signals.
+    """
+    NodeStorageUsage = apps.get_model('osf.NodeStorageUsage')
+
+    counters = NodeStorageUsage.objects.order_by(
+        models.F('reconciled').asc(nulls_first=True),
+    ).values_list('node_id', 'total')[:batch_size]
+    for node_id, total in counters:
+        reconciled_total = NodeStorageUsage.reconcile(node_id)
+        if reconciled_total != total:
+            logger.info('Storage usage of node {} reconciled from {} to {}'.format(node_id, total, reconciled_total))
@@ -1,17 +1,79 @@
+"""
+Rendering of node and preprint citations.
+
+Parsed CSL styles are kept in a process wide LRU of `CITATION_STYLE_CACHE_SIZE` styles, so
+the XML of a style (or of the parent of a dependent style) is only parsed once. Rendered
+citations are cached by style, node and a fingerprint of the CSL data of the node, so any
+change to the title, contributors or dates of a node renders it again. `render_citations`
+renders one style for many nodes at once.
+"""
+import hashlib
+import json
 import os
 import re
+import threading
 import httplib as http
+from collections import OrderedDict
 
 from citeproc import CitationStylesStyle, CitationStylesBibliography
 from citeproc import Citation, CitationItem
 from citeproc import formatter
 from citeproc.source.json import CiteProcJSON
+from django.core.cache import caches
 
+from api.base import settings as api_settings
 from framework.exceptions import HTTPError
 from framework.auth import utils
 from osf.models.citation import CitationStyle
+from website import settings
 from website.settings import CITATION_STYLES_PATH, BASE_PATH, CUSTOM_CITATIONS
 
+CITATION_KEY = 'citation:{style}:{node_id}:{fingerprint}'
+
+_styles = OrderedDict()
+_styles_lock = threading.Lock()
+# Parsed styles keep state while rendering, so they are used by one thread at a time
+_render_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[api_settings.CITATION_CACHE_NAME]
+
+
+def get_style(style):
+    """Return the parsed CSL style `style`, or the parsed parent style of a dependent style.
+
+    :raises ValueError: If neither the style nor its parent style could be found
+    """
+    with _styles_lock:
+        if style in _styles:
+            bib_style = _styles.pop(style)
+            _styles[style] = bib_style
+            return bib_style
+    bib_style = load_style(style)
+    with _styles_lock:
+        _styles[style] = bib_style
+        while len(_styles) > settings.CITATION_STYLE_CACHE_SIZE:
+            _styles.popitem(last=False)
+    return bib_style
+
+
+def load_style(style):
+    custom = CUSTOM_CITATIONS.get(style, False)
+    path = os.path.join(BASE_PATH, 'static', custom) if custom else os.path.join(CITATION_STYLES_PATH, style)
+
+    try:
+        return CitationStylesStyle(path, validate=False)
+    except ValueError:
+        citation_style = CitationStyle.load(style)
+        if citation_style is not None and citation_style.has_parent_style:
+            return get_style(citation_style.parent_style)
+        raise ValueError('Unable to find a dependent or independent parent style related to {}.csl'.format(style))
+
+
+def csl_fingerprint(csl):
+    return hashlib.sha1(json.dumps(csl, sort_keys=True)).hexdigest()
+
 
 def clean_up_common_errors(cit):
     cit = re.sub(r'\.+', '.', cit)
@@ -44,36 +106,47 @@ def process_name(node, user):
 
 def render_citation(node, style='apa'):
     """Given a node, return a citation"""
+    return render_citations([node], style=style)[0]
+
+
+def render_citations(nodes, style='apa'):
+    """Given nodes, return their citations in one style.
+
+    The citations that are not cached are rendered with the same parsed style and CSL source.
+    """
+    cache = get_cache()
+    csls = [node.csl for node in nodes]
+    keys = [
+        CITATION_KEY.format(style=style, node_id=node._id, fingerprint=csl_fingerprint(csl))
+        for node, csl in zip(nodes, csls)
+    ]
+    citations = cache.get_many(keys)
+
+    missing = OrderedDict()
+    for node, csl, key in zip(nodes, csls, keys):
+        if key not in citations:
+            missing[key] = (node, csl)
+    if missing:
+        bib_style = get_style(style)
+        bib_source = CiteProcJSON([csl for _, csl in missing.values()])
+        rendered = {}
+        for key, (node, csl) in missing.items():
+            with _render_lock:
+                # A bibliography per node, so each is rendered as the only entry of a bibliography
+                bibliography = CitationStylesBibliography(bib_style, bib_source, formatter.plain)
+                bibliography.register(Citation([CitationItem(node._id)]))
+                bib = bibliography.bibliography()
+            rendered[key] = reformat_citation(node, csl, style, unicode(bib[0] if len(bib) else ''))
+        cache.set_many(rendered, timeout=settings.CITATION_CACHE_TIMEOUT)
+        citations.update(rendered)
+
+    return [citations[key] for key in keys]
+
+
+def reformat_citation(node, csl, style, cit):
     reformat_styles = ['apa', 'chicago-author-date', 'modern-language-association']
-    csl = node.csl
-    data = [csl, ]
-
-    bib_source = CiteProcJSON(data)
-
-    custom = CUSTOM_CITATIONS.get(style, False)
-    path = os.path.join(BASE_PATH, 'static', custom) if custom else os.path.join(CITATION_STYLES_PATH, style)
-
-    try:
-        bib_style = CitationStylesStyle(path, validate=False)
-    except ValueError:
-        citation_style = CitationStyle.load(style)
-        if citation_style is not None and citation_style.has_parent_style:
-            parent_style = citation_style.parent_style
-            parent_path = os.path.join(CITATION_STYLES_PATH, parent_style)
-            bib_style = CitationStylesStyle(parent_path, validate=False)
-        else:
-            raise ValueError('Unable to find a dependent or independent parent style related to {}.csl'.format(style))
-
-    bibliography = CitationStylesBibliography(bib_style, bib_source, formatter.plain)
-
-    citation = Citation([CitationItem(node._id)])
-
-    bibliography.register(citation)
-
-    bib = bibliography.bibliography()
-    cit = unicode(bib[0] if len(bib) else '')
 
-    title = csl['title'] if csl else node.csl['title']
+    title = csl['title']
     title = title.rstrip('.')
     if cit.count(title) == 1:
         i = cit.index(title)
@@ -93,7 +166,7 @@ def render_citation(node, style='apa'):
     if style == 'apa':
         cit = apa_reformat(node, cit)
     if style == 'chicago-author-date':
-        cit = chicago_reformat(node, cit)
+        cit = chicago_reformat(node, cit, csl=csl)
     if style == 'modern-language-association':
         cit = mla_reformat(node, cit)
 
@@ -179,9 +252,9 @@ def mla_reformat(node, cit):
 def remove_extra_period_after_right_quotation(cit):
     return cit.encode('utf-8').replace('\xe2\x80\x9d.', '\xe2\x80\x9d').decode('utf-8')
 
-def chicago_reformat(node, cit):
+def chicago_reformat(node, cit, csl=None):
     cit = remove_extra_period_after_right_quotation(cit)
-    issued = node.csl.get('issued')
+    issued = (csl or node.csl).get('issued')
     new_csl = cit.split(str(issued['date-parts'][0][0]) if issued else 'n.d.', 1)
     contributors_list = list(node.visible_contributors)
     contributors_list_length = len(contributors_list)
@@ -16,7 +16,7 @@ from osf.models import (
 
 from api.base.exceptions import Gone
 from api.base.permissions import PermissionWithGetter
-from api.base.throttling import CreateGuidThrottle, NonCookieAuthThrottle, UserRateThrottle
+from api.base.throttling import CreateGuidThrottle, NonCookieAuthThrottle, UserThrottle
 from api.base import utils
 from api.base.views import JSONAPIBaseView
 from api.base import permissions as base_permissions
@@ -79,7 +79,7 @@ class FileDetail(JSONAPIBaseView, generics.RetrieveUpdateAPIView, FileMixin):
     required_write_scopes = [CoreScopes.NODE_FILE_WRITE]
 
     serializer_class = FileDetailSerializer
-    throttle_classes = (CreateGuidThrottle, NonCookieAuthThrottle, UserRateThrottle, )
+    throttle_classes = (CreateGuidThrottle, NonCookieAuthThrottle, UserThrottle, )
     view_category = 'files'
     view_name = 'file-detail'
 
@@ -1,4 +1,5 @@
 import re
+from collections import defaultdict
 
 from django.apps import apps
 from django.db.models import Q, OuterRef, Exists, Subquery, F
@@ -33,12 +34,12 @@ from api.base.parsers import (
 )
 from api.base.settings import ADDONS_OAUTH, API_BASE
 from api.base.throttling import (
-    UserRateThrottle,
+    UserThrottle,
     NonCookieAuthThrottle,
     AddContributorThrottle,
 )
 from api.base.utils import default_node_list_permission_queryset
-from api.base.utils import get_object_or_error, is_bulk_request, get_user_auth, is_truthy
+from api.base.utils import get_object_or_error, is_bulk_request, get_user_auth, is_truthy, get_embed_prefetch_store
 from api.base.views import JSONAPIBaseView
 from api.base.views import (
     BaseChildrenList,
@@ -122,7 +123,7 @@ from framework.auth.oauth_scopes import CoreScopes
 from osf.features import OSF_GROUPS
 from osf.models import AbstractNode
 from osf.models import (Node, PrivateLink, Institution, Comment, DraftRegistration, Registration, )
-from osf.models import OSFUser
+from osf.models import OSFUser, Contributor
 from osf.models import OSFGroup
 from osf.models import NodeRelation, Guid
 from osf.models import BaseFileNode
@@ -188,6 +189,29 @@ class NodeMixin(object):
             self.check_object_permissions(self.request, node)
         return node
 
+    @classmethod
+    def prefetch_embedded(cls, request, view_kwargs_list):
+        """Load the nodes of a page of embedded requests in one query, along with the
+        requesting user's permissions on them. `get_node` finds them in `request.parents`.
+        """
+        parents = get_embed_prefetch_store(request)['parents'][Node]
+        node_ids = set(
+            view_kwargs[cls.node_lookup_url_kwarg] for view_kwargs in view_kwargs_list
+            if view_kwargs.get(cls.node_lookup_url_kwarg)
+        ) - set(parents.keys())
+        if not node_ids:
+            return
+        # Same restrictions as `get_node`, so that deleted nodes still result in errors
+        nodes = list(
+            Node.objects.filter(guids___id__in=node_ids, is_deleted=False)
+            .annotate(region=F('addons_osfstorage_node_settings__region___id'))
+            .exclude(region=None)
+            .include('guids'),
+        )
+        for node in nodes:
+            parents[node._id] = node
+        base_permissions.prefetch_object_permissions(request, nodes)
+
 
 class DraftMixin(object):
 
@@ -424,7 +448,7 @@ class NodeContributorsList(BaseContributorList, bulk_views.BulkUpdateJSONAPIView
     required_write_scopes = [CoreScopes.NODE_CONTRIBUTORS_WRITE]
     model_class = OSFUser
 
-    throttle_classes = (AddContributorThrottle, UserRateThrottle, NonCookieAuthThrottle, )
+    throttle_classes = (AddContributorThrottle, UserThrottle, NonCookieAuthThrottle, )
 
     pagination_class = NodeContributorPagination
     serializer_class = NodeContributorsSerializer
@@ -435,6 +459,35 @@ class NodeContributorsList(BaseContributorList, bulk_views.BulkUpdateJSONAPIView
     def get_resource(self):
         return self.get_node()
 
+    @classmethod
+    def prefetch_embedded(cls, request, view_kwargs_list):
+        """Load the contributors of every embedded node in one query."""
+        super(NodeContributorsList, cls).prefetch_embedded(request, view_kwargs_list)
+        store = get_embed_prefetch_store(request)
+        nodes = {}
+        for view_kwargs in view_kwargs_list:
+            node = store['parents'][Node].get(view_kwargs.get(cls.node_lookup_url_kwarg))
+            if node is not None and (cls, node._id) not in store['results']:
+                nodes[node.id] = node
+        if not nodes:
+            return
+        contributors = defaultdict(list)
+        queryset = Contributor.objects.filter(node_id__in=nodes.keys()).include('user__guids').order_by('node_id', '_order')
+        for contributor in queryset:
+            contributor.node = nodes[contributor.node_id]
+            contributors[contributor.node_id].append(contributor)
+        for node in nodes.values():
+            store['results'][(cls, node._id)] = contributors[node.id]
+
+    def get_prefetched_embed(self):
+        contributors = get_embed_prefetch_store(self.request)['results'].get(
+            (NodeContributorsList, self.kwargs[self.node_lookup_url_kwarg]),
+        )
+        if contributors is not None:
+            # May raise a permission denied
+            self.get_node()
+        return contributors
+
     # overrides ListBulkCreateJSONAPIView, BulkUpdateJSONAPIView, BulkDeleteJSONAPIView
     def get_serializer_class(self):
         """
@@ -550,7 +603,7 @@ class NodeImplicitContributorsList(JSONAPIBaseView, generics.ListAPIView, ListFi
 
     model_class = OSFUser
 
-    throttle_classes = (UserRateThrottle, NonCookieAuthThrottle,)
+    throttle_classes = (UserThrottle, NonCookieAuthThrottle,)
 
     serializer_class = UserSerializer
     view_category = 'nodes'
@@ -603,7 +656,7 @@ class NodeBibliographicContributorsList(BaseContributorList, NodeMixin):
 
     model_class = OSFUser
 
-    throttle_classes = (UserRateThrottle, NonCookieAuthThrottle,)
+    throttle_classes = (UserThrottle, NonCookieAuthThrottle,)
 
     pagination_class = NodeContributorPagination
     serializer_class = NodeContributorsSerializer
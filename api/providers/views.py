@@ -1,4 +1,4 @@
-from django.db.models import Case, CharField, Q, Value, When
+from django.db.models import Case, CharField, IntegerField, Q, Value, When
 from guardian.shortcuts import get_objects_for_user
 from rest_framework.exceptions import ValidationError
 from rest_framework import generics
@@ -7,7 +7,7 @@ from rest_framework.exceptions import NotAuthenticated, NotFound
 
 from api.base import permissions as base_permissions
 from api.base.exceptions import InvalidFilterValue, InvalidFilterOperator, Conflict
-from api.base.filters import PreprintFilterMixin, ListFilterMixin
+from api.base.filters import OSFOrderingFilter, PreprintFilterMixin, ListFilterMixin
 from api.base.views import JSONAPIBaseView
 from api.base.metrics import MetricsViewMixin
 from api.base.pagination import MaxSizePagination, IncreasedPageSizePagination
@@ -244,12 +244,23 @@ class GenericProviderLicenseList(LicenseList):
     def get_queryset(self):
         provider = get_object_or_error(self._model_class, self.kwargs['provider_id'], self.request, display_name=self._model_class.__name__)
         if not provider.licenses_acceptable.count():
-            if not provider.default_license:
-                return super(GenericProviderLicenseList, self).get_queryset()
-            return [provider.default_license] + [license for license in super(GenericProviderLicenseList, self).get_queryset() if license != provider.default_license]
-        if not provider.default_license:
-            return provider.licenses_acceptable.get_queryset()
-        return [provider.default_license] + [license for license in provider.licenses_acceptable.all() if license != provider.default_license]
+            queryset = super(GenericProviderLicenseList, self).get_queryset()
+        else:
+            queryset = provider.licenses_acceptable.get_queryset()
+        if not provider.default_license_id:
+            return queryset
+        # The default license comes first, ordered in SQL so the licenses are not loaded to be paginated.
+        # The queryset is ordered already, so the requested sort is applied here
+        ordering = OSFOrderingFilter().get_ordering(self.request, queryset, self) or ('name',)
+        return NodeLicense.objects.filter(
+            Q(id__in=queryset.values('id')) | Q(id=provider.default_license_id),
+        ).annotate(
+            is_default=Case(
+                When(id=provider.default_license_id, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+        ).order_by('is_default', *ordering)
 
 
 class CollectionProviderLicenseList(GenericProviderLicenseList):
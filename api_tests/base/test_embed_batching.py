@@ -0,0 +1,109 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.base.settings.defaults import API_BASE
+from osf_tests.factories import (
+    AuthUserFactory,
+    NodeFactory,
+    ProjectFactory,
+)
+
+
+def count_queries(app, url, user, table=None):
+    with CaptureQueriesContext(connection) as ctx:
+        res = app.get(url, auth=user.auth)
+    assert res.status_code == 200
+    return len([
+        query for query in ctx.captured_queries
+        if table is None or '"{}"'.format(table) in query['sql']
+    ])
+
+
+def embed_query_counts(app, url, embed, user, page_sizes, table=None):
+    """Return the number of queries spent on resolving `embed`, for each page size,
+    optionally only those on `table`.
+
+    The queries spent on the page itself are subtracted, so the result should not
+    depend on the page size if embeds are resolved in batches.
+    """
+    counts = []
+    for page_size in page_sizes:
+        page_url = '{}{}page[size]={}'.format(url, '&' if '?' in url else '?', page_size)
+        embed_url = '{}&embed={}'.format(page_url, embed)
+        counts.append(count_queries(app, embed_url, user, table) - count_queries(app, page_url, user, table))
+    return counts
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    project = ProjectFactory(creator=user)
+    for _ in range(8):
+        NodeFactory(parent=project, creator=user)
+    return project
+
+
+@pytest.fixture()
+def url(project):
+    return '/{}nodes/{}/children/'.format(API_BASE, project._id)
+
+
+@pytest.fixture()
+def children_of_distinct_parents(user):
+    children = []
+    for _ in range(8):
+        children.append(NodeFactory(parent=ProjectFactory(creator=user), creator=user))
+    return children
+
+
+@pytest.fixture()
+def children_url(user, children_of_distinct_parents):
+    return '/{}users/{}/nodes/?filter[parent][ne]=null'.format(API_BASE, user._id)
+
+
+@pytest.mark.django_db
+class TestBatchedEmbeds:
+
+    def test_embedded_parent_matches_unbatched_result(self, app, user, project, url):
+        res = app.get('{}?embed=parent'.format(url), auth=user.auth)
+        assert res.status_code == 200
+        for item in res.json['data']:
+            assert item['embeds']['parent']['data']['id'] == project._id
+
+    def test_embedded_contributors(self, app, user, url):
+        res = app.get('{}?embed=contributors'.format(url), auth=user.auth)
+        assert res.status_code == 200
+        for item in res.json['data']:
+            contributors = item['embeds']['contributors']
+            assert [each['embeds']['users']['data']['id'] for each in contributors['data']] == [user._id]
+            assert contributors['meta']['total_bibliographic'] == 1
+
+    def test_embedded_parent_query_count_is_constant(self, app, user, url):
+        counts = embed_query_counts(app, url, 'parent', user, page_sizes=(2, 4, 8))
+        assert len(set(counts)) == 1
+
+    def test_embedded_distinct_parents(self, app, user, children_of_distinct_parents, children_url):
+        res = app.get('{}&embed=parent'.format(children_url), auth=user.auth)
+        assert res.status_code == 200
+        parents = {child._id: child.parent_node._id for child in children_of_distinct_parents}
+        assert len(res.json['data']) == len(parents)
+        for item in res.json['data']:
+            assert item['embeds']['parent']['data']['id'] == parents[item['id']]
+
+    def test_embedded_distinct_parents_query_count_is_constant(self, app, user, children_url):
+        counts = embed_query_counts(app, children_url, 'parent', user, page_sizes=(2, 4, 8))
+        assert len(set(counts)) == 1
+
+    def test_embedded_contributors_query_count_is_constant(self, app, user, project, url):
+        # Every child has contributors of its own. Their users are still embedded one at a
+        # time, so only the queries loading the contributor lists are counted.
+        for child in project.nodes:
+            child.add_contributor(AuthUserFactory(), save=True)
+        counts = embed_query_counts(app, url, 'contributors', user, page_sizes=(2, 4, 8), table='osf_contributor')
+        assert len(set(counts)) == 1
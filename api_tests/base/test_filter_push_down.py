@@ -0,0 +1,73 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.base.settings.defaults import API_BASE
+from framework.auth import Auth
+from osf_tests.factories import (
+    AuthUserFactory,
+    PreprintProviderFactory,
+    ProjectFactory,
+)
+from osf.models import NodeLicense
+
+
+def count_queries(app, url, user):
+    with CaptureQueriesContext(connection) as ctx:
+        res = app.get(url, auth=user.auth)
+    assert res.status_code == 200
+    return len(ctx.captured_queries), res
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def tagged(user):
+    projects = [ProjectFactory(creator=user) for _ in range(2)]
+    for project in projects:
+        project.add_tag('needle', Auth(user), save=True)
+    return projects
+
+
+def add_untagged_projects(user, count):
+    for _ in range(count):
+        ProjectFactory(creator=user).add_tag('hay', Auth(user), save=True)
+
+
+@pytest.mark.django_db
+class TestFilterPushDown:
+
+    @pytest.mark.parametrize('filter_param', ['filter[tags]=needle', 'filter[tags]=NEEDLE', 'filter[preprint]=false&filter[tags]=needle'])
+    def test_query_count_does_not_depend_on_unmatched_rows(self, app, user, tagged, filter_param):
+        url = '/{}users/me/nodes/?{}'.format(API_BASE, filter_param)
+        add_untagged_projects(user, 3)
+        small_count, res = count_queries(app, url, user)
+        assert {item['id'] for item in res.json['data']} == {project._id for project in tagged}
+
+        add_untagged_projects(user, 30)
+        large_count, res = count_queries(app, url, user)
+        assert {item['id'] for item in res.json['data']} == {project._id for project in tagged}
+        assert large_count == small_count
+
+
+@pytest.mark.django_db
+class TestProviderLicensesPushDown:
+
+    def test_default_license_is_ordered_first_in_sql(self, app, user):
+        licenses = list(NodeLicense.objects.all())
+        default = licenses[-1]
+        provider = PreprintProviderFactory()
+        provider.default_license = default
+        provider.save()
+        url = '/{}providers/preprints/{}/licenses/?page[size]=2'.format(API_BASE, provider._id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = app.get(url, auth=user.auth)
+        assert res.status_code == 200
+        assert res.json['data'][0]['id'] == default._id
+        assert res.json['links']['meta']['total'] == len(licenses)
+        assert any('LIMIT' in query['sql'] and 'osf_nodelicense' in query['sql'] for query in ctx.captured_queries)
@@ -14,16 +14,20 @@ from unittest import TestCase
 
 from tests.base import ApiTestCase
 
+from django.db.models import QuerySet
+
 from api.base.filters import ListFilterMixin
 import api.base.filters as filters
 from api.base.exceptions import (
     InvalidFilterError,
+    InvalidFilterFieldError,
     InvalidFilterOperator,
     InvalidFilterComparisonType,
     InvalidFilterMatchType,
 )
 
 from api.base.serializers import RelationshipField
+from osf.models import OSFUser
 
 
 class FakeSerializer(ser.Serializer):
@@ -84,6 +88,20 @@ class FakeListView(ListFilterMixin):
     serializer_class = FakeSerializer
 
 
+class FakeUserSerializer(ser.Serializer):
+
+    filterable_fields = ('full_name', 'method_field')
+
+    full_name = ser.CharField(source='fullname')
+    method_field = ser.SerializerMethodField()
+
+
+class FakeUserListView(ListFilterMixin):
+
+    serializer_class = FakeUserSerializer
+    model_class = OSFUser
+
+
 class TestFilterMixin(ApiTestCase):
 
     def setUp(self):
@@ -395,6 +413,26 @@ class TestListFilterMixin(ApiTestCase):
         assert_equal(parsed_field['op'], 'eq')
 
 
+class TestFilterCompiler(ApiTestCase):
+
+    def setUp(self):
+        super(TestFilterCompiler, self).setUp()
+        self.view = FakeUserListView()
+
+    def test_filters_are_applied_in_sql(self):
+        queryset = self.view.param_queryset({'filter[full_name]': 'Freddie'}, OSFUser.objects.all())
+        assert_true(isinstance(queryset, QuerySet))
+        assert_in('UPPER("osf_osfuser"."fullname"::text) LIKE UPPER', str(queryset.query))
+
+    def test_filter_that_cannot_be_pushed_down(self):
+        with assert_raises(InvalidFilterFieldError):
+            self.view.param_queryset({'filter[method_field]': 'foo'}, OSFUser.objects.all())
+
+    def test_list_of_model_instances_is_not_filtered_in_python(self):
+        with assert_raises(AssertionError):
+            self.view.param_queryset({'filter[full_name]': 'Freddie'}, [OSFUser(fullname='Freddie')])
+
+
 class TestOSFOrderingFilter(ApiTestCase):
     class query:
         title = ' '
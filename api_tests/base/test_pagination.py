@@ -54,3 +54,77 @@ class TestJSONAPIPagination(ApiTestCase):
         assert_not_in('meta', links)
         assert_in('total', meta)
         assert_in('per_page', meta)
+
+
+class TestCursorPagination(ApiTestCase):
+
+    def setUp(self):
+        super(TestCursorPagination, self).setUp()
+        self.user = factories.AuthUserFactory()
+        for i in range(0, 11):
+            factories.ProjectFactory(creator=self.user, title='Project {}'.format(i))
+        self.url = '/{}users/me/nodes/?version=2.1&page[size]=4'.format(settings.API_BASE)
+
+    def get_all(self, url):
+        ids = []
+        while url:
+            res = self.app.get(url, auth=self.user.auth)
+            ids.extend(node['id'] for node in res.json['data'])
+            url = res.json['links']['next']
+        return ids
+
+    def test_cursor_pages_match_numbered_pages(self):
+        numbered = self.get_all(self.url)
+        assert_equal(len(numbered), 11)
+        assert_equal(self.get_all(self.url + '&page[cursor]='), numbered)
+        assert_equal(self.get_all(self.url + '&page[cursor]=&sort=title'), self.get_all(self.url + '&sort=title'))
+
+    def test_cursor_links(self):
+        res = self.app.get(self.url + '&page[cursor]=', auth=self.user.auth)
+        first_page = [node['id'] for node in res.json['data']]
+        links = res.json['links']
+        assert_is_none(links['first'])
+        assert_is_none(links['prev'])
+        assert_is_not_none(links['last'])
+        assert_is_none(res.json['meta']['total'])
+        assert_equal(res.json['meta']['per_page'], 4)
+
+        res = self.app.get(links['next'], auth=self.user.auth)
+        assert_is_not_none(res.json['links']['first'])
+        res = self.app.get(res.json['links']['prev'], auth=self.user.auth)
+        assert_equal([node['id'] for node in res.json['data']], first_page)
+
+        res = self.app.get(links['last'], auth=self.user.auth)
+        assert_equal(len(res.json['data']), 4)
+        assert_is_none(res.json['links']['next'])
+        assert_is_not_none(res.json['links']['prev'])
+
+    def test_approximate_total(self):
+        res = self.app.get(self.url + '&page[cursor]=&page[total]=approximate', auth=self.user.auth)
+        assert_true(isinstance(res.json['meta']['total'], int))
+
+    def test_cursor_links_v2(self):
+        res = self.app.get('/{}users/me/nodes/?page[cursor]='.format(settings.API_BASE), auth=self.user.auth)
+        links = res.json['links']
+        assert_not_in('self', links)
+        assert_in('next', links)
+        assert_in('total', links['meta'])
+        assert_in('per_page', links['meta'])
+
+    def test_invalid_cursor(self):
+        res = self.app.get(self.url + '&page[cursor]=notacursor', auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 404)
+
+    def test_cursor_pages_of_contributors(self):
+        project = factories.ProjectFactory(creator=self.user)
+        for i in range(0, 5):
+            project.add_contributor(factories.UserFactory(), visible=i % 2 == 0, save=True)
+        url = '/{}nodes/{}/contributors/?version=2.1&page[size]=4'.format(settings.API_BASE, project._id)
+
+        res = self.app.get(url + '&page[cursor]=', auth=self.user.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(res.json['meta']['total_bibliographic'], 4)
+        assert_equal(self.get_all(url + '&page[cursor]='), self.get_all(url))
+
+        res = self.app.get(url.replace('version=2.1', 'version=2.0') + '&page[cursor]=', auth=self.user.auth)
+        assert_equal(res.json['links']['meta']['total_bibliographic'], 4)
@@ -0,0 +1,103 @@
+import mock
+import pytest
+
+from django.core.cache import caches
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.base import settings
+from api.base.throttling import BaseThrottle, get_throttle_metrics
+
+
+class FiveAMinuteThrottle(BaseThrottle):
+
+    scope = 'five-a-minute'
+    rate = '5/minute'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    caches[settings.THROTTLE_CACHE_NAME].clear()
+    caches[settings.THROTTLE_FALLBACK_CACHE_NAME].clear()
+    BaseThrottle.shared_cache_down_until = 0
+
+
+@pytest.fixture()
+def request_():
+    return Request(APIRequestFactory().get('/'))
+
+
+def make_throttle(now):
+    throttle = FiveAMinuteThrottle()
+    throttle.timer = lambda: now
+    return throttle
+
+
+def send(request, now, count):
+    return [make_throttle(now).allow_request(request, None) for _ in range(count)]
+
+
+class TestSlidingWindowThrottle:
+
+    def test_limit_within_a_window(self, request_):
+        assert send(request_, 600, 6) == [True] * 5 + [False]
+
+    def test_previous_window_is_weighted(self, request_):
+        assert all(send(request_, 600, 5))
+        # Halfway through the next window, 2.5 requests of the previous window still count
+        assert send(request_, 690, 3) == [True, True, False]
+
+    def test_limit_is_reset_after_two_windows(self, request_):
+        assert all(send(request_, 600, 5))
+        assert all(send(request_, 720, 5))
+
+    def test_throttled_requests_are_not_counted(self, request_):
+        assert send(request_, 600, 10) == [True] * 5 + [False] * 5
+        assert send(request_, 690, 3) == [True, True, False]
+
+    def test_wait(self, request_):
+        assert all(send(request_, 600, 5))
+        throttle = make_throttle(630)
+        assert not throttle.allow_request(request_, None)
+        assert throttle.wait() == pytest.approx(30 + 12)
+
+    def test_counters_are_shared_between_instances(self, request_):
+        first, second = make_throttle(600), make_throttle(600)
+        for _ in range(3):
+            assert first.allow_request(request_, None)
+        assert second.allow_request(request_, None)
+        assert second.allow_request(request_, None)
+        assert not first.allow_request(request_, None)
+
+    def test_bypass_token(self):
+        request = Request(APIRequestFactory().get('/', HTTP_X_THROTTLE_TOKEN=settings.BYPASS_THROTTLE_TOKEN))
+        assert all(send(request, 600, 10))
+
+
+class TestThrottleCacheFallback:
+
+    def test_fallback_to_local_cache(self, request_):
+        with mock.patch.object(caches[settings.THROTTLE_CACHE_NAME], 'add', side_effect=IOError):
+            assert send(request_, 600, 6) == [True] * 5 + [False]
+        assert BaseThrottle.shared_cache_down_until == 600 + settings.THROTTLE_CACHE_RETRY_INTERVAL
+
+    def test_shared_cache_is_retried(self, request_):
+        BaseThrottle.shared_cache_down_until = 630
+        assert all(send(request_, 600, 5))
+        assert all(send(request_, 630, 5))
+        key = 'throttle_five-a-minute_127.0.0.1:10'
+        assert caches[settings.THROTTLE_FALLBACK_CACHE_NAME].get(key) == 5
+        assert caches[settings.THROTTLE_CACHE_NAME].get(key) == 5
+
+
+class TestThrottleMetrics:
+
+    def test_metrics_per_scope(self, request_):
+        send(request_, 600, 7)
+        assert get_throttle_metrics(['five-a-minute', 'test-user']) == {
+            'five-a-minute': {'allowed': 5, 'throttled': 2},
+            'test-user': {'allowed': 0, 'throttled': 0},
+        }
@@ -2,15 +2,20 @@ import datetime
 import json
 
 import furl
+import mock
 import responses
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from nose.tools import *  # noqa:
 
 from framework.auth.core import Auth
 
-from addons.github.models import GithubFolder
+from addons.github.models import GithubFile, GithubFolder
 from addons.github.tests.factories import GitHubAccountFactory
 from api.base.settings.defaults import API_BASE
+from api.base.views import WaterButlerMixin
 from api.base.utils import waterbutler_api_url_for
 from api_tests import utils as api_utils
 from tests.base import ApiTestCase
@@ -297,6 +302,56 @@ class TestNodeFilesList(ApiTestCase):
         assert_equal(res.json['data'][0]['attributes']['name'], 'NewFile')
         assert_equal(res.json['data'][0]['attributes']['provider'], 'github')
 
+    @responses.activate
+    def test_node_files_list_reuses_existing_file_nodes(self):
+        self.add_github()
+        url = '/{}nodes/{}/files/github/'.format(API_BASE, self.project._id)
+        self._prepare_mock_wb_response(
+            provider='github', files=[{'name': 'NewFile', 'path': '/NewFile'}])
+        res = self.app.get(url, auth=self.user.auth)
+        file_id = res.json['data'][0]['id']
+
+        responses.reset()
+        self._prepare_mock_wb_response(
+            provider='github', files=[
+                {'name': 'Renamed', 'path': '/NewFile'},
+                {'name': 'Folder', 'path': '/Folder/', 'kind': 'folder'},
+            ])
+        res = self.app.get(url, auth=self.user.auth)
+        data = {each['attributes']['path']: each for each in res.json['data']}
+        assert_equal(data['/NewFile']['id'], file_id)
+        assert_equal(data['/NewFile']['attributes']['name'], 'Renamed')
+        assert_equal(data['/Folder/']['attributes']['kind'], 'folder')
+        assert_equal(GithubFile.objects.filter(target_object_id=self.project.id).count(), 1)
+
+    def test_bulk_get_file_nodes_query_count_does_not_depend_on_file_count(self):
+        class View(WaterButlerMixin):
+            request = mock.Mock(user=self.user)
+
+            def get_node(view, check_object_permissions=True):
+                return self.project
+
+        ContentType.objects.get_for_model(self.project)
+        query_counts = []
+        for count in (2, 20):
+            files_list = [{'attributes': {
+                'name': 'File{}'.format(i),
+                'path': '/{}/File{}'.format(count, i),
+                'materialized': '/{}/File{}'.format(count, i),
+                'provider': 'github',
+                'kind': 'file',
+                'modified': None,
+                'extra': {},
+            }} for i in range(count)]
+            # The first call creates the file nodes, the second one updates them
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as ctx:
+                    file_nodes = View().bulk_get_file_nodes_from_wb_resp(files_list)
+                assert_equal(len(file_nodes), count)
+                query_counts.append(len(ctx.captured_queries))
+        assert_equal(query_counts[0], query_counts[2])
+        assert_equal(query_counts[1], query_counts[3])
+
     @responses.activate
     def test_returns_folder_metadata_not_children(self):
         folder = GithubFolder(
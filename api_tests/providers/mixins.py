@@ -983,3 +983,17 @@ class ProviderLicensesViewTestBaseMixin(ProviderMixinBase):
         assert license_two._id not in license_ids
 
         assert license_three._id == license_ids[0]
+
+    def test_default_license_comes_before_sorted_licenses(self, app, provider, license_one, license_two, license_three, url):
+        provider.licenses_acceptable.add(license_one, license_two, license_three)
+        provider.default_license = license_three
+        provider.save()
+        others = sorted([license_one, license_two], key=lambda license: license.name)
+
+        res = app.get(url)
+        assert res.status_code == 200
+        assert [item['id'] for item in res.json['data']] == [license_three._id] + [license._id for license in others]
+
+        res = app.get('{}?sort=-name'.format(url))
+        assert res.status_code == 200
+        assert [item['id'] for item in res.json['data']] == [license_three._id] + [license._id for license in reversed(others)]
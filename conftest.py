@@ -2,9 +2,11 @@ import logging
 
 import mock
 import pytest
+from django.core.cache import caches
 from faker import Factory
 from website import settings as website_settings
 
+from api.base import settings as api_settings
 from framework.celery_tasks import app as celery_app
 
 logger = logging.getLogger(__name__)
@@ -56,6 +58,11 @@ def override_settings():
     # Set this here instead of in SILENT_LOGGERS, in case developers
     # call setLevel in local.py
     logging.getLogger('website.mails.mails').setLevel(logging.CRITICAL)
+    # Don't reuse sessions, credentials or citations cached by previous tests
+    caches[api_settings.SESSION_CACHE_NAME].clear()
+    caches[api_settings.CITATION_CACHE_NAME].clear()
+    from osf.models import service_credential
+    service_credential._cookies.clear()
 
 
 @pytest.fixture()
@@ -29,6 +29,12 @@ def update_counter(page, node_info=None):
     return PageCounter.update_counter(page, node_info)
 
 
+@app.task(ignore_result=True)
+def flush_page_counters():
+    from osf.models import PageCounter
+    return PageCounter.flush()
+
+
 def get_basic_counters(page):
     from osf.models import PageCounter
     return PageCounter.get_basic_counters(page)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Pooled SMTP delivery.
+
+Opening an SMTP connection, upgrading it with STARTTLS and logging in takes several round
+trips, which dominates the time spent sending large numbers of emails. `deliver` sends
+messages over connections taken from a bounded per-process pool, replacing connections that
+were idle too long, have sent too many messages, or fail while sending.
+"""
+import logging
+import smtplib
+import socket
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+# A message ready to be sent; `msg` is the serialized MIME message
+SMTPMessage = namedtuple('SMTPMessage', ['from_addr', 'to_addrs', 'msg'])
+
+# Errors after which a connection can not be used anymore
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error)
+
+
+class PooledConnection(object):
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.time()
+        self.sent = 0
+
+    @property
+    def expired(self):
+        return (
+            self.sent >= settings.MAIL_CONNECTION_MAX_MESSAGES or
+            time.time() - self.last_used > settings.MAIL_CONNECTION_MAX_IDLE
+        )
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPConnectionPool(object):
+    """A bounded pool of authenticated connections to one SMTP server."""
+
+    def __init__(self, host, port, ttls=True, username=None, password=None, size=None):
+        self.host = host
+        self.port = port
+        self.ttls = ttls
+        self.username = username
+        self.password = password
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size or settings.MAIL_POOL_SIZE)
+        self.stats = {
+            'sent': 0,
+            'failed': 0,
+            'connections': 0,
+            'send_seconds': 0.0,
+        }
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port)
+        smtp.ehlo()
+        if self.ttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.username is not None:
+            smtp.login(self.username, self.password)
+        self.stats['connections'] += 1
+        return PooledConnection(smtp)
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                connection = self._idle.pop()
+                if not connection.expired:
+                    return connection
+                connection.close()
+        return self._connect()
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            connection = self._checkout()
+            try:
+                yield connection
+            except Exception:
+                connection.close()
+                raise
+            connection.last_used = time.time()
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def _send(self, connection, message):
+        connection.smtp.sendmail(message.from_addr, message.to_addrs, message.msg)
+        connection.sent += 1
+
+    def send_batch(self, messages):
+        """Send `messages` over one pooled connection, reconnecting once per message on
+        connection errors.
+
+        :return list: Whether each message was accepted by the server
+        """
+        results = []
+        with self.connection() as connection:
+            for message in messages:
+                start = time.time()
+                try:
+                    try:
+                        self._send(connection, message)
+                    except CONNECTION_ERRORS:
+                        logger.warning('SMTP connection to {} lost, reconnecting'.format(self.host))
+                        connection.close()
+                        fresh = self._connect()
+                        connection.smtp, connection.sent = fresh.smtp, 0
+                        self._send(connection, message)
+                except (smtplib.SMTPException, socket.error) as e:
+                    logger.error('Failed to send email to {}: {}'.format(message.to_addrs, e))
+                    self.stats['failed'] += 1
+                    results.append(False)
+                else:
+                    self.stats['sent'] += 1
+                    results.append(True)
+                self.stats['send_seconds'] += time.time() - start
+        return results
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(ttls=True, login=True, username=None, password=None):
+    key = (settings.MAIL_SERVER, settings.MAIL_PORT, ttls, username if login else None)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SMTPConnectionPool(
+                settings.MAIL_SERVER,
+                settings.MAIL_PORT,
+                ttls=ttls,
+                username=username if login else None,
+                password=password if login else None,
+            )
+        return _pools[key]
+
+
+def deliver(messages, ttls=True, login=True, username=None, password=None, batch_size=None):
+    """Send a list of SMTPMessages over pooled connections.
+
+    :return list: Whether each message was accepted by the server
+    """
+    pool = get_pool(ttls=ttls, login=login, username=username, password=password)
+    batch_size = batch_size or settings.MAIL_BATCH_SIZE
+    results = []
+    for i in range(0, len(messages), batch_size):
+        results += pool.send_batch(messages[i:i + batch_size])
+    return results
+
+
+def get_stats():
+    """Return the delivery counters of this process, summed over all pools:
+    messages sent and failed, connections opened and seconds spent sending.
+    """
+    stats = {'sent': 0, 'failed': 0, 'connections': 0, 'send_seconds': 0.0}
+    with _pools_lock:
+        for pool in _pools.values():
+            for name, value in pool.stats.items():
+                stats[name] += value
+    return stats
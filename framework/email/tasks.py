@@ -1,9 +1,11 @@
 import smtplib
 import logging
+import time
 from email.mime.text import MIMEText
 
 from framework.celery_tasks import app
 from framework import sentry
+from framework.email import smtp
 from website import settings
 import sendgrid
 
@@ -64,15 +66,44 @@ def send_email(from_addr, to_addr, subject, message, mimetype='html', ttls=True,
         )
 
 
-def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=True, login=True, username=None, password=None,
-                    cc_addr=None, replyto=None, _charset='utf-8'):
+@app.task
+def send_emails(emails, ttls=True, login=True, username=None, password=None):
+    """Send a list of emails, reusing SMTP connections between them.
+
+    :param list emails: Keyword arguments of `send_email` for each email, except for
+        ``ttls``, ``login``, ``username`` and ``password``, which apply to all emails
+    :return list: Whether each email was sent successfully
+    """
+    if not settings.USE_EMAIL:
+        return
+    if settings.SENDGRID_API_KEY:
+        return [
+            _send_with_sendgrid(**{key: value for key, value in email.items() if key != '_charset'})
+            for email in emails
+        ]
+
     username = username or settings.MAIL_USERNAME
     password = password or settings.MAIL_PASSWORD
-
     if login and (username is None or password is None):
         logger.error('Mail username and password not set; skipping send.')
         return
 
+    start = time.time()
+    results = smtp.deliver(
+        [_build_smtp_message(**email) for email in emails],
+        ttls=ttls,
+        login=login,
+        username=username,
+        password=password,
+    )
+    logger.info('Sent {} of {} emails in {:.2f}s ({})'.format(
+        sum(results), len(results), time.time() - start, smtp.get_stats()
+    ))
+    return results
+
+
+def _build_smtp_message(from_addr, to_addr, subject, message, mimetype='html', cc_addr=None, replyto=None,
+                        _charset='utf-8', **kwargs):
     msg = MIMEText(message, mimetype, _charset)
     msg['Subject'] = subject
     msg['From'] = from_addr
@@ -85,19 +116,35 @@ def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=
     if replyto is not None:
         msg['Reply-To'] = replyto
 
-    s = smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT)
-    s.ehlo()
-    if ttls:
-        s.starttls()
-        s.ehlo()
-    if login:
-        s.login(username, password)
-    s.sendmail(
+    return smtp.SMTPMessage(
         from_addr=from_addr,
         to_addrs=[a for a in to_addrs if len(a) > 0],
-        msg=msg.as_string()
+        msg=msg.as_string(),
+    )
+
+
+def _send_with_smtp(from_addr, to_addr, subject, message, mimetype='html', ttls=True, login=True, username=None, password=None,
+                    cc_addr=None, replyto=None, _charset='utf-8'):
+    username = username or settings.MAIL_USERNAME
+    password = password or settings.MAIL_PASSWORD
+
+    if login and (username is None or password is None):
+        logger.error('Mail username and password not set; skipping send.')
+        return
+
+    smtp_message = _build_smtp_message(
+        from_addr=from_addr,
+        to_addr=to_addr,
+        subject=subject,
+        message=message,
+        mimetype=mimetype,
+        cc_addr=cc_addr,
+        replyto=replyto,
+        _charset=_charset,
     )
-    s.quit()
+    sent, = smtp.deliver([smtp_message], ttls=ttls, login=login, username=username, password=password)
+    if not sent:
+        raise smtplib.SMTPException('Failed to send email to {}'.format(to_addr))
     return True
 
 
@@ -15,6 +15,7 @@ from weakref import WeakKeyDictionary
 from werkzeug.local import LocalProxy
 
 from framework.flask import redirect
+from framework.sessions import store
 from framework.sessions.utils import remove_session
 from website import settings
 
@@ -129,15 +130,21 @@ def before_request():
         return cas.make_response_from_ticket(ticket=ticket, service_url=service_url.url)
 
     if request.authorization:
-        user = get_user(
-            email=request.authorization.username,
-            password=request.authorization.password
-        )
         # Create an empty session
         # TODO: Shoudn't need to create a session for Basic Auth
         user_session = Session()
         set_session(user_session)
 
+        email = request.authorization.username
+        password = request.authorization.password
+        verified = email and password and store.get_verified_password(email, password)
+        if verified:
+            user_session.data['auth_user_username'] = verified['username']
+            user_session.data['auth_user_fullname'] = verified['fullname']
+            user_session.data['auth_user_id'] = verified['user_id']
+            return
+
+        user = get_user(email=email, password=password)
         if user:
             user_addon = user.get_addon('twofactor')
             if user_addon and user_addon.is_confirmed:
@@ -146,6 +153,8 @@ def before_request():
                     # Must specify two-factor authentication OTP code or invalid two-factor authentication OTP code.
                     user_session.data['auth_error_code'] = http.UNAUTHORIZED
                     return
+            else:
+                store.set_verified_password(email, password, user)
             user_session.data['auth_user_username'] = user.username
             user_session.data['auth_user_fullname'] = user.fullname
             if user_session.data.get('auth_user_id', None) != user._primary_key:
@@ -160,16 +169,17 @@ def before_request():
     if cookie:
         try:
             session_id = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
-            user_session = Session.load(session_id) or Session(_id=session_id)
+            user_session = store.load_session(session_id) or Session(_id=session_id)
         except itsdangerous.BadData:
             return
         if not throttle_period_expired(user_session.created, settings.OSF_SESSION_TIMEOUT):
             # Update date last login when making non-api requests
-            if user_session.data.get('auth_user_id') and 'api' not in request.url:
+            user_id = user_session.data.get('auth_user_id')
+            if user_id and 'api' not in request.url and store.should_update_last_login(user_id):
                 OSFUser = apps.get_model('osf.OSFUser')
                 (
                     OSFUser.objects
-                    .filter(guids___id__isnull=False, guids___id=user_session.data['auth_user_id'])
+                    .filter(guids___id__isnull=False, guids___id=user_id)
                     # Throttle updates
                     .filter(Q(date_last_login__isnull=True) | Q(date_last_login__lt=timezone.now() - dt.timedelta(seconds=settings.DATE_LAST_LOGIN_THROTTLE)))
                 ).update(date_last_login=timezone.now())
@@ -181,4 +191,8 @@ def before_request():
 def after_request(response):
     # Disallow embedding in frames
     response.headers['X-Frame-Options'] = 'SAMEORIGIN'
+    # Write back changes to the session made while handling the request
+    user_session = sessions.get(request._get_current_object())
+    if user_session is not None:
+        store.save_if_changed(user_session)
     return response
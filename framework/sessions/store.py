@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Cached access to sessions and verified credentials.
+
+Sessions are read through a cache in front of `osf.models.Session` and only written back to
+the database when their data changed while handling the request (see `save_if_changed`).
+Verified HTTP Basic credentials and CAS access tokens are remembered for
+`CREDENTIALS_CACHE_TIMEOUT` seconds, so repeated requests with the same credentials skip the
+password hash and the CAS round trip.
+
+A session removed on logout, or credentials invalidated by a password, username or account
+status change or a revoked token, must stop working in every process at once. Sessions and
+credentials are therefore only cached when `CACHES[SESSION_CACHE_NAME]` is a backend shared by
+all processes. Production must configure one (e.g. memcached or redis, in local.py); with a
+process-local backend (the default) nothing is cached, and sessions and credentials are checked
+with the database or CAS on each request.
+"""
+import copy
+import hashlib
+import hmac
+import uuid
+
+from django.apps import apps
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.base import settings as api_settings
+from website import settings
+
+SESSION_KEY = 'session:{session_id}'
+CREDENTIALS_KEY = 'credentials:{digest}'
+USER_CREDENTIALS_TOKEN_KEY = 'credentials_user:{user_id}'
+LAST_LOGIN_KEY = 'date_last_login:{user_id}'
+
+# Fields of a user whose change invalidates the credentials verified for them
+CREDENTIAL_FIELDS = {'password', 'username', 'date_disabled', 'is_active', 'merged_by'}
+
+# Backends whose entries are not seen, or can not be invalidated, by other processes
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def get_cache():
+    return caches[api_settings.SESSION_CACHE_NAME]
+
+
+def is_shared():
+    """Return whether the session cache is shared by all processes."""
+    return not isinstance(get_cache(), LOCAL_BACKENDS)
+
+
+# Sessions
+
+def load_session(session_id):
+    """Return the saved Session with `_id` `session_id`, or None if there is none."""
+    Session = apps.get_model('osf.Session')
+    cached = get_cache().get(SESSION_KEY.format(session_id=session_id)) if is_shared() else None
+    if cached is None:
+        session = Session.load(session_id)
+        if session is None:
+            return None
+        cache_session(session)
+    else:
+        session = Session(**cached)
+        session._state.adding = False
+        session._state.db = 'default'
+    mark_clean(session)
+    return session
+
+
+def cache_session(session):
+    if not is_shared():
+        return
+    get_cache().set(
+        SESSION_KEY.format(session_id=session._id),
+        {
+            'id': session.id,
+            '_id': session._id,
+            'created': session.created,
+            'modified': session.modified,
+            'data': session.data,
+        },
+        timeout=settings.SESSION_CACHE_TIMEOUT,
+    )
+
+
+def uncache_sessions(session_ids):
+    get_cache().delete_many([SESSION_KEY.format(session_id=session_id) for session_id in session_ids])
+
+
+def mark_clean(session):
+    """Remember the data of `session` as stored in the database."""
+    session._stored_data = copy.deepcopy(session.data)
+
+
+def save_if_changed(session):
+    """Save a stored session if its data changed since it was loaded or last saved."""
+    if session.pk and session.data != getattr(session, '_stored_data', session.data):
+        session.save()
+
+
+@receiver(post_save, sender='osf.Session')
+def update_cached_session(sender, instance, **kwargs):
+    cache_session(instance)
+    mark_clean(instance)
+
+
+def should_update_last_login(user_id):
+    """Return whether the last login date of the user with guid `user_id` may be updated,
+    at most once every `DATE_LAST_LOGIN_THROTTLE` seconds per process.
+    """
+    return get_cache().add(LAST_LOGIN_KEY.format(user_id=user_id), True, timeout=settings.DATE_LAST_LOGIN_THROTTLE)
+
+
+# Credentials
+
+def _digest(*parts):
+    # Credentials are only stored as a keyed hash
+    message = b'\0'.join(part.encode('utf-8') if isinstance(part, unicode) else part for part in parts)
+    return hmac.new(settings.SECRET_KEY, message, hashlib.sha256).hexdigest()
+
+
+def _user_token(user_id):
+    cache = get_cache()
+    key = USER_CREDENTIALS_TOKEN_KEY.format(user_id=user_id)
+    cache.add(key, uuid.uuid4().hex, timeout=None)
+    return cache.get(key)
+
+
+def _get_credentials(digest):
+    if not is_shared():
+        return None
+    cache = get_cache()
+    cached = cache.get(CREDENTIALS_KEY.format(digest=digest))
+    if cached is None:
+        return None
+    # Credentials of a user are invalidated at once by replacing the token of the user
+    token = cache.get(USER_CREDENTIALS_TOKEN_KEY.format(user_id=cached['user_id']))
+    if token is None or token != cached['token']:
+        return None
+    return cached
+
+
+def _set_credentials(digest, user_id, **values):
+    if not is_shared():
+        return
+    values.update(user_id=user_id, token=_user_token(user_id))
+    get_cache().set(CREDENTIALS_KEY.format(digest=digest), values, timeout=settings.CREDENTIALS_CACHE_TIMEOUT)
+
+
+def get_verified_password(email, password):
+    """Return the cached result of a successful `get_user(email=email, password=password)`:
+    a dict with the guid, username and full name of the user, or None.
+    """
+    return _get_credentials(_digest('password', email.strip().lower(), password.strip()))
+
+
+def set_verified_password(email, password, user):
+    """Remember that `password` is the password of `user`. Must not be called for users with
+    two-factor authentication enabled, since their requests each need a one time password.
+    """
+    _set_credentials(
+        _digest('password', email.strip().lower(), password.strip()),
+        user._id,
+        username=user.username,
+        fullname=user.fullname,
+    )
+
+
+def get_verified_token(token):
+    """Return the cached CasResponse of a successful profile request for `token`, or None."""
+    cached = _get_credentials(_digest('token', token))
+    return cached and cached['response']
+
+
+def set_verified_token(token, response):
+    _set_credentials(_digest('token', token), response.user, response=response)
+
+
+def forget_token(token):
+    get_cache().delete(CREDENTIALS_KEY.format(digest=_digest('token', token)))
+
+
+def invalidate_credentials(user_id):
+    """Forget all credentials verified for the user with guid `user_id`."""
+    get_cache().delete(USER_CREDENTIALS_TOKEN_KEY.format(user_id=user_id))
+
+
+@receiver(post_save, sender='addons_twofactor.UserSettings')
+def invalidate_credentials_on_twofactor_change(sender, instance, **kwargs):
+    invalidate_credentials(instance.owner._id)
+
+
+@receiver(post_save, sender='osf.ApiOAuth2PersonalToken')
+@receiver(post_delete, sender='osf.ApiOAuth2PersonalToken')
+def forget_changed_token(sender, instance, **kwargs):
+    # Scopes may have changed or the token may have been revoked
+    forget_token(instance.token_id)
+
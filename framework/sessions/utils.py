@@ -3,15 +3,20 @@
 
 def remove_sessions_for_user(user):
     """
-    Permanently remove all stored sessions for the user from the DB.
+    Permanently remove all stored sessions and service credentials for the user from the DB.
 
     :param user: User
     :return:
     """
-    from osf.models import Session
+    from osf.models import ServiceCredential, Session
+    from framework.sessions import store
 
     if user._id:
-        Session.objects.filter(data__auth_user_id=user._id).delete()
+        sessions = Session.objects.filter(data__auth_user_id=user._id)
+        store.uncache_sessions(sessions.values_list('_id', flat=True))
+        sessions.delete()
+    if user.pk:
+        ServiceCredential.revoke(user)
 
 
 def remove_session(session):
@@ -22,4 +27,7 @@ def remove_session(session):
     :return:
     """
     from osf.models import Session
+    from framework.sessions import store
+    if session._id:
+        store.uncache_sessions([session._id])
     Session.objects.filter(id=session.id).delete()
@@ -16,3 +16,8 @@ class AppConfig(BaseAppConfig):
             update_permission_groups,
             dispatch_uid='osf.apps.update_permissions_groups'
         )
+        # All models are loaded, so the file node classes of all addons are registered
+        from osf.models.files import get_file_class_registry
+        get_file_class_registry()
+        from osf.models.storage_usage import connect_file_node_receivers
+        connect_file_node_receivers()
@@ -93,7 +93,7 @@ def export_files(node, user, current_dir):
             _internal=True,
             provider='osfstorage',
             zip='',
-            cookie=user.get_or_create_cookie(),
+            cookie=user.get_service_cookie(),
             base_url=node.osfstorage_region.waterbutler_url
         )
     )
@@ -147,7 +147,7 @@ def perform_wb_copy(reg, node_settings):
         if SKIP_COLLISIONS:
             complete_archive_target(reg, node_settings.short_name)
             return
-    params = {'cookie': user.get_or_create_cookie()}
+    params = {'cookie': user.get_service_cookie()}
     data = {
         'action': 'copy',
         'path': '/',
@@ -330,7 +330,7 @@ def build_file_tree(reg, node_settings):
 
 def archive(registration):
     for reg in registration.node_and_primary_descendants():
-        reg.registered_from.creator.get_or_create_cookie()  # Allow WB requests
+        reg.registered_from.creator.get_service_cookie()  # Allow WB requests
         if reg.archive_job.status == ARCHIVER_SUCCESS:
             continue
         logs_to_revert = reg.registered_from.logs.filter(date__gt=reg.registered_date).exclude(action__in=LOG_WHITELIST)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+import osf.utils.fields
+
+
+POPULATE_NODE_STORAGE_USAGE = """
+    INSERT INTO osf_nodestorageusage (node_id, total, reconciled, created, modified)
+    SELECT F.target_object_id, COALESCE(SUM(V.size), 0), now(), now(), now()
+    FROM osf_basefilenode AS F
+    JOIN osf_basefilenode_versions AS FV ON FV.basefilenode_id = F.id
+    JOIN osf_fileversion AS V ON V.id = FV.fileversion_id
+    WHERE F.type = 'osf.osfstoragefile'
+    AND F.target_content_type_id = (
+        SELECT id FROM django_content_type WHERE app_label = 'osf' AND model = 'abstractnode'
+    )
+    AND F.target_object_id IN (SELECT id FROM osf_abstractnode)
+    GROUP BY F.target_object_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0177_nodeclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeStorageUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('total', models.BigIntegerField(default=0)),
+                ('reconciled', osf.utils.fields.NonNaiveDateTimeField(blank=True, db_index=True, null=True)),
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='storage_usage_counter', to='osf.AbstractNode')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunSQL(POPULATE_NODE_STORAGE_USAGE, migrations.RunSQL.noop),
+    ]
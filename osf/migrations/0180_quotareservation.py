@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+import osf.models.base
+import osf.utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0179_archivechunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquota',
+            name='reserved',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='QuotaReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('_id', models.CharField(db_index=True, default=osf.models.base.generate_object_id, max_length=24, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('expires', osf.utils.fields.NonNaiveDateTimeField(db_index=True)),
+                ('user_quota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='osf.UserQuota')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
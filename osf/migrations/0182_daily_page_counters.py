@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django_extensions.db.fields
+
+
+# Move the per date counts of the JSON `date` field of PageCounter into rows of DailyPageCounter
+FORWARD_SQL = """
+    INSERT INTO osf_dailypagecounter (page, date, total, "unique", created, modified)
+    SELECT osf_pagecounter._id, to_date(counts.key, 'YYYY/MM/DD'),
+           coalesce((counts.value->>'total')::int, 0), coalesce((counts.value->>'unique')::int, 0),
+           now(), now()
+    FROM osf_pagecounter, jsonb_each(osf_pagecounter.date) AS counts;
+"""
+
+BACKWARD_SQL = """
+    UPDATE osf_pagecounter SET date = counts.date
+    FROM (
+        SELECT page, jsonb_object_agg(
+            to_char(date, 'YYYY/MM/DD'), jsonb_build_object('total', total, 'unique', "unique")
+        ) AS date
+        FROM osf_dailypagecounter GROUP BY page
+    ) AS counts
+    WHERE osf_pagecounter._id = counts.page;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0181_rdmannouncementchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPageCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('page', models.CharField(max_length=300)),
+                ('date', models.DateField(db_index=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('unique', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailypagecounter',
+            unique_together=set([('page', 'date')]),
+        ),
+        migrations.CreateModel(
+            name='PageCounterIncrement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('page', models.CharField(db_index=True, max_length=300)),
+                ('date', models.DateField()),
+                ('total', models.PositiveSmallIntegerField(default=0)),
+                ('unique', models.PositiveSmallIntegerField(default=0)),
+                ('daily_unique', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunSQL(FORWARD_SQL, BACKWARD_SQL),
+        migrations.RemoveField(
+            model_name='pagecounter',
+            name='date',
+        ),
+    ]
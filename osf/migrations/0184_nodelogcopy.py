@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0183_servicecredential'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeLogCopy',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('max_log_id', models.IntegerField()),
+                ('last_log_id', models.IntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('copied', models.PositiveIntegerField(default=0)),
+                ('done', models.BooleanField(db_index=True, default=False)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_copies', to='osf.AbstractNode')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='osf.AbstractNode')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
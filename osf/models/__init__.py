@@ -3,19 +3,20 @@ from osf.models.base import Guid, BlackListGuid  # noqa
 from osf.models.user import OSFUser, Email, UserExtendedData  # noqa
 from osf.models.contributor import Contributor, RecentlyAddedContributor, PreprintContributor  # noqa
 from osf.models.session import Session  # noqa
+from osf.models.service_credential import ServiceCredential  # noqa
 from osf.models.institution import Institution  # noqa
 from osf.models.collection import CollectionSubmission, Collection  # noqa
 from osf.models.node import AbstractNode, Node  # noqa
 from osf.models.sanctions import Sanction, Embargo, Retraction, RegistrationApproval, DraftRegistrationApproval, EmbargoTerminationApproval  # noqa
 from osf.models.registrations import Registration, DraftRegistrationLog, DraftRegistration  # noqa
-from osf.models.nodelog import NodeLog  # noqa
+from osf.models.nodelog import NodeLog, NodeLogCopy  # noqa
 from osf.models.filelog import FileLog  # noqa
 from osf.models.preprintlog import PreprintLog  # noqa
 from osf.models.tag import Tag  # noqa
 from osf.models.comment import Comment  # noqa
 from osf.models.conference import Conference, MailRecord  # noqa
 from osf.models.citation import CitationStyle  # noqa
-from osf.models.archive import ArchiveJob, ArchiveTarget  # noqa
+from osf.models.archive import ArchiveChunk, ArchiveJob, ArchiveTarget  # noqa
 from osf.models.queued_mail import QueuedMail  # noqa
 from osf.models.external import ExternalAccount, ExternalProvider  # noqa
 from osf.models.oauth import ApiOAuth2Application, ApiOAuth2PersonalToken, ApiOAuth2Scope  # noqa
@@ -36,8 +37,8 @@ from osf.models.files import (  # noqa
     FileVersion, TrashedFile, TrashedFileNode, TrashedFolder, FileVersionUserMetadata,  # noqa
 )  # noqa
 from osf.models.metadata import FileMetadataRecord  # noqa
-from osf.models.node_relation import NodeRelation  # noqa
-from osf.models.analytics import UserActivityCounter, PageCounter  # noqa
+from osf.models.node_relation import NodeRelation, NodeClosure  # noqa
+from osf.models.analytics import UserActivityCounter, PageCounter, DailyPageCounter, PageCounterIncrement  # noqa
 from osf.models.admin_profile import AdminProfile  # noqa
 from osf.models.admin_log_entry import AdminLogEntry  # noqa
 from osf.models.maintenance_state import MaintenanceState  # noqa
@@ -49,7 +50,7 @@ from osf.models.action import NodeRequestAction, PreprintRequestAction, ReviewAc
 from osf.models.storage import ProviderAssetFile  # noqa
 from osf.models.chronos import ChronosJournal, ChronosSubmission  # noqa
 from osf.models.blacklisted_email_domain import BlacklistedEmailDomain  # noqa
-from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementOption  # noqa
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementOption, RdmAnnouncementChunk  # noqa
 from osf.models.rdm_addons import RdmAddonOption, RdmAddonNoInstitutionOption  # noqa
 from osf.models.rdm_statistics import RdmStatistics  # noqa
 from osf.models.rdm_file_timestamptoken_verify_result import RdmFileTimestamptokenVerifyResult  # noqa
@@ -57,6 +58,7 @@ from osf.models.rdm_user_key import RdmUserKey  # noqa
 from osf.models.rdm_timestamp_grant_pattern import RdmTimestampGrantPattern  # noqa
 from osf.models.timestamp_task import TimestampTask  # noqa
 from osf.models.fileinfo import FileInfo  # noqa
-from osf.models.user_quota import UserQuota  # noqa
+from osf.models.user_quota import QuotaReservation, UserQuota  # noqa
+from osf.models.storage_usage import NodeStorageUsage  # noqa
 from osf.models.project_storage_type import ProjectStorageType  # noqa
 from osf.models.region_external_account import RegionExternalAccount  # noqa
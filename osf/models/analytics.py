@@ -1,17 +1,56 @@
+"""
+Activity and page counters.
+
+Page views and downloads are counted without locking the counter of the page: each one is
+appended to `PageCounterIncrement`, and `PageCounter.flush` (run periodically by
+`framework.analytics.flush_page_counters`) aggregates the buffered increments into a single
+upsert per page into `PageCounter` and per page and day into `DailyPageCounter`. The readers
+add the increments that were not flushed yet, so they return up to date counts.
+"""
+import datetime
 import logging
 
 from dateutil import parser
-from django.db import models, transaction
-from django.db.models import Sum
-from django.db.models.expressions import RawSQL
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
 from django.utils import timezone
 
 from framework.sessions import session
 from osf.models.base import BaseModel
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+from website import settings
 
 logger = logging.getLogger(__name__)
 
+# Moves up to %s buffered increments into the counters, and returns how many were moved.
+# Increments locked by a concurrent flush are skipped, so each is counted exactly once.
+FLUSH_SQL = """
+    WITH flushed AS (
+        DELETE FROM osf_pagecounterincrement
+        WHERE id IN (
+            SELECT id FROM osf_pagecounterincrement ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+        )
+        RETURNING page, date, total, "unique", daily_unique
+    ), daily AS (
+        INSERT INTO osf_dailypagecounter (page, date, total, "unique", created, modified)
+        SELECT page, date, count(*), sum(daily_unique), now(), now()
+        FROM flushed GROUP BY page, date
+        ON CONFLICT (page, date) DO UPDATE
+        SET total = osf_dailypagecounter.total + EXCLUDED.total,
+            "unique" = osf_dailypagecounter."unique" + EXCLUDED."unique",
+            modified = now()
+    ), counters AS (
+        INSERT INTO osf_pagecounter (_id, total, "unique", created, modified)
+        SELECT page, sum(total), sum("unique"), now(), now()
+        FROM flushed GROUP BY page
+        ON CONFLICT (_id) DO UPDATE
+        SET total = osf_pagecounter.total + EXCLUDED.total,
+            "unique" = osf_pagecounter."unique" + EXCLUDED."unique",
+            modified = now()
+    )
+    SELECT count(*) FROM flushed;
+"""
+
 
 class UserActivityCounter(BaseModel):
     primary_identifier_name = '_id'
@@ -60,7 +99,6 @@ class PageCounter(BaseModel):
 
     _id = models.CharField(max_length=300, null=False, blank=False, db_index=True,
                            unique=True)  # 272 in prod
-    date = DateTimeAwareJSONField(default=dict)
 
     total = models.PositiveIntegerField(default=0)
     unique = models.PositiveIntegerField(default=0)
@@ -71,19 +109,22 @@ class PageCounter(BaseModel):
     def get_all_downloads_on_date(cls, date):
         """
         Queries the total number of downloads on a date
-        :param str date: must be formatted the same as a page counter key so 'yyyy/mm/dd'
+        :param datetime date: the date
         :return: long sum:
         """
-        formatted_date = date.strftime('%Y/%m/%d')
-        # Get all PageCounters with data for the date made for all versions downloads,
-        # regex insures one colon so all versions are queried.
-        page_counters = cls.objects.filter(date__has_key=formatted_date, _id__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN)
-
-        # Get the total download numbers from the nested dict on the PageCounter by annotating it as daily_total then
-        # aggregating the sum.
-        daily_total = page_counters.annotate(daily_total=RawSQL("((date->%s->>'total')::int)", (formatted_date,))).aggregate(sum=Sum('daily_total'))['sum']
-
-        return daily_total
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        # Regex insures one colon so only the counters made for all versions are queried.
+        daily_total = DailyPageCounter.objects.filter(
+            date=date, page__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN
+        ).aggregate(sum=Sum('total'))['sum']
+        pending = PageCounterIncrement.objects.filter(
+            date=date, page__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN
+        ).count()
+
+        if daily_total is None and not pending:
+            return None
+        return (daily_total or 0) + pending
 
     @staticmethod
     def clean_page(page):
@@ -99,68 +140,99 @@ class PageCounter(BaseModel):
         date = timezone.now()
         date_string = date.strftime('%Y/%m/%d')
         visited_by_date = session.data.get('visited_by_date', {'date': date_string, 'pages': []})
-
-        with transaction.atomic():
-            model_instance, created = cls.objects.select_for_update().get_or_create(_id=cleaned_page)
-
-            # if they visited something today
-            if date_string == visited_by_date['date']:
-                # if they haven't visited this page today
-                if cleaned_page not in visited_by_date['pages']:
-                    # if the model_instance has today in it
-                    if date_string in model_instance.date.keys():
-                        # increment the number of unique visitors for today
-                        model_instance.date[date_string]['unique'] += 1
-                    else:
-                        # set the number of unique visitors for today to 1
-                        model_instance.date[date_string] = dict(unique=1)
-            # if they haven't visited something today
-            else:
-                # set their visited by date to blank
-                visited_by_date['date'] = date_string
-                visited_by_date['pages'] = []
-                # if the model_instance has today in it
-                if date_string in model_instance.date.keys():
-                    # increment the number of unique visitors for today
-                    model_instance.date[date_string]['unique'] += 1
-                else:
-                    # set the number of unique visitors to 1
-                    model_instance.date[date_string] = dict(unique=1)
-
-            # update their sessions
+        increment = PageCounterIncrement(page=cleaned_page, date=date.date())
+
+        # if they haven't visited something today
+        if date_string != visited_by_date['date']:
+            # set their visited by date to blank
+            visited_by_date['date'] = date_string
+            visited_by_date['pages'] = []
+        # if they haven't visited this page today
+        if cleaned_page not in visited_by_date['pages']:
+            increment.daily_unique = 1
             visited_by_date['pages'].append(cleaned_page)
-            session.data['visited_by_date'] = visited_by_date
 
-            if date_string in model_instance.date.keys():
-                if 'total' not in model_instance.date[date_string].keys():
-                    model_instance.date[date_string].update(total=0)
-                model_instance.date[date_string]['total'] += 1
-            else:
-                model_instance.date[date_string] = dict(total=1)
+        # update their sessions
+        session.data['visited_by_date'] = visited_by_date
 
-            # if a download counter is being updated, only perform the update
-            # if the user who is downloading isn't a contributor to the project
-            page_type = cleaned_page.split(':')[0]
-            if page_type in ('download', 'view') and node_info:
-                if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
-                    model_instance.save()
-                    return
+        # if a download counter is being updated, only count it in the daily counts
+        # if the user who is downloading is a contributor to the project
+        page_type = cleaned_page.split(':')[0]
+        if page_type in ('download', 'view') and node_info:
+            if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
+                increment.save()
+                return
 
-            visited = session.data.get('visited', [])
-            if page not in visited:
-                model_instance.unique += 1
-                visited.append(page)
-                session.data['visited'] = visited
+        visited = session.data.get('visited', [])
+        if page not in visited:
+            increment.unique = 1
+            visited.append(page)
+            session.data['visited'] = visited
 
-            session.save()
-            model_instance.total += 1
+        session.save()
+        increment.total = 1
+        increment.save()
 
-            model_instance.save()
+    @classmethod
+    def flush(cls, batch_size=None):
+        """Add the buffered increments to the counters, `batch_size` (default
+        `settings.PAGE_COUNTER_FLUSH_BATCH_SIZE`) increments per transaction.
+
+        :return int: The number of increments that were added
+        """
+        batch_size = batch_size or settings.PAGE_COUNTER_FLUSH_BATCH_SIZE
+        flushed = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(FLUSH_SQL, [batch_size])
+                count = cursor.fetchone()[0]
+            flushed += count
+            if count < batch_size:
+                return flushed
 
     @classmethod
     def get_basic_counters(cls, page):
-        try:
-            counter = cls.objects.get(_id=cls.clean_page(page))
-            return (counter.unique, counter.total)
-        except cls.DoesNotExist:
+        cleaned_page = cls.clean_page(page)
+        counter = cls.objects.filter(_id=cleaned_page).values_list('unique', 'total').first()
+        pending = PageCounterIncrement.objects.filter(page=cleaned_page).aggregate(
+            count=Count('id'), unique=Sum('unique'), total=Sum('total')
+        )
+        if counter is None and not pending['count']:
             return (None, None)
+        unique, total = counter or (0, 0)
+        return (unique + (pending['unique'] or 0), total + (pending['total'] or 0))
+
+    @classmethod
+    def get_totals_by_prefix(cls, prefix):
+        """Return the totals of the counters whose _id starts with `prefix`, by _id."""
+        totals = dict(cls.objects.filter(_id__startswith=prefix).values_list('_id', 'total'))
+        pending = PageCounterIncrement.objects.filter(page__startswith=prefix).values('page').annotate(sum=Sum('total'))
+        for row in pending:
+            totals[row['page']] = totals.get(row['page'], 0) + row['sum']
+        return totals
+
+
+class DailyPageCounter(BaseModel):
+    """The number of views or downloads of a page on a day, including those by contributors."""
+    page = models.CharField(max_length=300)
+    date = models.DateField(db_index=True)
+
+    total = models.PositiveIntegerField(default=0)
+    unique = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('page', 'date')
+
+
+class PageCounterIncrement(BaseModel):
+    """A view or download of a page that was not added to its counters yet.
+
+    `total` and `unique` are added to the `PageCounter` of the page, the increment itself
+    and `daily_unique` to its `DailyPageCounter`.
+    """
+    page = models.CharField(max_length=300, db_index=True)
+    date = models.DateField()
+
+    total = models.PositiveSmallIntegerField(default=0)
+    unique = models.PositiveSmallIntegerField(default=0)
+    daily_unique = models.PositiveSmallIntegerField(default=0)
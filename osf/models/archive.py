@@ -1,6 +1,7 @@
 from django.contrib.postgres.fields import ArrayField
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 
 from osf.utils.fields import NonNaiveDateTimeField
 from website import settings
@@ -10,6 +11,7 @@ from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from addons.base.models import BaseStorageAddon
 from website.archiver import (
     ARCHIVER_INITIATED,
+    ARCHIVER_PENDING,
     ARCHIVER_SUCCESS,
     ARCHIVER_FAILURE,
     ARCHIVER_FAILURE_STATUSES
@@ -33,6 +35,9 @@ class ArchiveTarget(ObjectIDMixin, BaseModel):
     # }
     stat_result = DateTimeAwareJSONField(default=dict, blank=True)
     errors = ArrayField(models.TextField(), default=list, blank=True)
+    # Bytes to archive and bytes archived so far
+    size = models.BigIntegerField(default=0)
+    archived = models.BigIntegerField(default=0)
 
     def __repr__(self):
         return '<{0}(_id={1}, name={2}, status={3})>'.format(
@@ -42,6 +47,71 @@ class ArchiveTarget(ObjectIDMixin, BaseModel):
             self.status
         )
 
+    @property
+    def chunked(self):
+        return self.chunks.exists()
+
+
+class ArchiveChunk(ObjectIDMixin, BaseModel):
+    """A part of the file tree of an ArchiveTarget that is copied separately. Each file
+    or folder of the chunk is copied with its own request; failed chunks are retried
+    without copying their successful files and folders again.
+    """
+    target = models.ForeignKey(ArchiveTarget, related_name='chunks', on_delete=models.CASCADE)
+    # Storage region of the source node; limits the number of chunks copied at once
+    region = models.ForeignKey('addons_osfstorage.Region', on_delete=models.CASCADE)
+    status = models.CharField(max_length=40, default=ARCHIVER_INITIATED, db_index=True)
+    # Format: [{
+    #     'path': <str>, WaterButler path of the file or folder on the source addon
+    #     'name': <str>,
+    #     'dest_path': <str>, WaterButler path of its parent folder in the archive
+    #     'size': <int>,
+    #     'status': None | ARCHIVER_SUCCESS | ARCHIVER_FAILURE,
+    # }]
+    units = DateTimeAwareJSONField(default=list, blank=True)
+    size = models.BigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    errors = ArrayField(models.TextField(), default=list, blank=True)
+
+    def __repr__(self):
+        return '<{0}(_id={1}, target={2}, status={3})>'.format(
+            self.__class__.__name__,
+            self._id,
+            self.target.name,
+            self.status
+        )
+
+    @property
+    def pending_units(self):
+        return [unit for unit in self.units if not unit['status']]
+
+    def finish_unit(self, path, errors=None):
+        """Record the result of copying the file or folder at `path`. Once all files and
+        folders are copied, the chunk succeeds, or is queued again to retry the failed ones
+        until it ran out of attempts. Must be called with the chunk locked.
+        """
+        unit = next((unit for unit in self.units if unit['path'] == path and not unit['status']), None)
+        if unit is None:
+            return
+        if errors:
+            unit['status'] = ARCHIVER_FAILURE
+            self.errors = self.errors + [u'{}: {}'.format(path, error) for error in errors]
+        else:
+            unit['status'] = ARCHIVER_SUCCESS
+            ArchiveTarget.objects.filter(id=self.target_id).update(archived=F('archived') + unit['size'])
+
+        if not self.pending_units:
+            failed = [each for each in self.units if each['status'] == ARCHIVER_FAILURE]
+            if not failed:
+                self.status = ARCHIVER_SUCCESS
+            elif self.attempts < settings.ARCHIVE_CHUNK_MAX_ATTEMPTS:
+                for unit in failed:
+                    unit['status'] = None
+                self.status = ARCHIVER_INITIATED
+            else:
+                self.status = ARCHIVER_FAILURE
+        self.save()
+
 
 class ArchiveJob(ObjectIDMixin, BaseModel):
 
@@ -87,6 +157,15 @@ class ArchiveJob(ObjectIDMixin, BaseModel):
             if target.status not in (ARCHIVER_SUCCESS, ARCHIVER_FAILURE)
         ])
 
+    @property
+    def progress(self):
+        """Bytes archived and bytes to archive, over all targets"""
+        totals = self.target_addons.aggregate(archived=Sum('archived'), size=Sum('size'))
+        return {
+            'archived': totals['archived'] or 0,
+            'size': totals['size'] or 0,
+        }
+
     def info(self):
         return self.src_node, self.dst_node, self.initiator
 
@@ -170,5 +249,29 @@ class ArchiveJob(ObjectIDMixin, BaseModel):
         target.status = status
         target.errors = errors
         target.stat_result = stat_result
+        if status == ARCHIVER_SUCCESS:
+            target.archived = target.size
         target.save()
         self._post_update_target()
+
+    def update_chunk(self, addon_short_name, path, errors=None):
+        """Record the result of copying the file or folder at `path` of a chunked target,
+        and update the target once all of its chunks succeeded or one of them failed.
+
+        :return: The ArchiveChunk containing `path`, or None
+        """
+        target = self.get_target(addon_short_name)
+        with transaction.atomic():
+            chunk = target.chunks.select_for_update().filter(
+                status=ARCHIVER_PENDING,
+                units__contains=[{'path': path}],
+            ).first()
+            if chunk is None:
+                return None
+            chunk.finish_unit(path, errors=errors)
+
+        if chunk.status == ARCHIVER_FAILURE:
+            self.update_target(addon_short_name, ARCHIVER_FAILURE, errors=chunk.errors)
+        elif chunk.status == ARCHIVER_SUCCESS and not target.chunks.exclude(status=ARCHIVER_SUCCESS).exists():
+            self.update_target(addon_short_name, ARCHIVER_SUCCESS)
+        return chunk
@@ -3,11 +3,12 @@ from __future__ import unicode_literals
 import logging
 import os
 
-import requests
 from dateutil.parser import parse as parse_date
 from django.apps import apps
 from django.db import models, IntegrityError
 from django.db.models import Manager
+from django.db.models.signals import class_prepared
+from django.dispatch import receiver
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
@@ -27,6 +28,7 @@ from api.base.utils import waterbutler_api_url_for
 from website.files import utils
 from website.files.exceptions import VersionNotFoundError
 from website.util import api_v2_url, web_url_for, api_url_for
+from website.util import waterbutler
 
 __all__ = (
     'File',
@@ -36,7 +38,6 @@ __all__ = (
     'TrashedFileNode',
 )
 
-PROVIDER_MAP = {}
 logger = logging.getLogger(__name__)
 
 
@@ -271,25 +272,20 @@ class BaseFileNode(TypedModel, CommentableMixin, OptionalGuidMixin, Taggable, Ob
         type_mapping = {0: Folder, 1: File, 2: None}
         type_cls = type_mapping[type_integer]
 
-        for subclass in BaseFileNode.__subclasses__():
-            if type_cls:
-                for subsubclass in subclass.__subclasses__():
-                    if issubclass(subsubclass, type_cls) and subsubclass._provider == provider:
-                        return subsubclass
-            else:
-                if subclass._provider == provider:
-                    return subclass
-        raise UnableToResolveFileClass('Could not resolve class for {} and {}'.format(provider, type_cls))
+        try:
+            return get_file_class_registry().classes[(provider, type_cls)]
+        except KeyError:
+            raise UnableToResolveFileClass('Could not resolve class for {} and {}'.format(provider, type_cls))
 
     def _resolve_class(self, type_cls):
-        for subclass in BaseFileNode.__subclasses__():
-            if type_cls:
-                for subsubclass in subclass.__subclasses__():
-                    if issubclass(subsubclass, type_cls) and subsubclass._provider == self.provider:
-                        return subsubclass
-            else:
-                if subclass._provider == self.provider:
-                    return subclass
+        return get_file_class_registry().classes.get((self.provider, type_cls))
+
+    @classmethod
+    def supports_hash_timestamp(cls, provider):
+        """Whether the files of `provider` are timestamped by the hash WaterButler reports
+        for them (`get_hash_for_timestamp`) rather than by downloading their contents.
+        """
+        return provider in get_file_class_registry().hash_timestamp_providers
 
     def get_version(self, revision, required=False):
         """Find a version with identifier revision
@@ -348,8 +344,9 @@ class BaseFileNode(TypedModel, CommentableMixin, OptionalGuidMixin, Taggable, Ob
         if auth_header:
             headers['Authorization'] = auth_header
 
-        resp = requests.get(
+        resp = waterbutler.get(
             self.generate_waterbutler_url(revision=revision, meta=True, _internal=True, **kwargs),
+            'metadata',
             headers=headers,
         )
         if resp.status_code != 200:
@@ -727,6 +724,44 @@ class TrashedFolder(TrashedFileNode):
         return tf
 
 
+class FileClassRegistry(object):
+    """The provider specific classes of file nodes, by provider and kind (`File`, `Folder`
+    or None for the base class of the provider), as resolved by `BaseFileNode.resolve_class`.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        # Classes are registered in the order `resolve_class` used to find them in
+        for subclass in BaseFileNode.__subclasses__():
+            self.classes.setdefault((subclass._provider, None), subclass)
+            for subsubclass in subclass.__subclasses__():
+                for type_cls in (File, Folder):
+                    if issubclass(subsubclass, type_cls):
+                        self.classes.setdefault((subsubclass._provider, type_cls), subsubclass)
+        self.hash_timestamp_providers = frozenset(
+            provider for (provider, type_cls), file_cls in self.classes.items()
+            if type_cls is File and hasattr(file_cls, 'get_hash_for_timestamp')
+        )
+
+
+_file_class_registry = None
+
+
+def get_file_class_registry():
+    global _file_class_registry
+    if _file_class_registry is None:
+        _file_class_registry = FileClassRegistry()
+    return _file_class_registry
+
+
+@receiver(class_prepared)
+def reset_file_class_registry(sender, **kwargs):
+    # File node classes of addons loaded after the registry was built
+    global _file_class_registry
+    if issubclass(sender, BaseFileNode):
+        _file_class_registry = None
+
+
 class FileVersionUserMetadata(BaseModel):
     user = models.ForeignKey('OSFUser', on_delete=models.CASCADE)
     file_version = models.ForeignKey('FileVersion', on_delete=models.CASCADE)
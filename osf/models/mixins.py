@@ -30,6 +30,7 @@ from osf.utils.machines import ReviewsMachine, NodeRequestMachine, PreprintReque
 from osf.utils.permissions import ADMIN, REVIEW_GROUPS, READ, WRITE
 from osf.utils.workflows import DefaultStates, DefaultTriggers, ReviewStates, ReviewTriggers
 from osf.utils.requests import get_request_and_user_id
+from osf.utils.permission_resolver import get_permission_resolver
 from website.project import signals as project_signals
 from website import settings, mails, language
 from api.base.rdmlogger import RdmLogger, rdmlog
@@ -1508,13 +1509,16 @@ class ContributorMixin(models.Model):
         if not user or user.is_anonymous:
             return False
         perm = '{}_{}'.format(permission, object_type)
-        # Using get_group_perms to get permissions that are inferred through
-        # group membership - not inherited from superuser status
-        has_permission = perm in get_group_perms(user, self)
         if object_type == 'node':
+            # Node permissions are memoized for the rest of the request
+            resolver = get_permission_resolver()
+            has_permission = resolver.has_perm(user, self, perm)
             if not has_permission and permission == READ and check_parent:
-                return self.is_admin_parent(user)
-        return has_permission
+                return resolver.is_admin_parent(user, self)
+            return has_permission
+        # Using get_group_perms to get permissions that are inferred through
+        # group membership - not inherited from superuser status
+        return perm in get_group_perms(user, self)
 
     # TODO: Remove save parameter
     def add_permission(self, user, permission, save=False):
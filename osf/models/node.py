@@ -6,29 +6,26 @@ import urlparse
 import warnings
 import httplib
 
-import bson
 from django.db.models import Q
 from dirtyfields import DirtyFieldsMixin
 from django.apps import apps
 from django_bulk_update.helper import bulk_update
 from django.contrib.auth.models import AnonymousUser, Permission
 from django.contrib.contenttypes.fields import GenericRelation
-from django.core.paginator import Paginator
 from django.core.urlresolvers import reverse
 from django.db import models, connection
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.functional import cached_property
 from keen import scoped_keys
-from psycopg2._psycopg import AsIs
 from typedmodels.models import TypedModel, TypedModelManager
 from include import IncludeManager
 from guardian.models import (
     GroupObjectPermissionBase,
     UserObjectPermissionBase,
 )
-from guardian.shortcuts import get_objects_for_user, get_groups_with_perms, get_group_perms
+from guardian.shortcuts import get_objects_for_user, get_groups_with_perms
 
 from framework import status
 from framework.auth import oauth_scopes
@@ -44,8 +41,8 @@ from osf.models.identifiers import Identifier, IdentifierMixin
 from osf.models.licenses import NodeLicenseRecord
 from osf.models.mixins import (AddonModelMixin, CommentableMixin, Loggable, ContributorMixin, GuardianMixin,
                                NodeLinkMixin, Taggable, TaxonomizableMixin, SpamOverrideMixin)
-from osf.models.node_relation import NodeRelation
-from osf.models.nodelog import NodeLog
+from osf.models.node_relation import NodeClosure, NodeRelation
+from osf.models.nodelog import NodeLog, NodeLogCopy
 from osf.models.sanctions import RegistrationApproval
 from osf.models.private_link import PrivateLink
 from osf.models.tag import Tag
@@ -56,8 +53,9 @@ from osf.models.validators import validate_title
 from framework.auth.core import Auth
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.utils.fields import NonNaiveDateTimeField
+from osf.utils.permission_resolver import get_permission_resolver, clear_permission_cache
 from osf.utils.requests import get_request_and_user_id, string_type_request_headers
-from osf.utils import sanitize
+from osf.utils import node_copy, sanitize
 from api.base import settings as api_settings
 from website import language, settings
 from website.citations.utils import datetime_to_csl
@@ -65,6 +63,7 @@ from website.project.licenses import set_license
 from website.project import signals as project_signals
 from website.project import tasks as node_tasks
 from website.project.model import NodeUpdateError
+from website.notifications.subscriptions import invalidate_all_subscribers, invalidate_subscribers
 from website.identifiers.tasks import update_doi_metadata_on_change
 from website.identifiers.clients import DataCiteClient
 from osf.utils.permissions import (
@@ -79,7 +78,6 @@ from osf.utils.permissions import (
 )
 from website.util import api_url_for, api_v2_url, web_url_for
 from .base import BaseModel, GuidMixin, GuidMixinQuerySet
-from api.caching.tasks import update_storage_usage
 from api.caching import settings as cache_settings
 from api.caching.utils import storage_usage_cache
 
@@ -93,54 +91,15 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
         return self.filter(id__in=self.exclude(type='osf.collection').exclude(type='osf.quickfilesnode').values_list('root_id', flat=True))
 
     def get_children(self, root, active=False, include_root=False):
-        # If `root` is a root node, we can use the 'descendants' related name
-        # rather than doing a recursive query
-        if root.id == root.root_id:
-            query = root.descendants.all() if include_root else root.descendants.exclude(id=root.id)
-            if active:
-                query = query.filter(is_deleted=False)
-            return query
-        else:
-            sql = """
-                WITH RECURSIVE descendants AS (
-                SELECT
-                    parent_id,
-                    child_id,
-                    1 AS LEVEL,
-                    ARRAY[parent_id] as pids
-                FROM %s
-                %s
-                WHERE is_node_link IS FALSE AND parent_id = %s %s
-                UNION ALL
-                SELECT
-                    d.parent_id,
-                    s.child_id,
-                    d.level + 1,
-                    d.pids || s.parent_id
-                FROM descendants AS d
-                    JOIN %s AS s
-                    ON d.child_id = s.parent_id
-                WHERE s.is_node_link IS FALSE AND %s = ANY(pids)
-                ) SELECT array_agg(DISTINCT child_id)
-                FROM descendants
-                WHERE parent_id = %s;
-            """
-            with connection.cursor() as cursor:
-                node_relation_table = AsIs(NodeRelation._meta.db_table)
-                cursor.execute(sql, [
-                    node_relation_table,
-                    AsIs('LEFT JOIN osf_abstractnode ON {}.child_id = osf_abstractnode.id'.format(node_relation_table) if active else ''),
-                    root.pk,
-                    AsIs('AND osf_abstractnode.is_deleted IS FALSE' if active else ''),
-                    node_relation_table,
-                    root.pk,
-                    root.pk])
-                row = cursor.fetchone()[0]
-                if not row:
-                    return AbstractNode.objects.filter(id=root.pk) if include_root else AbstractNode.objects.none()
-                if include_root:
-                    row.append(root.pk)
-                return AbstractNode.objects.filter(id__in=row)
+        # Subtree lookups go through the NodeClosure table, which holds a row for
+        # every (ancestor, descendant) pair of the component hierarchy
+        query = Q(id__in=NodeClosure.objects.filter(ancestor_id=root.pk).values('descendant_id'))
+        if include_root:
+            query |= Q(id=root.pk)
+        children = AbstractNode.objects.filter(query)
+        if active:
+            children = children.filter(is_deleted=False)
+        return children
 
     def can_view(self, user=None, private_link=None):
         qs = self.filter(is_public=True)
@@ -158,23 +117,26 @@ class AbstractNodeQuerySet(GuidMixinQuerySet):
             qs |= read_user_query
             qs |= self.extra(where=["""
                 "osf_abstractnode".id in (
-                    WITH RECURSIVE implicit_read AS (
-                        SELECT N.id as node_id
-                        FROM osf_abstractnode as N, auth_permission as P, osf_nodegroupobjectpermission as G, osf_osfuser_groups as UG
-                        WHERE P.codename = 'admin_node'
-                        AND G.permission_id = P.id
-                        AND UG.osfuser_id = %s
-                        AND G.group_id = UG.group_id
-                        AND G.content_object_id = N.id
-                        AND N.type = 'osf.node'
-                    UNION ALL
-                        SELECT "osf_noderelation"."child_id"
-                        FROM "implicit_read"
-                        LEFT JOIN "osf_noderelation" ON "osf_noderelation"."parent_id" = "implicit_read"."node_id"
-                        WHERE "osf_noderelation"."is_node_link" IS FALSE
-                    ) SELECT * FROM implicit_read
+                    SELECT N.id
+                    FROM osf_abstractnode as N, auth_permission as P, osf_nodegroupobjectpermission as G, osf_osfuser_groups as UG
+                    WHERE P.codename = 'admin_node'
+                    AND G.permission_id = P.id
+                    AND UG.osfuser_id = %s
+                    AND G.group_id = UG.group_id
+                    AND G.content_object_id = N.id
+                    AND N.type = 'osf.node'
+                UNION ALL
+                    SELECT C.descendant_id
+                    FROM osf_nodeclosure as C, osf_abstractnode as N, auth_permission as P, osf_nodegroupobjectpermission as G, osf_osfuser_groups as UG
+                    WHERE P.codename = 'admin_node'
+                    AND G.permission_id = P.id
+                    AND UG.osfuser_id = %s
+                    AND G.group_id = UG.group_id
+                    AND G.content_object_id = N.id
+                    AND N.type = 'osf.node'
+                    AND C.ancestor_id = N.id
                 )
-            """], params=(user.id, ))
+            """], params=(user.id, user.id, ))
         return qs.filter(is_deleted=False)
 
 
@@ -903,9 +865,10 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return OSFGroup.objects.filter(osfgroupgroupobjectpermission__group_id__in=member_groups)
 
     def get_aggregate_logs_query(self, auth):
+        readable_children = Node.objects.get_children(self).can_view(user=auth.user, private_link=auth.private_link)
         return (
             (
-                Q(node_id__in=list(Node.objects.get_children(self).can_view(user=auth.user, private_link=auth.private_link).values_list('id', flat=True)) + [self.id])
+                Q(node_id__in=readable_children.values('id')) | Q(node_id=self.id)
             ) & Q(should_hide=False)
         )
 
@@ -924,7 +887,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         if isinstance(user, AnonymousUser):
             return []
         # Returns perms either through contributorship or group membership
-        user_perms = sorted(set(get_group_perms(user, self)).intersection(PERMISSIONS), key=PERMISSIONS.index)
+        user_perms = sorted(get_permission_resolver().get_perms(user, self).intersection(PERMISSIONS), key=PERMISSIONS.index)
         return [CONTRIB_PERMISSIONS[perm] for perm in user_perms]
 
     def has_permission_on_children(self, user, permission):
@@ -933,7 +896,9 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         """
         if self.has_permission(user, permission):
             return True
-        for node in self.nodes_primary.filter(is_deleted=False):
+        children = self.nodes_primary.filter(is_deleted=False)
+        get_permission_resolver().prefetch(user, children)
+        for node in children:
             if node.has_permission_on_children(user, permission):
                 return True
         return False
@@ -945,11 +910,12 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
                                     Useful for checking parent permissions for non-group actions like registrations.
         :return: bool Does the user have admin permissions on this object or its parents?
         """
+        if include_group_admin:
+            if not user or user.is_anonymous:
+                return False
+            return get_permission_resolver().is_admin_parent(user, self)
         if self.has_permission(user, ADMIN, check_parent=False):
-            ret = True
-            if not include_group_admin and not self.is_contributor(user):
-                ret = False
-            return ret
+            return self.is_contributor(user)
         parent = self.parent_node
         if parent:
             return parent.is_admin_parent(user, include_group_admin=include_group_admin)
@@ -1398,39 +1364,10 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         return self.private_links.filter(is_deleted=True).values_list('key', flat=True)
 
     def get_root(self):
-        sql = """
-            WITH RECURSIVE ascendants AS (
-              SELECT
-                parent_id,
-                child_id,
-                1 AS LEVEL,
-                ARRAY[child_id] as cids
-              FROM %s
-              WHERE is_node_link IS FALSE and child_id = %s
-              UNION ALL
-              SELECT
-                S.parent_id,
-                D.child_id,
-                D.level + 1,
-                D.cids || S.child_id
-              FROM ascendants AS D
-                JOIN %s AS S
-                  ON D.parent_id = S.child_id
-              WHERE S.is_node_link IS FALSE
-                AND %s = ANY(cids)
-            ) SELECT parent_id
-              FROM ascendants
-              WHERE child_id = %s
-              ORDER BY level DESC
-              LIMIT 1;
-        """
-        with connection.cursor() as cursor:
-            node_relation_table = AsIs(NodeRelation._meta.db_table)
-            cursor.execute(sql, [node_relation_table, self.pk, node_relation_table, self.pk, self.pk])
-            res = cursor.fetchone()
-            if res:
-                return AbstractNode.objects.get(pk=res[0])
-            return self
+        closure = NodeClosure.objects.filter(descendant_id=self.pk).select_related('ancestor').order_by('-depth').first()
+        if closure:
+            return closure.ancestor
+        return self
 
     def find_readable_antecedent(self, auth):
         """ Returns first antecendant node readable by <user>.
@@ -1443,14 +1380,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
     def copy_contributors_from(self, node):
         """Copies the contibutors from node (including permissions and visibility) into this node."""
-        contribs = []
-        for contrib in node.contributor_set.all():
-            permission = contrib.permission
-            contrib.id = None
-            contrib.node = self
-            contribs.append(contrib)
-            self.add_permission(contrib.user, permission, save=True)
-        Contributor.objects.bulk_create(contribs)
+        node_copy.copy_contributors(node, self)
 
     def register_node(self, schema, auth, data, parent=None, child_ids=None, provider=None):
         """Make a frozen copy of a node.
@@ -1505,7 +1435,7 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
         registered.registered_schema.add(schema)
         registered.copy_contributors_from(self)
-        registered.tags.add(*self.all_tags.values_list('pk', flat=True))
+        node_copy.copy_tags(self, registered)
         registered.subjects.add(*self.subjects.values_list('pk', flat=True))
         registered.affiliated_institutions.add(*self.affiliated_institutions.values_list('pk', flat=True))
 
@@ -1667,7 +1597,6 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         for affiliation in user.affiliated_institutions.all():
             new.affiliated_institutions.add(affiliation)
 
-    # TODO: Optimize me (e.g. use bulk create)
     def fork_node(self, auth, title=None, parent=None):
         """Recursively fork a node.
 
@@ -1711,33 +1640,13 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         # Need to save here in order to access m2m fields
         forked.save()
 
-        forked.tags.add(*self.all_tags.values_list('pk', flat=True))
+        node_copy.copy_tags(self, forked)
         forked.subjects.add(*self.subjects.values_list('pk', flat=True))
 
         if parent:
             node_relation = NodeRelation.objects.get(parent=parent.forked_from, child=original)
             NodeRelation.objects.get_or_create(_order=node_relation._order, parent=parent, child=forked)
 
-        for node_relation in original.node_relations.filter(child__is_deleted=False):
-            node_contained = node_relation.child
-            # Fork child nodes
-            if not node_relation.is_node_link:
-                try:  # Catch the potential PermissionsError above
-                    node_contained.fork_node(
-                        auth=auth,
-                        title='',
-                        parent=forked,
-                    )
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-            else:
-                # Copy linked nodes
-                NodeRelation.objects.get_or_create(
-                    is_node_link=True,
-                    parent=forked,
-                    child=node_contained
-                )
-
         if title is None:
             forked.title = PREFIX + original.title
         elif title == '':
@@ -1783,31 +1692,50 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         # Need to call this after save for the notifications to be created with the _primary_key
         project_signals.contributor_added.send(forked, contributor=user, auth=auth, email_template='false')
 
+        if parent is None:
+            # Fork the components one level of the tree at a time, parents first
+            forks = {original.id: forked}
+            for node_relations in node_copy.component_levels(original):
+                for node_relation in node_relations:
+                    parent_fork = forks.get(node_relation.parent_id)
+                    if parent_fork is None:
+                        continue  # The parent was omitted, and so are its components
+                    node_contained = node_relation.child
+                    # Fork child nodes
+                    if not node_relation.is_node_link:
+                        try:  # Catch the potential PermissionsError above
+                            forks[node_contained.id] = node_contained.fork_node(
+                                auth=auth,
+                                title='',
+                                parent=parent_fork,
+                            )
+                        except PermissionsError:
+                            pass  # If this exception is thrown omit the node from the result set
+                    else:
+                        # Copy linked nodes
+                        NodeRelation.objects.get_or_create(
+                            is_node_link=True,
+                            parent=parent_fork,
+                            child=node_contained
+                        )
+
         return forked
 
-    def clone_logs(self, node, page_size=100):
-        paginator = Paginator(self.logs.order_by('pk').all(), page_size)
-        for page_num in paginator.page_range:
-            page = paginator.page(page_num)
-            # Instantiate NodeLogs "manually"
-            # because BaseModel#clone() is too slow for large projects
-            logs_to_create = [
-                NodeLog(
-                    _id=bson.ObjectId(),
-                    action=log.action,
-                    date=log.date,
-                    params=log.params,
-                    should_hide=log.should_hide,
-                    foreign_user=log.foreign_user,
-                    # Set foreign keys, not their objects
-                    # to speed things up
-                    node_id=node.pk,
-                    user_id=log.user_id,
-                    original_node_id=log.original_node_id
-                )
-                for log in page
-            ]
-            NodeLog.objects.bulk_create(logs_to_create)
+    def clone_logs(self, node):
+        """Copy all logs of this node to `node` server-side. The logs of nodes with more than
+        `NODE_LOG_COPY_INLINE_MAX` logs are copied in the background, see NodeLogCopy.
+        """
+        logs = self.logs.aggregate(count=models.Count('id'), max_id=models.Max('id'))
+        if logs['count'] <= settings.NODE_LOG_COPY_INLINE_MAX:
+            node_copy.copy_logs(self, node)
+            return
+        log_copy = NodeLogCopy.objects.create(
+            source=self,
+            destination=node,
+            max_log_id=logs['max_id'],
+            total=logs['count'],
+        )
+        enqueue_task(node_tasks.copy_node_logs.s(log_copy.id))
 
     def use_as_template(self, auth, changes=None, top_level=True, parent=None):
         """Create a new project, using an existing project as a template.
@@ -1906,16 +1834,6 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             node_relation = NodeRelation.objects.get(parent=parent.template_node, child=self)
             NodeRelation.objects.get_or_create(_order=node_relation._order, parent=parent, child=new)
 
-        # deal with the children of the node, if any
-        for node_relation in self.node_relations.select_related('child').filter(child__is_deleted=False):
-            node_contained = node_relation.child
-            # template child nodes
-            if not node_relation.is_node_link:
-                try:  # Catch the potential PermissionsError above
-                    node_contained.use_as_template(auth, changes, top_level=False, parent=new)
-                except PermissionsError:
-                    pass
-
         new.root = None
         new.save()  # Recompute root on save()
 
@@ -1925,6 +1843,22 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             if method:
                 method(self, new, auth.user)
 
+        if parent is None:
+            # Template the components one level of the tree at a time, parents first
+            templated = {self.id: new}
+            for node_relations in node_copy.component_levels(self):
+                for node_relation in node_relations:
+                    parent_new = templated.get(node_relation.parent_id)
+                    # template child nodes, unless their parent was omitted
+                    if parent_new is None or node_relation.is_node_link:
+                        continue
+                    node_contained = node_relation.child
+                    try:  # Catch the potential PermissionsError above
+                        templated[node_contained.id] = node_contained.use_as_template(
+                            auth, changes, top_level=False, parent=parent_new)
+                    except PermissionsError:
+                        pass
+
         return new
 
     def next_descendants(self, auth, condition=lambda auth, node: True):
@@ -2426,11 +2360,12 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         key = cache_settings.STORAGE_USAGE_KEY.format(target_id=self._id)
 
         storage_usage_total = storage_usage_cache.get(key)
-        if storage_usage_total:
-            return storage_usage_total
-        else:
-            update_storage_usage(self)  # sets cache
-            return storage_usage_cache.get(key)
+        if storage_usage_total is None:
+            # The counter is maintained incrementally, so a cache miss never aggregates over files
+            NodeStorageUsage = apps.get_model('osf.NodeStorageUsage')
+            storage_usage_total = NodeStorageUsage.get_total(self.id)
+            storage_usage_cache.set(key, storage_usage_total, cache_settings.FIVE_MIN_TIMEOUT)
+        return storage_usage_total
 
 
 class NodeUserObjectPermission(UserObjectPermissionBase):
@@ -2552,3 +2487,43 @@ def set_parent_and_root(sender, instance, created, *args, **kwargs):
     if not instance.root:
         instance.root = instance.get_root()
         instance.save()
+
+
+@receiver(post_save, sender=NodeGroupObjectPermission)
+@receiver(post_delete, sender=NodeGroupObjectPermission)
+@receiver(post_save, sender=NodeRelation)
+@receiver(post_delete, sender=NodeRelation)
+@receiver(m2m_changed, sender=OSFUser.groups.through)
+def clear_node_permission_cache(sender, *args, **kwargs):
+    # Node permissions, group membership or the node hierarchy changed - drop
+    # any permissions memoized for the current request
+    clear_permission_cache()
+
+
+@receiver(post_save, sender=NodeGroupObjectPermission)
+@receiver(post_delete, sender=NodeGroupObjectPermission)
+def invalidate_subscribers_on_permission_change(sender, instance, **kwargs):
+    invalidate_subscribers([instance.content_object_id])
+
+
+@receiver(post_save, sender=NodeRelation)
+@receiver(post_delete, sender=NodeRelation)
+def invalidate_subscribers_on_relation_change(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        invalidate_subscribers([instance.parent_id, instance.child_id])
+
+
+@receiver(m2m_changed, sender=OSFUser.groups.through)
+def invalidate_subscribers_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        group_ids = [instance.id]
+    elif pk_set is None:
+        invalidate_all_subscribers()
+        return
+    else:
+        group_ids = pk_set
+    invalidate_subscribers(
+        NodeGroupObjectPermission.objects.filter(group_id__in=group_ids).values_list('content_object_id', flat=True)
+    )
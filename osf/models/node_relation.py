@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from .base import BaseModel, ObjectIDMixin
 
@@ -25,3 +27,70 @@ class NodeRelation(ObjectIDMixin, BaseModel):
         index_together = (
             ('is_node_link', 'child', 'parent'),
         )
+
+
+class NodeClosure(models.Model):
+    """Transitive closure of the component hierarchy (node links are not included).
+
+    There is one row for every (ancestor, descendant) pair, where `depth` is the
+    number of component relations between them (1 for a direct child). Rows are
+    maintained by the NodeRelation signal receivers below, so any subtree or
+    ancestor lookup is a single indexed join instead of a recursive query.
+    """
+    ancestor = models.ForeignKey('AbstractNode', related_name='descendant_closures', on_delete=models.CASCADE)
+    descendant = models.ForeignKey('AbstractNode', related_name='ancestor_closures', on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField()
+
+    LINK_SQL = """
+        INSERT INTO osf_nodeclosure (ancestor_id, descendant_id, depth)
+        SELECT A.ancestor_id, D.descendant_id, A.depth + D.depth + 1
+        FROM (
+            SELECT ancestor_id, depth FROM osf_nodeclosure WHERE descendant_id = %(parent)s
+            UNION ALL SELECT %(parent)s, 0
+        ) AS A, (
+            SELECT descendant_id, depth FROM osf_nodeclosure WHERE ancestor_id = %(child)s
+            UNION ALL SELECT %(child)s, 0
+        ) AS D
+        ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+    """
+
+    UNLINK_SQL = """
+        DELETE FROM osf_nodeclosure
+        WHERE descendant_id IN (
+            SELECT descendant_id FROM osf_nodeclosure WHERE ancestor_id = %(child)s
+            UNION ALL SELECT %(child)s
+        ) AND ancestor_id IN (
+            SELECT ancestor_id FROM osf_nodeclosure WHERE descendant_id = %(parent)s
+            UNION ALL SELECT %(parent)s
+        );
+    """
+
+    @classmethod
+    def link(cls, parent_id, child_id):
+        """Attach the subtree rooted at `child_id` below `parent_id` and all of its ancestors."""
+        with connection.cursor() as cursor:
+            cursor.execute(cls.LINK_SQL, {'parent': parent_id, 'child': child_id})
+
+    @classmethod
+    def unlink(cls, parent_id, child_id):
+        """Detach the subtree rooted at `child_id` from `parent_id` and all of its ancestors."""
+        with connection.cursor() as cursor:
+            cursor.execute(cls.UNLINK_SQL, {'parent': parent_id, 'child': child_id})
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        index_together = (
+            ('descendant', 'depth'),
+        )
+
+
+@receiver(post_save, sender=NodeRelation)
+def add_node_closure(sender, instance, created, **kwargs):
+    if created and not instance.is_node_link:
+        NodeClosure.link(instance.parent_id, instance.child_id)
+
+
+@receiver(post_delete, sender=NodeRelation)
+def remove_node_closure(sender, instance, **kwargs):
+    if not instance.is_node_link:
+        NodeClosure.unlink(instance.parent_id, instance.child_id)
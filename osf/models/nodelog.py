@@ -198,3 +198,33 @@ class NodeLog(ObjectIDMixin, BaseModel):
 
     def _natural_key(self):
         return self._id
+
+
+class NodeLogCopy(BaseModel):
+    """Logs of a node copied to a fork or registration by a background task, in batches of
+    `NODE_LOG_COPY_BATCH_SIZE` logs. `last_log_id` is the last log copied, so an interrupted
+    copy resumes after it; logs added to the source after `max_log_id` are not copied.
+    """
+    source = models.ForeignKey('AbstractNode', related_name='+', on_delete=models.CASCADE)
+    destination = models.ForeignKey('AbstractNode', related_name='log_copies', on_delete=models.CASCADE)
+    max_log_id = models.IntegerField()
+    last_log_id = models.IntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    copied = models.PositiveIntegerField(default=0)
+    done = models.BooleanField(default=False, db_index=True)
+
+    def __repr__(self):
+        return '<{0}(source={1}, destination={2}, copied={3}/{4})>'.format(
+            self.__class__.__name__,
+            self.source_id,
+            self.destination_id,
+            self.copied,
+            self.total,
+        )
+
+    @property
+    def progress(self):
+        """Fraction of the logs copied so far"""
+        if not self.total:
+            return 1.0 if self.done else 0.0
+        return min(float(self.copied) / self.total, 1.0)
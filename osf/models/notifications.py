@@ -1,11 +1,14 @@
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from osf.models import Node
 from osf.models import OSFUser
 from osf.models.base import BaseModel, ObjectIDMixin
 from osf.models.validators import validate_subscription_type
 from osf.utils.fields import NonNaiveDateTimeField
 from website.notifications.constants import NOTIFICATION_TYPES
+from website.notifications.subscriptions import invalidate_all_subscribers, invalidate_subscribers
 from website.util import api_v2_url
 
 
@@ -91,6 +94,30 @@ class NotificationSubscription(BaseModel):
             self.save()
 
 
+@receiver(post_save, sender=NotificationSubscription)
+@receiver(post_delete, sender=NotificationSubscription)
+def invalidate_subscribers_on_subscription_change(sender, instance, **kwargs):
+    if instance.node_id:
+        invalidate_subscribers([instance.node_id])
+
+
+@receiver(m2m_changed, sender=NotificationSubscription.none.through)
+@receiver(m2m_changed, sender=NotificationSubscription.email_digest.through)
+@receiver(m2m_changed, sender=NotificationSubscription.email_transactional.through)
+def invalidate_subscribers_on_subscribers_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        if instance.node_id:
+            invalidate_subscribers([instance.node_id])
+    elif pk_set is None:
+        invalidate_all_subscribers()
+    else:
+        invalidate_subscribers(
+            NotificationSubscription.objects.filter(id__in=pk_set, node__isnull=False).values_list('node_id', flat=True)
+        )
+
+
 class NotificationDigest(ObjectIDMixin, BaseModel):
     user = models.ForeignKey('OSFUser', null=True, blank=True, on_delete=models.CASCADE)
     provider = models.ForeignKey('AbstractProvider', null=True, blank=True, on_delete=models.CASCADE)
@@ -11,6 +11,19 @@ class RdmAnnouncement(BaseModel):
     announcement_type = models.CharField(max_length=256, null=False)
     date_sent = NonNaiveDateTimeField(auto_now_add=True)
     is_success = models.BooleanField(default=False)
+    # Delivery progress of announcements sent to users in the background, see
+    # admin.rdm_announcement.tasks
+    status = models.CharField(max_length=16, null=True, blank=True)
+    recipients = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    @property
+    def progress(self):
+        """Fraction of the recipients the announcement was sent or failed to be sent to"""
+        if not self.recipients:
+            return 1.0 if self.status in (RdmAnnouncementChunk.SENT, RdmAnnouncementChunk.FAILED) else 0.0
+        return min(float(self.sent + self.failed) / self.recipients, 1.0)
 
 class RdmAnnouncementOption(BaseModel):
     user = models.ForeignKey('OSFUser', null=True)
@@ -28,3 +41,21 @@ class RdmFcmDevice(BaseModel):
     user = models.ForeignKey('OSFUser', null=True)
     device_token = EncryptedTextField(blank=True, null=True)
     date_created = NonNaiveDateTimeField(auto_now_add=True)
+
+class RdmAnnouncementChunk(BaseModel):
+    """Recipients of an announcement sent by one task: the users (for emails) or devices
+    (for push notifications) with primary keys from `first_id` to `last_id`
+    """
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    announcement = models.ForeignKey(RdmAnnouncement, related_name='chunks', on_delete=models.CASCADE)
+    first_id = models.IntegerField()
+    last_id = models.IntegerField()
+    status = models.CharField(max_length=16, default=QUEUED, db_index=True)
+    recipients = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
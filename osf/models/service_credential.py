@@ -0,0 +1,92 @@
+"""
+Credentials of requests made to other services on behalf of a user.
+
+Background tasks (the archiver, timestamp verification, statistics, addon syncs, ...) call
+WaterButler as a user, which authenticates them by calling back `OSFUser.from_cookie`. Instead
+of a browser session, they present a `ServiceCredential`: a short-lived, scoped token looked up
+by its indexed id. Each process reuses the credential of a user while at least half of its
+`SERVICE_CREDENTIAL_LIFETIME` is left, keeping up to `SERVICE_CREDENTIAL_CACHE_SIZE` of them, so
+a batch job creates one credential per user at most. Expired credentials are deleted by
+`scripts.clear_sessions`.
+"""
+import threading
+from collections import OrderedDict
+
+import itsdangerous
+from django.db import models
+from django.utils import timezone
+
+from osf.models.base import BaseModel, ObjectIDMixin
+from website import settings
+
+_cookies = OrderedDict()
+_cookies_lock = threading.Lock()
+
+
+class ServiceCredential(ObjectIDMixin, BaseModel):
+    # Signed cookies of credentials start with the prefix, so they are told apart from the
+    # cookies of sessions without querying the database
+    PREFIX = 'service:'
+
+    WATERBUTLER = 'waterbutler'
+    SCOPE_CHOICES = (
+        (WATERBUTLER, 'WaterButler'),
+    )
+
+    user = models.ForeignKey('OSFUser', related_name='service_credentials', on_delete=models.CASCADE)
+    scope = models.CharField(max_length=32, choices=SCOPE_CHOICES, default=WATERBUTLER)
+    expires = models.DateTimeField(db_index=True)
+
+    @classmethod
+    def get_cookie(cls, user, scope=WATERBUTLER, secret=None):
+        """Return the signed cookie of a valid credential of `user`, reusing the one this process
+        created last if at least half of its lifetime is left.
+        """
+        secret = secret or settings.SECRET_KEY
+        key = (user.id, scope, secret)
+        renew_at = timezone.now() + settings.SERVICE_CREDENTIAL_LIFETIME / 2
+        with _cookies_lock:
+            if key in _cookies:
+                cookie, expires = _cookies.pop(key)
+                if expires > renew_at:
+                    _cookies[key] = (cookie, expires)
+                    return cookie
+
+        credential = cls.objects.create(
+            user=user,
+            scope=scope,
+            expires=timezone.now() + settings.SERVICE_CREDENTIAL_LIFETIME,
+        )
+        cookie = itsdangerous.Signer(secret).sign(cls.PREFIX + credential._id)
+        with _cookies_lock:
+            _cookies[key] = (cookie, credential.expires)
+            while len(_cookies) > settings.SERVICE_CREDENTIAL_CACHE_SIZE:
+                _cookies.popitem(last=False)
+        return cookie
+
+    @classmethod
+    def load_user(cls, token, scope=WATERBUTLER):
+        """Return the user of the unexpired credential of `scope` with the unsigned `token`,
+        or None.
+        """
+        if not token.startswith(cls.PREFIX):
+            return None
+        credential = cls.objects.select_related('user').filter(
+            _id=token[len(cls.PREFIX):],
+            scope=scope,
+            expires__gt=timezone.now(),
+        ).first()
+        return credential.user if credential else None
+
+    @classmethod
+    def revoke(cls, user):
+        """Delete the credentials of `user`, e.g. when their password changes."""
+        with _cookies_lock:
+            for key in [key for key in _cookies if key[0] == user.id]:
+                del _cookies[key]
+        cls.objects.filter(user=user).delete()
+
+    @classmethod
+    def clear_expired(cls):
+        """Delete the expired credentials, and return how many were deleted."""
+        return cls.objects.filter(expires__lte=timezone.now()).delete()[0]
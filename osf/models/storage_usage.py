@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Incrementally maintained storage usage of nodes.
+
+The storage usage of a node is the total size of all versions of the active OSF Storage
+files it owns. Instead of aggregating over all files every time a file changes,
+`NodeStorageUsage.total` is adjusted by the size of the change from the signal receivers
+below:
+
+* versions added to or removed from a file,
+* files moved to another node, trashed or restored,
+* files deleted from the database.
+
+The receivers of file node changes are connected to `BaseFileNode` and each of its typed
+subclasses by `connect_file_node_receivers` once all models are loaded, so saving other
+models does not run them.
+
+Changes made with bulk queryset operations bypass the receivers, so
+`api.caching.tasks.reconcile_storage_usage` periodically recomputes the counters.
+"""
+from __future__ import unicode_literals
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, models, transaction
+from django.db.models import Sum
+from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from osf.models.base import BaseModel
+from osf.models.files import BaseFileNode, FileVersion
+from osf.models.node import AbstractNode
+from osf.utils.fields import NonNaiveDateTimeField
+
+# Only active OSF Storage files count towards the storage usage of a node
+COUNTED_FILE_TYPE = 'osf.osfstoragefile'
+
+ADD_SQL = """
+    INSERT INTO osf_nodestorageusage (node_id, total, created, modified)
+    VALUES (%s, %s, now(), now())
+    ON CONFLICT (node_id) DO UPDATE
+    SET total = osf_nodestorageusage.total + EXCLUDED.total, modified = now();
+"""
+
+
+class NodeStorageUsage(BaseModel):
+    node = models.OneToOneField('AbstractNode', related_name='storage_usage_counter', on_delete=models.CASCADE)
+    total = models.BigIntegerField(default=0)
+    # When `total` was last recomputed from the node's files
+    reconciled = NonNaiveDateTimeField(null=True, blank=True, db_index=True)
+
+    @classmethod
+    def add(cls, node_id, delta):
+        """Atomically add `delta` bytes to the storage usage of the node with id `node_id`."""
+        if not delta:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(ADD_SQL, [node_id, delta])
+
+    @classmethod
+    def get_total(cls, node_id):
+        return cls.objects.filter(node_id=node_id).values_list('total', flat=True).first() or 0
+
+    @staticmethod
+    def compute_total(node_id):
+        """Aggregate the storage usage of a node over all of its files."""
+        return FileVersion.objects.filter(
+            basefilenode__type=COUNTED_FILE_TYPE,
+            basefilenode__target_object_id=node_id,
+            basefilenode__target_content_type=ContentType.objects.get_for_model(AbstractNode),
+        ).aggregate(sum=Sum('size'))['sum'] or 0
+
+    @classmethod
+    def reconcile(cls, node_id):
+        """Recompute the storage usage of a node from its files and return it.
+
+        The counter row is locked while aggregating, so changes committed concurrently are
+        either included in the aggregate or applied on top of it afterwards.
+        """
+        with transaction.atomic():
+            counter, _ = cls.objects.get_or_create(node_id=node_id)
+            counter = cls.objects.select_for_update().get(pk=counter.pk)
+            counter.total = cls.compute_total(node_id)
+            counter.reconciled = timezone.now()
+            counter.save()
+        return counter.total
+
+
+_UNKNOWN = object()
+
+
+def _counted_node_id(file_node):
+    """Return the id of the node whose storage usage `file_node` counts towards, or None.
+    Returns `_UNKNOWN` if the fields needed to tell were not loaded from the database.
+    """
+    fields = file_node.__dict__
+    if not all(name in fields for name in ('type', 'target_content_type_id', 'target_object_id')):
+        return _UNKNOWN
+    if fields['type'] != COUNTED_FILE_TYPE or fields['target_object_id'] is None:
+        return None
+    if fields['target_content_type_id'] != ContentType.objects.get_for_model(AbstractNode).id:
+        return None
+    return fields['target_object_id']
+
+
+def _versions_size(file_node):
+    return file_node.versions.aggregate(sum=Sum('size'))['sum'] or 0
+
+
+def remember_counted_node(sender, instance, **kwargs):
+    instance._storage_usage_node_id = _counted_node_id(instance)
+
+
+def update_storage_usage_on_file_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_storage_usage_node_id', _UNKNOWN)
+    after = _counted_node_id(instance)
+    instance._storage_usage_node_id = after
+    # New files do not have versions yet
+    if created or _UNKNOWN in (before, after) or before == after:
+        return
+
+    size = _versions_size(instance)
+    if before is not None:
+        NodeStorageUsage.add(before, -size)
+    if after is not None:
+        NodeStorageUsage.add(after, size)
+
+
+def update_storage_usage_on_file_delete(sender, instance, **kwargs):
+    node_id = _counted_node_id(instance)
+    if node_id not in (None, _UNKNOWN):
+        NodeStorageUsage.add(node_id, -_versions_size(instance))
+
+
+def _file_node_classes(cls=BaseFileNode):
+    yield cls
+    for subclass in cls.__subclasses__():
+        for file_cls in _file_node_classes(subclass):
+            yield file_cls
+
+
+def connect_file_node_receivers():
+    """Connect the receivers of file node changes to `BaseFileNode` and all of its subclasses.
+
+    Signals are sent with the class of the instance and typed file nodes are proxy models, so
+    every class needs to be connected. Must be called once all models are loaded.
+    """
+    for file_cls in set(_file_node_classes()):
+        post_init.connect(remember_counted_node, sender=file_cls, dispatch_uid='osf.storage_usage.remember_counted_node')
+        post_save.connect(update_storage_usage_on_file_change, sender=file_cls, dispatch_uid='osf.storage_usage.update_on_file_change')
+        pre_delete.connect(update_storage_usage_on_file_delete, sender=file_cls, dispatch_uid='osf.storage_usage.update_on_file_delete')
+
+
+@receiver(m2m_changed, sender=BaseFileNode.versions.through)
+def update_storage_usage_on_versions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+
+    if not reverse:
+        node_id = _counted_node_id(instance)
+        if node_id in (None, _UNKNOWN):
+            return
+        versions = instance.versions.all() if action == 'pre_clear' else FileVersion.objects.filter(id__in=pk_set)
+        NodeStorageUsage.add(node_id, sign * (versions.aggregate(sum=Sum('size'))['sum'] or 0))
+        return
+
+    # A version was attached to or detached from files
+    if action == 'pre_clear':
+        pk_set = sender.objects.filter(fileversion_id=instance.id).values_list('basefilenode_id', flat=True)
+    node_ids = BaseFileNode.objects.filter(
+        id__in=pk_set,
+        type=COUNTED_FILE_TYPE,
+        target_content_type=ContentType.objects.get_for_model(AbstractNode),
+    ).values_list('target_object_id', flat=True)
+    for node_id in node_ids:
+        NodeStorageUsage.add(node_id, sign * (instance.size or 0))
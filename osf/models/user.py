@@ -36,6 +36,7 @@ from framework.auth.exceptions import (ChangePasswordError, ExpiredTokenError,
                                        MergeConflictError,
                                        MergeDisableError)
 from framework.exceptions import PermissionsError
+from framework.sessions.store import CREDENTIAL_FIELDS, invalidate_credentials
 from framework.sessions.utils import remove_sessions_for_user
 from osf.utils.requests import get_current_request
 from osf.exceptions import reraise_django_validation_errors, MaxRetriesError, UserStateError
@@ -44,6 +45,7 @@ from osf.models.contributor import Contributor, RecentlyAddedContributor
 from osf.models.institution import Institution
 from osf.models.mixins import AddonModelMixin
 from osf.models.spam import SpamMixin
+from osf.models.service_credential import ServiceCredential
 from osf.models.session import Session
 from osf.models.tag import Tag
 from osf.models.mapcore import MAPProfile
@@ -56,6 +58,7 @@ from osf.utils.permissions import API_CONTRIBUTOR_PERMISSIONS, MANAGER, MEMBER,
 from website import settings as website_settings
 from website import filters, mails
 from website.project import new_bookmark_collection
+from website.notifications.subscriptions import invalidate_all_subscribers
 
 logger = logging.getLogger(__name__)
 
@@ -1010,7 +1013,13 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
         self.update_is_active()
         self.username = self.username.lower().strip() if self.username else None
         dirty_fields = set(self.get_dirty_fields(check_relationship=True))
+        created = self._state.adding
         ret = super(OSFUser, self).save(*args, **kwargs)
+        if 'date_disabled' in dirty_fields and not created:
+            # Disabled users are not notified
+            invalidate_all_subscribers()
+        if CREDENTIAL_FIELDS.intersection(dirty_fields) and not created:
+            invalidate_credentials(self._id)
         if self.SEARCH_UPDATE_FIELDS.intersection(dirty_fields) and self.is_confirmed:
             self.update_search()
             self.update_search_nodes_contributors()
@@ -1712,9 +1721,20 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
         signer = itsdangerous.Signer(secret)
         return signer.sign(user_session._id)
 
+    def get_service_cookie(self, secret=None):
+        """Return a cookie authenticating requests made to WaterButler on behalf of the user,
+        e.g. by background tasks. Unlike `get_or_create_cookie`, it does not look up the sessions
+        of the user: the cookie is a short-lived `ServiceCredential`, reused by this process.
+
+        :param str secret: The key to sign the cookie with
+        :returns: The signed cookie
+        """
+        return ServiceCredential.get_cookie(self, secret=secret)
+
     @classmethod
     def from_cookie(cls, cookie, secret=None):
-        """Attempt to load a user from their signed cookie
+        """Attempt to load a user from their signed cookie, or from the signed cookie of one of
+        their service credentials
         :returns: None if a user cannot be loaded else User
         """
         if not cookie:
@@ -1727,6 +1747,9 @@ class OSFUser(DirtyFieldsMixin, GuidMixin, BaseModel, AbstractBaseUser, Permissi
         except itsdangerous.BadSignature:
             return None
 
+        if token.startswith(ServiceCredential.PREFIX):
+            return ServiceCredential.load_user(token)
+
         user_session = Session.load(token)
 
         if user_session is None:
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from django.db import models
 
+from osf.models.base import BaseModel, ObjectIDMixin
 from osf.models.storage import StorageType
+from osf.utils.fields import NonNaiveDateTimeField
 
 
 class UserQuota(StorageType):
@@ -11,3 +13,14 @@ class UserQuota(StorageType):
         default=StorageType.NII_STORAGE)
     max_quota = models.IntegerField(default=100)
     used = models.BigIntegerField(default=0)
+    # Sum of the sizes of the QuotaReservations of this quota
+    reserved = models.BigIntegerField(default=0)
+
+
+class QuotaReservation(ObjectIDMixin, BaseModel):
+    """Storage held for an upload in progress, counted against the quota until the upload
+    is logged, fails, or the reservation expires.
+    """
+    user_quota = models.ForeignKey(UserQuota, related_name='reservations', on_delete=models.CASCADE)
+    size = models.BigIntegerField()
+    expires = NonNaiveDateTimeField(db_index=True)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Server-side copying of node relations for forks, templates and registrations.
+
+Each function copies all rows of one relation from a source node to a destination node with
+a single `INSERT ... SELECT` statement, so the cost in round trips does not depend on the
+size of the source node. Logs of large nodes are copied in batches by a background task
+instead, see `osf.models.NodeLogCopy`.
+
+Components are copied one level of the component tree at a time, see `component_levels`.
+"""
+from __future__ import unicode_literals
+
+from django.apps import apps
+from django.db import connection
+
+from osf.utils.permission_resolver import clear_permission_cache
+from website.notifications.subscriptions import invalidate_subscribers
+
+COPY_LOGS_SQL = """
+    INSERT INTO osf_nodelog (
+        created, modified, _id, date, action, params, should_hide, foreign_user, node_id, user_id, original_node_id
+    )
+    SELECT now(), now(), generate_object_id(), date, action, params, should_hide, foreign_user, %s, user_id, original_node_id
+    FROM osf_nodelog
+    WHERE node_id = %s
+    ORDER BY id;
+"""
+
+# Copies a batch of logs with ids in (after, until], and returns how many and the last id
+COPY_LOGS_BATCH_SQL = """
+    WITH batch AS (
+        SELECT id
+        FROM osf_nodelog
+        WHERE node_id = %(source)s AND id > %(after)s AND id <= %(until)s
+        ORDER BY id
+        LIMIT %(limit)s
+    ), copied AS (
+        INSERT INTO osf_nodelog (
+            created, modified, _id, date, action, params, should_hide, foreign_user, node_id, user_id, original_node_id
+        )
+        SELECT now(), now(), generate_object_id(), date, action, params, should_hide, foreign_user, %(destination)s, user_id, original_node_id
+        FROM osf_nodelog
+        WHERE id IN (SELECT id FROM batch)
+        ORDER BY id
+    )
+    SELECT count(*), max(id) FROM batch;
+"""
+
+COPY_TAGS_SQL = """
+    INSERT INTO osf_abstractnode_tags (abstractnode_id, tag_id)
+    SELECT %s, tag_id
+    FROM osf_abstractnode_tags
+    WHERE abstractnode_id = %s
+    ON CONFLICT DO NOTHING;
+"""
+
+COPY_CONTRIBUTORS_SQL = """
+    INSERT INTO osf_contributor (visible, read, write, admin, user_id, node_id, _order)
+    SELECT visible, read, write, admin, user_id, %s, _order
+    FROM osf_contributor
+    WHERE node_id = %s
+    ORDER BY _order
+    ON CONFLICT DO NOTHING;
+"""
+
+# Node permission groups are named node_<id>_<permission>, see AbstractNode.group_format
+COPY_PERMISSION_GROUPS_SQL = """
+    INSERT INTO osf_osfuser_groups (osfuser_id, group_id)
+    SELECT UG.osfuser_id, DG.id
+    FROM osf_osfuser_groups AS UG
+    JOIN auth_group AS SG ON SG.id = UG.group_id
+    JOIN auth_group AS DG ON DG.name = 'node_' || %s || '_' || substring(SG.name FROM '[^_]+$')
+    WHERE SG.name IN ('node_' || %s || '_read', 'node_' || %s || '_write', 'node_' || %s || '_admin')
+    ON CONFLICT DO NOTHING;
+"""
+
+
+def copy_logs(source, destination):
+    """Copy the logs of `source` to `destination`, keeping their order."""
+    with connection.cursor() as cursor:
+        cursor.execute(COPY_LOGS_SQL, [destination.id, source.id])
+
+
+def copy_logs_batch(source_id, destination_id, after, until, limit):
+    """Copy at most `limit` logs of the node with id `source_id` whose ids are greater than
+    `after` and at most `until`, keeping their order.
+
+    :return tuple: The number of logs copied and the id of the last one, None if there were none
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(COPY_LOGS_BATCH_SQL, {
+            'source': source_id,
+            'destination': destination_id,
+            'after': after,
+            'until': until,
+            'limit': limit,
+        })
+        return cursor.fetchone()
+
+
+def copy_tags(source, destination):
+    """Add all tags of `source`, including system tags, to `destination`."""
+    with connection.cursor() as cursor:
+        cursor.execute(COPY_TAGS_SQL, [destination.id, source.id])
+
+
+def copy_contributors(source, destination):
+    """Copy the contributors of `source` to `destination`, including their permissions,
+    bibliographic status and order. `destination` must not have any contributors yet.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(COPY_CONTRIBUTORS_SQL, [destination.id, source.id])
+        cursor.execute(COPY_PERMISSION_GROUPS_SQL, [destination.id, source.id, source.id, source.id])
+    clear_permission_cache()
+    invalidate_subscribers([destination.id])
+
+
+def component_levels(node):
+    """Yield the relations below `node` one level of the component tree at a time, parents
+    before their children, loading each level with one query. Relations to deleted nodes are
+    skipped, and node links are yielded but not descended into.
+    """
+    NodeRelation = apps.get_model('osf.NodeRelation')
+    parent_ids = [node.id]
+    while parent_ids:
+        relations = list(
+            NodeRelation.objects.filter(parent_id__in=parent_ids, child__is_deleted=False)
+            .select_related('child')
+            .order_by('parent_id', '_order')
+        )
+        if not relations:
+            return
+        yield relations
+        parent_ids = [relation.child_id for relation in relations if not relation.is_node_link]
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Request-scoped resolution of a user's effective permissions on AbstractNodes.
+
+Permission checks on nodes are repeated many times for the same (user, node) pair while
+serving a single request (list pages, embeds, serializer fields, DRF permission classes).
+The resolver loads a user's permissions for a batch of nodes in one query - including
+permissions inherited through OSF Group membership - plus a second query on the
+NodeClosure table for implicit admin permissions granted by an admin ancestor.
+Results are memoized on the current Flask or Django request for the rest of that request.
+
+Outside of a request (celery tasks, scripts, shell) every call to `get_permission_resolver`
+returns a fresh resolver, so nothing is memoized across calls.
+
+Any change to node permission rows, group membership or node hierarchy clears the
+request-scoped cache (see the receivers in osf/models/node.py).
+"""
+from __future__ import unicode_literals
+
+from django.apps import apps
+from django.db import connection
+
+from osf.utils.permissions import ADMIN_NODE, READ_NODE
+from osf.utils.requests import DummyRequest, get_current_request
+
+_REQUEST_ATTR = '_osf_permission_resolver'
+
+IMPLICIT_ADMIN_SQL = """
+    SELECT DISTINCT C.descendant_id
+    FROM osf_nodeclosure AS C
+    JOIN osf_nodegroupobjectpermission AS G ON G.content_object_id = C.ancestor_id
+    JOIN auth_permission AS P ON P.id = G.permission_id
+    JOIN osf_osfuser_groups AS UG ON UG.group_id = G.group_id
+    WHERE C.descendant_id = ANY(%s)
+    AND P.codename = %s
+    AND UG.osfuser_id = %s;
+"""
+
+# Explicit read permission on a node, or admin permission on the node or any of its ancestors
+READERS_SQL = """
+    SELECT DISTINCT N.node_id, UG.osfuser_id
+    FROM (
+        SELECT node_id, node_id AS permission_node_id, %(read)s AS codename FROM unnest(%(nodes)s) AS node_id
+        UNION ALL SELECT node_id, node_id, %(admin)s FROM unnest(%(nodes)s) AS node_id
+        UNION ALL SELECT descendant_id, ancestor_id, %(admin)s FROM osf_nodeclosure WHERE descendant_id = ANY(%(nodes)s)
+    ) AS N
+    JOIN osf_nodegroupobjectpermission AS G ON G.content_object_id = N.permission_node_id
+    JOIN auth_permission AS P ON P.id = G.permission_id AND P.codename = N.codename
+    JOIN osf_osfuser_groups AS UG ON UG.group_id = G.group_id
+    WHERE UG.osfuser_id = ANY(%(users)s);
+"""
+
+
+class NodePermissionResolver(object):
+    """Memoizes the effective node permissions of users.
+
+    Permissions are stored as guardian codenames (e.g. 'read_node'), matching the output
+    of `guardian.shortcuts.get_group_perms`.
+    """
+
+    def __init__(self):
+        self._perms = {}
+        self._admin_ancestor = {}
+
+    def clear(self):
+        self._perms.clear()
+        self._admin_ancestor.clear()
+
+    def prefetch(self, user, nodes, include_ancestors=True):
+        """Load `user`'s permissions on all `nodes` that have not been resolved yet.
+
+        :param OSFUser user: User whose permissions are loaded
+        :param nodes: Iterable of AbstractNodes or AbstractNode primary keys
+        :param bool include_ancestors: Also resolve implicit admin permissions granted by ancestors
+        """
+        if not user or user.is_anonymous or not user.id:
+            return
+        node_ids = set(getattr(node, 'id', node) for node in nodes)
+        node_ids.discard(None)
+
+        missing = [node_id for node_id in node_ids if (user.id, node_id) not in self._perms]
+        if missing:
+            self._load_perms(user, missing)
+
+        if include_ancestors:
+            missing = [node_id for node_id in node_ids if (user.id, node_id) not in self._admin_ancestor]
+            if missing:
+                self._load_admin_ancestors(user, missing)
+
+    def get_perms(self, user, node):
+        """Return the set of guardian codenames `user` has on `node` through contributorship
+        or group membership (not inherited from superuser status or ancestors).
+        """
+        if not user or user.is_anonymous or not user.id or not node.id:
+            return frozenset()
+        key = (user.id, node.id)
+        if key not in self._perms:
+            self._load_perms(user, [node.id])
+        return self._perms[key]
+
+    def has_perm(self, user, node, codename):
+        return codename in self.get_perms(user, node)
+
+    def is_admin_parent(self, user, node):
+        """Return whether `user` is an admin on `node` or any of its ancestors, through
+        contributorship or group membership.
+        """
+        if self.has_perm(user, node, ADMIN_NODE):
+            return True
+        if not user or user.is_anonymous or not user.id or not node.id:
+            return False
+        key = (user.id, node.id)
+        if key not in self._admin_ancestor:
+            self._load_admin_ancestors(user, [node.id])
+        return self._admin_ancestor[key]
+
+    def _load_perms(self, user, node_ids):
+        NodeGroupObjectPermission = apps.get_model('osf', 'NodeGroupObjectPermission')
+        OSFUserGroup = apps.get_model('osf', 'osfuser_groups')
+
+        found = {node_id: set() for node_id in node_ids}
+        rows = NodeGroupObjectPermission.objects.filter(
+            content_object_id__in=node_ids,
+            group_id__in=OSFUserGroup.objects.filter(osfuser_id=user.id).values_list('group_id', flat=True),
+        ).values_list('content_object_id', 'permission__codename')
+        for node_id, codename in rows:
+            found[node_id].add(codename)
+        for node_id, codenames in found.items():
+            self._perms[(user.id, node_id)] = frozenset(codenames)
+
+    def _load_admin_ancestors(self, user, node_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(IMPLICIT_ADMIN_SQL, [list(node_ids), ADMIN_NODE, user.id])
+            admin_ancestor_ids = set(row[0] for row in cursor.fetchall())
+        for node_id in node_ids:
+            self._admin_ancestor[(user.id, node_id)] = node_id in admin_ancestor_ids
+
+
+def get_permission_resolver():
+    """Return the permission resolver for the current request, creating it if needed.
+
+    When called outside of a Flask or Django request a new, unshared resolver is returned.
+    """
+    request = get_current_request()
+    if isinstance(request, DummyRequest):
+        return NodePermissionResolver()
+    resolver = getattr(request, _REQUEST_ATTR, None)
+    if resolver is None:
+        resolver = NodePermissionResolver()
+        setattr(request, _REQUEST_ATTR, resolver)
+    return resolver
+
+
+def prefetch_node_permissions(user, nodes):
+    """Batch-load `user`'s permissions for `nodes` into the current request's resolver.
+    """
+    AbstractNode = apps.get_model('osf', 'AbstractNode')
+    nodes = [node for node in nodes if isinstance(node, AbstractNode)]
+    if nodes:
+        get_permission_resolver().prefetch(user, nodes)
+
+
+def get_node_readers(node_ids, user_ids):
+    """Batch version of `node.has_permission(user, READ)` for many nodes and users.
+
+    :return set: (node id, user id) pairs for which the user can read the node
+    """
+    node_ids, user_ids = list(set(node_ids)), list(set(user_ids))
+    if not node_ids or not user_ids:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(READERS_SQL, {'read': READ_NODE, 'admin': ADMIN_NODE, 'nodes': node_ids, 'users': user_ids})
+        return set(cursor.fetchall())
+
+
+def clear_permission_cache():
+    """Drop any permissions memoized for the current request."""
+    request = get_current_request()
+    resolver = getattr(request, _REQUEST_ATTR, None)
+    if resolver is not None:
+        resolver.clear()
@@ -9,11 +9,11 @@ import pytest
 from django.utils import timezone
 from nose.tools import *  # noqa: F403
 
-from datetime import datetime
+from datetime import date, datetime
 
 from addons.osfstorage.models import OsfStorageFile
 from framework import analytics
-from osf.models import PageCounter
+from osf.models import DailyPageCounter, PageCounter, PageCounterIncrement
 
 from tests.base import OsfTestCase
 from osf_tests.factories import UserFactory, ProjectFactory
@@ -71,19 +71,22 @@ def file_node3(project):
 @pytest.fixture()
 def page_counter(project, file_node):
     page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 41, u'unique': 33}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCounter.objects.create(page=page_counter_id, date=date(2018, 2, 4), total=41, unique=33)
     return page_counter
 
 @pytest.fixture()
 def page_counter2(project, file_node2):
     page_counter_id = 'download:{}:{}'.format(project._id, file_node2.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 4, u'unique': 26}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCounter.objects.create(page=page_counter_id, date=date(2018, 2, 4), total=4, unique=26)
     return page_counter
 
 @pytest.fixture()
 def page_counter_for_individual_version(project, file_node3):
     page_counter_id = 'download:{}:{}:0'.format(project._id, file_node3.id)
-    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id, date={u'2018/02/04': {u'total': 1, u'unique': 1}})
+    page_counter, created = PageCounter.objects.get_or_create(_id=page_counter_id)
+    DailyPageCounter.objects.create(page=page_counter_id, date=date(2018, 2, 4), total=1, unique=1)
     return page_counter
 
 
@@ -96,16 +99,21 @@ class TestPageCounter:
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {})
-
-        page_counter = PageCounter.objects.get(_id=page_counter_id)
-        assert page_counter.total == 1
-        assert page_counter.unique == 1
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 1)
 
         PageCounter.update_counter(page_counter_id, {})
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 2)
 
-        page_counter.refresh_from_db()
+        assert PageCounter.flush() == 2
+        assert not PageCounterIncrement.objects.exists()
+        page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 2
         assert page_counter.unique == 1
+        daily_counter = DailyPageCounter.objects.get(page=page_counter_id)
+        assert daily_counter.date == timezone.now().date()
+        assert daily_counter.total == 2
+        assert daily_counter.unique == 1
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 2)
 
     @mock.patch('osf.models.analytics.session')
     def test_download_update_counter_contributor(self, mock_session, user, project, file_node):
@@ -113,15 +121,36 @@ class TestPageCounter:
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        assert PageCounter.get_basic_counters(page_counter_id) == (0, 0)
+
+        PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        PageCounter.flush()
+
         page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 0
         assert page_counter.unique == 0
+        # Downloads by contributors are still counted in the daily counts
+        daily_counter = DailyPageCounter.objects.get(page=page_counter_id)
+        assert daily_counter.total == 2
+        assert daily_counter.unique == 1
 
-        PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+    def test_get_basic_counters_without_counter(self):
+        assert PageCounter.get_basic_counters('download:abcde:nofile') == (None, None)
 
+    @mock.patch('osf.models.analytics.session')
+    def test_flush_in_batches_adds_to_counters(self, mock_session, page_counter):
+        mock_session.data = {}
+        page_counter.total = 10
+        page_counter.unique = 5
+        page_counter.save()
+        for _ in range(3):
+            PageCounter.update_counter(page_counter._id, {})
+
+        assert PageCounter.flush(batch_size=2) == 3
         page_counter.refresh_from_db()
-        assert page_counter.total == 0
-        assert page_counter.unique == 0
+        assert page_counter.total == 13
+        assert page_counter.unique == 6
+        assert DailyPageCounter.objects.get(page=page_counter._id, date=date(2018, 2, 4)).total == 41
 
     def test_get_all_downloads_on_date(self, page_counter, page_counter2):
         """
@@ -137,6 +166,19 @@ class TestPageCounter:
 
         assert total_downloads == 45
 
+    @mock.patch('osf.models.analytics.session')
+    def test_get_all_downloads_on_date_includes_pending(self, mock_session, page_counter, page_counter2):
+        mock_session.data = {}
+        PageCounter.update_counter(page_counter._id, {})
+        PageCounter.update_counter(page_counter._id + ':0', {})
+        today = timezone.now()
+
+        assert PageCounter.get_all_downloads_on_date(today) == 1
+        PageCounter.flush()
+        assert PageCounter.get_all_downloads_on_date(today) == 1
+        assert PageCounter.get_all_downloads_on_date(datetime(2018, 2, 4)) == 45
+        assert PageCounter.get_all_downloads_on_date(datetime(2018, 2, 5)) is None
+
     def test_get_all_downloads_on_date_exclude_versions(self, page_counter, page_counter2, page_counter_for_individual_version):
         """
         This method tests that individual version counts for file node's aren't "double counted" in the totals
@@ -19,12 +19,14 @@ from framework.celery_tasks import handlers
 
 from website.archiver import (
     ARCHIVER_INITIATED,
+    ARCHIVER_PENDING,
+    StatResult,
 )
 from website.archiver import utils as archiver_utils
 from website.app import *  # noqa: F403
 from website.archiver import listeners
 from website.archiver.tasks import *   # noqa: F403
-from osf.models.archive import ArchiveTarget, ArchiveJob
+from osf.models.archive import ArchiveChunk, ArchiveTarget, ArchiveJob
 from website.archiver.decorators import fail_archive_on_error
 
 from website import mails
@@ -541,7 +543,7 @@ class TestArchiverTasks(ArchiverTestCase):
     def test_archive_addon(self, mock_make_copy_request):
         archive_addon('osfstorage', self.archive_job._id)
         assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_INITIATED)
-        cookie = self.user.get_or_create_cookie()
+        cookie = self.user.get_service_cookie()
         assert(mock_make_copy_request.called_with(
             self.archive_job._id,
             settings.WATERBUTLER_URL + '/ops/copy',
@@ -1260,6 +1262,141 @@ class TestArchiverBehavior(OsfTestCase):
         assert_false(mock_update_search.called)
 
 
+def chunk_stat_result():
+    return AggregateStatResult('abc', 'osfstorage', targets=[
+        AggregateStatResult('', '', targets=[
+            StatResult('small.txt', 'small.txt', disk_usage=10),
+            AggregateStatResult('big/', 'big', targets=[
+                StatResult('big/one.txt', 'one.txt', disk_usage=60),
+                StatResult('big/two.txt', 'two.txt', disk_usage=50),
+                AggregateStatResult('big/empty/', 'empty'),
+            ]),
+        ]),
+    ])
+
+
+class TestArchiveChunks(ArchiverTestCase):
+
+    def setUp(self):
+        super(TestArchiveChunks, self).setUp()
+        self.region = self.src.osfstorage_region
+        self.target = self.archive_job.get_target('osfstorage')
+        self.target.size = 120
+        self.target.save()
+
+    def _make_chunk(self, paths, status=ARCHIVER_PENDING, attempts=1):
+        return ArchiveChunk.objects.create(
+            target=self.target,
+            region=self.region,
+            status=status,
+            attempts=attempts,
+            units=[
+                {'path': path, 'name': path, 'dest_path': '/abc/', 'size': 10, 'status': None}
+                for path in paths
+            ],
+            size=10 * len(paths),
+        )
+
+    def test_plan_splits_big_folders(self):
+        chunks = archiver_utils.plan_archive_chunks(chunk_stat_result(), 100, 10)
+        units = sorted((unit for chunk in chunks for unit in chunk), key=lambda unit: unit['path'])
+        assert_equal([unit['path'] for unit in units], ['/big/empty/', '/big/one.txt', '/big/two.txt', '/small.txt'])
+        assert_equal(units[1]['parents'], ['big'])
+        assert_equal(units[3]['parents'], [])
+        assert_true(all(sum(unit['size'] for unit in chunk) <= 100 for chunk in chunks))
+        assert_equal(len(chunks), 2)
+
+    def test_plan_limits_units_per_chunk(self):
+        chunks = archiver_utils.plan_archive_chunks(chunk_stat_result(), 1000, 2)
+        assert_equal(len(chunks), 1)
+        assert_equal(len(chunks[0]), 2)
+
+        chunks = archiver_utils.plan_archive_chunks(chunk_stat_result(), 100, 1)
+        assert_equal(len(chunks), 4)
+
+    @mock.patch('website.archiver.tasks.archive_addon.delay')
+    @mock.patch('website.archiver.tasks.archive_addon_chunks.delay')
+    def test_archive_node_archives_big_addons_in_chunks(self, mock_archive_chunks, mock_archive_addon):
+        with mock.patch.object(settings, 'ARCHIVE_CHUNK_SIZE', 100):
+            archive_node([chunk_stat_result()], self.archive_job._id)
+        assert_false(mock_archive_addon.called)
+        assert_true(mock_archive_chunks.called)
+        assert_equal(self.archive_job.get_target('osfstorage').size, 120)
+
+    @mock.patch('website.archiver.tasks.archive_addon.delay')
+    @mock.patch('website.archiver.tasks.archive_addon_chunks.delay')
+    def test_archive_node_archives_small_addons_at_once(self, mock_archive_chunks, mock_archive_addon):
+        with mock.patch.object(settings, 'ARCHIVE_CHUNK_SIZE', 1000):
+            archive_node([chunk_stat_result()], self.archive_job._id)
+        assert_true(mock_archive_addon.called)
+        assert_false(mock_archive_chunks.called)
+
+    @mock.patch('website.archiver.tasks.copy_archive_chunk.delay')
+    def test_dispatch_limits_chunks_in_flight_per_region(self, mock_copy):
+        self._make_chunk(['/a'])
+        waiting = [self._make_chunk([str(i)], status=ARCHIVER_INITIATED, attempts=0) for i in range(3)]
+        with mock.patch.object(settings, 'ARCHIVE_CHUNK_CONCURRENCY', 2):
+            dispatch_archive_chunks(self.region.id)
+        assert_equal(mock_copy.call_args_list, [call(waiting[0].id)])
+        waiting[0].reload()
+        assert_equal(waiting[0].status, ARCHIVER_PENDING)
+        assert_equal(waiting[0].attempts, 1)
+        assert_equal(ArchiveChunk.objects.filter(status=ARCHIVER_INITIATED).count(), 2)
+
+    @mock.patch('website.archiver.tasks.dispatch_archive_chunks.delay')
+    def test_target_succeeds_with_all_chunks(self, mock_dispatch):
+        first = self._make_chunk(['/a', '/b'])
+        self._make_chunk(['/c'])
+        finish_archive_unit(self.archive_job, 'osfstorage', '/a')
+        assert_false(mock_dispatch.called)
+        assert_equal(self.archive_job.progress, {'archived': 10, 'size': 120})
+
+        finish_archive_unit(self.archive_job, 'osfstorage', '/b')
+        first.reload()
+        assert_equal(first.status, ARCHIVER_SUCCESS)
+        mock_dispatch.assert_called_with(self.region.id)
+        assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_INITIATED)
+
+        finish_archive_unit(self.archive_job, 'osfstorage', '/c')
+        target = self.archive_job.get_target('osfstorage')
+        assert_equal(target.status, ARCHIVER_SUCCESS)
+        assert_equal(self.archive_job.progress, {'archived': 120, 'size': 120})
+
+    @mock.patch('website.archiver.tasks.dispatch_archive_chunks.delay')
+    def test_failed_chunk_retries_failed_units(self, mock_dispatch):
+        chunk = self._make_chunk(['/a', '/b'])
+        finish_archive_unit(self.archive_job, 'osfstorage', '/a')
+        finish_archive_unit(self.archive_job, 'osfstorage', '/b', errors=['Not found'])
+        chunk.reload()
+        assert_equal(chunk.status, ARCHIVER_INITIATED)
+        assert_equal([unit['path'] for unit in chunk.pending_units], ['/b'])
+        assert_equal(self.archive_job.get_target('osfstorage').status, ARCHIVER_INITIATED)
+        assert_true(mock_dispatch.called)
+
+    @mock.patch('website.archiver.tasks.dispatch_archive_chunks.delay')
+    def test_chunk_fails_target_after_last_attempt(self, mock_dispatch):
+        chunk = self._make_chunk(['/a'], attempts=settings.ARCHIVE_CHUNK_MAX_ATTEMPTS)
+        finish_archive_unit(self.archive_job, 'osfstorage', '/a', errors=['Not found'])
+        chunk.reload()
+        assert_equal(chunk.status, ARCHIVER_FAILURE)
+        target = self.archive_job.get_target('osfstorage')
+        assert_equal(target.status, ARCHIVER_FAILURE)
+        assert_equal(target.errors, ['/a: Not found'])
+
+    @mock.patch('website.archiver.tasks.dispatch_archive_chunks.delay')
+    @mock.patch('website.archiver.tasks.waterbutler.post')
+    def test_copy_archive_chunk_copies_pending_units(self, mock_post, mock_dispatch):
+        mock_post.return_value = mock.Mock(status_code=202)
+        chunk = self._make_chunk(['/a', '/b'])
+        chunk.units[0]['status'] = ARCHIVER_SUCCESS
+        chunk.save()
+        copy_archive_chunk(chunk.id)
+        assert_equal(mock_post.call_count, 1)
+        url, endpoint = mock_post.call_args[0]
+        assert_in('/b', url)
+        assert_equal(json.loads(mock_post.call_args[1]['data'])['path'], '/abc/')
+
+
 class TestArchiveTarget(OsfTestCase):
 
     def test_repr(self):
@@ -1,3 +1,4 @@
+import gzip
 import os
 
 import pytest
@@ -5,7 +6,9 @@ import mock
 import shutil
 import tempfile
 import xml
+import xml.etree.ElementTree
 import urlparse
+import json
 
 from scripts import generate_sitemap
 from osf_tests.factories import (AuthUserFactory, ProjectFactory, RegistrationFactory, CollectionFactory,
@@ -16,18 +19,23 @@ from website import settings
 def get_all_sitemap_urls():
     # Create temporary directory for the sitemaps to be generated
 
-    generate_sitemap.main()
+    with mock.patch('website.settings.SITEMAP_CONCURRENCY', 1):
+        generate_sitemap.main()
 
-    # Parse the generated XML sitemap file
-    with open(os.path.join(settings.STATIC_FOLDER, 'sitemaps/sitemap_0.xml')) as f:
-        tree = xml.etree.ElementTree.parse(f)
-
-    shutil.rmtree(settings.STATIC_FOLDER)
-
-    # Get all the urls in the sitemap
+    # Parse the generated XML sitemap files
     # Note: namespace was defined in the XML file, therefore necessary to include in tag
     namespace = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
-    urls = [element.text for element in tree.iter(namespace + 'loc')]
+    sitemap_dir = os.path.join(settings.STATIC_FOLDER, 'sitemaps')
+    with open(os.path.join(sitemap_dir, 'sitemap_index.xml')) as f:
+        index = xml.etree.ElementTree.parse(f)
+    urls = []
+    for loc in index.iter(namespace + 'loc'):
+        with gzip.open(os.path.join(sitemap_dir, loc.text.rsplit('/', 1)[1])) as f:
+            tree = xml.etree.ElementTree.parse(f)
+        # Get all the urls in the sitemap
+        urls.extend(element.text for element in tree.iter(namespace + 'loc'))
+
+    shutil.rmtree(settings.STATIC_FOLDER)
 
     return urls
 
@@ -175,3 +183,31 @@ class TestGenerateSitemap:
             urls = get_all_sitemap_urls()
 
         assert urlparse.urljoin(settings.DOMAIN, project_deleted.url) not in urls
+
+    def test_only_changed_shards_are_rewritten(self, create_tmp_directory, project_private):
+        with mock.patch('website.settings.STATIC_FOLDER', create_tmp_directory), \
+                mock.patch('website.settings.SITEMAP_CONCURRENCY', 1):
+            generate_sitemap.main()
+            sitemap_dir = os.path.join(create_tmp_directory, 'sitemaps')
+            with open(os.path.join(sitemap_dir, 'sitemap_manifest.json')) as f:
+                manifest = json.load(f)
+            assert manifest['sitemap_static_0.xml.gz']['urls'] == len(settings.SITEMAP_STATIC_URLS)
+
+            project_private.is_public = True
+            project_private.save()
+            with mock.patch('scripts.generate_sitemap.os.rename', wraps=os.rename) as mock_rename:
+                generate_sitemap.main()
+            with open(os.path.join(sitemap_dir, 'sitemap_manifest.json')) as f:
+                new_manifest = json.load(f)
+
+        shutil.rmtree(create_tmp_directory)
+        changed = {name for name in new_manifest if manifest.get(name) != new_manifest[name]}
+        assert changed == {'sitemap_node_{}.xml.gz'.format(project_private.pk // settings.SITEMAP_URL_MAX)}
+        assert [call[0][1] for call in mock_rename.call_args_list] == [os.path.join(sitemap_dir, name) for name in changed]
+
+    def test_shards_are_split_by_primary_key(self, create_tmp_directory, all_included_links):
+        with mock.patch('website.settings.STATIC_FOLDER', create_tmp_directory), \
+                mock.patch('website.settings.SITEMAP_URL_MAX', 2):
+            urls = get_all_sitemap_urls()
+
+        assert set(urls) == set(all_included_links)
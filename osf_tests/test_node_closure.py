@@ -0,0 +1,91 @@
+import pytest
+
+from framework.auth import Auth
+from osf.models import Node, NodeClosure, NodeLog, NodeRelation
+
+from .factories import AuthUserFactory, NodeFactory, ProjectFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def closure_pairs(node):
+    return set(
+        NodeClosure.objects.filter(ancestor=node).values_list('descendant_id', 'depth')
+    )
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    return ProjectFactory(creator=user)
+
+
+@pytest.fixture()
+def child(user, project):
+    return NodeFactory(parent=project, creator=user)
+
+
+@pytest.fixture()
+def grandchild(user, child):
+    return NodeFactory(parent=child, creator=user)
+
+
+class TestNodeClosure:
+
+    def test_component_creation(self, project, child, grandchild):
+        assert closure_pairs(project) == {(child.id, 1), (grandchild.id, 2)}
+        assert closure_pairs(child) == {(grandchild.id, 1)}
+        assert closure_pairs(grandchild) == set()
+
+    def test_node_links_are_not_included(self, user, project, child):
+        linked = ProjectFactory(creator=user)
+        project.add_node_link(linked, auth=Auth(user), save=True)
+        assert closure_pairs(project) == {(child.id, 1)}
+
+    def test_move_subtree(self, user, project, child, grandchild):
+        other = ProjectFactory(creator=user)
+        NodeRelation.objects.get(parent=project, child=child).delete()
+        assert closure_pairs(project) == set()
+        assert closure_pairs(child) == {(grandchild.id, 1)}
+
+        NodeRelation.objects.create(parent=other, child=child, is_node_link=False)
+        assert closure_pairs(other) == {(child.id, 1), (grandchild.id, 2)}
+
+    def test_hard_delete(self, project, child, grandchild):
+        child.delete()
+        assert closure_pairs(project) == set()
+        assert not NodeClosure.objects.filter(descendant=grandchild).exists()
+
+    def test_fork(self, user, project, child, grandchild):
+        fork = project.fork_node(auth=Auth(user))
+        forked_child = fork.nodes_primary.get()
+        forked_grandchild = forked_child.nodes_primary.get()
+        assert closure_pairs(fork) == {(forked_child.id, 1), (forked_grandchild.id, 2)}
+
+    def test_template(self, user, project, child, grandchild):
+        templated = project.use_as_template(auth=Auth(user))
+        templated_child = templated.nodes_primary.get()
+        templated_grandchild = templated_child.nodes_primary.get()
+        assert closure_pairs(templated) == {(templated_child.id, 1), (templated_grandchild.id, 2)}
+
+    def test_get_root(self, project, child, grandchild):
+        assert grandchild.get_root() == project
+        assert project.get_root() == project
+
+    @pytest.mark.django_assert_num_queries
+    def test_get_children_is_a_single_query(self, project, child, grandchild, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert set(Node.objects.get_children(child, include_root=True)) == {child, grandchild}
+
+    def test_aggregate_logs(self, user, project, child, grandchild):
+        logs = child.get_aggregate_logs_queryset(Auth(user))
+        assert set(logs.values_list('node_id', flat=True)) == {child.id, grandchild.id}
+
+        non_contributor = AuthUserFactory()
+        logs = child.get_aggregate_logs_queryset(Auth(non_contributor))
+        assert set(logs.values_list('node_id', flat=True)) <= {child.id}
+        assert logs.filter(action=NodeLog.PROJECT_CREATED).exists()
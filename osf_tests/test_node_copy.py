@@ -0,0 +1,211 @@
+import mock
+import pytest
+from django.utils import timezone
+
+from addons.wiki.models import WikiPage
+from framework.auth import Auth
+from osf.models import Contributor, NodeLog, NodeLogCopy, NodeRelation, Tag
+from osf.utils import node_copy
+from osf.utils.permissions import ADMIN, READ, WRITE
+from website import settings
+from website.project import tasks
+
+from .factories import AuthUserFactory, NodeFactory, ProjectFactory, RegistrationFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    project = ProjectFactory(creator=user)
+    for i in range(5):
+        project.add_log(NodeLog.EDITED_TITLE, params={'node': project._id, 'i': i}, auth=Auth(user))
+    return project
+
+
+class TestCopyLogs:
+
+    @pytest.mark.django_assert_num_queries
+    def test_copy_logs_is_a_single_query(self, user, project, django_assert_num_queries):
+        destination = ProjectFactory(creator=user)
+        destination.logs.all().delete()
+        # Counting the logs, and copying them
+        with django_assert_num_queries(2):
+            project.clone_logs(destination)
+
+        copied = list(destination.logs.order_by('id').values_list('action', 'params', 'date', 'user_id'))
+        original = list(project.logs.order_by('id').values_list('action', 'params', 'date', 'user_id'))
+        assert copied == original
+        assert not destination.logs.filter(_id__in=project.logs.values('_id')).exists()
+
+    def test_fork_copies_logs(self, user, project):
+        fork = project.fork_node(Auth(user))
+        assert fork.logs.count() == project.logs.count() + 1
+        assert fork.logs.filter(action=NodeLog.NODE_FORKED).exists()
+
+
+def logs_of(node):
+    return list(node.logs.order_by('id').values_list('action', 'params', 'date', 'user_id'))
+
+
+@mock.patch.object(settings, 'NODE_LOG_COPY_INLINE_MAX', 2)
+@mock.patch.object(settings, 'NODE_LOG_COPY_BATCH_SIZE', 2)
+class TestCopyLogsInBackground:
+
+    @pytest.fixture()
+    def destination(self, user):
+        destination = ProjectFactory(creator=user)
+        destination.logs.all().delete()
+        return destination
+
+    def test_copy_logs_in_batches(self, project, destination):
+        with mock.patch('osf.models.node.enqueue_task') as mock_enqueue:
+            project.clone_logs(destination)
+        log_copy = NodeLogCopy.objects.get(destination=destination)
+        assert mock_enqueue.call_count == 1
+        assert not destination.logs.exists()
+        assert log_copy.progress == 0.0
+
+        tasks.copy_node_logs(log_copy.id)
+        log_copy.reload()
+        assert log_copy.done
+        assert log_copy.copied == log_copy.total == project.logs.count()
+        assert log_copy.progress == 1.0
+        assert logs_of(destination) == logs_of(project)
+
+    def test_copy_logs_resumes(self, project, destination):
+        project.clone_logs(destination)
+        log_copy = NodeLogCopy.objects.get(destination=destination)
+        copy_logs_batch = node_copy.copy_logs_batch
+
+        def interrupted(*args, **kwargs):
+            if interrupted.batches == 2:
+                raise Exception('Worker lost')
+            interrupted.batches += 1
+            return copy_logs_batch(*args, **kwargs)
+        interrupted.batches = 0
+
+        with mock.patch('osf.utils.node_copy.copy_logs_batch', side_effect=interrupted):
+            with pytest.raises(Exception):
+                tasks.copy_node_logs(log_copy.id)
+        log_copy.reload()
+        assert not log_copy.done
+        assert log_copy.copied == destination.logs.count() == 4
+
+        # Resumed after the batches already copied
+        NodeLogCopy.objects.filter(id=log_copy.id).update(
+            modified=timezone.now() - settings.NODE_LOG_COPY_RESUME_AFTER,
+        )
+        tasks.resume_node_log_copies()
+        log_copy.reload()
+        assert log_copy.done
+        assert logs_of(destination) == logs_of(project)
+
+    def test_logs_added_later_are_not_copied(self, user, project, destination):
+        project.clone_logs(destination)
+        project.add_log(NodeLog.EDITED_TITLE, params={'node': project._id}, auth=Auth(user))
+        tasks.copy_node_logs(NodeLogCopy.objects.get(destination=destination).id)
+        assert destination.logs.count() == project.logs.count() - 1
+
+
+class TestCopyComponents:
+
+    @pytest.fixture()
+    def tree(self, user, project):
+        component = NodeFactory(parent=project, creator=user, title='component')
+        subcomponent = NodeFactory(parent=component, creator=user, title='subcomponent')
+        deleted = NodeFactory(parent=project, creator=user, title='deleted')
+        NodeFactory(parent=deleted, creator=user)
+        deleted.is_deleted = True
+        deleted.save()
+        linked = ProjectFactory(creator=user)
+        component.add_node_link(linked, auth=Auth(user), save=True)
+        return component, subcomponent, linked
+
+    def test_component_levels(self, project, tree):
+        component, subcomponent, linked = tree
+        levels = [
+            [(relation.child, relation.is_node_link) for relation in relations]
+            for relations in node_copy.component_levels(project)
+        ]
+        assert levels == [
+            [(component, False)],
+            [(subcomponent, False), (linked, True)],
+        ]
+
+    def test_fork_copies_component_tree(self, user, project, tree):
+        component, subcomponent, linked = tree
+        fork = project.fork_node(Auth(user))
+        forked_component, = fork.get_nodes(is_node_link=False)
+        assert forked_component.title == 'component'
+        assert forked_component.forked_from == component
+        assert forked_component.root == fork
+        assert [node.forked_from for node in forked_component.get_nodes(is_node_link=False)] == [subcomponent]
+        assert NodeRelation.objects.filter(parent=forked_component, child=linked, is_node_link=True).exists()
+
+    def test_template_copies_component_tree(self, user, project, tree):
+        component, subcomponent, linked = tree
+        new = project.use_as_template(Auth(user))
+        templated_component, = new.get_nodes(is_node_link=False)
+        assert templated_component.title == 'component'
+        assert templated_component.template_node == component
+        assert templated_component.root == new
+        assert [node.template_node for node in templated_component.get_nodes(is_node_link=False)] == [subcomponent]
+        # Node links are not copied to templates
+        assert not NodeRelation.objects.filter(parent=templated_component, is_node_link=True).exists()
+
+
+class TestCopyTags:
+
+    def test_fork_copies_tags(self, user, project):
+        project.add_tag('science', auth=Auth(user), save=True)
+        project.add_system_tag('system', save=True)
+        fork = project.fork_node(Auth(user))
+        assert set(fork.all_tags.values_list('name', flat=True)) == {'science', 'system'}
+        assert Tag.all_tags.filter(name='science').count() == 1
+
+
+class TestCopyContributors:
+
+    def test_copy_contributors(self, user, project):
+        write_contrib = AuthUserFactory()
+        read_contrib = AuthUserFactory()
+        project.add_contributor(write_contrib, permissions=WRITE, visible=False, save=True)
+        project.add_contributor(read_contrib, permissions=READ, save=True)
+
+        registration = RegistrationFactory(project=project, creator=user)
+        assert list(registration.contributor_set.values_list('user_id', 'visible')) == \
+            list(project.contributor_set.values_list('user_id', 'visible'))
+        assert registration.has_permission(user, ADMIN)
+        assert registration.has_permission(write_contrib, WRITE)
+        assert not registration.has_permission(write_contrib, ADMIN)
+        assert registration.has_permission(read_contrib, READ)
+        assert not registration.has_permission(read_contrib, WRITE)
+
+    def test_copy_contributors_keeps_existing(self, user, project):
+        destination = ProjectFactory(creator=user)
+        node_copy.copy_contributors(project, destination)
+        assert Contributor.objects.filter(node=destination, user=user).count() == 1
+
+
+class TestCopyWikiVersions:
+
+    def test_fork_copies_wiki_versions_in_order(self, user, project):
+        page = WikiPage.objects.create_for_node(project, 'home', 'first', Auth(user))
+        page.update(user, 'second')
+        forker = AuthUserFactory()
+        project.is_public = True
+        project.save()
+
+        fork = project.fork_node(Auth(forker))
+        forked_page = WikiPage.objects.get_for_node(fork, 'home')
+        versions = forked_page.get_versions()
+        assert [version.content for version in versions] == ['second', 'first']
+        assert [version.identifier for version in versions] == [2, 1]
+        assert all(version.user == forker for version in versions)
+        assert forked_page.get_version().content == 'second'
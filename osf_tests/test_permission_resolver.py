@@ -0,0 +1,138 @@
+import mock
+import pytest
+
+from guardian.shortcuts import get_group_perms
+
+from api.base.api_globals import api_globals
+from osf.models import NodeRelation
+from osf.utils.permission_resolver import (
+    NodePermissionResolver,
+    get_node_readers,
+    get_permission_resolver,
+)
+from osf.utils.permissions import ADMIN, READ, WRITE, READ_NODE, WRITE_NODE
+
+from .factories import (
+    AuthUserFactory,
+    NodeFactory,
+    OSFGroupFactory,
+    ProjectFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    return ProjectFactory(creator=user)
+
+
+class FakeRequest(object):
+    pass
+
+
+@pytest.fixture()
+def fake_request():
+    request = FakeRequest()
+    with mock.patch.object(api_globals, 'request', request, create=True):
+        yield request
+
+
+class TestNodePermissionResolver:
+
+    def test_matches_guardian(self, user, project):
+        write_contrib = AuthUserFactory()
+        project.add_contributor(write_contrib, permissions=WRITE, save=True)
+        resolver = NodePermissionResolver()
+        for contrib in (user, write_contrib, AuthUserFactory()):
+            assert resolver.get_perms(contrib, project) == set(get_group_perms(contrib, project))
+
+    def test_group_inherited_permissions(self, project):
+        member = AuthUserFactory()
+        group = OSFGroupFactory(creator=member)
+        project.add_osf_group(group, WRITE)
+        resolver = NodePermissionResolver()
+        assert resolver.has_perm(member, project, WRITE_NODE)
+        assert resolver.has_perm(member, project, READ_NODE)
+
+    def test_admin_parent(self, user, project):
+        child = NodeFactory(parent=project, creator=AuthUserFactory())
+        grandchild = NodeFactory(parent=child, creator=child.creator)
+        resolver = NodePermissionResolver()
+        assert not resolver.has_perm(user, grandchild, READ_NODE)
+        assert resolver.is_admin_parent(user, grandchild)
+        assert not resolver.is_admin_parent(AuthUserFactory(), grandchild)
+
+    def test_anonymous_user_has_no_permissions(self, project):
+        resolver = NodePermissionResolver()
+        assert resolver.get_perms(None, project) == set()
+        assert not resolver.is_admin_parent(None, project)
+
+    @pytest.mark.django_assert_num_queries
+    def test_prefetch_is_constant_in_node_count(self, user, project, django_assert_num_queries):
+        nodes = [project] + [NodeFactory(parent=project, creator=user) for _ in range(5)]
+        resolver = NodePermissionResolver()
+        with django_assert_num_queries(2):
+            resolver.prefetch(user, nodes)
+        with django_assert_num_queries(0):
+            for node in nodes:
+                assert resolver.has_perm(user, node, READ_NODE)
+                assert resolver.is_admin_parent(user, node)
+
+
+class TestRequestScopedResolver:
+
+    def test_new_resolver_outside_of_request(self):
+        assert get_permission_resolver() is not get_permission_resolver()
+
+    def test_resolver_is_shared_within_request(self, fake_request):
+        assert get_permission_resolver() is get_permission_resolver()
+
+    @pytest.mark.django_assert_num_queries
+    def test_permission_checks_are_memoized(self, fake_request, user, project, django_assert_num_queries):
+        project.has_permission(user, ADMIN)
+        with django_assert_num_queries(0):
+            assert project.has_permission(user, ADMIN)
+            assert project.has_permission(user, READ)
+            assert project.can_edit(user=user)
+            assert project.get_permissions(user) == [READ, WRITE, ADMIN]
+
+    def test_cache_cleared_on_contributor_change(self, fake_request, project):
+        contrib = AuthUserFactory()
+        assert not project.has_permission(contrib, WRITE)
+        project.add_contributor(contrib, permissions=WRITE, save=True)
+        assert project.has_permission(contrib, WRITE)
+        project.set_permissions(contrib, READ, save=True)
+        assert not project.has_permission(contrib, WRITE)
+
+    def test_cache_cleared_on_hierarchy_change(self, fake_request, user, project):
+        other = ProjectFactory(creator=AuthUserFactory())
+        assert not other.has_permission(user, READ)
+        NodeRelation.objects.create(parent=project, child=other, is_node_link=False)
+        assert other.has_permission(user, READ)
+
+
+class TestGetNodeReaders:
+
+    def test_matches_has_permission(self, user, project):
+        child = NodeFactory(parent=project, creator=user)
+        read_contrib = AuthUserFactory()
+        child.add_contributor(read_contrib, permissions=READ, save=True)
+        member = AuthUserFactory()
+        group = OSFGroupFactory(creator=member)
+        project.add_osf_group(group, ADMIN)
+        outsider = AuthUserFactory()
+
+        users = [user, read_contrib, member, outsider]
+        readers = get_node_readers([project.id, child.id], [u.id for u in users])
+        for node in (project, child):
+            for u in users:
+                assert ((node.id, u.id) in readers) == node.has_permission(u, READ)
+
+    def test_empty(self, project):
+        assert get_node_readers([project.id], []) == set()
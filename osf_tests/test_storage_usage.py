@@ -0,0 +1,124 @@
+import mock
+import pytest
+
+from addons.osfstorage.tests.factories import FileVersionFactory
+from api.caching.settings import STORAGE_USAGE_KEY
+from api.caching.tasks import reconcile_storage_usage
+from api.caching.utils import storage_usage_cache
+from api_tests.utils import create_test_file
+from osf.models import BaseFileNode, FileVersion, NodeStorageUsage
+
+from .factories import AuthUserFactory, ProjectFactory
+
+pytestmark = pytest.mark.django_db
+
+# Size of the version created by create_test_file
+SIZE = 1337
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+
+@pytest.fixture()
+def project(user):
+    return ProjectFactory(creator=user)
+
+
+@pytest.fixture()
+def other_project(user):
+    return ProjectFactory(creator=user)
+
+
+@pytest.fixture()
+def test_file(project, user):
+    return create_test_file(project, user)
+
+
+def total(node):
+    return NodeStorageUsage.get_total(node.id)
+
+
+class TestNodeStorageUsageCounter:
+
+    def test_upload(self, project, user, test_file):
+        assert total(project) == SIZE
+        create_test_file(project, user, filename='other_file')
+        assert total(project) == 2 * SIZE
+        assert total(project) == NodeStorageUsage.compute_total(project.id)
+
+    def test_new_version(self, project, user, test_file):
+        version = FileVersionFactory(size=10)
+        test_file.versions.add(version)
+        assert total(project) == SIZE + 10
+        test_file.versions.remove(version)
+        assert total(project) == SIZE
+
+    def test_delete_and_restore(self, project, user, test_file):
+        trashed = test_file.delete(user=user)
+        assert total(project) == 0
+        trashed.restore()
+        assert total(project) == SIZE
+
+    def test_delete_folder(self, project, user):
+        folder = project.get_addon('osfstorage').get_root().append_folder('folder')
+        test_file = create_test_file(project, user)
+        test_file.move_under(folder)
+        assert total(project) == SIZE
+        folder.delete(user=user)
+        assert total(project) == 0
+
+    def test_move_to_other_node(self, project, other_project, test_file):
+        test_file.move_under(other_project.get_addon('osfstorage').get_root())
+        assert total(project) == 0
+        assert total(other_project) == SIZE
+
+    def test_copy_to_other_node(self, project, other_project, test_file):
+        test_file.copy_under(other_project.get_addon('osfstorage').get_root())
+        assert total(project) == SIZE
+        assert total(other_project) == SIZE
+
+    def test_hard_delete(self, project, test_file):
+        BaseFileNode.objects.filter(id=test_file.id).delete()
+        assert total(project) == 0
+
+
+class TestReconciliation:
+
+    def test_reconcile(self, project, test_file):
+        # Bulk updates bypass the signals
+        test_file.versions.update(size=SIZE + 1)
+        assert total(project) == SIZE
+        assert NodeStorageUsage.reconcile(project.id) == SIZE + 1
+        assert total(project) == SIZE + 1
+        assert NodeStorageUsage.objects.get(node=project).reconciled is not None
+
+    def test_reconcile_task(self, project, other_project, user, test_file):
+        create_test_file(other_project, user)
+        FileVersion.objects.update(size=1)
+        reconcile_storage_usage()
+        assert total(project) == 1
+        assert total(other_project) == 1
+
+    def test_reconcile_task_starts_with_least_recently_reconciled(self, project, other_project, user, test_file):
+        create_test_file(other_project, user)
+        NodeStorageUsage.reconcile(project.id)
+        FileVersion.objects.update(size=1)
+        reconcile_storage_usage(batch_size=1)
+        assert total(project) == SIZE
+        assert total(other_project) == 1
+
+
+class TestStorageUsageProperty:
+
+    def test_cache_miss_reads_counter(self, project, test_file):
+        key = STORAGE_USAGE_KEY.format(target_id=project._id)
+        storage_usage_cache.delete(key)
+        with mock.patch.object(NodeStorageUsage, 'compute_total') as mock_compute:
+            assert project.storage_usage == SIZE
+        assert not mock_compute.called
+        assert storage_usage_cache.get(key) == SIZE
+
+    def test_no_files(self, project):
+        assert project.storage_usage == 0
@@ -18,6 +18,7 @@ from framework.auth.exceptions import ExpiredTokenError, InvalidTokenError, Chan
 from framework.auth.signals import user_merged
 from framework.analytics import get_total_activity_count
 from framework.exceptions import PermissionsError
+from framework.sessions.utils import remove_sessions_for_user
 from framework.celery_tasks import handlers
 from website import settings
 from website import filters
@@ -26,7 +27,7 @@ from website.project.signals import contributor_added
 from website.project.views.contributor import notify_added_contributor
 from website.views import find_bookmark_collection
 
-from osf.models import AbstractNode, OSFUser, OSFGroup, Tag, Contributor, Session, BlacklistedEmailDomain, QuickFilesNode, PreprintContributor
+from osf.models import AbstractNode, OSFUser, OSFGroup, Tag, Contributor, ServiceCredential, Session, BlacklistedEmailDomain, QuickFilesNode, PreprintContributor
 from addons.github.tests.factories import GitHubAccountFactory
 from addons.osfstorage.models import Region
 from addons.osfstorage.settings import DEFAULT_REGION_ID
@@ -854,6 +855,61 @@ class TestCookieMethods:
         assert OSFUser.from_cookie(cookie) is None
 
 
+class TestServiceCookie:
+
+    def test_get_user_by_service_cookie(self):
+        user = UserFactory()
+        cookie = user.get_service_cookie()
+        assert user == OSFUser.from_cookie(cookie)
+        assert not Session.objects.filter(data__auth_user_id=user._id).exists()
+
+    def test_service_cookie_does_not_query_sessions(self):
+        user = UserFactory()
+        with CaptureQueriesContext(connection) as ctx:
+            cookie = user.get_service_cookie()
+            assert user == OSFUser.from_cookie(cookie)
+        assert not any('osf_session' in query['sql'] for query in ctx.captured_queries)
+
+    def test_service_cookie_is_reused(self):
+        user = UserFactory()
+        cookie = user.get_service_cookie()
+        with CaptureQueriesContext(connection) as ctx:
+            assert user.get_service_cookie() == cookie
+        assert len(ctx.captured_queries) == 0
+        assert ServiceCredential.objects.filter(user=user).count() == 1
+        assert user.get_service_cookie('another secret') != cookie
+
+    def test_service_cookie_is_renewed(self):
+        user = UserFactory()
+        cookie = user.get_service_cookie()
+        ServiceCredential.objects.filter(user=user).update(expires=timezone.now())
+        with mock.patch('osf.models.service_credential.timezone.now', return_value=timezone.now() + settings.SERVICE_CREDENTIAL_LIFETIME):
+            renewed = user.get_service_cookie()
+        assert renewed != cookie
+        assert OSFUser.from_cookie(cookie) is None
+        assert OSFUser.from_cookie(renewed) == user
+
+    def test_service_cookie_is_not_a_session(self):
+        user = UserFactory()
+        cookie = user.get_service_cookie()
+        token = itsdangerous.Signer(settings.SECRET_KEY).unsign(cookie)
+        assert Session.load(token) is None
+
+    def test_service_cookie_is_revoked_with_sessions(self):
+        user = UserFactory()
+        cookie = user.get_service_cookie()
+        remove_sessions_for_user(user)
+        assert OSFUser.from_cookie(cookie) is None
+        assert user.get_service_cookie() != cookie
+
+    def test_clear_expired(self):
+        user = UserFactory()
+        user.get_service_cookie()
+        ServiceCredential.objects.create(user=user, expires=timezone.now() - dt.timedelta(minutes=1))
+        assert ServiceCredential.clear_expired() == 1
+        assert ServiceCredential.objects.filter(user=user).count() == 1
+
+
 class TestChangePassword:
 
     def test_change_password(self, user):
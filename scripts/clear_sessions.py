@@ -9,7 +9,7 @@ from django.utils import timezone
 from framework.celery_tasks import app as celery_app
 from website.app import setup_django
 setup_django()
-from osf.models import Session
+from osf.models import ServiceCredential, Session
 
 from scripts.utils import add_file_logger
 
@@ -34,6 +34,9 @@ def main(dry_run=True):
 
         logger.info('Deleting {} Session objects took {} seconds'.format(sessions_deleted, end - start))
 
+        credentials_deleted = ServiceCredential.clear_expired()
+        logger.info('Deleted {} expired ServiceCredential objects'.format(credentials_deleted))
+
         if dry_run:
             raise Exception('Dry run, aborting the transaction!')
 
@@ -1,13 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""Generate a sitemap for osf.io"""
+"""Generate a sitemap for osf.io
+
+The sitemap is split in shards: one for the static urls, and for users, nodes and preprints one
+per fixed range of `SITEMAP_URL_MAX` primary keys, so new objects only change the last shards
+of their type. Shards are built by up to `SITEMAP_CONCURRENCY` threads, each streaming its
+objects from a server side cursor into a gzipped file. The SHA-256 of the contents of each
+shard is kept in `sitemap_manifest.json`, and only the shards whose contents changed since the
+last run are replaced and sent to S3.
+"""
 import boto3
 import datetime
 import gzip
+import hashlib
+import json
 import os
 import shutil
+import threading
 import urlparse
-import xml
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import escape
 
 import django
 django.setup()
@@ -16,9 +29,9 @@ import tempfile
 
 from framework import sentry
 from framework.celery_tasks import app as celery_app
-from django.db.models import Q
+from django.db import connection
+from django.db.models import Max, Min
 from osf.models import OSFUser, AbstractNode, Preprint, PreprintProvider
-from osf.utils.workflows import DefaultStates
 from scripts import utils as script_utils
 from website import settings
 from website.app import init_app
@@ -26,12 +39,39 @@ from website.app import init_app
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+MANIFEST_NAME = 'sitemap_manifest.json'
+SHARD_NAME = 'sitemap_{kind}_{index}.xml.gz'
+
+
+def users():
+    return OSFUser.objects.filter(is_active=True).exclude(date_confirmed__isnull=True)
+
+
+def nodes():
+    # Nodes and Registrations, no Collections
+    return (AbstractNode.objects
+        .filter(is_public=True, is_deleted=False, retraction_id__isnull=True)
+        .exclude(type__in=['osf.collection', 'osf.quickfilesnode']))
+
+
+def preprints():
+    return Preprint.objects.can_view()
+
+
+# The querysets of each kind of shard, and the most urls one object adds to the sitemap
+SHARD_KINDS = OrderedDict([
+    ('user', (users, 1)),
+    ('node', (nodes, 1)),
+    ('preprint', (preprints, 2)),
+])
+
 
 class Sitemap(object):
-    def __init__(self):
-        self.sitemap_count = 0
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.SITEMAP_CONCURRENCY
         self.errors = 0
-        self.new_doc()
+        self.errors_lock = threading.Lock()
         if not settings.SITEMAP_TO_S3:
             self.sitemap_dir = os.path.join(settings.STATIC_FOLDER, 'sitemaps')
             if not os.path.exists(self.sitemap_dir):
@@ -48,57 +88,155 @@ class Sitemap(object):
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
                 region_name='us-east-1'
             )
+        self.manifest = self.load_manifest()
 
     def cleanup(self):
         if settings.SITEMAP_TO_S3:
             shutil.rmtree(self.sitemap_dir)
 
-    def new_doc(self):
-        """Creates new sitemap document and resets the url_count."""
-        self.doc = xml.dom.minidom.Document()
-        self.urlset = self.doc.createElement('urlset')
-        self.urlset.setAttribute('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        self.doc.appendChild(self.urlset)
-        self.url_count = 0
-
-    def add_tag(self, name, text):
-        """Adds a tag to the current url"""
-        tag = self.doc.createElement(name)
-        self.url.appendChild(tag)
-        tag_text = self.doc.createTextNode(text)
-        tag.appendChild(tag_text)
-
-    def add_url(self, config):
-        """Adds a url to the current urlset"""
-        if self.url_count >= settings.SITEMAP_URL_MAX:
-            self.write_doc()
-            self.new_doc()
-        self.url = self.doc.createElement('url')
-        self.urlset.appendChild(self.url)
-
-        for k, v in config.items():
-            self.add_tag(k, v)
-        self.url_count += 1
-
-    def write_doc(self):
-        """Writes and gzips each sitemap xml file"""
-        file_name = 'sitemap_{}.xml'.format(str(self.sitemap_count))
-        file_path = os.path.join(self.sitemap_dir, file_name)
-        zip_file_name = file_name + '.gz'
-        zip_file_path = file_path + '.gz'
-        print('Writing and gzipping `{}`: url_count = {}'.format(file_path, str(self.url_count)))
-
-        xml_str = self.doc.toprettyxml(indent='  ', encoding='utf-8')
+    def load_manifest(self):
+        """Return the hash, url count and date of last change of each shard of the last run."""
+        try:
+            if settings.SITEMAP_TO_S3:
+                body = self.s3.Object(settings.SITEMAP_AWS_BUCKET, 'sitemaps/{}'.format(MANIFEST_NAME)).get()['Body']
+                return json.loads(body.read())
+            with open(os.path.join(self.sitemap_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except Exception:
+            logger.info('No sitemap manifest found, writing all sitemap shards')
+            return {}
+
+    def write_manifest(self):
+        file_path = os.path.join(self.sitemap_dir, MANIFEST_NAME)
         with open(file_path, 'wb') as f:
-            f.write(xml_str)
-
-        # Write zipped file
-        with open(file_path, 'rb') as f_in, gzip.open(zip_file_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
         if settings.SITEMAP_TO_S3:
-            self.ship_to_s3(file_name, file_path)
-            self.ship_to_s3(zip_file_name, zip_file_path)
-        self.sitemap_count += 1
+            self.ship_to_s3(MANIFEST_NAME, file_path)
+
+    def get_shards(self):
+        """Return the kind, name and primary key range of all shards that can have urls."""
+        shards = [('static', SHARD_NAME.format(kind='static', index=0), None, None)]
+        for kind, (get_queryset, urls_per_object) in SHARD_KINDS.items():
+            width = settings.SITEMAP_URL_MAX // urls_per_object
+            bounds = get_queryset().aggregate(min=Min('pk'), max=Max('pk'))
+            if bounds['min'] is None:
+                continue
+            for index in range(bounds['min'] // width, bounds['max'] // width + 1):
+                shards.append((kind, SHARD_NAME.format(kind=kind, index=index), index * width, (index + 1) * width))
+        return shards
+
+    def get_urls(self, kind, start, end):
+        """Yield the configs of the urls of the objects of `kind` with `start` <= pk < `end`."""
+        if kind == 'static':
+            for config in settings.SITEMAP_STATIC_URLS:
+                yield OrderedDict(config, loc=urlparse.urljoin(settings.DOMAIN, config['loc']))
+            return
+
+        get_queryset, _ = SHARD_KINDS[kind]
+        objs = get_queryset().filter(pk__gte=start, pk__lt=end).order_by('pk')
+        if kind == 'user':
+            for obj in objs.values_list('guids___id', flat=True).iterator():
+                try:
+                    yield OrderedDict(settings.SITEMAP_USER_CONFIG, loc=urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj)))
+                except Exception as e:
+                    self.log_errors('USER', obj, e)
+        elif kind == 'node':
+            for obj in objs.values('guids___id', 'modified').iterator():
+                try:
+                    yield OrderedDict(
+                        settings.SITEMAP_NODE_CONFIG,
+                        loc=urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj['guids___id'])),
+                        lastmod=obj['modified'].strftime('%Y-%m-%d'),
+                    )
+                except Exception as e:
+                    self.log_errors('NODE', obj['guids___id'], e)
+        else:
+            osf = PreprintProvider.objects.get(_id='osf')
+            for obj in objs.select_related('node', 'provider', 'primary_file').iterator():
+                for config in self.get_preprint_urls(obj, osf):
+                    yield config
+
+    def get_preprint_urls(self, obj, osf):
+        configs = []
+        try:
+            preprint_date = obj.modified.strftime('%Y-%m-%d')
+            preprint_url = obj.url
+            provider = obj.provider
+            domain = provider.domain if (provider.domain_redirect_enabled and provider.domain) else settings.DOMAIN
+            if provider == osf:
+                preprint_url = '/preprints/{}/'.format(obj._id)
+            configs.append(OrderedDict(
+                settings.SITEMAP_PREPRINT_CONFIG,
+                loc=urlparse.urljoin(domain, preprint_url),
+                lastmod=preprint_date,
+            ))
+
+            # Preprint file urls
+            try:
+                configs.append(OrderedDict(
+                    settings.SITEMAP_PREPRINT_FILE_CONFIG,
+                    loc=urlparse.urljoin(
+                        obj.provider.domain or settings.DOMAIN,
+                        os.path.join(
+                            obj._id,
+                            'download',
+                            '?format=pdf'
+                        )
+                    ),
+                    lastmod=preprint_date,
+                ))
+            except Exception as e:
+                self.log_errors(obj.primary_file, obj.primary_file._id, e)
+        except Exception as e:
+            self.log_errors(obj, obj._id, e)
+        return configs
+
+    def write_shard(self, shard):
+        """Stream the urls of a shard into a gzipped temporary file.
+
+        :return dict: The name, temporary path, url count and content hash of the shard
+        """
+        kind, name, start, end = shard
+        file_path = os.path.join(self.sitemap_dir, name + '.tmp')
+        content_hash = hashlib.sha256()
+        url_count = 0
+        # mtime=0 keeps the gzipped files of unchanged shards identical
+        with open(file_path, 'wb') as f, gzip.GzipFile(filename=name[:-len('.gz')], mode='wb', fileobj=f, mtime=0) as out:
+            def write(text):
+                data = text.encode('utf-8')
+                content_hash.update(data)
+                out.write(data)
+
+            write(u'<?xml version="1.0" encoding="utf-8"?>\n<urlset xmlns="{}">\n'.format(XMLNS))
+            for config in self.get_urls(kind, start, end):
+                write(u'  <url>\n{}  </url>\n'.format(u''.join(
+                    u'    <{0}>{1}</{0}>\n'.format(tag, escape(text)) for tag, text in config.items()
+                )))
+                url_count += 1
+            write(u'</urlset>\n')
+        return {
+            'name': name,
+            'path': file_path,
+            'urls': url_count,
+            'hash': content_hash.hexdigest(),
+        }
+
+    def write_shard_in_thread(self, shard):
+        try:
+            return self.write_shard(shard)
+        finally:
+            # Threads have their own database connection
+            connection.close()
+
+    def write_shards(self, shards):
+        if self.concurrency <= 1:
+            return [self.write_shard(shard) for shard in shards]
+        pool = ThreadPool(self.concurrency)
+        try:
+            return pool.map(self.write_shard_in_thread, shards)
+        finally:
+            pool.close()
+            pool.join()
 
     def ship_to_s3(self, name, path):
         data = open(path, 'rb')
@@ -110,145 +248,97 @@ class Sitemap(object):
             sentry.log_message('ERROR: Sitemaps could not be uploaded to s3, see `generate_sitemap` logs')
         data.close()
 
-    def write_sitemap_index(self):
-        """Writes the index file for all of the sitemap files"""
-        doc = xml.dom.minidom.Document()
-        sitemap_index = self.doc.createElement('sitemapindex')
-        sitemap_index.setAttribute('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        doc.appendChild(sitemap_index)
-
-        for f in range(self.sitemap_count):
-            sitemap = doc.createElement('sitemap')
-            sitemap_index.appendChild(sitemap)
-
-            loc = doc.createElement('loc')
-            sitemap.appendChild(loc)
-            loc_text = self.doc.createTextNode(urlparse.urljoin(settings.DOMAIN, 'sitemaps/sitemap_{}.xml'.format(str(f))))
-            loc.appendChild(loc_text)
+    def remove_shard(self, name):
+        file_path = os.path.join(self.sitemap_dir, name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if settings.SITEMAP_TO_S3:
+            try:
+                self.s3.Object(settings.SITEMAP_AWS_BUCKET, 'sitemaps/{}'.format(name)).delete()
+            except Exception as e:
+                logger.info('Error deleting data from s3 via boto3')
+                logger.exception(e)
 
-            datemod = doc.createElement('lastmod')
-            sitemap.appendChild(datemod)
-            datemod_text = self.doc.createTextNode(datetime.datetime.now().strftime('%Y-%m-%d'))
-            datemod.appendChild(datemod_text)
+    def write_sitemap_index(self, names):
+        """Writes the index file for all of the sitemap files"""
+        lines = [
+            u'<?xml version="1.0" encoding="utf-8"?>\n',
+            u'<sitemapindex xmlns="{}">\n'.format(XMLNS),
+        ]
+        for name in names:
+            lines.append(u'  <sitemap>\n    <loc>{}</loc>\n    <lastmod>{}</lastmod>\n  </sitemap>\n'.format(
+                escape(urlparse.urljoin(settings.DOMAIN, 'sitemaps/{}'.format(name))),
+                self.manifest[name]['lastmod'],
+            ))
+        lines.append(u'</sitemapindex>\n')
 
         print('Writing `sitemap_index.xml`')
         file_name = 'sitemap_index.xml'
         file_path = os.path.join(self.sitemap_dir, file_name)
-        xml_str = doc.toprettyxml(indent='  ', encoding='utf-8')
         with open(file_path, 'wb') as f:
-            f.write(xml_str)
+            f.write(u''.join(lines).encode('utf-8'))
         if settings.SITEMAP_TO_S3:
             self.ship_to_s3(file_name, file_path)
 
     def log_errors(self, obj, obj_id, error):
-        if not self.errors:
-            script_utils.add_file_logger(logger, __file__)
-        self.errors += 1
+        with self.errors_lock:
+            if not self.errors:
+                script_utils.add_file_logger(logger, __file__)
+            self.errors += 1
+            errors = self.errors
         logger.info('Error on {}, {}:'.format(obj, obj_id))
         logger.exception(error)
 
-        if self.errors <= 10:
+        if errors <= 10:
             sentry.log_message('Sitemap Error: {}'.format(error))
 
-        if self.errors == 1000:
+        if errors == 1000:
             sentry.log_message('ERROR: generate_sitemap stopped execution after reaching 1000 errors. See logs for details.')
             raise Exception('Too many errors generating sitemap.')
 
     def generate(self):
         print('Generating Sitemap')
-
-        # Progress bar
-        progress = script_utils.Progress(precision=0)
-
-        # Static urls
-        progress.start(len(settings.SITEMAP_STATIC_URLS), 'STAT: ')
-        for config in settings.SITEMAP_STATIC_URLS:
-            config['loc'] = urlparse.urljoin(settings.DOMAIN, config['loc'])
-            self.add_url(config)
-            progress.increment()
-        progress.stop()
-
-        # User urls
-        objs = OSFUser.objects.filter(is_active=True).exclude(date_confirmed__isnull=True).values_list('guids___id', flat=True)
-        progress.start(objs.count(), 'USER: ')
-        for obj in objs:
-            try:
-                config = settings.SITEMAP_USER_CONFIG
-                config['loc'] = urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj))
-                self.add_url(config)
-            except Exception as e:
-                self.log_errors('USER', obj, e)
-            progress.increment()
-        progress.stop()
-
-        # AbstractNode urls (Nodes and Registrations, no Collections)
-        objs = (AbstractNode.objects
-            .filter(is_public=True, is_deleted=False, retraction_id__isnull=True)
-            .exclude(type__in=['osf.collection', 'osf.quickfilesnode'])
-            .values('guids___id', 'modified'))
-        progress.start(objs.count(), 'NODE: ')
-        for obj in objs:
-            try:
-                config = settings.SITEMAP_NODE_CONFIG
-                config['loc'] = urlparse.urljoin(settings.DOMAIN, '/{}/'.format(obj['guids___id']))
-                config['lastmod'] = obj['modified'].strftime('%Y-%m-%d')
-                self.add_url(config)
-            except Exception as e:
-                self.log_errors('NODE', obj['guids___id'], e)
-            progress.increment()
-        progress.stop()
-
-        # Preprint urls
-
-        objs = (Preprint.objects.can_view()
-                    .select_related('node', 'provider', 'primary_file'))
-        progress.start(objs.count() * 2, 'PREP: ')
-        osf = PreprintProvider.objects.get(_id='osf')
-        for obj in objs:
-            try:
-                preprint_date = obj.modified.strftime('%Y-%m-%d')
-                config = settings.SITEMAP_PREPRINT_CONFIG
-                preprint_url = obj.url
-                provider = obj.provider
-                domain = provider.domain if (provider.domain_redirect_enabled and provider.domain) else settings.DOMAIN
-                if provider == osf:
-                    preprint_url = '/preprints/{}/'.format(obj._id)
-                config['loc'] = urlparse.urljoin(domain, preprint_url)
-                config['lastmod'] = preprint_date
-                self.add_url(config)
-
-                # Preprint file urls
-                try:
-                    file_config = settings.SITEMAP_PREPRINT_FILE_CONFIG
-                    file_config['loc'] = urlparse.urljoin(
-                        obj.provider.domain or settings.DOMAIN,
-                        os.path.join(
-                            obj._id,
-                            'download',
-                            '?format=pdf'
-                        )
-                    )
-                    file_config['lastmod'] = preprint_date
-                    self.add_url(file_config)
-                except Exception as e:
-                    self.log_errors(obj.primary_file, obj.primary_file._id, e)
-            except Exception as e:
-                self.log_errors(obj, obj._id, e)
-            progress.increment(2)
-        progress.stop()
-
-        # Final write
-        self.write_doc()
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+
+        shards = self.get_shards()
+        print('Writing {} sitemap shards'.format(len(shards)))
+        results = self.write_shards(shards)
+
+        manifest = OrderedDict()
+        changed = 0
+        for result in results:
+            name = result['name']
+            if not result['urls']:
+                os.remove(result['path'])
+                continue
+            previous = self.manifest.get(name)
+            file_path = os.path.join(self.sitemap_dir, name)
+            if previous and previous['hash'] == result['hash'] and (settings.SITEMAP_TO_S3 or os.path.exists(file_path)):
+                os.remove(result['path'])
+                manifest[name] = previous
+                continue
+            print('Writing `{}`: url_count = {}'.format(file_path, result['urls']))
+            os.rename(result['path'], file_path)
+            if settings.SITEMAP_TO_S3:
+                self.ship_to_s3(name, file_path)
+            manifest[name] = {'hash': result['hash'], 'urls': result['urls'], 'lastmod': today}
+            changed += 1
+
+        for name in set(self.manifest) - set(manifest):
+            print('Removing `{}`'.format(name))
+            self.remove_shard(name)
+
+        self.manifest = manifest
+        self.write_manifest()
         # Create index file
-        self.write_sitemap_index()
+        self.write_sitemap_index(list(manifest))
 
         # TODO: once the sitemap is validated add a ping to google with sitemap index file location
-        # TODO: server side cursor query wrapper might be useful as the index gets larger.
         # Sitemap indexable limit check
-        if self.sitemap_count > settings.SITEMAP_INDEX_MAX * .90:  # 10% of urls remaining
+        if len(manifest) > settings.SITEMAP_INDEX_MAX * .90:  # 10% of urls remaining
             sentry.log_message('WARNING: Max sitemaps nearly reached.')
-        print('Total url_count = {}'.format((self.sitemap_count - 1) * settings.SITEMAP_URL_MAX + self.url_count))
-        print('Total sitemap_count = {}'.format(str(self.sitemap_count)))
+        print('Total url_count = {}'.format(sum(shard['urls'] for shard in manifest.values())))
+        print('Total sitemap_count = {} ({} changed)'.format(len(manifest), changed))
         if self.errors:
             sentry.log_message('WARNING: Generate sitemap encountered errors. See logs for details.')
             print('Total errors = {}'.format(str(self.errors)))
@@ -19,7 +19,7 @@ from django.conf import settings
 from elasticsearch.helpers import bulk
 from elasticsearch_dsl.connections import connections
 
-from osf.models import PageCounter, Preprint
+from osf.models import DailyPageCounter, Preprint
 from scripts import utils
 from website.search.elastic_search import client
 
@@ -48,42 +48,41 @@ def main():
         preprint_id = preprint._id
         provider_id = preprint.provider._id
         file_id = preprint.primary_file._id
-        page_counters = (
-            PageCounter.objects
+        daily_counters = (
+            DailyPageCounter.objects
             .filter(
-                _id__startswith='download:{preprint_id}:{file_id}:'.format(
+                page__startswith='download:{preprint_id}:{file_id}:'.format(
                     preprint_id=preprint_id,
                     file_id=file_id
                 )
-            ).values_list('_id', 'date')
+            ).values_list('page', 'date', 'total')
         )
-        for page_counter in page_counters:
-            page_counter__id, date = page_counter
-            version_num = page_counter__id.split(':')[-1]
-            for date, totals in date.items():
-                timestamp = datetime.datetime.strptime(date, '%Y/%m/%d').replace(tzinfo=pytz.utc)
-                batch_to_update.append({
-                    '_index': 'osf_preprintdownload_{}'.format(timestamp.strftime(settings.ELASTICSEARCH_METRICS_DATE_FORMAT)),
-                    '_source': {
-                        'count': totals['total'],
-                        'path': '/{}'.format(file_id),
-                        'preprint_id': preprint_id,
-                        'provider_id': provider_id,
-                        'timestamp': timestamp,
-                        'user_id': None,  # Pagecounter never tracked this
-                        'version': int(version_num) + 1
-                    },
-                    '_type': 'doc'
-                })
-
-                if len(batch_to_update) >= MAX_BATCH_SIZE:
-                    logger.info('Bulk-indexing data from {} PageCounter records'.format(len(batch_to_update)))
-                    if not dry:
-                        bulk(es, batch_to_update, max_retries=3, chunk_size=CHUNK_SIZE, request_timeout=REQUEST_TIMEOUT)
-                    batch_to_update = []
-                    # Allow elasticsearch to catch up
-                    print('{}/{} preprints completed ({:.2f}%)'.format(i + 1, total_preprints, (i + 1) / total_preprints * 100))
-                    sleep(THROTTLE_PERIOD)
+        for daily_counter in daily_counters:
+            page, date, total = daily_counter
+            version_num = page.split(':')[-1]
+            timestamp = datetime.datetime.combine(date, datetime.time()).replace(tzinfo=pytz.utc)
+            batch_to_update.append({
+                '_index': 'osf_preprintdownload_{}'.format(timestamp.strftime(settings.ELASTICSEARCH_METRICS_DATE_FORMAT)),
+                '_source': {
+                    'count': total,
+                    'path': '/{}'.format(file_id),
+                    'preprint_id': preprint_id,
+                    'provider_id': provider_id,
+                    'timestamp': timestamp,
+                    'user_id': None,  # Pagecounter never tracked this
+                    'version': int(version_num) + 1
+                },
+                '_type': 'doc'
+            })
+
+            if len(batch_to_update) >= MAX_BATCH_SIZE:
+                logger.info('Bulk-indexing data from {} PageCounter records'.format(len(batch_to_update)))
+                if not dry:
+                    bulk(es, batch_to_update, max_retries=3, chunk_size=CHUNK_SIZE, request_timeout=REQUEST_TIMEOUT)
+                batch_to_update = []
+                # Allow elasticsearch to catch up
+                print('{}/{} preprints completed ({:.2f}%)'.format(i + 1, total_preprints, (i + 1) / total_preprints * 100))
+                sleep(THROTTLE_PERIOD)
 
     # Index final batch
     if len(batch_to_update):
@@ -6,7 +6,8 @@ import mock
 from nose.tools import *  # noqa: F403
 import sendgrid
 
-from framework.email.tasks import send_email, _send_with_sendgrid
+from framework.email import smtp
+from framework.email.tasks import send_email, send_emails, _send_with_sendgrid, _send_with_smtp
 from website import settings
 from tests.base import fake
 from osf_tests.factories import fake_email
@@ -77,5 +78,72 @@ class TestEmail(unittest.TestCase):
         assert_false(ret)
 
 
+@mock.patch('framework.email.smtp.smtplib.SMTP')
+class TestSMTPConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        smtp._pools.clear()
+
+    def tearDown(self):
+        smtp._pools.clear()
+
+    def message(self, to_addr='baz@quux.com'):
+        return smtp.SMTPMessage(from_addr='foo@bar.com', to_addrs=[to_addr], msg='message')
+
+    def test_connection_is_reused(self, mock_smtp):
+        assert_equal(smtp.deliver([self.message(), self.message()], username='user', password='pass'), [True, True])
+        assert_equal(smtp.deliver([self.message()], username='user', password='pass'), [True])
+        assert_equal(mock_smtp.call_count, 1)
+        connection = mock_smtp.return_value
+        assert_equal(connection.starttls.call_count, 1)
+        connection.login.assert_called_once_with('user', 'pass')
+        assert_equal(connection.sendmail.call_count, 3)
+        assert_equal(smtp.get_stats()['sent'], 3)
+
+    def test_no_login(self, mock_smtp):
+        smtp.deliver([self.message()], ttls=False, login=False)
+        assert_false(mock_smtp.return_value.starttls.called)
+        assert_false(mock_smtp.return_value.login.called)
+
+    def test_reconnect_on_disconnect(self, mock_smtp):
+        mock_smtp.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), {}, {}]
+        assert_equal(smtp.deliver([self.message(), self.message()]), [True, True])
+        assert_equal(mock_smtp.call_count, 2)
+
+    def test_failed_message_does_not_stop_batch(self, mock_smtp):
+        mock_smtp.return_value.sendmail.side_effect = [
+            smtplib.SMTPRecipientsRefused({'bad@quux.com': (550, 'No such user')}), {},
+        ]
+        results = smtp.deliver([self.message('bad@quux.com'), self.message()])
+        assert_equal(results, [False, True])
+        assert_equal(mock_smtp.call_count, 1)
+        stats = smtp.get_stats()
+        assert_equal((stats['sent'], stats['failed']), (1, 1))
+
+    def test_expired_connection_is_replaced(self, mock_smtp):
+        with mock.patch.object(settings, 'MAIL_CONNECTION_MAX_MESSAGES', 2):
+            smtp.deliver([self.message(), self.message()])
+            smtp.deliver([self.message()])
+        assert_equal(mock_smtp.call_count, 2)
+        assert_true(mock_smtp.return_value.quit.called)
+
+    @mock.patch.object(settings, 'USE_EMAIL', True)
+    @mock.patch.object(settings, 'SENDGRID_API_KEY', None)
+    def test_send_emails(self, mock_smtp):
+        emails = [
+            {'from_addr': 'foo@bar.com', 'to_addr': to_addr, 'subject': 'subject', 'message': '<p>Hi</p>'}
+            for to_addr in ('a@quux.com', 'b@quux.com', 'c@quux.com')
+        ]
+        assert_equal(send_emails(emails, ttls=False, login=False), [True, True, True])
+        assert_equal(mock_smtp.call_count, 1)
+        recipients = [call[0][1] for call in mock_smtp.return_value.sendmail.call_args_list]
+        assert_equal(recipients, [['a@quux.com'], ['b@quux.com'], ['c@quux.com']])
+
+    def test_send_with_smtp_raises_on_failure(self, mock_smtp):
+        mock_smtp.return_value.sendmail.side_effect = smtplib.SMTPDataError(554, 'Rejected')
+        with assert_raises(smtplib.SMTPException):
+            _send_with_smtp('foo@bar.com', 'baz@quux.com', 'subject', 'message', ttls=False, login=False)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import mock
+from nose.tools import *  # noqa: F403
+
+from api.base.settings import API_BASE
+from framework.auth import cas, core
+from framework.sessions import store
+from framework.sessions.utils import remove_session
+from osf.models import Session
+from osf_tests.factories import ApiOAuth2PersonalTokenFactory, AuthUserFactory
+from tests.base import ApiTestCase, OsfTestCase
+
+
+class TestSessionStore(OsfTestCase):
+
+    def setUp(self):
+        super(TestSessionStore, self).setUp()
+        # Behave as with a cache shared by all processes
+        self.shared_patcher = mock.patch.object(store, 'is_shared', return_value=True)
+        self.shared_patcher.start()
+        self.session = Session(data={'auth_user_id': 'abcde'})
+        self.session.save()
+
+    def tearDown(self):
+        self.shared_patcher.stop()
+        super(TestSessionStore, self).tearDown()
+
+    def test_load_session_reads_through_cache(self):
+        store.get_cache().clear()
+        assert_equal(store.load_session(self.session._id).data, self.session.data)
+        with mock.patch.object(Session, 'load') as mock_load:
+            loaded = store.load_session(self.session._id)
+        assert_false(mock_load.called)
+        assert_equal(loaded.pk, self.session.pk)
+        assert_equal(loaded.created, self.session.created)
+        assert_equal(loaded.data, {'auth_user_id': 'abcde'})
+
+    def test_load_missing_session(self):
+        assert_is_none(store.load_session('notasession'))
+
+    def test_save_updates_cache(self):
+        self.session.data['auth_user_fullname'] = 'Freddie Mercury'
+        self.session.save()
+        assert_equal(store.load_session(self.session._id).data['auth_user_fullname'], 'Freddie Mercury')
+
+    def test_save_if_changed(self):
+        loaded = store.load_session(self.session._id)
+        with mock.patch.object(Session, 'save') as mock_save:
+            store.save_if_changed(loaded)
+            assert_false(mock_save.called)
+            loaded.data['status'] = ['message']
+            store.save_if_changed(loaded)
+            assert_true(mock_save.called)
+
+    def test_save_if_changed_persists_data(self):
+        loaded = store.load_session(self.session._id)
+        loaded.data['status'] = ['message']
+        store.save_if_changed(loaded)
+        assert_equal(Session.objects.get(id=self.session.id).data['status'], ['message'])
+
+    def test_remove_session_uncaches_it(self):
+        store.load_session(self.session._id)
+        remove_session(self.session)
+        assert_is_none(store.load_session(self.session._id))
+
+
+class TestLocalSessionCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestLocalSessionCache, self).setUp()
+        self.session = Session(data={'auth_user_id': 'abcde'})
+        self.session.save()
+
+    def test_default_cache_is_not_shared(self):
+        assert_false(store.is_shared())
+
+    def test_load_session_reads_database(self):
+        store.load_session(self.session._id)
+        Session.objects.filter(id=self.session.id).update(data={'auth_user_id': 'fghij'})
+        assert_equal(store.load_session(self.session._id).data, {'auth_user_id': 'fghij'})
+
+    def test_removed_session_is_not_loaded(self):
+        store.load_session(self.session._id)
+        Session.objects.filter(id=self.session.id).delete()
+        assert_is_none(store.load_session(self.session._id))
+
+
+class TestVerifiedCredentials(OsfTestCase):
+
+    def setUp(self):
+        super(TestVerifiedCredentials, self).setUp()
+        # Behave as with a cache shared by all processes
+        self.shared_patcher = mock.patch.object(store, 'is_shared', return_value=True)
+        self.shared_patcher.start()
+        self.user = AuthUserFactory()
+        self.email, self.password = self.user.auth
+
+    def tearDown(self):
+        self.shared_patcher.stop()
+        super(TestVerifiedCredentials, self).tearDown()
+
+    def test_verified_password(self):
+        assert_is_none(store.get_verified_password(self.email, self.password))
+        store.set_verified_password(self.email, self.password, self.user)
+        verified = store.get_verified_password(self.email.upper(), self.password)
+        assert_equal(verified['user_id'], self.user._id)
+        assert_equal(verified['fullname'], self.user.fullname)
+        assert_is_none(store.get_verified_password(self.email, 'wrong password'))
+
+    def test_password_change_invalidates_credentials(self):
+        store.set_verified_password(self.email, self.password, self.user)
+        self.user.set_password('a new password', notify=False)
+        self.user.save()
+        assert_is_none(store.get_verified_password(self.email, self.password))
+
+    def test_username_change_invalidates_credentials(self):
+        store.set_verified_password(self.email, self.password, self.user)
+        self.user.username = 'brian@queen.com'
+        self.user.save()
+        assert_is_none(store.get_verified_password(self.email, self.password))
+
+    def test_disable_invalidates_credentials(self):
+        store.set_verified_password(self.email, self.password, self.user)
+        self.user.disable_account()
+        self.user.save()
+        assert_is_none(store.get_verified_password(self.email, self.password))
+
+    def test_unrelated_change_keeps_credentials(self):
+        store.set_verified_password(self.email, self.password, self.user)
+        self.user.fullname = 'Brian May'
+        self.user.save()
+        assert_is_not_none(store.get_verified_password(self.email, self.password))
+
+    def test_token_revocation_forgets_token(self):
+        token = ApiOAuth2PersonalTokenFactory(owner=self.user)
+        store.set_verified_token(token.token_id, cas.CasResponse(authenticated=True, user=self.user._id))
+        assert_is_not_none(store.get_verified_token(token.token_id))
+        with mock.patch('framework.auth.cas.CasClient.revoke_tokens'):
+            token.deactivate(save=True)
+        assert_is_none(store.get_verified_token(token.token_id))
+
+    def test_basic_auth_checks_password_once(self):
+        with mock.patch('framework.auth.core.get_user', wraps=core.get_user) as mock_get_user:
+            self.app.get('/', auth=self.user.auth, expect_errors=True)
+            self.app.get('/', auth=self.user.auth, expect_errors=True)
+        assert_equal(mock_get_user.call_count, 1)
+
+    def test_basic_auth_with_twofactor_is_not_remembered(self):
+        self.user.add_addon('twofactor')
+        user_settings = self.user.get_addon('twofactor')
+        user_settings.is_confirmed = True
+        user_settings.save()
+        with mock.patch('framework.auth.core.get_user', wraps=core.get_user) as mock_get_user:
+            self.app.get('/', auth=self.user.auth, expect_errors=True)
+            self.app.get('/', auth=self.user.auth, expect_errors=True)
+        assert_equal(mock_get_user.call_count, 2)
+
+
+class TestLocalCredentials(OsfTestCase):
+
+    def test_basic_auth_checks_password_on_every_request(self):
+        # Nothing is cached with the default process-local backend
+        user = AuthUserFactory()
+        with mock.patch('framework.auth.core.get_user', wraps=core.get_user) as mock_get_user:
+            self.app.get('/', auth=user.auth, expect_errors=True)
+            self.app.get('/', auth=user.auth, expect_errors=True)
+        assert_equal(mock_get_user.call_count, 2)
+        assert_is_none(store.get_verified_password(*user.auth))
+
+
+class TestApiVerifiedCredentials(ApiTestCase):
+
+    def setUp(self):
+        super(TestApiVerifiedCredentials, self).setUp()
+        self.shared_patcher = mock.patch.object(store, 'is_shared', return_value=True)
+        self.shared_patcher.start()
+        self.user = AuthUserFactory()
+        self.url = '/{}users/me/'.format(API_BASE)
+
+    def tearDown(self):
+        self.shared_patcher.stop()
+        super(TestApiVerifiedCredentials, self).tearDown()
+
+    def test_basic_auth_checks_password_once(self):
+        with mock.patch('api.base.authentication.drf.get_user', wraps=core.get_user) as mock_get_user:
+            for _ in range(2):
+                res = self.app.get(self.url, auth=self.user.auth)
+                assert_equal(res.json['data']['id'], self.user._id)
+        assert_equal(mock_get_user.call_count, 1)
+
+    def test_basic_auth_after_password_change(self):
+        self.app.get(self.url, auth=self.user.auth)
+        self.user.set_password('a new password', notify=False)
+        self.user.save()
+        res = self.app.get(self.url, auth=self.user.auth, expect_errors=True)
+        assert_equal(res.status_code, 401)
+
+    @mock.patch('framework.auth.cas.CasClient.profile')
+    def test_token_is_checked_with_cas_once(self, mock_profile):
+        mock_profile.return_value = cas.CasResponse(
+            authenticated=True, user=self.user._id,
+            attributes={'accessTokenScope': ['osf.full_read']}
+        )
+        for _ in range(2):
+            res = self.app.get(self.url, auth='some_valid_token', auth_type='jwt')
+            assert_equal(res.json['data']['id'], self.user._id)
+        assert_equal(mock_profile.call_count, 1)
+
+    @mock.patch('framework.auth.cas.CasClient.profile')
+    def test_token_of_disabled_user(self, mock_profile):
+        mock_profile.return_value = cas.CasResponse(
+            authenticated=True, user=self.user._id,
+            attributes={'accessTokenScope': ['osf.full_read']}
+        )
+        self.app.get(self.url, auth='some_valid_token', auth_type='jwt')
+        self.user.disable_account()
+        self.user.save()
+        res = self.app.get(self.url, auth='some_valid_token', auth_type='jwt', expect_errors=True)
+        assert_equal(mock_profile.call_count, 2)
+        assert_not_equal(res.status_code, 200)
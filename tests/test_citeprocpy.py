@@ -2,13 +2,16 @@
 import os
 import json
 
+import mock
 from django.utils import timezone
 from nose.tools import *  # noqa: F403
 
-from api.citations.utils import render_citation
+from api.citations import utils as citation_utils
+from api.citations.utils import render_citation, render_citations
 from osf_tests.factories import UserFactory, PreprintFactory
 from tests.base import OsfTestCase
 from osf.models import OSFUser
+from website import settings
 
 class Node:
     _id = '2nthu'
@@ -172,3 +175,49 @@ class TestCiteprocpyMLA(OsfTestCase):
                 self.preprint.provider.name,
                 self.formated_date)
         )
+
+
+class TestCitationCaches(OsfTestCase):
+
+    def setUp(self):
+        super(TestCitationCaches, self).setUp()
+        self.user = UserFactory(fullname='John Tordoff')
+        self.preprint = PreprintFactory(creator=self.user, title='My Preprint')
+
+    def test_parsed_styles_are_reused(self):
+        style = citation_utils.get_style('apa')
+        with mock.patch('api.citations.utils.CitationStylesStyle') as mock_style:
+            assert_is(citation_utils.get_style('apa'), style)
+        assert_false(mock_style.called)
+
+    def test_least_recently_used_styles_are_evicted(self):
+        with mock.patch.object(settings, 'CITATION_STYLE_CACHE_SIZE', 2):
+            apa = citation_utils.get_style('apa')
+            citation_utils.get_style('modern-language-association')
+            citation_utils.get_style('apa')
+            citation_utils.get_style('chicago-author-date')
+            assert_is(citation_utils.get_style('apa'), apa)
+            assert_not_in('modern-language-association', citation_utils._styles)
+
+    def test_rendered_citations_are_cached(self):
+        citation = render_citation(self.preprint, 'apa')
+        with mock.patch('api.citations.utils.CitationStylesBibliography') as mock_bibliography:
+            assert_equal(render_citation(self.preprint, 'apa'), citation)
+        assert_false(mock_bibliography.called)
+
+    def test_changes_to_the_node_render_again(self):
+        render_citation(self.preprint, 'modern-language-association')
+        self.preprint.title = 'A Study of Coffee'
+        self.preprint.save()
+        assert_in('A Study of Coffee', render_citation(self.preprint, 'modern-language-association'))
+
+        self.user.suffix = 'Junior'
+        self.user.save()
+        assert_true(render_citation(self.preprint, 'modern-language-association').startswith('Tordoff, John, Junior.'))
+
+    def test_render_citations(self):
+        preprints = [self.preprint, PreprintFactory(creator=self.user, title='Another Preprint')]
+        for style in ['apa', 'ieee']:
+            citations = render_citations(preprints, style)
+            citation_utils.get_cache().clear()
+            assert_equal(citations, [render_citation(preprint, style) for preprint in preprints])
@@ -12,6 +12,7 @@ from osf.models import Comment, NotificationDigest, NotificationSubscription, Gu
 from website.notifications.tasks import get_users_emails, send_users_email, group_by_node, remove_notifications
 from website.notifications import constants
 from website.notifications import emails
+from website.notifications import tasks
 from website.notifications import utils
 from website import mails
 from website.profile.utils import get_profile_image_url
@@ -1265,6 +1266,48 @@ class TestCompileSubscriptions(NotificationTestCase):
         subs = emails.compile_subscriptions(node5, 'file_updated')
         assert_equal(subs, {'email_transactional': [], 'email_digest': [self.user_1._id], 'none': []})
 
+    def test_event_subscription_overrides_node_subscription(self):
+        self.shared_sub.email_transactional.add(self.user_1)
+        file_sub = factories.NotificationSubscriptionFactory(
+            _id=self.shared_node._id + '_xyz42_file_updated',
+            node=self.shared_node,
+            event_name='xyz42_file_updated'
+        )
+        file_sub.save()
+        file_sub.email_digest.add(self.user_1)
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated', 'xyz42_file_updated')
+        assert_equal({'email_transactional': [], 'none': [], 'email_digest': [self.user_1._id]}, result)
+
+    def test_disabled_users_not_listed(self):
+        self.base_sub.email_transactional.add(self.user_1, self.user_2)
+        self.user_2.is_disabled = True
+        self.user_2.save()
+        result = emails.compile_subscriptions(self.base_project, 'file_updated')
+        assert_equal({'email_transactional': [self.user_1._id], 'none': [], 'email_digest': []}, result)
+
+    def test_subscribers_are_cached(self):
+        self.base_sub.email_transactional.add(self.user_1)
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        with mock.patch('website.notifications.subscriptions.compute_subscribers') as mock_compute:
+            assert_equal(emails.compile_subscriptions(self.shared_node, 'file_updated'), result)
+        assert_false(mock_compute.called)
+
+    def test_cache_invalidated_on_parent_subscription_change(self):
+        self.base_sub.email_transactional.add(self.user_1)
+        emails.compile_subscriptions(self.shared_node, 'file_updated')
+        self.base_sub.email_transactional.remove(self.user_1)
+        self.base_sub.email_digest.add(self.user_1)
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal({'email_transactional': [], 'none': [], 'email_digest': [self.user_1._id]}, result)
+
+    def test_cache_invalidated_on_contributor_removal(self):
+        self.shared_sub.email_transactional.add(self.user_3)
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal(result['email_transactional'], [self.user_3._id])
+        self.shared_node.remove_contributor(self.user_3, auth=Auth(self.user_1))
+        result = emails.compile_subscriptions(self.shared_node, 'file_updated')
+        assert_equal(result['email_transactional'], [])
+
 
 class TestMoveSubscription(NotificationTestCase):
     def setUp(self):
@@ -1680,6 +1723,10 @@ class TestSendEmails(NotificationTestCase):
         assert_equal(emails.localize_timestamp(timestamp, self.user), formatted_datetime)
 
 
+class WorkerLost(BaseException):
+    """Stops a digest chunk like a killed worker, past its error handling"""
+
+
 class TestSendDigest(OsfTestCase):
     def setUp(self):
         super(TestSendDigest, self).setUp()
@@ -1842,6 +1889,90 @@ class TestSendDigest(OsfTestCase):
         send_users_email(send_type)
         assert_false(mock_send_mail.called)
 
+    def _create_digests(self, send_type='email_transactional'):
+        return [
+            factories.NotificationDigestFactory(
+                user=user,
+                send_type=send_type,
+                event='comment_replies',
+                timestamp=self.timestamp,
+                message='Hello',
+                node_lineage=[self.project._id]
+            )
+            for user in (self.user_1, self.user_2)
+        ]
+
+    @mock.patch('website.notifications.tasks.send_users_digest_chunk.delay')
+    def test_send_users_email_sends_users_in_chunks(self, mock_chunk):
+        self._create_digests()
+        with mock.patch.object(settings, 'NOTIFICATION_DIGEST_CHUNK_SIZE', 1):
+            send_users_email('email_transactional')
+        assert_equal(
+            mock_chunk.call_args_list,
+            [
+                mock.call('email_transactional', [min(self.user_1.id, self.user_2.id)]),
+                mock.call('email_transactional', [max(self.user_1.id, self.user_2.id)]),
+            ]
+        )
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_removes_sent_digests(self, mock_send_mail):
+        digests = self._create_digests()
+        send_users_email('email_transactional')
+        assert_equal(mock_send_mail.call_count, 2)
+        assert_equal(mock_send_mail.call_args[1]['node'], self.project)
+        assert_false(NotificationDigest.objects.filter(id__in=[d.id for d in digests]).exists())
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_digests_of_failed_emails(self, mock_send_mail):
+        digest_1, digest_2 = self._create_digests()
+        mock_send_mail.side_effect = lambda **kwargs: self._fail_for(kwargs, self.user_1)
+        send_users_email('email_transactional')
+        assert_equal(mock_send_mail.call_count, 2)
+        assert_true(NotificationDigest.objects.filter(id=digest_1.id).exists())
+        assert_false(NotificationDigest.objects.filter(id=digest_2.id).exists())
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_digests_of_undelivered_emails(self, mock_send_mail):
+        digest_1, digest_2 = self._create_digests()
+        mock_send_mail.side_effect = lambda **kwargs: kwargs['to_addr'] != self.user_1.username
+        send_users_email('email_transactional')
+        assert_equal(mock_send_mail.call_count, 2)
+        assert_true(NotificationDigest.objects.filter(id=digest_1.id).exists())
+        assert_false(NotificationDigest.objects.filter(id=digest_2.id).exists())
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_removals_before_a_crash(self, mock_send_mail):
+        digests = self._create_digests()
+        remove = tasks.remove_notifications
+
+        def crash_after_first(email_notification_ids=None):
+            if mock_send_mail.call_count > 1:
+                raise WorkerLost()
+            remove(email_notification_ids=email_notification_ids)
+
+        with mock.patch('website.notifications.tasks.remove_notifications', side_effect=crash_after_first):
+            with assert_raises(WorkerLost):
+                send_users_email('email_transactional')
+        assert_equal(mock_send_mail.call_count, 2)
+        remaining = NotificationDigest.objects.filter(id__in=[d.id for d in digests])
+        # The digests of the first user stay removed, those of the second are kept
+        assert_equal(remaining.count(), 1)
+
+    def test_send_users_email_skips_digests_locked_by_another_run(self):
+        self._create_digests()
+        with mock.patch('website.mails.send_mail') as mock_send_mail, \
+                mock.patch.object(NotificationDigest.objects, 'select_for_update') as mock_lock:
+            mock_lock.return_value.filter.return_value.values_list.return_value = []
+            send_users_email('email_transactional')
+        assert_false(mock_send_mail.called)
+        assert_equal(NotificationDigest.objects.count(), 2)
+
+    def _fail_for(self, kwargs, user):
+        if kwargs['to_addr'] == user.username:
+            raise Exception('SMTP server unavailable')
+        return True
+
     def test_remove_sent_digest_notifications(self):
         d = factories.NotificationDigestFactory(
             event='comment_replies',
@@ -3,13 +3,15 @@ import datetime
 import mock
 from nose.tools import *  # noqa (PEP8 asserts)
 import pytest
+from django.utils import timezone
 
 from addons.osfstorage.models import OsfStorageFileNode
 from api.base import settings as api_settings
 from framework.auth import signing
 from tests.base import OsfTestCase
 from osf.models import (
-    FileLog, FileInfo, TrashedFileNode, TrashedFolder, UserQuota, ProjectStorageType
+    FileLog, FileInfo, TrashedFileNode, TrashedFolder, UserQuota, ProjectStorageType,
+    QuotaReservation
 )
 from osf_tests.factories import (
     AuthUserFactory, ProjectFactory, UserFactory, InstitutionFactory, RegionFactory
@@ -1253,3 +1255,106 @@ class TestQuotaApiBrowser(OsfTestCase):
         assert_equal(response.status_code, 200)
         assert_equal(response.json['max'], 200 * api_settings.SIZE_UNIT_GB)
         assert_equal(response.json['used'], 100 * api_settings.SIZE_UNIT_GB)
+
+
+class TestQuotaReservation(OsfTestCase):
+    def setUp(self):
+        super(TestQuotaReservation, self).setUp()
+        self.user = AuthUserFactory()
+        self.node = ProjectFactory(creator=self.user)
+        self.user_quota = UserQuota.objects.create(
+            storage_type=UserQuota.NII_STORAGE,
+            user=self.user,
+            max_quota=1,
+            used=api_settings.SIZE_UNIT_GB - 1000
+        )
+        self.file = OsfStorageFileNode.create(
+            target=self.node,
+            path='/testfile',
+            _id='testfile',
+            name='testfile',
+            materialized_path='/testfile'
+        )
+        self.file.save()
+
+    def test_reserve_quota(self):
+        reservation = quota.reserve_quota(self.node, 600)
+        assert_equal(reservation.size, 600)
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.reserved, 600)
+
+    def test_reservations_can_not_exceed_quota(self):
+        assert_is_not_none(quota.reserve_quota(self.node, 600))
+        assert_is_none(quota.reserve_quota(self.node, 600))
+        assert_is_not_none(quota.reserve_quota(self.node, 400))
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.reserved, 1000)
+
+    def test_release_reservation(self):
+        reservation = quota.reserve_quota(self.node, 600)
+        quota.release_reservation(reservation._id)
+        quota.release_reservation(reservation._id)
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.reserved, 0)
+        assert_false(QuotaReservation.objects.exists())
+
+    def test_release_expired_reservations(self):
+        expired = quota.reserve_quota(self.node, 600)
+        expired.expires = timezone.now() - datetime.timedelta(seconds=1)
+        expired.save()
+        quota.reserve_quota(self.node, 100)
+        quota.release_expired_reservations()
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.reserved, 100)
+        assert_equal(QuotaReservation.objects.count(), 1)
+
+    def test_upload_commits_reservation(self):
+        reservation = quota.reserve_quota(self.node, 600)
+        quota.update_used_quota(
+            self=None,
+            target=self.node,
+            user=self.user,
+            event_type=FileLog.FILE_ADDED,
+            payload={
+                'provider': 'osfstorage',
+                'reservation': reservation._id,
+                'metadata': {
+                    'provider': 'osfstorage',
+                    'name': 'testfile',
+                    'materialized': '/filename',
+                    'path': '/' + self.file._id,
+                    'kind': 'file',
+                    'size': 500,
+                    'created_utc': '',
+                    'modified_utc': '',
+                    'extra': {'version': '1'}
+                }
+            }
+        )
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.used, api_settings.SIZE_UNIT_GB - 500)
+        assert_equal(self.user_quota.reserved, 0)
+        assert_false(QuotaReservation.objects.exists())
+
+    def test_reserve_view(self):
+        url = self.node.api_url_for('waterbutler_reserve_quota')
+        response = self.app.post_json(url, signing.sign_data(signing.default_signer, {'size': 600}))
+        assert_equal(response.status_code, 201)
+        assert_true(QuotaReservation.objects.filter(_id=response.json['reservation']).exists())
+
+        response = self.app.post_json(
+            url, signing.sign_data(signing.default_signer, {'size': 600}), expect_errors=True
+        )
+        assert_equal(response.status_code, 507)
+
+    def test_release_view(self):
+        reservation = quota.reserve_quota(self.node, 600)
+        response = self.app.delete(
+            '{}?payload={payload}&signature={signature}'.format(
+                self.node.api_url_for('waterbutler_release_quota'),
+                **signing.sign_data(signing.default_signer, {'reservation': reservation._id})
+            )
+        )
+        assert_equal(response.status_code, 200)
+        self.user_quota.refresh_from_db()
+        assert_equal(self.user_quota.reserved, 0)
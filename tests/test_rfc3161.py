@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+The fixtures in test_files/timestamp were made by `openssl ts -reply` with a test TSA whose
+certificate is issued by root.pem: sha512.tsr stamps data.txt (ESS signing certificate v1),
+sha256.tsr stamps its sha256 digest (ESS signing certificate v2), and other.tsr stamps data.txt
+with a TSA issued by other.pem.
+
+The other tokens stamp data.txt with a TSA whose certificate is issued through an intermediate
+certificate under root.pem: a CA (intermediate.tsr), an end entity certificate
+(non_ca_intermediate.tsr), a CA without keyCertSign (no_key_cert_sign.tsr), and a CA issued by a
+CA with pathlen:0 (path_length.tsr).
+"""
+import hashlib
+import os
+import subprocess
+from distutils.spawn import find_executable
+
+import pytest
+
+from website.util import rfc3161
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_files', 'timestamp')
+DATA = os.path.join(HERE, 'data.txt')
+ROOT = os.path.join(HERE, 'root.pem')
+OTHER_ROOT = os.path.join(HERE, 'other.pem')
+
+
+def fixture(name):
+    with open(os.path.join(HERE, name), 'rb') as f:
+        return f.read()
+
+
+def openssl_verifies(response, ca_file, tmpdir):
+    path = str(tmpdir.join('token.tsr'))
+    with open(path, 'wb') as f:
+        f.write(response)
+    process = subprocess.Popen(
+        ['openssl', 'ts', '-verify', '-data', DATA, '-in', path, '-CAfile', ca_file],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout_data, stderr_data = process.communicate()
+    return b'OK' in stdout_data
+
+
+def verifies(response, hash_name, ca_file):
+    try:
+        rfc3161.verify_response(response, rfc3161.digest_file(DATA, hash_name), hash_name, ca_file)
+    except rfc3161.TimestampError:
+        return False
+    return True
+
+
+def tampered(response):
+    response = bytearray(response)
+    response[-10] ^= 1
+    return bytes(response)
+
+
+class TestBuildRequest:
+
+    def test_request(self):
+        digest = rfc3161.digest_file(DATA, 'sha512')
+        request = rfc3161.decode(rfc3161.build_request(digest, 'sha512', nonce=42)).children
+        assert request[0].as_int() == 1
+        algorithm, hashed_message = request[1].children
+        assert algorithm.children[0].as_oid() == rfc3161.HASH_ALGORITHMS['sha512']
+        assert hashed_message.contents == hashlib.sha512(fixture('data.txt')).digest()
+        assert request[2].as_int() == 42
+        assert request[3].der == b'\x01\x01\xff'
+
+    def test_random_nonce(self):
+        digest = rfc3161.digest_file(DATA, 'sha256')
+        assert rfc3161.build_request(digest, 'sha256') != rfc3161.build_request(digest, 'sha256')
+
+    @pytest.mark.parametrize('digest, hash_name', [
+        ('not hex', 'sha256'),
+        (hashlib.sha256(b'').hexdigest(), 'sha512'),
+        (hashlib.sha256(b'').hexdigest(), 'md5'),
+    ])
+    def test_invalid_digest(self, digest, hash_name):
+        with pytest.raises(rfc3161.TimestampError):
+            rfc3161.build_request(digest, hash_name)
+
+    def test_missing_file(self):
+        with pytest.raises(rfc3161.TimestampError):
+            rfc3161.digest_file(os.path.join(HERE, 'missing'), 'sha512')
+
+
+class TestVerifyResponse:
+
+    @pytest.mark.parametrize('name, hash_name', [('sha512.tsr', 'sha512'), ('sha256.tsr', 'sha256')])
+    def test_valid(self, name, hash_name):
+        token = rfc3161.verify_response(
+            fixture(name), rfc3161.digest_file(DATA, hash_name), hash_name, ROOT)
+        assert token.imprint_algorithm == hash_name
+        assert token.policy == '1.2.3.4.1'
+
+    def test_modified_data(self):
+        with pytest.raises(rfc3161.TimestampError) as exc:
+            rfc3161.verify_response(fixture('sha512.tsr'), hashlib.sha512(b'modified').hexdigest(), 'sha512', ROOT)
+        assert 'imprint' in str(exc.value)
+
+    def test_other_hash_type(self):
+        with pytest.raises(rfc3161.TimestampError):
+            rfc3161.verify_response(fixture('sha256.tsr'), rfc3161.digest_file(DATA, 'sha512'), 'sha512', ROOT)
+
+    @pytest.mark.parametrize('name, ca_file', [('sha512.tsr', OTHER_ROOT), ('other.tsr', ROOT)])
+    def test_untrusted(self, name, ca_file):
+        assert not verifies(fixture(name), 'sha512', ca_file)
+
+    def test_intermediate_ca(self):
+        assert verifies(fixture('intermediate.tsr'), 'sha512', ROOT)
+
+    @pytest.mark.parametrize('name, message', [
+        ('non_ca_intermediate.tsr', 'Invalid CA certificate'),
+        ('no_key_cert_sign.tsr', 'does not allow signing certificates'),
+        ('path_length.tsr', 'Path length constraint exceeded'),
+    ])
+    def test_invalid_intermediate(self, name, message):
+        with pytest.raises(rfc3161.TimestampError) as exc:
+            rfc3161.verify_response(fixture(name), rfc3161.digest_file(DATA, 'sha512'), 'sha512', ROOT)
+        assert message in str(exc.value)
+
+    def test_tampered(self):
+        with pytest.raises(rfc3161.TimestampError):
+            rfc3161.verify_response(tampered(fixture('sha512.tsr')), rfc3161.digest_file(DATA, 'sha512'), 'sha512', ROOT)
+
+    @pytest.mark.parametrize('response', [None, b'', b'\x30\x03\x02\x01', b'\x30\x00', fixture('root.pem')])
+    def test_malformed(self, response):
+        assert not verifies(response, 'sha512', ROOT)
+
+    def test_rejected(self):
+        status_info = rfc3161.encode(rfc3161.SEQUENCE, rfc3161.encode_int(2))
+        assert rfc3161.parse_response(rfc3161.encode(rfc3161.SEQUENCE, status_info)) == (2, None)
+        assert not verifies(rfc3161.encode(rfc3161.SEQUENCE, status_info), 'sha512', ROOT)
+
+    def test_missing_ca_file(self):
+        assert not verifies(fixture('sha512.tsr'), 'sha512', os.path.join(HERE, 'missing.pem'))
+
+    @pytest.mark.skipif(not find_executable('openssl'), reason='openssl is not installed')
+    @pytest.mark.parametrize('response, ca_file', [
+        (fixture('sha512.tsr'), ROOT),
+        (fixture('sha512.tsr'), OTHER_ROOT),
+        (fixture('other.tsr'), ROOT),
+        (fixture('intermediate.tsr'), ROOT),
+        (fixture('non_ca_intermediate.tsr'), ROOT),
+        (fixture('no_key_cert_sign.tsr'), ROOT),
+        (fixture('path_length.tsr'), ROOT),
+        (tampered(fixture('sha512.tsr')), ROOT),
+    ])
+    def test_same_result_as_openssl(self, response, ca_file, tmpdir):
+        assert verifies(response, 'sha512', ca_file) == openssl_verifies(response, ca_file, tmpdir)
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import datetime
+import furl
 import mock
 import os
 import pytz
@@ -627,6 +628,36 @@ class TestRdmUserKey(OsfTestCase):
         nt.assert_equal(rdmuserkey_pub_key.count(), 1)
 
 
+class TestGetFullList(ApiTestCase):
+
+    def setUp(self):
+        super(TestGetFullList, self).setUp()
+        self.node = ProjectFactory(is_public=False)
+        self.user = self.node.creator
+
+    def api_get(self, url, headers=None, cookies=None):
+        # Send the request of get_full_list to the API app, with the cookies it was given
+        for name, value in (cookies or {}).items():
+            self.app.set_cookie(name, str(value))
+        res = self.app.get(str(furl.furl(url).path), headers=headers, expect_errors=True)
+        if res.status_code in (301, 302):
+            res = res.follow(headers=headers, expect_errors=True)
+        return mock.Mock(status_code=res.status_code, json=lambda: res.json, close=lambda: None)
+
+    @mock.patch('website.util.timestamp.waterbutler.get_node_info')
+    @mock.patch('website.util.timestamp.requests.get')
+    def test_private_node(self, mock_get, mock_get_node_info):
+        mock_get.side_effect = self.api_get
+        mock_get_node_info.return_value = {'data': []}
+
+        nt.assert_equal(timestamp.get_full_list(self.user.id, self.node._id, self.node), [])
+        mock_get_node_info.assert_called_once_with(
+            mock.ANY, self.node._id, 'osfstorage', '/')
+        # WaterButler is called with a service credential
+        wb_cookie = mock_get_node_info.call_args[0][0]
+        nt.assert_equal(self.user.from_cookie(wb_cookie), self.user)
+
+
 class TestOSFAbortableResult(OsfTestCase):
 
     @mock.patch('celery.contrib.abortable.AbortableAsyncResult.ready')
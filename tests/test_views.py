@@ -5318,10 +5318,11 @@ class TestTimestampView(OsfTestCase):
     @mock.patch('celery.contrib.abortable.AbortableAsyncResult.ready')
     @mock.patch('celery.contrib.abortable.AbortableTask.is_aborted')
     @mock.patch('website.project.views.node.find_bookmark_collection')
-    @mock.patch('website.util.waterbutler.shutil')
+    @mock.patch('website.util.waterbutler.request')
     @mock.patch('requests.get')
-    def test_add_timestamp_token(self, mock_get, mock_shutil, mock_collection, mock_aborted, mock_ready):
+    def test_add_timestamp_token(self, mock_get, mock_wb_request, mock_collection, mock_aborted, mock_ready):
         mock_get.return_value.content = ''
+        mock_wb_request.return_value = mock_get.return_value
         mock_get.return_value.status_code = 200
         mock_aborted.return_value = False
         mock_ready.return_value = True
@@ -5366,10 +5367,11 @@ class TestTimestampView(OsfTestCase):
     @mock.patch('website.util.timestamp.check_file_timestamp')
     @mock.patch('website.util.timestamp.get_full_list')
     @mock.patch('celery.contrib.abortable.AbortableTask.is_aborted')
-    @mock.patch('website.util.waterbutler.shutil')
+    @mock.patch('website.util.waterbutler.request')
     @mock.patch('requests.get')
-    def test_verify_timestamp_token(self, mock_get, mock_shutil, mock_aborted, mock_getfulllist, mock_checkfilets):
+    def test_verify_timestamp_token(self, mock_get, mock_wb_request, mock_aborted, mock_getfulllist, mock_checkfilets):
         mock_get.return_value.content = ''
+        mock_wb_request.return_value = mock_get.return_value
         mock_aborted.return_value = False
         mock_getfulllist.return_value = [
             {
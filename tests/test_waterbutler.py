@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import mock
+import responses
+from nose.tools import *  # noqa (PEP8 asserts)
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from website.util import waterbutler
+
+WB_URL = 'http://localhost:7777/v1/resources/abcde/providers/osfstorage'
+
+
+def listing(*entries):
+    return {'data': [
+        {'attributes': {'path': path, 'kind': 'folder' if path.endswith('/') else 'file'}}
+        for path in entries
+    ]}
+
+
+def url_for(path):
+    return WB_URL + path
+
+
+class TestWaterButlerClient(unittest.TestCase):
+
+    @responses.activate
+    def test_metadata(self):
+        responses.add(responses.GET, url_for('/'), json=listing('/a'))
+        responses.add(responses.GET, url_for('/missing'), status=404)
+        assert_equal(waterbutler.metadata(url_for('/')), listing('/a'))
+        assert_is_none(waterbutler.metadata(url_for('/missing')))
+
+    @responses.activate
+    def test_metadata_many_keeps_order(self):
+        for name in 'abcdef':
+            responses.add(responses.GET, url_for('/' + name), json=listing('/' + name))
+        results = waterbutler.metadata_many([url_for('/' + name) for name in 'abcdef'], concurrency=3)
+        assert_equal(results, [listing('/' + name) for name in 'abcdef'])
+
+    @responses.activate
+    def test_walk(self):
+        responses.add(responses.GET, url_for('/'), json=listing('/a', '/b/', '/c/'))
+        responses.add(responses.GET, url_for('/b/'), json=listing('/b/d/', '/b/e'))
+        responses.add(responses.GET, url_for('/c/'), status=503)
+        responses.add(responses.GET, url_for('/b/d/'), json=listing())
+        listings = waterbutler.walk(url_for, concurrency=2)
+        assert_equal(set(listings), {'/', '/b/', '/c/', '/b/d/'})
+        assert_equal(listings['/b/'], listing('/b/d/', '/b/e')['data'])
+        assert_is_none(listings['/c/'])
+
+    @responses.activate
+    def test_walk_max_requests(self):
+        responses.add(responses.GET, url_for('/'), json=listing('/a/', '/b/'))
+        responses.add(responses.GET, url_for('/a/'), json=listing())
+        listings = waterbutler.walk(url_for, max_requests=2)
+        assert_equal(len(listings), 2)
+        assert_equal(len(responses.calls), 2)
+
+    @responses.activate
+    def test_iter_download(self):
+        responses.add(responses.GET, url_for('/a'), body=b'x' * 10)
+        responses.add(responses.GET, url_for('/missing'), status=404)
+        assert_equal(b''.join(waterbutler.iter_download(url_for('/a'), chunk_size=3)), b'x' * 10)
+        assert_is_none(waterbutler.iter_download(url_for('/missing')))
+
+    @responses.activate
+    def test_download_file_makes_one_request(self):
+        responses.add(responses.GET, url_for('/a'), body=b'contents')
+        file_node = mock.Mock(path='/a')
+        file_node.name = 'a.txt'
+        file_node.generate_waterbutler_url.return_value = url_for('/a')
+        download_path = tempfile.mkdtemp()
+        try:
+            path = waterbutler.download_file('cookie', file_node, download_path)
+            with open(path, 'rb') as f:
+                assert_equal(f.read(), b'contents')
+        finally:
+            shutil.rmtree(download_path)
+        assert_equal(len(responses.calls), 1)
+        assert_equal(path, os.path.join(download_path, 'a.txt'))
+
+    @responses.activate
+    def test_stats(self):
+        responses.add(responses.GET, url_for('/'), json=listing())
+        responses.add(responses.GET, url_for('/missing'), status=404)
+        before = waterbutler.get_stats().get('metadata', {'requests': 0, 'errors': 0})
+        waterbutler.metadata(url_for('/'))
+        waterbutler.metadata(url_for('/missing'))
+        stats = waterbutler.get_stats()['metadata']
+        assert_equal(stats['requests'] - before['requests'], 2)
+        assert_equal(stats['errors'] - before['errors'], 1)
+        assert_true(stats['max_seconds'] <= stats['seconds'])
+
+    def test_session_does_not_keep_cookies(self):
+        session = waterbutler.get_session()
+        assert_is(session, waterbutler.get_session())
+        with responses.RequestsMock() as rsps:
+            rsps.add(responses.GET, url_for('/'), json=listing(), headers={'Set-Cookie': 'osf=other; Path=/'})
+            waterbutler.metadata(url_for('/'), cookies={'osf': 'mine'})
+            assert_equal(rsps.calls[0].request.headers['Cookie'], 'osf=mine')
+        assert_equal(len(session.cookies), 0)
+
+    @responses.activate
+    def test_upload_folder_recursive(self):
+        def put_callback(request):
+            url = urlparse(request.url)
+            query = parse_qs(url.query)
+            name = query['name'][0]
+            if name == 'bad':
+                return (409, {}, json.dumps({}))
+            item_id = url.path.split('/providers/')[1] + name + ('/' if query['kind'][0] == 'folder' else '')
+            return (201, {}, json.dumps({'data': {'id': item_id}}))
+
+        responses.add_callback(responses.PUT, re.compile(r'.*/v1/resources/abcde/providers/.*'), callback=put_callback)
+        local_path = tempfile.mkdtemp()
+        try:
+            for folder in ['sub/deeper', 'bad']:
+                os.makedirs(os.path.join(local_path, folder))
+            for path in ['a.txt', 'sub/b.txt', 'sub/deeper/c.txt', 'bad/d.txt']:
+                with open(os.path.join(local_path, path), 'w') as f:
+                    f.write(path)
+            result = waterbutler.upload_folder_recursive('cookie', 'abcde', local_path, 'osfstorage/', concurrency=2)
+        finally:
+            shutil.rmtree(local_path)
+
+        assert_equal(result['fail_file'], 0)
+        assert_equal(result['fail_folder'], 1)
+        ids = {os.path.relpath(item['path'], local_path): item['id'] for item in result['items']}
+        assert_equal(ids, {
+            'a.txt': 'osfstorage/a.txt',
+            'sub': 'osfstorage/sub/',
+            'bad': None,
+            'sub/b.txt': 'osfstorage/sub/b.txt',
+            'sub/deeper': 'osfstorage/sub/deeper/',
+            'sub/deeper/c.txt': 'osfstorage/sub/deeper/c.txt',
+        })
+        # Each folder is created before anything is uploaded to it
+        names = [parse_qs(urlparse(call.request.url).query)['name'][0] for call in responses.calls]
+        assert_true(names.index('sub') < names.index('b.txt'))
+        assert_true(names.index('deeper') < names.index('c.txt'))
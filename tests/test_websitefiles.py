@@ -527,7 +527,7 @@ class TestFileObj(FilesTestCase):
         v1.refresh_from_db()
         assert_equal(v1.size, 1337)
 
-    @mock.patch('osf.models.files.requests.get')
+    @mock.patch('osf.models.files.waterbutler.get')
     def test_touch(self, mock_requests):
         file = TestFile(
             _path='/afile',
@@ -556,7 +556,7 @@ class TestFileObj(FilesTestCase):
         assert_equals(v.size, 0xDEADBEEF)
         assert_equals(file.versions.count(), 0)
 
-    @mock.patch('osf.models.files.requests.get')
+    @mock.patch('osf.models.files.waterbutler.get')
     def test_touch_caching(self, mock_requests):
         file = TestFile(
             _path='/afile',
@@ -583,7 +583,7 @@ class TestFileObj(FilesTestCase):
         assert_equals(file.versions.count(), 1)
         assert_equals(file.touch(None, revision='foo'), v)
 
-    @mock.patch('osf.models.files.requests.get')
+    @mock.patch('osf.models.files.waterbutler.get')
     def test_touch_auth(self, mock_requests):
         file = TestFile(
             _path='/afile',
@@ -712,3 +712,27 @@ class TestSubclasses(FilesTestCase):
             mock.call('bar', version='foo'),
             mock.call(None, version='zyzz', bar='baz'),
         ])
+
+
+class TestFileClassRegistry(FilesTestCase):
+
+    def test_resolve_class(self):
+        assert_is(BaseFileNode.resolve_class('osfstorage', BaseFileNode.FILE), OsfStorageFile)
+        assert_is(BaseFileNode.resolve_class('osfstorage', BaseFileNode.FOLDER), OsfStorageFolder)
+        assert_is(BaseFileNode.resolve_class('osfstorage', BaseFileNode.ANY), OsfStorageFileNode)
+        assert_is(BaseFileNode.resolve_class('test', BaseFileNode.FILE), TestFile)
+        with assert_raises(exceptions.UnableToResolveFileClass):
+            BaseFileNode.resolve_class('notaprovider', BaseFileNode.FILE)
+
+    def test_registry_is_rebuilt_for_classes_prepared_later(self):
+        registry = models.files.get_file_class_registry()
+        models.files.reset_file_class_registry(sender=models.Session)
+        assert_is(models.files.get_file_class_registry(), registry)
+        models.files.reset_file_class_registry(sender=TestFile)
+        assert_is_not(models.files.get_file_class_registry(), registry)
+        assert_is(BaseFileNode.resolve_class('test', BaseFileNode.FILE), TestFile)
+
+    def test_supports_hash_timestamp(self):
+        assert_true(BaseFileNode.supports_hash_timestamp('dropboxbusiness'))
+        assert_false(BaseFileNode.supports_hash_timestamp('osfstorage'))
+        assert_false(BaseFileNode.supports_hash_timestamp('notaprovider'))
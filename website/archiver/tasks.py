@@ -4,6 +4,9 @@ import httplib as http
 
 import celery
 from celery.utils.log import get_task_logger
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 from framework.celery_tasks import app as celery_app
 from framework.celery_tasks.utils import logged
@@ -12,6 +15,8 @@ from framework.exceptions import HTTPError
 from api.base.utils import waterbutler_api_url_for
 
 from website.archiver import (
+    ARCHIVER_INITIATED,
+    ARCHIVER_PENDING,
     ARCHIVER_SUCCESS,
     ARCHIVER_FAILURE,
     ARCHIVER_SIZE_EXCEEDED,
@@ -26,12 +31,15 @@ from website.archiver import signals as archiver_signals
 
 from website.project import signals as project_signals
 from website import settings
+from website.util import waterbutler
 from website.app import init_addons
 from osf.models import (
+    ArchiveChunk,
     ArchiveJob,
     AbstractNode,
     DraftRegistration,
 )
+from addons.osfstorage.models import Region
 
 
 def create_app_context():
@@ -161,14 +169,14 @@ def make_copy_request(job_pk, url, data):
     job = ArchiveJob.load(job_pk)
     src, dst, user = job.info()
     logger.info('Sending copy request for addon: {0} on node: {1}'.format(data['provider'], dst._id))
-    res = requests.post(url, data=json.dumps(data))
+    res = waterbutler.post(url, 'copy', data=json.dumps(data))
     if res.status_code not in (http.OK, http.CREATED, http.ACCEPTED):
         raise HTTPError(res.status_code)
 
-def make_waterbutler_payload(dst_id, rename):
+def make_waterbutler_payload(dst_id, rename, path='/'):
     return {
         'action': 'copy',
-        'path': '/',
+        'path': path,
         'rename': rename.replace('/', '-'),
         'resource': dst_id,
         'provider': settings.ARCHIVE_PROVIDER,
@@ -189,7 +197,7 @@ def archive_addon(addon_short_name, job_pk):
     src, dst, user = job.info()
     logger.info('Archiving addon: {0} on node: {1}'.format(addon_short_name, src._id))
 
-    cookie = user.get_or_create_cookie()
+    cookie = user.get_service_cookie()
     params = {'cookie': cookie}
     rename_suffix = ''
     # The dataverse API will not differentiate between published and draft files
@@ -209,6 +217,141 @@ def archive_addon(addon_short_name, job_pk):
     data = make_waterbutler_payload(dst._id, rename)
     make_copy_request.delay(job_pk=job_pk, url=url, data=data)
 
+def archive_in_chunks(stat_result):
+    """Whether the addon with AggregateStatResult dict `stat_result` is archived in chunks"""
+    return bool(
+        settings.ARCHIVE_CHUNK_SIZE and
+        'dataverse' not in stat_result['target_name'] and
+        stat_result['disk_usage'] > settings.ARCHIVE_CHUNK_SIZE
+    )
+
+def create_archive_folder(dst, region, cookie, path, name):
+    """Create a folder in the archive of `dst`
+
+    :param path: WaterButler path of the parent folder
+    :return: WaterButler path of the new folder
+    """
+    url = waterbutler_api_url_for(
+        dst._id, settings.ARCHIVE_PROVIDER, path=path, name=name.replace('/', '-'), kind='folder',
+        _internal=True, base_url=region.waterbutler_url, cookie=cookie,
+    )
+    res = waterbutler.put(url, 'create_folder')
+    if res.status_code != http.CREATED:
+        raise HTTPError(res.status_code)
+    return res.json()['data']['attributes']['path']
+
+@celery_app.task(base=ArchiverTask, ignore_result=False)
+@logged('archive_addon_chunks')
+def archive_addon_chunks(addon_short_name, job_pk, stat_result):
+    """Archive the contents of an addon in chunks of about settings.ARCHIVE_CHUNK_SIZE bytes,
+    copied in parallel by #copy_archive_chunk. Creates the folders of the archive that the
+    chunks are copied into, then queues the chunks.
+
+    :param addon_short_name: AddonConfig.short_name of the addon to be archived
+    :param job_pk: primary key of ArchiveJob
+    :param stat_result: AggregateStatResult dict of the addon, as returned by #stat_addon
+    :return: None
+    """
+    create_app_context()
+    job = ArchiveJob.load(job_pk)
+    src, dst, user = job.info()
+    logger.info('Archiving addon: {0} on node: {1} in chunks'.format(addon_short_name, src._id))
+
+    cookie = user.get_service_cookie()
+    region = src.osfstorage_region
+    src_provider = src.get_addon(addon_short_name)
+    plan = utils.plan_archive_chunks(stat_result, settings.ARCHIVE_CHUNK_SIZE, settings.ARCHIVE_CHUNK_MAX_UNITS)
+
+    # Recreate the folders that were split into several units, parents first
+    folders = {(): create_archive_folder(dst, region, cookie, '/', src_provider.archive_folder_name)}
+    for units in plan:
+        for unit in units:
+            parents = tuple(unit.pop('parents'))
+            for depth in range(1, len(parents) + 1):
+                if parents[:depth] not in folders:
+                    folders[parents[:depth]] = create_archive_folder(
+                        dst, region, cookie, folders[parents[:depth - 1]], parents[depth - 1]
+                    )
+            unit['dest_path'] = folders[parents]
+
+    target = job.get_target(addon_short_name)
+    ArchiveChunk.objects.bulk_create([
+        ArchiveChunk(target=target, region=region, units=units, size=sum(unit['size'] for unit in units))
+        for units in plan
+    ])
+    dispatch_archive_chunks.delay(region.id)
+
+@celery_app.task(ignore_result=False)
+@logged('dispatch_archive_chunks')
+def dispatch_archive_chunks(region_id):
+    """Queue the chunks waiting to be copied from a storage region, keeping at most
+    settings.ARCHIVE_CHUNK_CONCURRENCY chunks of the region in flight
+
+    :param region_id: primary key of Region
+    :return: None
+    """
+    with transaction.atomic():
+        # Dispatching is serialized per region
+        Region.objects.select_for_update().get(id=region_id)
+        chunks = ArchiveChunk.objects.filter(region_id=region_id, target__status=ARCHIVER_INITIATED)
+        in_flight = chunks.filter(
+            status=ARCHIVER_PENDING,
+            modified__gte=timezone.now() - settings.ARCHIVE_TIMEOUT_TIMEDELTA,
+        ).count()
+        chunk_ids = list(chunks.filter(
+            status=ARCHIVER_INITIATED,
+        ).order_by('id').values_list('id', flat=True)[:max(settings.ARCHIVE_CHUNK_CONCURRENCY - in_flight, 0)])
+        ArchiveChunk.objects.filter(id__in=chunk_ids).update(
+            status=ARCHIVER_PENDING,
+            attempts=F('attempts') + 1,
+            modified=timezone.now(),
+        )
+    for chunk_id in chunk_ids:
+        copy_archive_chunk.delay(chunk_id)
+
+@celery_app.task(ignore_result=False)
+@logged('copy_archive_chunk')
+def copy_archive_chunk(chunk_pk):
+    """Make copy requests to the WaterButler API for the files and folders of a chunk that
+    were not copied yet. Their results are reported to #finish_archive_unit by the
+    registration callbacks.
+
+    :param chunk_pk: primary key of ArchiveChunk
+    :return: None
+    """
+    create_app_context()
+    chunk = ArchiveChunk.objects.select_related('target', 'region').get(pk=chunk_pk)
+    job = chunk.target.archivejob_set.get()
+    src, dst, user = job.info()
+    cookie = user.get_service_cookie()
+    for unit in chunk.pending_units:
+        url = waterbutler_api_url_for(
+            src._id, chunk.target.name, path=unit['path'],
+            _internal=True, base_url=chunk.region.waterbutler_url, cookie=cookie,
+        )
+        data = make_waterbutler_payload(dst._id, unit['name'], path=unit['dest_path'])
+        try:
+            res = waterbutler.post(url, 'copy', data=json.dumps(data))
+        except requests.exceptions.RequestException as e:
+            errors = [str(e)]
+        else:
+            errors = [] if res.status_code in (http.OK, http.CREATED, http.ACCEPTED) else [
+                'Copy request failed with status {}'.format(res.status_code)
+            ]
+        if errors:
+            finish_archive_unit(job, chunk.target.name, unit['path'], errors=errors)
+
+def finish_archive_unit(job, addon_short_name, path, errors=None):
+    """Record the result of copying a file or folder of a chunked target, and queue the
+    next chunks of its region once its chunk is finished
+
+    :return: The ArchiveChunk containing `path`, or None
+    """
+    chunk = job.update_chunk(addon_short_name, path, errors=errors)
+    if chunk and chunk.status != ARCHIVER_PENDING:
+        dispatch_archive_chunks.delay(chunk.region_id)
+    return chunk
+
 @celery_app.task(base=ArchiverTask, ignore_result=False)
 @logged('archive_node')
 def archive_node(stat_results, job_pk):
@@ -239,8 +382,15 @@ def archive_node(stat_results, job_pk):
             job.status = ARCHIVER_SUCCESS
             job.save()
         for result in stat_result.targets:
+            job.target_addons.filter(name=result['target_name']).update(size=int(result['disk_usage']))
             if not result['num_files']:
                 job.update_target(result['target_name'], ARCHIVER_SUCCESS)
+            elif archive_in_chunks(result):
+                archive_addon_chunks.delay(
+                    addon_short_name=result['target_name'],
+                    job_pk=job_pk,
+                    stat_result=result,
+                )
             else:
                 archive_addon.delay(
                     addon_short_name=result['target_name'],
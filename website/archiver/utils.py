@@ -1,4 +1,5 @@
 import functools
+import heapq
 
 from framework.auth import Auth
 
@@ -170,6 +171,58 @@ def aggregate_file_tree_metadata(addon_short_name, fileobj_metadata, user):
             targets=[aggregate_file_tree_metadata(addon_short_name, child, user) for child in fileobj_metadata.get('children', [])],
         )
 
+def split_archive_units(file_tree, chunk_size, parents=()):
+    """Split the contents of a folder into files and folders no bigger than `chunk_size`,
+    descending into bigger folders.
+
+    :param file_tree: AggregateStatResult dict of the folder
+    :param parents: Names of the folders above `file_tree`, relative to the addon root
+    :return: generator of unit dicts (see osf.models.ArchiveChunk.units), with the names of
+    their parent folders instead of a destination path
+    """
+    for child in file_tree['targets']:
+        if 'targets' in child and child['disk_usage'] > chunk_size:
+            for unit in split_archive_units(child, chunk_size, parents + (child['target_name'],)):
+                yield unit
+        else:
+            yield {
+                'path': '/' + child['target_id'],
+                'name': child['target_name'],
+                'parents': list(parents),
+                'size': int(child['disk_usage']),
+                'status': None,
+            }
+
+
+def plan_archive_chunks(stat_result, chunk_size, max_units):
+    """Distribute the file tree of an addon into chunks of roughly equal size, each with at
+    most `max_units` files and folders and, unless a single file is bigger, at most
+    `chunk_size` bytes.
+
+    :param stat_result: AggregateStatResult dict of the addon, as returned by stat_addon
+    :return: list of lists of units
+    """
+    units = []
+    for file_tree in stat_result['targets']:
+        units.extend(split_archive_units(file_tree, chunk_size))
+    units.sort(key=lambda unit: unit['size'], reverse=True)
+
+    # Add each unit to the smallest chunk, starting with the biggest units
+    chunks = []
+    heap = []
+    for unit in units:
+        if heap and heap[0][0] + unit['size'] <= chunk_size:
+            size, index = heapq.heappop(heap)
+        else:
+            size, index = 0, len(chunks)
+            chunks.append([])
+        chunks[index].append(unit)
+        # Full chunks are not considered again
+        if len(chunks[index]) < max_units:
+            heapq.heappush(heap, (size + unit['size'], index))
+    return chunks
+
+
 def before_archive(node, user):
     from osf.models import ArchiveJob
     link_archive_provider(node, user)
@@ -0,0 +1,142 @@
+"""
+Resolution of the users subscribed to an event on a node.
+
+A user's subscription on a node overrides their subscriptions on its ancestors, and users
+are only notified about nodes they can read. `get_subscribers` loads the subscriptions of
+the whole node lineage and checks read permissions of all candidates with a fixed number of
+queries, and caches the result per (node, event).
+
+Cached results are validated against two tokens: one per node tree, replaced whenever a
+subscription, permission or parent relation of a node in the tree changes, and one global
+token for changes that can not be attributed to a tree (e.g. disabled users).
+"""
+import uuid
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+
+from api.base import settings as api_settings
+from osf.utils.permission_resolver import get_node_readers
+from website import settings
+from website.notifications import constants
+from website.notifications.utils import to_subscription_key
+
+SUBSCRIBERS_KEY = 'notification_subscribers:{node_id}:{event_type}:{event}'
+TREE_TOKEN_KEY = 'notification_subscribers_tree:{root_id}'
+GLOBAL_TOKEN_KEY = 'notification_subscribers_global'
+
+
+def get_cache():
+    return caches[api_settings.NOTIFICATION_SUBSCRIBERS_CACHE_NAME]
+
+
+def _root_id(node):
+    return node.root_id or node.id
+
+
+def get_subscribers(node, event_type, event=None):
+    """Return the guids of the users subscribed to `event_type` on `node` or its ancestors,
+    by notification type. If `event` is given, subscriptions to `event` on `node` take
+    precedence over the others.
+
+    :return dict: Lists of user guids, keyed by notification type
+    """
+    cache = get_cache()
+    key = SUBSCRIBERS_KEY.format(node_id=node.id, event_type=event_type, event=event)
+    tree_key = TREE_TOKEN_KEY.format(root_id=_root_id(node))
+    cached = cache.get_many([key, tree_key, GLOBAL_TOKEN_KEY])
+    tokens = (cached.get(GLOBAL_TOKEN_KEY), cached.get(tree_key))
+    if key in cached and None not in tokens and cached[key][0] == tokens:
+        return cached[key][1]
+
+    if None in tokens:
+        cache.add(GLOBAL_TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+        cache.add(tree_key, uuid.uuid4().hex, timeout=None)
+        tokens = (cache.get(GLOBAL_TOKEN_KEY), cache.get(tree_key))
+    # Tokens are read before computing, so results computed during a change are not reused
+    subscribers = compute_subscribers(node, event_type, event)
+    cache.set(key, (tokens, subscribers), timeout=settings.NOTIFICATION_SUBSCRIBERS_CACHE_TIMEOUT)
+    return subscribers
+
+
+def compute_subscribers(node, event_type, event=None):
+    """Uncached version of `get_subscribers`."""
+    AbstractNode = apps.get_model('osf.AbstractNode')
+    Guid = apps.get_model('osf.Guid')
+    NodeClosure = apps.get_model('osf.NodeClosure')
+    NotificationSubscription = apps.get_model('osf.NotificationSubscription')
+
+    # Node ids from the top level project down to `node`
+    lineage = list(NodeClosure.objects.filter(
+        descendant_id=node.id,
+    ).order_by('-depth').values_list('ancestor_id', flat=True)) + [node.id]
+    guids = dict(Guid.objects.filter(
+        content_type=ContentType.objects.get_for_model(AbstractNode),
+        object_id__in=lineage,
+    ).order_by('created').values_list('object_id', '_id'))
+
+    # Subscriptions in order of increasing precedence
+    levels = [(node_id, to_subscription_key(guids[node_id], event_type)) for node_id in lineage if node_id in guids]
+    if event and node.id in guids:
+        levels.append((node.id, to_subscription_key(guids[node.id], event)))
+
+    subscribed = {}
+    for notification_type in constants.NOTIFICATION_TYPES:
+        through = getattr(NotificationSubscription, notification_type).through
+        rows = through.objects.filter(
+            notificationsubscription___id__in=[subscription_key for _, subscription_key in levels],
+            osfuser__date_disabled__isnull=True,
+        ).values_list('notificationsubscription___id', 'osfuser_id')
+        for subscription_key, user_id in rows:
+            subscribed.setdefault(subscription_key, {}).setdefault(notification_type, set()).add(user_id)
+
+    user_ids = set()
+    for by_type in subscribed.values():
+        for users in by_type.values():
+            user_ids |= users
+    readers = get_node_readers(lineage, user_ids)
+
+    result = {notification_type: set() for notification_type in constants.NOTIFICATION_TYPES}
+    for node_id, subscription_key in levels:
+        level = {
+            notification_type: set(
+                user_id for user_id in subscribed.get(subscription_key, {}).get(notification_type, ())
+                if (node_id, user_id) in readers
+            )
+            for notification_type in constants.NOTIFICATION_TYPES
+        }
+        for notification_type in result:
+            overridden = set()
+            for other_type, users in level.items():
+                if other_type != notification_type:
+                    overridden |= users
+            result[notification_type] = (result[notification_type] | level[notification_type]) - overridden
+
+    user_guids = dict(Guid.objects.filter(
+        content_type=ContentType.objects.get_for_model(apps.get_model('osf.OSFUser')),
+        object_id__in=set().union(*result.values()),
+    ).order_by('created').values_list('object_id', '_id'))
+    return {
+        notification_type: [
+            user_guids[user_id] for user_id in sorted(users)
+            if (node.id, user_id) in readers and user_id in user_guids
+        ]
+        for notification_type, users in result.items()
+    }
+
+
+def invalidate_subscribers(node_ids):
+    """Drop the cached subscribers of all nodes in the trees of the nodes with `node_ids`."""
+    AbstractNode = apps.get_model('osf.AbstractNode')
+    root_ids = set()
+    for node_id, root_id in AbstractNode.objects.filter(id__in=set(node_ids)).values_list('id', 'root_id'):
+        root_ids.update([node_id, root_id or node_id])
+    if root_ids:
+        get_cache().set_many({
+            TREE_TOKEN_KEY.format(root_id=root_id): uuid.uuid4().hex for root_id in root_ids
+        }, timeout=None)
+
+
+def invalidate_all_subscribers():
+    get_cache().set(GLOBAL_TOKEN_KEY, uuid.uuid4().hex, timeout=None)
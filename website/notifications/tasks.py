@@ -3,11 +3,12 @@ Tasks for making even transactional emails consolidated.
 """
 import itertools
 
-from django.db import connection
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
 
 from framework.celery_tasks import app as celery_app
 from framework.sentry import log_exception
-from osf.models import OSFUser, AbstractNode, AbstractProvider
+from osf.models import OSFUser, AbstractNode, AbstractProvider, Guid
 from osf.models import NotificationDigest
 from osf.utils.permissions import ADMIN
 from website import mails, settings
@@ -27,33 +28,108 @@ def send_users_email(send_type):
 
 def _send_global_and_node_emails(send_type):
     """
-    Called by `send_users_email`. Send all global and node-related notification emails.
+    Called by `send_users_email`. Stream the users with pending global and node-related
+    notifications and send their emails in chunks of `NOTIFICATION_DIGEST_CHUNK_SIZE` users,
+    each processed by a separate `send_users_digest_chunk` task.
     """
-    grouped_emails = get_users_emails(send_type)
-    for group in grouped_emails:
-        user = OSFUser.load(group['user_id'])
+    user_ids = NotificationDigest.objects.filter(
+        send_type=send_type,
+    ).exclude(
+        event='new_pending_submissions',
+    ).order_by('user_id').values_list('user_id', flat=True).distinct().iterator()
+
+    while True:
+        chunk = list(itertools.islice(user_ids, settings.NOTIFICATION_DIGEST_CHUNK_SIZE))
+        if not chunk:
+            break
+        send_users_digest_chunk.delay(send_type, chunk)
+
+
+@celery_app.task(name='website.notifications.tasks.send_users_digest_chunk', max_retries=0)
+def send_users_digest_chunk(send_type, user_ids):
+    """Send the global and node-related notification emails of the users with ids `user_ids`.
+
+    The digests of each user are locked, sent and removed in a transaction of their own, so
+    they are not sent twice by overlapping runs, are only removed once their email was
+    delivered, and stay removed if the chunk fails for a later user.
+    """
+    digest_ids = list(NotificationDigest.objects.filter(
+        user_id__in=user_ids,
+        send_type=send_type,
+    ).exclude(
+        event='new_pending_submissions',
+    ).values_list('id', flat=True))
+    if not digest_ids:
+        return
+
+    groups = list(get_users_emails(send_type, digest_ids=digest_ids))
+    users = _load_by_guid(OSFUser, [group['user_id'] for group in groups])
+    sorted_messages = {group['user_id']: group_by_node(group['info']) for group in groups}
+    # If there's only one node in digest we can show it's preferences link in the template.
+    nodes = _load_by_guid(AbstractNode, [
+        messages['children'].keys()[0]
+        for messages in sorted_messages.values()
+        if len(messages['children']) == 1
+    ])
+
+    for group in groups:
+        user = users.get(group['user_id'])
         if not user:
             log_exception()
             continue
-        info = group['info']
-        notification_ids = [message['_id'] for message in info]
-        sorted_messages = group_by_node(info)
-        if sorted_messages:
-            if not user.is_disabled:
-                # If there's only one node in digest we can show it's preferences link in the template.
-                notification_nodes = sorted_messages['children'].keys()
-                node = AbstractNode.load(notification_nodes[0]) if len(
-                    notification_nodes) == 1 else None
-                mails.send_mail(
-                    to_addr=user.username,
-                    mimetype='html',
-                    can_change_node_preferences=bool(node),
-                    node=node,
-                    mail=mails.DIGEST,
-                    name=user.fullname,
-                    message=sorted_messages,
-                )
-            remove_notifications(email_notification_ids=notification_ids)
+        try:
+            with transaction.atomic():
+                _send_user_digest(user, group['info'], sorted_messages[group['user_id']], nodes)
+        except Exception:
+            # Keep the digests, so they are sent by the next run
+            log_exception()
+
+
+def _send_user_digest(user, info, messages, nodes):
+    """Send the digest email of `user` and remove its digests, unless an overlapping run holds
+    them or the email was not delivered. Must be called in a transaction.
+    """
+    notification_ids = [message['_id'] for message in info]
+    locked = NotificationDigest.objects.select_for_update(skip_locked=True).filter(
+        _id__in=notification_ids,
+    ).values_list('_id', flat=True)
+    if len(locked) != len(notification_ids):
+        # Being sent by an overlapping run, or already sent
+        return
+    if messages and not user.is_disabled:
+        notification_nodes = messages['children'].keys()
+        node = nodes.get(notification_nodes[0]) if len(notification_nodes) == 1 else None
+        sent = mails.send_mail(
+            to_addr=user.username,
+            mimetype='html',
+            celery=False,
+            can_change_node_preferences=bool(node),
+            node=node,
+            mail=mails.DIGEST,
+            name=user.fullname,
+            message=messages,
+        )
+        # The SendGrid API reports failures by returning False
+        if sent is False:
+            return
+    remove_notifications(email_notification_ids=notification_ids)
+
+
+def _load_by_guid(model, guids):
+    """Load the objects of `model` with the given guids in bulk.
+
+    :return dict: Objects by guid; guids of missing objects are left out
+    """
+    if not guids:
+        return {}
+    object_ids = dict(Guid.objects.filter(
+        _id__in=guids,
+        content_type=ContentType.objects.get_for_model(model),
+    ).values_list('object_id', '_id'))
+    return {
+        object_ids[pk]: obj
+        for pk, obj in model.objects.in_bulk(object_ids.keys()).items()
+    }
 
 
 def _send_reviews_moderator_emails(send_type):
@@ -121,11 +197,12 @@ def get_moderators_emails(send_type):
         return itertools.chain.from_iterable(cursor.fetchall())
 
 
-def get_users_emails(send_type):
+def get_users_emails(send_type, digest_ids=None):
     """Get all emails that need to be sent.
     NOTE: These do not include reviews triggered emails for moderators.
 
     :param send_type: from NOTIFICATION_TYPES
+    :param digest_ids: If given, only include the NotificationDigests with these primary keys
     :return: Iterable of dicts of the form:
         {
             'user_id': 'se8ea',
@@ -159,12 +236,19 @@ def get_users_emails(send_type):
       LEFT JOIN osf_guid ON nd.user_id = osf_guid.object_id
     WHERE send_type = %s AND event != 'new_pending_submissions'
     AND osf_guid.content_type_id = (SELECT id FROM django_content_type WHERE model = 'osfuser')
+    {}
     GROUP BY osf_guid.id
     ORDER BY osf_guid.id ASC
     """
+    params = [send_type]
+    if digest_ids is None:
+        sql = sql.format('')
+    else:
+        sql = sql.format('AND nd.id = ANY(%s)')
+        params.append(list(digest_ids))
 
     with connection.cursor() as cursor:
-        cursor.execute(sql, [send_type, ])
+        cursor.execute(sql, params)
         return itertools.chain.from_iterable(cursor.fetchall())
 
 
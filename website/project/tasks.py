@@ -3,6 +3,8 @@ import logging
 import urlparse
 import random
 import requests
+from django.db import transaction
+from django.utils import timezone
 
 from framework.celery_tasks import app as celery_app
 
@@ -179,3 +181,50 @@ def send_desk_share_error(node, resp, retries):
         retries=retries,
         can_change_preferences=False,
     )
+
+
+@celery_app.task(ignore_results=True)
+def release_expired_quota_reservations():
+    from website.util import quota
+    quota.release_expired_reservations()
+
+
+@celery_app.task(ignore_results=True, acks_late=True, reject_on_worker_lost=True)
+def copy_node_logs(log_copy_id):
+    """Copy the logs of a NodeLogCopy in batches. Each batch is copied and recorded in a
+    transaction of its own, so an interrupted copy resumes after the last batch.
+    """
+    from osf.utils import node_copy
+    NodeLogCopy = apps.get_model('osf.NodeLogCopy')
+
+    while True:
+        with transaction.atomic():
+            # Locked, so overlapping runs do not copy the same batch
+            log_copy = NodeLogCopy.objects.select_for_update().get(id=log_copy_id)
+            if log_copy.done:
+                return
+            copied, last_log_id = node_copy.copy_logs_batch(
+                log_copy.source_id,
+                log_copy.destination_id,
+                after=log_copy.last_log_id,
+                until=log_copy.max_log_id,
+                limit=settings.NODE_LOG_COPY_BATCH_SIZE,
+            )
+            if last_log_id is None:
+                log_copy.done = True
+            else:
+                log_copy.last_log_id = last_log_id
+                log_copy.copied += copied
+            log_copy.save()
+        logger.info('Copied {} of {} logs of node {}'.format(log_copy.copied, log_copy.total, log_copy.source_id))
+
+
+@celery_app.task(ignore_results=True)
+def resume_node_log_copies():
+    """Resume the log copies without progress for `NODE_LOG_COPY_RESUME_AFTER`, e.g. those
+    whose task was lost.
+    """
+    NodeLogCopy = apps.get_model('osf.NodeLogCopy')
+    stale = timezone.now() - settings.NODE_LOG_COPY_RESUME_AFTER
+    for log_copy_id in NodeLogCopy.objects.filter(done=False, modified__lt=stale).values_list('id', flat=True):
+        copy_node_logs.delay(log_copy_id)
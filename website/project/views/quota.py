@@ -1,4 +1,7 @@
+import httplib as http
+
 from framework.auth.decorators import must_be_signed
+from framework.exceptions import HTTPError
 from osf.models import AbstractNode
 from website.project.decorators import must_be_contributor_or_public
 from website.util import quota
@@ -9,6 +12,30 @@ from api.base import settings as api_settings
 def waterbutler_creator_quota(pid, **kwargs):
     return get_quota_from_pid(pid)
 
+@must_be_signed
+def waterbutler_reserve_quota(pid, payload, **kwargs):
+    """Reserve storage for an upload of `payload['size']` bytes before it starts. WaterButler
+    passes the reservation on to the upload callback, or releases it if the upload fails.
+    """
+    try:
+        size = int(payload['size'])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPError(http.BAD_REQUEST)
+    if size < 0:
+        raise HTTPError(http.BAD_REQUEST)
+    reservation = quota.reserve_quota(AbstractNode.load(pid), size)
+    if reservation is None:
+        raise HTTPError(http.INSUFFICIENT_STORAGE)
+    return {
+        'reservation': reservation._id,
+        'expires': reservation.expires.isoformat(),
+    }, http.CREATED
+
+@must_be_signed
+def waterbutler_release_quota(pid, payload, **kwargs):
+    quota.release_reservation(payload.get('reservation'))
+    return {'status': 'success'}
+
 @must_be_contributor_or_public
 def get_creator_quota(pid, **kwargs):
     return get_quota_from_pid(pid)
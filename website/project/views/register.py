@@ -10,7 +10,7 @@ from framework.flask import redirect  # VOL-aware redirect
 
 from framework.auth.decorators import must_be_signed
 
-from website.archiver import ARCHIVER_SUCCESS, ARCHIVER_FAILURE
+from website.archiver import ARCHIVER_SUCCESS, ARCHIVER_FAILURE, ARCHIVER_PENDING
 
 from addons.base.views import DOWNLOAD_ACTIONS
 from website import settings
@@ -246,9 +246,19 @@ def get_referent_by_identifier(category, value):
 def registration_callbacks(node, payload, *args, **kwargs):
     if payload.get('action', None) in DOWNLOAD_ACTIONS:
         return {'status': 'success'}
+    if payload.get('action', None) == 'create_folder':
+        # Folders of addons archived in chunks
+        return {'status': 'success'}
     errors = payload.get('errors')
     src_provider = payload['source']['provider']
-    if errors:
+    target = node.archive_job.get_target(src_provider)
+    if target and target.chunked:
+        from website.archiver import tasks
+        chunk = tasks.finish_archive_unit(node.archive_job, src_provider, payload['source']['path'], errors=errors)
+        if chunk is None or chunk.status == ARCHIVER_PENDING:
+            # The target did not change
+            return
+    elif errors:
         node.archive_job.update_target(
             src_provider,
             ARCHIVER_FAILURE,
@@ -1939,6 +1939,22 @@ def make_url_map(app):
             project_views.quota.waterbutler_creator_quota,
             json_renderer,
         ),
+        Rule(
+            [  # For waterbutler
+                '/project/<pid>/creator_quota/reservations/',
+            ],
+            ['post'],
+            project_views.quota.waterbutler_reserve_quota,
+            json_renderer,
+        ),
+        Rule(
+            [  # For waterbutler
+                '/project/<pid>/creator_quota/reservations/',
+            ],
+            ['delete'],
+            project_views.quota.waterbutler_release_quota,
+            json_renderer,
+        ),
         Rule(
             [  # For user (browser)
                 '/project/<pid>/get_creator_quota/',
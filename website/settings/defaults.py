@@ -44,6 +44,9 @@ EXPIRATION_TIME_DICT = {
 }
 
 CITATION_STYLES_PATH = os.path.join(BASE_PATH, 'static', 'vendor', 'bower_components', 'styles')
+# Parsed CSL styles kept in memory by each process, see api.citations.utils
+CITATION_STYLE_CACHE_SIZE = 32
+CITATION_CACHE_TIMEOUT = 60 * 60 * 24
 
 # Minimum seconds between forgot password email attempts
 SEND_EMAIL_THROTTLE = 30
@@ -126,6 +129,15 @@ OSF_SESSION_TIMEOUT = 30 * 24 * 60 * 60  # 30 days in seconds
 SECRET_KEY = 'CHANGEME'
 SESSION_COOKIE_SECURE = SECURE_MODE
 SESSION_COOKIE_HTTPONLY = True
+# Seconds sessions are cached in front of the database, see framework.sessions.store
+SESSION_CACHE_TIMEOUT = 60
+# Seconds verified Basic auth credentials and access tokens are remembered, see
+# framework.sessions.store
+CREDENTIALS_CACHE_TIMEOUT = 60
+# Lifetime of the credentials of background requests to WaterButler made on behalf of a user,
+# and how many each process keeps for reuse, see osf.models.service_credential
+SERVICE_CREDENTIAL_LIFETIME = timedelta(hours=6)
+SERVICE_CREDENTIAL_CACHE_SIZE = 1000
 
 # local path to private key and cert for local development using https, overwrite in local.py
 OSF_SERVER_KEY = None
@@ -162,6 +174,26 @@ MAIL_SERVER = 'smtp.sendgrid.net'
 MAIL_PORT = 0
 MAIL_USERNAME = 'osf-smtp'
 MAIL_PASSWORD = ''  # Set this in local.py
+# Authenticated SMTP connections kept open per worker process
+MAIL_POOL_SIZE = 4
+# Seconds after which an idle pooled connection is replaced rather than reused
+MAIL_CONNECTION_MAX_IDLE = 60
+# Messages sent over one connection before it is replaced
+MAIL_CONNECTION_MAX_MESSAGES = 100
+# Messages sent per connection checkout by framework.email.tasks.send_emails
+MAIL_BATCH_SIZE = 50
+# Users whose pending notification digests are sent by one website.notifications.tasks.send_users_digest_chunk task
+NOTIFICATION_DIGEST_CHUNK_SIZE = 100
+# Seconds the subscribers of a node event are cached, see website.notifications.subscriptions
+NOTIFICATION_SUBSCRIBERS_CACHE_TIMEOUT = 60 * 60 * 24
+# Users sent an announcement email by one admin.rdm_announcement.tasks.send_announcement_chunk task
+ANNOUNCEMENT_EMAIL_CHUNK_SIZE = 1000
+# Bcc recipients per announcement email, below the recipient limit of the SMTP server
+ANNOUNCEMENT_EMAIL_RECIPIENTS_PER_MESSAGE = 100
+# Devices sent a push notification by one task, at most the FCM limit of 1000 per request
+ANNOUNCEMENT_PUSH_CHUNK_SIZE = 1000
+# Seconds after which a chunk claimed by a lost worker is sent again, longer than sending a chunk takes
+ANNOUNCEMENT_CHUNK_CLAIM_TIMEOUT = 60 * 30
 
 # OR, if using Sendgrid's API
 # WARNING: If `SENDGRID_WHITELIST_MODE` is True,
@@ -239,6 +271,10 @@ WIKI_WHITELIST = {
         'list-style',
     ]
 }
+# Rendered wiki versions are cached per renderer version; increase it when the rendering of
+# wiki pages changes
+WIKI_RENDERER_VERSION = 1
+WIKI_RENDER_CACHE_TIMEOUT = 60 * 60 * 24 * 30
 
 # Maps category identifier => Human-readable representation for use in
 # titles, menus, etc.
@@ -318,10 +354,25 @@ GROUP_CONNECTED_EMAIL_THROTTLE = 24 * 3600
 GOOGLE_ANALYTICS_ID = None
 GOOGLE_SITE_VERIFICATION = None
 
+# Buffered page view and download increments added to the counters per transaction by
+# framework.analytics.flush_page_counters
+PAGE_COUNTER_FLUSH_BATCH_SIZE = 10000
+
 DEFAULT_HMAC_SECRET = 'changeme'
 DEFAULT_HMAC_ALGORITHM = hashlib.sha256
 WATERBUTLER_URL = 'http://localhost:7777'
 WATERBUTLER_INTERNAL_URL = WATERBUTLER_URL
+# Connections to WaterButler kept alive per process, see website.util.waterbutler
+WATERBUTLER_POOL_SIZE = 10
+# (connect, read) timeouts of requests to WaterButler, in seconds
+WATERBUTLER_TIMEOUT = (10, 300)
+# Retries of requests to WaterButler that could not connect or got a gateway error
+WATERBUTLER_MAX_RETRIES = 3
+WATERBUTLER_RETRY_BACKOFF = 0.5
+# Requests sent to WaterButler at a time when listing many folders
+WATERBUTLER_CONCURRENCY = 4
+# Bytes read at a time when downloading files from WaterButler
+WATERBUTLER_CHUNK_SIZE = 64 * 1024
 
 ####################
 #   Identifiers   #
@@ -372,6 +423,22 @@ ARCHIVE_TIMEOUT_TIMEDELTA = timedelta(1)  # 24 hours
 
 ENABLE_ARCHIVER = True
 
+# Addons with more bytes than this are archived in chunks of at most this size, copied in
+# parallel. None archives each addon with a single copy.
+ARCHIVE_CHUNK_SIZE = None
+# Largest number of files and folders copied separately per chunk
+ARCHIVE_CHUNK_MAX_UNITS = 500
+# Largest number of chunks copied at once per storage region
+ARCHIVE_CHUNK_CONCURRENCY = 4
+ARCHIVE_CHUNK_MAX_ATTEMPTS = 3
+
+# Forks and registrations of nodes with more logs than this copy the logs in the background
+NODE_LOG_COPY_INLINE_MAX = 10000
+# Logs copied per transaction by website.project.tasks.copy_node_logs
+NODE_LOG_COPY_BATCH_SIZE = 10000
+# Background log copies without progress for this long are resumed
+NODE_LOG_COPY_RESUME_AFTER = timedelta(minutes=30)
+
 JWT_SECRET = 'changeme'
 JWT_ALGORITHM = 'HS256'
 
@@ -470,6 +537,7 @@ class CeleryConfig:
     imports = (
         'framework.celery_tasks',
         'framework.email.tasks',
+        'framework.analytics',
         'osf.external.tasks',
         'website.mailchimp_utils',
         'website.notifications.tasks',
@@ -493,6 +561,8 @@ class CeleryConfig:
         'scripts.premigrate_created_modified',
         'scripts.add_missing_identifiers_to_preprints',
         'nii.mapcore_refresh_tokens',
+        'api.caching.tasks',
+        'admin.rdm_announcement.tasks',
     )
 
     # Modules that need metrics and release requirements
@@ -567,6 +637,18 @@ class CeleryConfig:
                 'schedule': crontab(minute=0, hour=5),  # Daily 12 a.m
                 'kwargs': {'dry_run': False},
             },
+            'flush_page_counters': {
+                'task': 'framework.analytics.flush_page_counters',
+                'schedule': crontab(minute='*'),
+            },
+            'release_expired_quota_reservations': {
+                'task': 'website.project.tasks.release_expired_quota_reservations',
+                'schedule': crontab(minute='*/5'),
+            },
+            'resume_node_log_copies': {
+                'task': 'website.project.tasks.resume_node_log_copies',
+                'schedule': crontab(minute='*/10'),
+            },
             'send_queued_mails': {
                 'task': 'scripts.send_queued_mails',
                 'schedule': crontab(minute=0, hour=17),  # Daily 12 p.m.
@@ -606,6 +688,10 @@ class CeleryConfig:
                 #'schedule': crontab(minute='*/1'), # for DEBUG
                 'kwargs': {'dry_run': False},
             },
+            'reconcile_storage_usage': {
+                'task': 'api.caching.tasks.reconcile_storage_usage',
+                'schedule': crontab(minute='*/10'),
+            },
         }
 
         # Tasks that need metrics and release requirements
@@ -1856,6 +1942,8 @@ SITEMAP_TO_S3 = False
 SITEMAP_AWS_BUCKET = None
 SITEMAP_URL_MAX = 25000
 SITEMAP_INDEX_MAX = 50000
+# Threads building sitemap shards at the same time
+SITEMAP_CONCURRENCY = 4
 SITEMAP_STATIC_URLS = [
     OrderedDict([('loc', ''), ('changefreq', 'yearly'), ('priority', '0.5')]),
     OrderedDict([('loc', 'preprints'), ('changefreq', 'yearly'), ('priority', '0.5')]),
@@ -34,7 +34,11 @@
                         <span class="label label-info"><strong>Pending embargo</strong></span> |
                     % endif
                     % if summary['archiving']:
-                        <span class="label label-primary"><strong>Archiving</strong></span> |
+                        <span class="label label-primary"><strong>Archiving</strong>
+                        % if summary.get('archive_progress'):
+                            ${summary['archive_progress']['archived']} / ${summary['archive_progress']['size']}
+                        % endif
+                        </span> |
                     % endif
                 </span>
             <span data-bind='getIcon: ${ summary["category"] | sjson, n }'></span>
@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
+import datetime
 import logging
 
 from addons.base import signals as file_signals
 from addons.osfstorage.models import OsfStorageFileNode, Region
 from api.base import settings as api_settings
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.db.models import BigIntegerField, F, Sum
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
 from osf.models import (
     AbstractNode, BaseFileNode, FileLog, FileInfo, Guid, OSFUser, UserQuota,
-    ProjectStorageType
+    ProjectStorageType, QuotaReservation
 )
 # import inspect
 logger = logging.getLogger(__name__)
@@ -54,6 +57,58 @@ def get_quota_info(user, storage_type=UserQuota.NII_STORAGE):
     except UserQuota.DoesNotExist:
         return (api_settings.DEFAULT_MAX_QUOTA, used_quota(user._id, storage_type))
 
+def get_or_create_user_quota(user, storage_type=UserQuota.NII_STORAGE):
+    try:
+        return user.userquota_set.get(storage_type=storage_type)
+    except UserQuota.DoesNotExist:
+        return UserQuota.objects.create(
+            user=user,
+            storage_type=storage_type,
+            max_quota=api_settings.DEFAULT_MAX_QUOTA,
+            used=used_quota(user._id, storage_type),
+        )
+
+def reserve_quota(node, size):
+    """Reserve `size` bytes of the quota of the creator of `node` for an upload, if the
+    quota allows it. The check and the reservation are a single update of the UserQuota,
+    so concurrent uploads can not exceed the quota together.
+
+    :return: QuotaReservation, or None if the quota would be exceeded
+    """
+    user_quota = get_or_create_user_quota(node.creator, get_project_storage_type(node))
+    with transaction.atomic():
+        reserved = UserQuota.objects.filter(
+            id=user_quota.id,
+            used__lte=Cast('max_quota', BigIntegerField()) * api_settings.SIZE_UNIT_GB - F('reserved') - size,
+        ).update(reserved=F('reserved') + size)
+        if not reserved:
+            return None
+        return QuotaReservation.objects.create(
+            user_quota=user_quota,
+            size=size,
+            expires=timezone.now() + datetime.timedelta(seconds=api_settings.QUOTA_RESERVATION_TTL),
+        )
+
+def release_reservation(reservation_id):
+    """Return the storage held by the QuotaReservation with `_id` `reservation_id` to its
+    quota. Does nothing if it was already released.
+    """
+    if not reservation_id:
+        return
+    with transaction.atomic():
+        reservation = QuotaReservation.objects.select_for_update().filter(_id=reservation_id).first()
+        if reservation is None:
+            return
+        UserQuota.objects.filter(id=reservation.user_quota_id).update(
+            reserved=Greatest(F('reserved') - reservation.size, 0)
+        )
+        reservation.delete()
+
+def release_expired_reservations():
+    expired = QuotaReservation.objects.filter(expires__lt=timezone.now()).values_list('_id', flat=True)
+    for reservation_id in expired.iterator():
+        release_reservation(reservation_id)
+
 def get_project_storage_type(node):
     try:
         return ProjectStorageType.objects.get(node=node).storage_type
@@ -62,6 +117,12 @@ def get_project_storage_type(node):
 
 @file_signals.file_updated.connect
 def update_used_quota(self, target, user, event_type, payload):
+    with transaction.atomic():
+        _update_used_quota(target, user, event_type, payload)
+        # Uploads are charged once logged, so their storage is no longer held
+        release_reservation(payload.get('reservation'))
+
+def _update_used_quota(target, user, event_type, payload):
     if payload.get('provider') != 'osfstorage':
         return
     try:
@@ -87,14 +148,11 @@ def file_added(target, payload, file_node, storage_type):
     file_size = int(payload['metadata']['size'])
     if file_size < 0:
         return
-    try:
-        user_quota = UserQuota.objects.get(
-            user=target.creator,
-            storage_type=storage_type
-        )
-        user_quota.used += file_size
-        user_quota.save()
-    except UserQuota.DoesNotExist:
+    updated = UserQuota.objects.filter(
+        user=target.creator,
+        storage_type=storage_type
+    ).update(used=F('used') + file_size)
+    if not updated:
         UserQuota.objects.create(
             user=target.creator,
             storage_type=storage_type,
@@ -141,10 +199,9 @@ def file_modified(target, user, payload, file_node, storage_type):
     except FileInfo.DoesNotExist:
         file_info = FileInfo(file=file_node, file_size=0)
 
-    user_quota.used += file_size - file_info.file_size
-    if user_quota.used < 0:
-        user_quota.used = 0
-    user_quota.save()
+    UserQuota.objects.filter(id=user_quota.id).update(
+        used=Greatest(F('used') + (file_size - file_info.file_size), 0)
+    )
 
     file_info.file_size = file_size
     file_info.save()
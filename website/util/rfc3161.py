@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+"""
+RFC 3161 timestamp queries and responses, built and verified in process.
+
+`build_request` makes the query `openssl ts -query -cert` makes, and `verify_response` runs the
+checks of `openssl ts -verify -CAfile`: the response was granted, the token is signed by the
+certificate it names in its ESS signing certificate attribute, that certificate is a timestamping
+certificate chaining up to one of the trusted CA certificates through CA certificates allowed to
+issue it, and the message imprint of the token matches the digest. Trusted CA files are parsed
+once per process.
+
+Only the subset of DER needed for timestamp tokens is decoded here; signatures and certificates
+are checked with `cryptography`.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import os
+import re
+import struct
+import threading
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, ExtensionOID
+
+HASH_ALGORITHMS = {
+    'sha1': '1.3.14.3.2.26',
+    'sha256': '2.16.840.1.101.3.4.2.1',
+    'sha384': '2.16.840.1.101.3.4.2.2',
+    'sha512': '2.16.840.1.101.3.4.2.3',
+}
+HASH_NAMES = {oid: name for name, oid in HASH_ALGORITHMS.items()}
+
+OID_SIGNED_DATA = '1.2.840.113549.1.7.2'
+OID_TST_INFO = '1.2.840.113549.1.9.16.1.4'
+OID_CONTENT_TYPE = '1.2.840.113549.1.9.3'
+OID_MESSAGE_DIGEST = '1.2.840.113549.1.9.4'
+OID_SIGNING_CERTIFICATE = '1.2.840.113549.1.9.16.2.12'
+OID_SIGNING_CERTIFICATE_V2 = '1.2.840.113549.1.9.16.2.47'
+
+# PKIStatus of granted and grantedWithMods responses
+GRANTED = (0, 1)
+# Depth of certificate chains, like the default of openssl
+MAX_CHAIN_LENGTH = 100
+
+SEQUENCE = 0x30
+SET = 0x31
+INTEGER = 0x02
+BOOLEAN = 0x01
+OCTET_STRING = 0x04
+NULL = 0x05
+OID = 0x06
+GENERALIZED_TIME = 0x18
+CONTEXT_0 = 0xa0
+CONTEXT_0_IMPLICIT = 0x80
+CONTEXT_1 = 0xa1
+
+PEM_CERTIFICATE = re.compile(
+    br'-----BEGIN CERTIFICATE-----(.+?)-----END CERTIFICATE-----', re.DOTALL,
+)
+
+_trusted = {}
+_trusted_lock = threading.Lock()
+
+
+class TimestampError(Exception):
+    """Raised when a timestamp query cannot be built, or a timestamp response does not verify."""
+    pass
+
+
+class Element(object):
+    """A decoded DER element: its tag, and the offsets of its header and contents in `data`."""
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+        if offset + 2 > len(data):
+            raise TimestampError('Truncated DER element')
+        self.tag = data[offset]
+        if self.tag & 0x1f == 0x1f:
+            raise TimestampError('Unsupported DER tag')
+        length = data[offset + 1]
+        start = offset + 2
+        if length & 0x80:
+            size = length & 0x7f
+            if not 0 < size <= 4:
+                raise TimestampError('Unsupported DER length')
+            length = 0
+            for byte in data[start:start + size]:
+                length = (length << 8) | byte
+            start += size
+        self.start = start
+        self.end = start + length
+        if self.end > len(data):
+            raise TimestampError('Truncated DER element')
+
+    @property
+    def contents(self):
+        return bytes(self.data[self.start:self.end])
+
+    @property
+    def der(self):
+        return bytes(self.data[self.offset:self.end])
+
+    @property
+    def children(self):
+        children = []
+        offset = self.start
+        while offset < self.end:
+            child = Element(self.data, offset)
+            children.append(child)
+            offset = child.end
+        return children
+
+    def expect(self, tag):
+        if self.tag != tag:
+            raise TimestampError('Unexpected DER tag {:#x}, expected {:#x}'.format(self.tag, tag))
+        return self
+
+    def as_int(self):
+        return decode_int(self.expect(INTEGER).contents)
+
+    def as_oid(self):
+        return decode_oid(self.expect(OID).contents)
+
+
+def decode(der):
+    """Decode the DER element that makes up all of `der`."""
+    element = Element(bytearray(der))
+    if element.end != len(element.data):
+        raise TimestampError('Trailing data after DER element')
+    return element
+
+
+def decode_int(contents):
+    value = int(binascii.hexlify(contents), 16) if contents else 0
+    if contents and bytearray(contents)[0] & 0x80:
+        value -= 1 << (8 * len(contents))
+    return value
+
+
+def decode_oid(contents):
+    values = []
+    value = 0
+    for byte in bytearray(contents):
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            values.append(value)
+            value = 0
+    if not values:
+        raise TimestampError('Empty object identifier')
+    first = min(values[0] // 40, 2)
+    return '.'.join(str(value) for value in [first, values[0] - 40 * first] + values[1:])
+
+
+def encode(tag, contents):
+    length = len(contents)
+    if length < 0x80:
+        header = struct.pack('BB', tag, length)
+    else:
+        size = bytearray()
+        while length:
+            size.insert(0, length & 0xff)
+            length >>= 8
+        header = struct.pack('BB', tag, 0x80 | len(size)) + bytes(size)
+    return header + contents
+
+
+def encode_int(value):
+    contents = bytearray()
+    while True:
+        contents.insert(0, value & 0xff)
+        value >>= 8
+        if not value and not contents[0] & 0x80:
+            break
+    return encode(INTEGER, bytes(contents))
+
+
+def encode_oid(oid):
+    values = [int(value) for value in oid.split('.')]
+    contents = bytearray()
+    for value in [40 * values[0] + values[1]] + values[2:]:
+        chunk = bytearray([value & 0x7f])
+        value >>= 7
+        while value:
+            chunk.insert(0, 0x80 | (value & 0x7f))
+            value >>= 7
+        contents += chunk
+    return encode(OID, bytes(contents))
+
+
+def algorithm_identifier(hash_name):
+    if hash_name not in HASH_ALGORITHMS:
+        raise TimestampError('Unsupported hash algorithm: {}'.format(hash_name))
+    return encode(SEQUENCE, encode_oid(HASH_ALGORITHMS[hash_name]) + encode(NULL, b''))
+
+
+def digest_file(path, hash_name, chunk_size=1024 * 1024):
+    """Return the hex digest of the file at `path`, read in chunks."""
+    digest = hashlib.new(hash_name)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    except (IOError, OSError) as e:
+        raise TimestampError('Cannot read data file: {}'.format(e.strerror))
+    return digest.hexdigest()
+
+
+def build_request(digest, hash_name, cert_req=True, nonce=None):
+    """Return the DER TimeStampReq of the hex `digest`, with a random 64 bit nonce like openssl.
+
+    :raises TimestampError: If the digest does not match the hash algorithm
+    """
+    try:
+        hashed_message = binascii.unhexlify(digest)
+    except (TypeError, ValueError):
+        raise TimestampError('Invalid digest: {}'.format(digest))
+    if len(hashed_message) != hashlib.new(hash_name).digest_size:
+        raise TimestampError('Invalid {} digest length: {}'.format(hash_name, len(hashed_message)))
+    if nonce is None:
+        nonce = int(binascii.hexlify(os.urandom(8)), 16)
+    message_imprint = encode(SEQUENCE, algorithm_identifier(hash_name) + encode(OCTET_STRING, hashed_message))
+    contents = encode_int(1) + message_imprint + encode_int(nonce)
+    if cert_req:
+        contents += encode(BOOLEAN, b'\xff')
+    return encode(SEQUENCE, contents)
+
+
+class TimestampToken(object):
+    """The parts of a TimeStampToken (CMS SignedData of a TSTInfo) that are verified."""
+
+    def __init__(self, der):
+        content_info = decode(der).expect(SEQUENCE).children
+        if content_info[0].as_oid() != OID_SIGNED_DATA:
+            raise TimestampError('Timestamp token is not signed data')
+        signed_data = content_info[1].expect(CONTEXT_0).children[0].expect(SEQUENCE).children
+        encap_content_info = signed_data[2].expect(SEQUENCE).children
+        if encap_content_info[0].as_oid() != OID_TST_INFO:
+            raise TimestampError('Timestamp token does not contain a TSTInfo')
+        self.tst_info_der = encap_content_info[1].expect(CONTEXT_0).children[0].expect(OCTET_STRING).contents
+
+        self.certificates = []
+        for element in signed_data[3:-1]:
+            if element.tag == CONTEXT_0:
+                self.certificates = [child.der for child in element.children if child.tag == SEQUENCE]
+        signer_infos = signed_data[-1].expect(SET).children
+        if len(signer_infos) != 1:
+            raise TimestampError('Timestamp token must have exactly one signer')
+        self._parse_signer_info(signer_infos[0].expect(SEQUENCE).children)
+        self._parse_tst_info(decode(self.tst_info_der).expect(SEQUENCE).children)
+
+    def _parse_signer_info(self, signer_info):
+        sid = signer_info[1]
+        if sid.tag == SEQUENCE:
+            issuer, serial = sid.children
+            self.signer_issuer = issuer.der
+            self.signer_serial = serial.as_int()
+            self.signer_key_id = None
+        else:
+            self.signer_issuer = self.signer_serial = None
+            self.signer_key_id = sid.contents
+        self.digest_algorithm = hash_name_of(signer_info[2])
+        signed_attrs = signer_info[3]
+        if signed_attrs.tag != CONTEXT_0:
+            raise TimestampError('Timestamp token has no signed attributes')
+        # The signature is over the DER of the attributes tagged as a SET
+        self.signed_attrs_der = bytes(bytearray([SET])) + signed_attrs.der[1:]
+        self.signed_attrs = {}
+        for attribute in signed_attrs.children:
+            attr_type, values = attribute.expect(SEQUENCE).children
+            self.signed_attrs[attr_type.as_oid()] = values.expect(SET).children
+        self.signature = signer_info[5].expect(OCTET_STRING).contents
+
+    def _parse_tst_info(self, tst_info):
+        self.version = tst_info[0].as_int()
+        self.policy = tst_info[1].as_oid()
+        hash_algorithm, hashed_message = tst_info[2].expect(SEQUENCE).children
+        self.imprint_algorithm = hash_name_of(hash_algorithm)
+        self.imprint = hashed_message.expect(OCTET_STRING).contents
+        self.serial_number = tst_info[3].as_int()
+        self.gen_time = tst_info[4].expect(GENERALIZED_TIME).contents.decode('ascii')
+
+    def signed_attr(self, oid):
+        values = self.signed_attrs.get(oid)
+        return values[0] if values else None
+
+
+def hash_name_of(algorithm_identifier):
+    oid = algorithm_identifier.expect(SEQUENCE).children[0].as_oid()
+    if oid not in HASH_NAMES:
+        raise TimestampError('Unsupported hash algorithm: {}'.format(oid))
+    return HASH_NAMES[oid]
+
+
+def parse_response(der):
+    """Return the PKIStatus and the DER TimeStampToken (or None) of a DER TimeStampResp."""
+    if not der:
+        raise TimestampError('Empty timestamp response')
+    try:
+        response = decode(der).expect(SEQUENCE).children
+        status = response[0].expect(SEQUENCE).children[0].as_int()
+    except IndexError:
+        raise TimestampError('Malformed timestamp response')
+    token = response[1].der if len(response) > 1 else None
+    return status, token
+
+
+class Certificate(object):
+    """A certificate, with the raw DER names used to build chains."""
+
+    def __init__(self, der):
+        self.der = der
+        self.cert = x509.load_der_x509_certificate(der, default_backend())
+        tbs = decode(der).expect(SEQUENCE).children[0].expect(SEQUENCE).children
+        if tbs[0].tag == CONTEXT_0:
+            tbs = tbs[1:]
+        self.serial = tbs[0].as_int()
+        self.issuer = tbs[2].der
+        self.subject = tbs[4].der
+
+    @property
+    def key_id(self):
+        try:
+            return self.cert.extensions.get_extension_for_oid(ExtensionOID.SUBJECT_KEY_IDENTIFIER).value.digest
+        except x509.ExtensionNotFound:
+            return None
+
+    def check_validity(self, now):
+        if not self.cert.not_valid_before <= now <= self.cert.not_valid_after:
+            raise TimestampError('Certificate {} is not valid at {}'.format(self.cert.subject, now))
+
+    def check_issued_by(self, issuer):
+        verify_signature(issuer.cert.public_key(), self.cert.signature, self.cert.tbs_certificate_bytes,
+                         self.cert.signature_hash_algorithm)
+
+    def check_ca(self, intermediates, anchor=False):
+        """Check the certificate may issue certificates, with `intermediates` CA certificates
+        below it in the chain. Like openssl, trusted certificates without basic constraints
+        (version 1 roots) are accepted.
+        """
+        extensions = self.cert.extensions
+        try:
+            constraints = extensions.get_extension_for_oid(ExtensionOID.BASIC_CONSTRAINTS).value
+        except x509.ExtensionNotFound:
+            constraints = None
+        if (constraints is None and not anchor) or (constraints is not None and not constraints.ca):
+            raise TimestampError('Invalid CA certificate {}'.format(self.cert.subject))
+        if constraints is not None and constraints.path_length is not None and intermediates > constraints.path_length:
+            raise TimestampError('Path length constraint exceeded by {}'.format(self.cert.subject))
+        try:
+            key_usage = extensions.get_extension_for_oid(ExtensionOID.KEY_USAGE).value
+        except x509.ExtensionNotFound:
+            return
+        if not key_usage.key_cert_sign:
+            raise TimestampError('Key usage of {} does not allow signing certificates'.format(self.cert.subject))
+
+    def check_timestamping(self):
+        """Check the extended key usage of the certificate is (only) timestamping, and critical."""
+        try:
+            extension = self.cert.extensions.get_extension_for_oid(ExtensionOID.EXTENDED_KEY_USAGE)
+        except x509.ExtensionNotFound:
+            raise TimestampError('Signer certificate is not a timestamping certificate')
+        if not extension.critical or list(extension.value) != [ExtendedKeyUsageOID.TIME_STAMPING]:
+            raise TimestampError('Signer certificate is not a timestamping certificate')
+
+
+def verify_signature(public_key, signature, data, algorithm):
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature, data, padding.PKCS1v15(), algorithm)
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(signature, data, ec.ECDSA(algorithm))
+        else:
+            raise TimestampError('Unsupported public key type')
+    except InvalidSignature:
+        raise TimestampError('Invalid signature')
+
+
+def load_trusted(ca_file):
+    """Return the certificates of the PEM file `ca_file`, parsed once per process while the
+    file is unchanged.
+    """
+    try:
+        mtime = os.path.getmtime(ca_file)
+    except OSError:
+        raise TimestampError('CA file not found: {}'.format(ca_file))
+    with _trusted_lock:
+        if ca_file in _trusted and _trusted[ca_file][0] == mtime:
+            return _trusted[ca_file][1]
+    with open(ca_file, 'rb') as f:
+        certificates = [
+            Certificate(base64.b64decode(b''.join(block.split())))
+            for block in PEM_CERTIFICATE.findall(f.read())
+        ]
+    with _trusted_lock:
+        _trusted[ca_file] = (mtime, certificates)
+    return certificates
+
+
+def find_signer(token, certificates):
+    for certificate in certificates:
+        if token.signer_key_id is not None:
+            if certificate.key_id == token.signer_key_id:
+                return certificate
+        elif certificate.issuer == token.signer_issuer and certificate.serial == token.signer_serial:
+            return certificate
+    raise TimestampError('Signer certificate not found in timestamp token')
+
+
+def check_chain(signer, untrusted, trusted, now):
+    """Check that `signer` chains up to one of the `trusted` certificates, through issuers that
+    are CA certificates allowed to sign certificates at their depth.
+    """
+    certificate = signer
+    # CA certificates between the signer and the issuer being checked, for path length constraints
+    intermediates = 0
+    for _ in range(MAX_CHAIN_LENGTH):
+        certificate.check_validity(now)
+        if any(certificate.der == anchor.der for anchor in trusted):
+            return
+        for issuer in trusted + untrusted:
+            if issuer.subject == certificate.issuer and issuer.der != certificate.der:
+                try:
+                    certificate.check_issued_by(issuer)
+                except TimestampError:
+                    continue
+                break
+        else:
+            raise TimestampError('Unable to get issuer certificate of {}'.format(certificate.cert.subject))
+        anchor = any(issuer.der == other.der for other in trusted)
+        issuer.check_ca(intermediates, anchor=anchor)
+        if anchor:
+            issuer.check_validity(now)
+            return
+        # Self-issued certificates do not count towards path lengths (RFC 5280 4.2.1.9)
+        if issuer.subject != issuer.issuer:
+            intermediates += 1
+        certificate = issuer
+    raise TimestampError('Certificate chain too long')
+
+
+def check_signing_certificate(token, signer):
+    """Check the ESS signing certificate attribute of the token names the signer certificate."""
+    signing_certificate = token.signed_attr(OID_SIGNING_CERTIFICATE)
+    if signing_certificate is not None:
+        cert_id = signing_certificate.expect(SEQUENCE).children[0].expect(SEQUENCE).children[0]
+        hash_name = 'sha1'
+        cert_hash = cert_id.expect(SEQUENCE).children[0].expect(OCTET_STRING).contents
+    else:
+        signing_certificate = token.signed_attr(OID_SIGNING_CERTIFICATE_V2)
+        if signing_certificate is None:
+            raise TimestampError('Timestamp token has no signing certificate attribute')
+        cert_id = signing_certificate.expect(SEQUENCE).children[0].expect(SEQUENCE).children[0]
+        parts = cert_id.expect(SEQUENCE).children
+        hash_name = 'sha256'
+        if parts[0].tag == SEQUENCE:
+            hash_name = hash_name_of(parts[0])
+            parts = parts[1:]
+        cert_hash = parts[0].expect(OCTET_STRING).contents
+    if hashlib.new(hash_name, signer.der).digest() != cert_hash:
+        raise TimestampError('Signing certificate attribute does not match the signer certificate')
+
+
+def verify_token(token_der, digest, hash_name, ca_file, now=None):
+    """Verify the DER TimeStampToken `token_der` stamps the hex `digest`, and is signed by a
+    timestamping certificate trusted by the certificates of `ca_file`.
+
+    :return TimestampToken: The verified token
+    :raises TimestampError: If the token does not verify
+    """
+    try:
+        return _verify_token(token_der, digest, hash_name, ca_file, now or datetime.datetime.utcnow())
+    except (IndexError, ValueError) as e:
+        # Missing or mistyped elements and undecodable certificates
+        raise TimestampError('Malformed timestamp token: {}'.format(e))
+
+
+def _verify_token(token_der, digest, hash_name, ca_file, now):
+    trusted = load_trusted(ca_file)
+    token = TimestampToken(token_der)
+    if token.version != 1:
+        raise TimestampError('Unsupported TSTInfo version: {}'.format(token.version))
+
+    certificates = [Certificate(der) for der in token.certificates]
+    signer = find_signer(token, certificates + trusted)
+    signer.check_timestamping()
+    check_signing_certificate(token, signer)
+    check_chain(signer, certificates, trusted, now)
+
+    content_type = token.signed_attr(OID_CONTENT_TYPE)
+    if content_type is None or content_type.as_oid() != OID_TST_INFO:
+        raise TimestampError('Content type attribute does not match the TSTInfo')
+    message_digest = token.signed_attr(OID_MESSAGE_DIGEST)
+    tst_info_digest = hashlib.new(token.digest_algorithm, token.tst_info_der).digest()
+    if message_digest is None or message_digest.expect(OCTET_STRING).contents != tst_info_digest:
+        raise TimestampError('Message digest attribute does not match the TSTInfo')
+    verify_signature(signer.cert.public_key(), token.signature, token.signed_attrs_der,
+                     getattr(hashes, token.digest_algorithm.upper())())
+
+    if token.imprint_algorithm != hash_name:
+        raise TimestampError('Message imprint algorithm mismatch: {}'.format(token.imprint_algorithm))
+    try:
+        expected = binascii.unhexlify(digest)
+    except (TypeError, ValueError):
+        raise TimestampError('Invalid digest: {}'.format(digest))
+    if token.imprint != expected:
+        raise TimestampError('Message imprint mismatch')
+    return token
+
+
+def verify_response(response_der, digest, hash_name, ca_file, now=None):
+    """Verify the DER TimeStampResp `response_der` was granted, and that its token verifies with
+    `verify_token`.
+
+    :return TimestampToken: The verified token
+    :raises TimestampError: If the response does not verify
+    """
+    status, token = parse_response(response_der)
+    if status not in GRANTED or token is None:
+        raise TimestampError('Timestamp request was rejected with status {}'.format(status))
+    return verify_token(token, digest, hash_name, ca_file, now=now)
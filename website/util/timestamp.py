@@ -28,7 +28,7 @@ from osf.models import (
 from osf.models.nodelog import NodeLog
 from website import util
 from website import settings
-from website.util import waterbutler
+from website.util import rfc3161, waterbutler
 
 from django.contrib.contenttypes.models import ContentType
 from framework.celery_tasks import app as celery_app
@@ -233,13 +233,15 @@ def get_full_list(uid, pid, node):
     '''Get a full list of timestamps from all files uploaded to a storage.
     '''
     user_info = OSFUser.objects.get(id=uid)
-    cookie = user_info.get_or_create_cookie()
+    cookie = user_info.get_service_cookie()
 
     api_url = util.api_v2_url('nodes/{}/files'.format(pid))
     headers = {'content-type': 'application/json'}
     cookies = {settings.COOKIE_NAME: cookie}
 
-    file_res = requests.get(api_url, headers=headers, cookies=cookies)
+    # Service credentials are only accepted by WaterButler, API v2 authenticates sessions
+    api_cookies = {settings.COOKIE_NAME: user_info.get_or_create_cookie()}
+    file_res = requests.get(api_url, headers=headers, cookies=api_cookies)
     provider_json_res = file_res.json()
     file_res.close()
     provider_list = []
@@ -328,7 +330,7 @@ def check_file_timestamp(uid, node, data, verify_external_only=False):
             return TimeStampTokenVerifyCheckHash.timestamp_check(
                 ext_info, user._id, data, node._id)
 
-    cookie = user.get_or_create_cookie()
+    cookie = user.get_service_cookie()
     tmp_dir = None
     result = None
     try:
@@ -541,7 +543,7 @@ def add_token(uid, node, data):
             return AddTimestampHash.add_timestamp(
                 user._id, data, node._id, ext_info)
 
-    cookie = user.get_or_create_cookie()
+    cookie = user.get_service_cookie()
     tmp_dir = None
 
     # Check access to provider
@@ -583,13 +585,13 @@ def add_token(uid, node, data):
 
 def get_file_info(cookie, file_node, version):
     headers = {'content-type': 'application/json'}
-    file_data_request = requests.get(
+    file_data_response = waterbutler.metadata(
         file_node.generate_waterbutler_url(
             version=version.identifier, meta='', _internal=True
         ), headers=headers, cookies={settings.COOKIE_NAME: cookie}
     )
-    if file_data_request.status_code == 200:
-        file_data = file_data_request.json().get('data')
+    if file_data_response:
+        file_data = file_data_response.get('data')
         file_info = {
             'provider': file_node.provider,
             'file_id': file_node._id,
@@ -876,29 +878,23 @@ def file_node_gone(project_id, addon_name, src_path):
 
 def waterbutler_folder_file_info(pid, provider, path, node, cookies, headers):
     # get waterbutler folder file
-    if provider == 'osfstorage':
-        waterbutler_meta_url = waterbutler_api_url_for(
-            pid, provider,
-            '/' + path,
-            meta=int(time.mktime(datetime.datetime.now().timetuple()))
-        )
-    else:
-        waterbutler_meta_url = waterbutler_api_url_for(
-            pid, provider,
-            path,
-            meta=int(time.mktime(datetime.datetime.now().timetuple()))
-        )
+    meta = int(time.mktime(datetime.datetime.now().timetuple()))
+
+    def url_for(folder_path):
+        if provider == 'osfstorage':
+            folder_path = '/' + folder_path
+        return waterbutler_api_url_for(pid, provider, folder_path, meta=meta)
+
+    listings = waterbutler.walk(url_for, path=path, headers=headers, cookies=cookies)
+    return _folder_file_info(listings, path, provider, node)
 
-    waterbutler_res = requests.get(waterbutler_meta_url, headers=headers, cookies=cookies)
-    waterbutler_json_res = waterbutler_res.json()
-    waterbutler_res.close()
+def _folder_file_info(listings, path, provider, node):
     file_list = []
     child_file_list = []
-    for file_data in waterbutler_json_res['data']:
+    for file_data in listings.get(path) or ():
         if file_data['attributes']['kind'] == 'folder':
-            child_file_list.extend(waterbutler_folder_file_info(
-                pid, provider, file_data['attributes']['path'],
-                node, cookies, headers))
+            child_file_list.extend(_folder_file_info(
+                listings, file_data['attributes']['path'], provider, node))
         else:
             basefile_node = BaseFileNode.resolve_class(
                 provider,
@@ -1017,13 +1013,8 @@ def get_timestamp_verify_result(file_id, project_id, provider, path, inspection_
 class AddTimestamp:
     #1 create tsq (timestamp request) from file, and keyinfo
     def get_timestamp_request(self, file_name):
-        cmd = shlex.split(api_settings.SSL_CREATE_TIMESTAMP_REQUEST.format(filename_formatter(file_name)))
-        process = subprocess.Popen(
-            cmd, shell=False, stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        stdout_data, stderr_data = process.communicate()
-        return stdout_data
+        digest = rfc3161.digest_file(file_name, HASH_TYPE_SHA512)
+        return rfc3161.build_request(digest, HASH_TYPE_SHA512)
 
     #2 send tsq to TSA, and recieve tsr (timestamp token)
     def get_timestamp_response(self, file_name, ts_request_file, key_file):
@@ -1260,31 +1251,18 @@ class TimeStampTokenVerifyCheck:
 
         if STATUS_IS_NO_ERROR(ret):
             if not api_settings.USE_UPKI:
-                timestamptoken_file = user_guid + '.tsr'
-                timestamptoken_file_path = os.path.join(tmp_dir, timestamptoken_file)
-                with open(timestamptoken_file_path, 'wb') as fout:
-                    fout.write(verify_result.timestamp_token)
-
                 # verify timestamptoken and rootCA (FreeTSA)
-                cmd = shlex.split(api_settings.SSL_GET_TIMESTAMP_RESPONSE.format(
-                    filename_formatter(file_name),
-                    timestamptoken_file_path,
-                    os.path.join(api_settings.KEY_SAVE_PATH, api_settings.VERIFY_ROOT_CERTIFICATE)
-                ))
-                # exec timestamptoken verification
                 try:
-                    prc = subprocess.Popen(
-                        cmd, shell=False, stdin=subprocess.PIPE,
-                        stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-                    stdout_data, stderr_data = prc.communicate()
-                    ret = api_settings.TIME_STAMP_TOKEN_UNCHECKED
-                    if stdout_data.__str__().find(api_settings.OPENSSL_VERIFY_RESULT_OK) > -1:
-                        ret = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS
-                        verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS_MSG  # 'OK'
-                    else:
-                        logger.error('timestamp verification error occured.({}:{}) : {}'.format(verify_result.provider, filename_formatter(file_name), stderr_data))
-                        ret = api_settings.TIME_STAMP_TOKEN_CHECK_NG
-                        verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_NG_MSG  # 'NG'
+                    rfc3161.verify_response(
+                        verify_result.timestamp_token,
+                        rfc3161.digest_file(file_name, HASH_TYPE_SHA512),
+                        HASH_TYPE_SHA512, verify_root_certificate_path())
+                    ret = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS
+                    verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS_MSG  # 'OK'
+                except rfc3161.TimestampError as err:
+                    logger.error('timestamp verification error occured.({}:{}) : {}'.format(verify_result.provider, filename_formatter(file_name), err))
+                    ret = api_settings.TIME_STAMP_TOKEN_CHECK_NG
+                    verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_NG_MSG  # 'NG'
                 except Exception as err:
                     logger.error('timestamp verification error occured.({}:{}) : {}'.format(verify_result.provider, filename_formatter(file_name), err))
                     ret = api_settings.TIME_STAMP_VERIFICATION_ERR
@@ -1399,7 +1377,7 @@ class AddTimestampHash:
     def _generate_timestamp(cls, ext_info):
         try:
             if not api_settings.USE_UPKI:
-                req_out = cls.gen_timestamp_request(ext_info)
+                req_out = cls._gen_timestamp_request(ext_info)
                 tsa_response = cls._gen_timestamp_response(req_out)
             else:
                 tsa_response = cls._gen_timestamp_upki(ext_info)
@@ -1410,16 +1388,8 @@ class AddTimestampHash:
 
     @classmethod
     def _gen_timestamp_request(cls, ext_info):
-        digest = ext_info.hash_value
-        digest_type = hash_type_to_openssl_digest_type(ext_info.hash_type)
-        fmt = api_settings.SSL_CREATE_TIMESTAMP_HASH_REQUEST
-        cmd = shlex.split(fmt.format(digest=digest, digest_type=digest_type))
-        DEBUG(str(cmd))
-        process = subprocess.Popen(
-            cmd, shell=False, stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout_data, stderr_data = process.communicate()
-        return stdout_data
+        check_hash_type(ext_info.hash_type)
+        return rfc3161.build_request(ext_info.hash_value, ext_info.hash_type)
 
     @classmethod
     def _gen_timestamp_response(cls, ts_request):
@@ -1460,43 +1430,32 @@ class AddTimestampHash:
 class TimeStampTokenVerifyCheckHash:
     @classmethod
     def _verify(cls, tmp_dir, ext_info, user_guid, project_id, verify_result):
-        timestamptoken_file = user_guid + '.tmp'
-        timestamptoken_file_path = os.path.join(
-            tmp_dir, timestamptoken_file)
-        with open(timestamptoken_file_path, 'wb') as fout:
-            fout.write(select_timestamp_token(verify_result, ext_info))
-        DEBUG('TIMESTAMP TOKEN filesize={}'.format(os.path.getsize(timestamptoken_file_path)))
+        timestamp_token = select_timestamp_token(verify_result, ext_info)
         digest = ext_info.hash_value
         ret = api_settings.TIME_STAMP_TOKEN_UNCHECKED
         if not api_settings.USE_UPKI:
-            digest_type = hash_type_to_openssl_digest_type(ext_info.hash_type)
-            fmt = api_settings.SSL_GET_TIMESTAMP_HASH_RESPONSE
-            cmd = shlex.split(fmt.format(
-                digest=digest,
-                digest_type=digest_type,
-                input=timestamptoken_file_path,
-                ca=os.path.join(api_settings.KEY_SAVE_PATH,
-                                api_settings.VERIFY_ROOT_CERTIFICATE)
-            ))
-            DEBUG(str(cmd))
+            check_hash_type(ext_info.hash_type)
             try:
-                prc = subprocess.Popen(
-                    cmd, shell=False, stdin=subprocess.PIPE,
-                    stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-                stdout_data, stderr_data = prc.communicate()
-                ret = api_settings.TIME_STAMP_TOKEN_UNCHECKED
-                if stdout_data.__str__().find(api_settings.OPENSSL_VERIFY_RESULT_OK) > -1:
-                    ret = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS
-                    verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS_MSG  # 'OK'
-                else:
-                    logger.error('timestamp verification error occured.({}) : {}'.format(verify_result.provider, stderr_data))
-                    ret = api_settings.TIME_STAMP_TOKEN_CHECK_NG
-                    verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_NG_MSG  # 'file modified'
+                rfc3161.verify_response(
+                    timestamp_token, digest, ext_info.hash_type,
+                    verify_root_certificate_path())
+                ret = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS
+                verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_SUCCESS_MSG  # 'OK'
+            except rfc3161.TimestampError as err:
+                logger.error('timestamp verification error occured.({}) : {}'.format(verify_result.provider, err))
+                ret = api_settings.TIME_STAMP_TOKEN_CHECK_NG
+                verify_result_title = api_settings.TIME_STAMP_TOKEN_CHECK_NG_MSG  # 'file modified'
             except Exception as err:
                 logger.error('timestamp verification error occured.({}): {}'.format(verify_result.provider, err))
                 ret = api_settings.TIME_STAMP_VERIFICATION_ERR
                 verify_result_title = api_settings.TIME_STAMP_VERIFICATION_ERR_MSG  # 'NG'
         else:  # USE_UPKI=True
+            timestamptoken_file = user_guid + '.tmp'
+            timestamptoken_file_path = os.path.join(
+                tmp_dir, timestamptoken_file)
+            with open(timestamptoken_file_path, 'wb') as fout:
+                fout.write(timestamp_token)
+            DEBUG('TIMESTAMP TOKEN filesize={}'.format(os.path.getsize(timestamptoken_file_path)))
             hash_type_to_upki_digest_type(ext_info.hash_type)  # check only
             fmt = api_settings.UPKI_VERIFY_TIMESTAMP_HASH
             cmd = shlex.split(fmt.format(
@@ -1547,14 +1506,14 @@ class TimeStampTokenVerifyCheckHash:
                 ext_info, file_info, verify_result, project_id, user_id)
 
         if STATUS_IS_NO_ERROR(ret):
-            tmp_dir = tempfile.mkdtemp()
+            # only the uPKI tool reads the token from a file
+            tmp_dir = tempfile.mkdtemp() if api_settings.USE_UPKI else None
             try:
                 verify_result, verify_result_title, ret = cls._verify(
                     tmp_dir, ext_info, user_guid, project_id, verify_result)
-            except Exception:
-                shutil.rmtree(tmp_dir)
-                raise
-            shutil.rmtree(tmp_dir)
+            finally:
+                if tmp_dir:
+                    shutil.rmtree(tmp_dir)
         return TimeStampTokenVerifyCheck.generate_verify_result(
             baseFileNode, file_info, user_id,
             verify_result, verify_result_title, ret)
@@ -1563,14 +1522,12 @@ class TimeStampTokenVerifyCheckHash:
 HASH_TYPE_SHA256 = 'sha256'
 HASH_TYPE_SHA512 = 'sha512'
 
-def hash_type_to_openssl_digest_type(hash_type):
-    if hash_type == HASH_TYPE_SHA512:
-        digest_type = '-sha512'
-    elif hash_type == HASH_TYPE_SHA256:
-        digest_type = '-sha256'
-    else:
+def check_hash_type(hash_type):
+    if hash_type not in (HASH_TYPE_SHA256, HASH_TYPE_SHA512):
         raise Exception('unknown hash_type: ' + hash_type)
-    return digest_type
+
+def verify_root_certificate_path():
+    return os.path.join(api_settings.KEY_SAVE_PATH, api_settings.VERIFY_ROOT_CERTIFICATE)
 
 def hash_type_to_upki_digest_type(hash_type):
     if hash_type == HASH_TYPE_SHA512:
@@ -1608,7 +1565,7 @@ class ExternalInfo():
     @property
     def file_exists(self):
         if self._file_exists is None:
-            cookie = self.user.get_or_create_cookie()
+            cookie = self.user.get_service_cookie()
             file_info = waterbutler.get_node_info(
                 cookie, self.node._id,
                 self.file_node.provider, self.file_node.path)
@@ -1623,10 +1580,9 @@ class ExternalInfo():
     def _init_hash(self):
         # return (hash_type, hash_value)
         def get():
-            func = getattr(self.file_node, 'get_hash_for_timestamp', None)
-            if func is None:
+            if self.file_node.is_deleted or not BaseFileNode.supports_hash_timestamp(self.file_node.provider):
                 return None, None  # unsupported -> downloading file
-            return func()
+            return self.file_node.get_hash_for_timestamp()
 
         self.hash_type, self.hash_value = get()
 
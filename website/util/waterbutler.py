@@ -1,13 +1,195 @@
 # -*- coding: utf-8 -*-
+"""Client for the WaterButler API.
 
-import requests
-import shutil
+Requests to WaterButler go through one pooled `requests.Session` per process, so connections
+are kept alive between requests, and share the same timeouts and retries of idempotent
+requests on connection and gateway errors. `metadata_many` and `walk` fetch many listings
+and `upload_folder_recursive` uploads folder trees with bounded concurrency, and the latency of the requests is counted per endpoint (see
+`get_stats`).
+"""
+import cookielib
+import logging
 import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from api.base.utils import waterbutler_api_url_for
 from website import settings
-import logging
+
 logger = logging.getLogger(__name__)
 
+# Requests retried on gateway errors; other requests are only retried if they could not connect
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_STATUSES = (502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """Return the pooled session of this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_maxsize=settings.WATERBUTLER_POOL_SIZE,
+                max_retries=Retry(
+                    total=settings.WATERBUTLER_MAX_RETRIES,
+                    backoff_factor=settings.WATERBUTLER_RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    method_whitelist=RETRY_METHODS,
+                    raise_on_status=False,
+                ),
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            # The session is shared by all users, cookies are passed with each request instead
+            session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+            _session = session
+        return _session
+
+
+def _record(endpoint, seconds, failed):
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        stats['requests'] += 1
+        stats['errors'] += int(failed)
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+
+def get_stats():
+    """Return the request counters of this process by endpoint: requests sent, requests that
+    failed or got an error response, and total and maximum seconds until the response headers
+    were received.
+    """
+    with _stats_lock:
+        return {endpoint: dict(stats) for endpoint, stats in _stats.items()}
+
+
+def request(method, url, endpoint, **kwargs):
+    """Send a request to WaterButler over the pooled session, with `settings.WATERBUTLER_TIMEOUT`
+    unless a timeout is given.
+
+    :param str endpoint: Name the request is counted under in `get_stats`, e.g. 'metadata'
+    :raises requests.exceptions.RequestException: If no response was received
+    """
+    kwargs.setdefault('timeout', settings.WATERBUTLER_TIMEOUT)
+    start = time.time()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        _record(endpoint, time.time() - start, True)
+        raise
+    _record(endpoint, time.time() - start, response.status_code >= 400)
+    return response
+
+
+def get(url, endpoint, **kwargs):
+    return request('GET', url, endpoint, **kwargs)
+
+
+def put(url, endpoint, **kwargs):
+    return request('PUT', url, endpoint, **kwargs)
+
+
+def post(url, endpoint, **kwargs):
+    return request('POST', url, endpoint, **kwargs)
+
+
+def metadata(url, **kwargs):
+    """Return the parsed metadata at `url`, or None if WaterButler did not return it."""
+    try:
+        response = get(url, 'metadata', **kwargs)
+    except requests.exceptions.RequestException as err:
+        logger.error(err)
+        return None
+    try:
+        if response.status_code != requests.codes.ok:
+            return None
+        return response.json()
+    finally:
+        response.close()
+
+
+def map_concurrent(func, items, concurrency=None):
+    """Return `[func(item) for item in items]`, calling `func` for up to `concurrency`
+    (default `settings.WATERBUTLER_CONCURRENCY`) items at a time. `func` is called in other
+    threads, so it must not use the database.
+    """
+    items = list(items)
+    concurrency = min(concurrency or settings.WATERBUTLER_CONCURRENCY, len(items))
+    if concurrency <= 1:
+        return [func(item) for item in items]
+    pool = ThreadPool(concurrency)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def metadata_many(urls, concurrency=None, **kwargs):
+    """Return the parsed metadata at each of `urls` as `metadata` would, fetching up to
+    `concurrency` of them at a time.
+    """
+    return map_concurrent(lambda url: metadata(url, **kwargs), urls, concurrency=concurrency)
+
+
+def walk(url_for, path='/', concurrency=None, max_requests=None, **kwargs):
+    """List the folder at `path` and all folders below it, one level of the tree at a time,
+    with up to `concurrency` listings fetched at once.
+
+    :param url_for: Function returning the metadata URL of a folder, given its path
+    :param int max_requests: Stop listing after this many folders
+    :return dict: The entries of each listed folder by path, None for folders that could
+        not be listed
+    """
+    listings = {}
+    level = [path]
+    while level:
+        if max_requests is not None:
+            level = level[:max(max_requests - len(listings), 0)]
+        results = metadata_many([url_for(folder) for folder in level], concurrency=concurrency, **kwargs)
+        next_level = []
+        for folder, result in zip(level, results):
+            listings[folder] = result and result.get('data')
+            for entry in listings[folder] or ():
+                child = entry['attributes']['path']
+                if entry['attributes']['kind'] == 'folder' and child not in listings:
+                    next_level.append(child)
+        level = next_level
+    return listings
+
+
+def iter_download(url, chunk_size=None, **kwargs):
+    """Return an iterator over the contents of the file at `url`, streamed in chunks of
+    `chunk_size` (default `settings.WATERBUTLER_CHUNK_SIZE`) bytes, or None if WaterButler
+    did not return the file.
+    """
+    response = get(url, 'download', stream=True, **kwargs)
+    if response.status_code != requests.codes.ok:
+        response.close()
+        return None
+    return _iter_content(response, chunk_size or settings.WATERBUTLER_CHUNK_SIZE)
+
+
+def _iter_content(response, chunk_size):
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            yield chunk
+    finally:
+        response.close()
+
+
 def download_file(osf_cookie, file_node, download_path, **kwargs):
     """Download an waterbutler file by streaming its contents while saving,
     so we do not waste memory.
@@ -18,64 +200,87 @@ def download_file(osf_cookie, file_node, download_path, **kwargs):
     assert download_filename
 
     full_path = os.path.join(download_path, download_filename)
-    file_info = get_node_info(osf_cookie, file_node.target._id, file_node.provider, file_node.path)
-    if file_info is None:
-        return None
-
     try:
-        response = requests.get(
+        content = iter_download(
             file_node.generate_waterbutler_url(action='download', direct=None, **kwargs),
             cookies={settings.COOKIE_NAME: osf_cookie},
-            stream=True
         )
     except Exception as err:
         logger.error(err)
         return None
+    if content is None:
+        return None
 
     with open(full_path, 'wb') as f:
-        shutil.copyfileobj(response.raw, f)
-
-    response.close()
+        for chunk in content:
+            f.write(chunk)
     return full_path
 
-def upload_folder_recursive(osf_cookie, pid, local_path, dest_path):
-    """Upload all the content (files and folders) inside a folder.
+def upload_folder_recursive(osf_cookie, pid, local_path, dest_path, concurrency=None):
+    """Upload all the content (files and folders) inside a folder, one level of the folder
+    tree at a time. The folders and files of a level are sent with up to `concurrency`
+    requests at once, after the folders they are uploaded to were created.
+
+    :return dict: The number of files and folders that could not be uploaded, and in 'items'
+        the result of each file and folder: its local path, kind, the status code of the
+        request and the WaterButler id it was created with, or the error if it could not be sent
     """
     count = {
         'fail_file': 0,
-        'fail_folder': 0
+        'fail_folder': 0,
+        'items': [],
     }
-    content_list = os.listdir(local_path)
-
-    for item_name in content_list:
-        full_path = os.path.join(local_path, item_name)
-
-        # Upload folder
-        if os.path.isdir(full_path):
-            folder_response = create_folder(osf_cookie, pid, item_name, dest_path)
-            if folder_response.status_code == requests.codes.created:
-                folder_id = folder_response.json()['data']['id']
-                rec_response = upload_folder_recursive(osf_cookie, pid, full_path, folder_id)
-                count['fail_file'] += rec_response['fail_file']
-                count['fail_folder'] += rec_response['fail_folder']
-            else:
-                count['fail_folder'] += 1
-
-        # Upload file
-        else:
-            file_response = upload_file(osf_cookie, pid, full_path, item_name, dest_path)
-            if file_response.status_code != requests.codes.created:
-                count['fail_file'] += 1
+    level = [(local_path, dest_path)]
+    while level:
+        uploads = []
+        for folder_path, folder_dest_path in level:
+            for item_name in os.listdir(folder_path):
+                full_path = os.path.join(folder_path, item_name)
+                kind = 'folder' if os.path.isdir(full_path) else 'file'
+                uploads.append((kind, full_path, item_name, folder_dest_path))
+        # Folders first, so the uploads of the next level can start as early as possible
+        uploads.sort(key=lambda upload: upload[0] != 'folder')
 
+        level = []
+        results = map_concurrent(lambda upload: _upload_item(osf_cookie, pid, *upload), uploads, concurrency=concurrency)
+        for (kind, full_path, _, _), result in zip(uploads, results):
+            count['items'].append(result)
+            if result['id'] is None:
+                count['fail_' + kind] += 1
+            elif kind == 'folder':
+                level.append((full_path, result['id']))
     return count
 
+def _upload_item(osf_cookie, pid, kind, full_path, item_name, dest_path):
+    result = {
+        'path': full_path,
+        'kind': kind,
+        'status_code': None,
+        'id': None,
+    }
+    try:
+        if kind == 'folder':
+            response = create_folder(osf_cookie, pid, item_name, dest_path)
+        else:
+            response = upload_file(osf_cookie, pid, full_path, item_name, dest_path)
+    except requests.exceptions.RequestException as err:
+        logger.error(err)
+        result['error'] = str(err)
+        return result
+    result['status_code'] = response.status_code
+    if response.status_code == requests.codes.created:
+        result['id'] = response.json()['data']['id']
+    response.close()
+    return result
+
 def create_folder(osf_cookie, pid, folder_name, dest_path):
     dest_arr = dest_path.split('/')
-    response = requests.put(
+    response = put(
         waterbutler_api_url_for(
             pid, dest_arr[0], path='/' + os.path.join(*dest_arr[1:]),
             name=folder_name, kind='folder', meta='', _internal=True
         ),
+        'create_folder',
         cookies={
             'osf': osf_cookie
         }
@@ -86,11 +291,12 @@ def upload_file(osf_cookie, pid, file_path, file_name, dest_path):
     response = None
     dest_arr = dest_path.split('/')
     with open(file_path, 'r') as f:
-        response = requests.put(
+        response = put(
             waterbutler_api_url_for(
                 pid, dest_arr[0], path='/' + os.path.join(*dest_arr[1:]),
                 name=file_name, kind='file', _internal=True
             ),
+            'upload',
             data=f,
             cookies={
                 'osf': osf_cookie
@@ -99,20 +305,10 @@ def upload_file(osf_cookie, pid, file_path, file_name, dest_path):
     return response
 
 def get_node_info(osf_cookie, pid, provider, path):
-    try:
-        response = requests.get(
-            waterbutler_api_url_for(
-                pid, provider, path=path, _internal=True, meta=''
-            ),
-            headers={'content-type': 'application/json'},
-            cookies={'osf': osf_cookie}
-        )
-    except Exception as err:
-        logger.error(err)
-        return None
-
-    content = None
-    if response.status_code == 200:
-        content = response.json()
-    response.close()
-    return content
+    return metadata(
+        waterbutler_api_url_for(
+            pid, provider, path=path, _internal=True, meta=''
+        ),
+        headers={'content-type': 'application/json'},
+        cookies={'osf': osf_cookie}
+    )
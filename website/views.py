@@ -32,6 +32,7 @@ from website.settings import EXTERNAL_EMBER_APPS, PROXY_EMBER_APPS, EXTERNAL_EMB
 from website.ember_osf_web.decorators import ember_flag_is_active
 from website.ember_osf_web.views import use_ember_app
 from website.project.model import has_anonymous_link
+from website.project.utils import sizeof_fmt
 from osf.utils import permissions
 
 from api.waffle.utils import flag_is_active, storage_i18n_flag_active
@@ -103,6 +104,13 @@ def serialize_node_summary(node, auth, primary=True, show_path=False):
         'is_embargoed': node.is_embargoed if is_registration else False,
         'archiving': node.archiving if is_registration else False,
     }
+    if summary['archiving']:
+        progress = node.archive_job.progress
+        if progress['size']:
+            summary['archive_progress'] = {
+                'archived': sizeof_fmt(progress['archived']),
+                'size': sizeof_fmt(progress['size']),
+            }
 
     parent_node = node.parent_node
     user = auth.user